@@ -1,11 +1,50 @@
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 import sqlite3
 import json
 import datetime 
+import collections
+import queue
+import threading
+import os
+import time
+import uuid
+import zlib
+import base64
+import hashlib
+import hmac
+import gzip
+import tempfile
+import stat
+import select
+import random
+import logging
+import urllib.parse
+import urllib.request
+import http.client
+import http.server
+import contextlib
+import concurrent.futures
+import functools
+import itertools
+import io
+import textwrap
+import argparse
+import csv
+import sys
+import re
+import unicodedata
 import pandas as pd 
-from PIL import Image 
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    import zstandard  # Opcional: compresión zstd de las exportaciones
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("reportes_camiones")
 
 # --- Configuración de la apariencia ---
 # ⭐️ CAMBIO: Se establece el modo "Light" para tener un fondo blanco
@@ -14,6 +53,26 @@ ctk.set_default_color_theme("blue")
 
 # --- Constantes y Configuración de DB ---
 DB_NAME = "reportes_camiones.db"
+LOGO_PATH = "logo.png"
+
+# Clientes (multi-inquilino): cada cliente tiene su carpeta <TENANTS_DIR>/<cliente>/ con su
+# propia DB, fotos, cola de envíos, respaldos, exportación e instantánea de análisis
+TENANTS_DIR = "clientes"
+TENANT = None              # Cliente activo (None = instalación de un solo cliente en la carpeta actual)
+
+# Búsqueda de reportes mientras se escribe
+SEARCH_DEBOUNCE_MS = 250   # Espera tras la última tecla antes de buscar
+SEARCH_POLL_MS = 15        # Intervalo de revisión de resultados en segundo plano (~1 frame)
+SEARCH_CACHE_SIZE = 16     # Resultados recientes guardados en la caché LRU
+
+# Sincronización con la base central (None = depósito sin sincronización)
+SYNC_SERVER_URL = None     # Ej: "http://servidor-central:8765"
+SYNC_BATCH_SIZE = 500      # Cambios por lote enviado/recibido
+SYNC_TIMEOUT_S = 30
+SYNC_TOKEN = None          # Clave compartida con la base central (obligatoria para sincronizar)
+SYNC_MAX_BODY_BYTES = 8 << 20       # Tamaño máximo de un lote recibido (comprimido)
+SYNC_MAX_PAYLOAD_BYTES = 64 << 20   # Tamaño máximo de un lote una vez descomprimido
+
 # Definición de los ítems del checklist (Tomado del formato PEM 360)
 CHECKLIST_ITEMS = [
     ("Niveles", ["Líquido refrigerante", "Líquido de frenos", "Nivel de aceite", "Nivel líquido hidráulico", "Depósito limpiaparabrisas"]),
@@ -25,10 +84,13 @@ CHECKLIST_ITEMS = [
     ("Imagen", ["Pintura", "Faldones", "Valla (ambos lados)"])
 ]
 
-def inicializar_db():
-    """Crea las tablas necesarias y usuarios por defecto."""
-    conn = sqlite3.connect(DB_NAME)
+def inicializar_db(db_name=None, backend=None):
+    """Crea las tablas necesarias y usuarios por defecto (backend: por defecto, el configurado)."""
+    conn = (backend or get_storage_backend()).connect(db_name)
     cursor = conn.cursor()
+
+    # Las DB nuevas nacen con vacuum incremental (en una existente solo aplica tras un VACUUM)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
     
     # 1. Tabla de usuarios (con el ID del vehículo asignado)
     cursor.execute("""
@@ -70,18 +132,60 @@ def inicializar_db():
         FOREIGN KEY (driver_id) REFERENCES users (id)
     )
     """)
+
+    # 4. Registro de cambios para la sincronización con la base central
+    install_sync_schema(cursor)
+
+    # 5. Serie de lecturas de odómetro por vehículo
+    install_odometer_schema(cursor)
+
+    # 6. Órdenes de trabajo generadas por ítems en "Mal estado"
+    install_work_order_schema(cursor)
+
+    # 7. Calendario diario de inspecciones (cumplimiento)
+    install_compliance_schema(cursor)
+
+    # 8. Referencias a fotos de evidencia (los archivos viven fuera de la DB)
+    install_photo_schema(cursor)
+
+    # 9. Bitácora de mantenimiento
+    install_maintenance_schema(cursor)
+
+    # 10. Auditoría de cambios administrativos (solo inserción)
+    install_audit_schema(cursor)
+
+    # 11. Historial de asignaciones vehículo-piloto
+    install_assignment_schema(cursor)
+
+    # 12. Envíos idempotentes (id de envío y hash de contenido)
+    install_submission_schema(cursor)
+
+    # 13. Agregados de inspecciones por día/semana/mes
+    install_rollup_schema(cursor)
+
+    # 14. Índice invertido de etiquetas de las observaciones
+    install_observation_schema(cursor)
+
+    # 15. Instantáneas de reportes (detalle y exportación sin joins)
+    install_snapshot_schema(cursor)
+
+    # 16. Último reporte por vehículo (captura rápida del checklist)
+    install_quick_entry_schema(cursor)
     
-    # Crear usuario Admin de ejemplo si no existe
+    # 17. Cambio de contraseña obligatorio (usuarios de ejemplo)
+    install_credential_schema(cursor)
+
+    # Crear usuario Admin de ejemplo si no existe (debe cambiar la contraseña al ingresar)
     try:
-        cursor.execute("INSERT INTO users (username, password, full_name, role) VALUES (?, ?, ?, ?)", 
-                       ("admin", "super", "Administrador", "admin"))
+        cursor.execute("INSERT INTO users (username, password, full_name, role, must_change_password) VALUES (?, ?, ?, ?, 1)", 
+                       ("admin", DEFAULT_CREDENTIALS["admin"], "Administrador", "admin"))
     except sqlite3.IntegrityError:
         pass 
         
-    # Crear usuario Piloto de ejemplo si no existe
+    # Crear usuario Piloto de ejemplo si no existe (debe cambiar la contraseña al ingresar)
     try:
-        cursor.execute("INSERT INTO users (username, password, full_name, role, assigned_vehicle_plate) VALUES (?, ?, ?, ?, ?)", 
-                       ("piloto1", "1234", "Juan Pérez", "piloto", "C123456"))
+        cursor.execute("INSERT INTO users (username, password, full_name, role, assigned_vehicle_plate, must_change_password) VALUES (?, ?, ?, ?, ?, 1)", 
+                       ("piloto1", DEFAULT_CREDENTIALS["piloto1"], "Juan Pérez", "piloto", "C123456"))
     except sqlite3.IntegrityError:
         pass 
         
@@ -97,868 +201,6443 @@ def inicializar_db():
     except sqlite3.IntegrityError:
         pass
 
+    # Las asignaciones de versiones anteriores (y la de ejemplo) pasan al historial
+    migrate_legacy_assignments(cursor)
+
+    # Las contraseñas nunca quedan en texto plano (incluye las de ejemplo y las de versiones anteriores)
+    migrate_plaintext_passwords(cursor)
+
     conn.commit()
     conn.close()
 
-# --- Ventana de Detalles de Reporte (Para Admin) ---
+# --- Credenciales: Hash de Contraseñas y Límite de Intentos ---
+
+PASSWORD_SCHEME = "scrypt"
+PASSWORD_SCRYPT_N = 2 ** 14   # Costo (CPU/memoria). ~50 ms por verificación en un equipo de oficina
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_SALT_BYTES = 16
+
+LOGIN_MAX_ATTEMPTS = 5        # Intentos fallidos permitidos por usuario...
+LOGIN_WINDOW_S = 300          # ...dentro de esta ventana de tiempo
+LOGIN_LOCKOUT_S = 300         # Bloqueo tras superar el límite
+LOGIN_POLL_MS = 15            # Revisión del resultado de la verificación (hilo de fondo)
+LOGIN_TRACKED_USERS = 10000   # Usuarios con fallos recientes que se recuerdan (los más antiguos se olvidan)
+
+DEFAULT_CREDENTIALS = {"admin": "super", "piloto1": "1234"}   # Usuarios de ejemplo creados por inicializar_db
+
+def hash_password(password, n=None, r=None, p=None):
+    """Devuelve el hash con sal en formato 'scrypt$n$r$p$sal$hash' (base64)."""
+    n, r, p = n or PASSWORD_SCRYPT_N, r or PASSWORD_SCRYPT_R, p or PASSWORD_SCRYPT_P
+    salt = os.urandom(PASSWORD_SALT_BYTES)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=32)
+    return "$".join([PASSWORD_SCHEME, str(n), str(r), str(p),
+                     base64.b64encode(salt).decode("ascii"), base64.b64encode(digest).decode("ascii")])
+
+def is_password_hash(stored):
+    return bool(stored) and stored.startswith(PASSWORD_SCHEME + "$")
+
+# Verificaciones exitosas recientes: evita repetir scrypt en inicios de sesión repetidos
+# (p. ej. cambios de turno en la misma estación). La clave es un HMAC con un secreto del
+# proceso, de modo que la caché no contiene contraseñas ni hashes reutilizables.
+_VERIFY_CACHE_SECRET = os.urandom(32)
+_VERIFY_CACHE_SIZE = 64
+_verify_cache = collections.OrderedDict()
+_verify_cache_lock = threading.Lock()
+
+def verify_password(password, stored):
+    """
+    Comprueba una contraseña contra el valor guardado. Devuelve (válida, requiere_rehash).
+    Acepta filas antiguas en texto plano (requiere_rehash=True) para migrarlas al iniciar sesión.
+    """
+    if not stored:
+        return False, False
+    if not is_password_hash(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
 
-class ReportDetailWindow(ctk.CTkToplevel):
-    def __init__(self, master, report_data):
-        super().__init__(master)
-        self.title(f"Detalles del Reporte ID: {report_data['ID']}")
-        self.geometry("700x600")
-        self.transient(master)  
-        self.report_data = report_data
-        
-        self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(0, weight=1)
+    cache_key = hmac.new(_VERIFY_CACHE_SECRET, f"{stored}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+    with _verify_cache_lock:
+        if cache_key in _verify_cache:
+            _verify_cache.move_to_end(cache_key)
+            return True, False
 
-        self.scrollable_frame = ctk.CTkScrollableFrame(self)
-        self.scrollable_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.scrollable_frame.grid_columnconfigure(0, weight=1)
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        digest = hashlib.scrypt(password.encode("utf-8"), salt=base64.b64decode(salt), n=n, r=r, p=p, dklen=32)
+    except (ValueError, TypeError):
+        return False, False
+    if not hmac.compare_digest(digest, base64.b64decode(expected)):
+        return False, False
+
+    with _verify_cache_lock:
+        _verify_cache[cache_key] = True
+        while len(_verify_cache) > _VERIFY_CACHE_SIZE:
+            _verify_cache.popitem(last=False)
+    needs_rehash = (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return True, needs_rehash
+
+def install_credential_schema(cursor):
+    """
+    Agrega users.must_change_password. Al agregarla, los usuarios de ejemplo que siguen con
+    la contraseña de fábrica quedan obligados a cambiarla en el próximo inicio de sesión.
+    """
+    cursor.execute("PRAGMA table_info(users)")
+    if "must_change_password" in {row[1] for row in cursor.fetchall()}:
+        return
+    cursor.execute("ALTER TABLE users ADD COLUMN must_change_password INTEGER NOT NULL DEFAULT 0")
+    for username, default_password in DEFAULT_CREDENTIALS.items():
+        cursor.execute("SELECT id, password FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        if row and verify_password(default_password, row[1])[0]:
+            cursor.execute("UPDATE users SET must_change_password = 1 WHERE id = ?", (row[0],))
+
+def change_password(user_id, new_password, db_name=None):
+    """Guarda una nueva contraseña elegida por el propio usuario y quita la obligación de cambiarla."""
+    if not new_password:
+        raise ValueError("La contraseña no puede estar vacía.")
+    conn = open_db(db_name)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT username FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"No se encontró usuario con ID {user_id}.")
+        if DEFAULT_CREDENTIALS.get(row[0]) == new_password:
+            raise ValueError("Elija una contraseña distinta de la de fábrica.")
+        cursor.execute("UPDATE users SET password = ?, must_change_password = 0 WHERE id = ?", (hash_password(new_password), user_id))
+        conn.commit()
+    finally:
+        conn.close()
 
-        self.display_report()
+def migrate_plaintext_passwords(cursor):
+    """Reemplaza las contraseñas guardadas en texto plano por su hash."""
+    cursor.execute("SELECT id, password FROM users WHERE password != '' AND password NOT LIKE ?", (PASSWORD_SCHEME + "$%",))
+    for user_id, password in cursor.fetchall():
+        cursor.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user_id))
 
-    def create_detail_label(self, parent, text, value, row, column=0, font_size=14, weight="normal"):
-        """Función auxiliar para crear etiquetas de detalle."""
-        label_text = f"{text}:"
-        label = ctk.CTkLabel(parent, text=label_text, font=ctk.CTkFont(size=font_size, weight="bold"))
-        label.grid(row=row, column=column, padx=10, pady=(5, 0), sticky="nw")
-        
-        value_label = ctk.CTkLabel(parent, text=value, font=ctk.CTkFont(size=font_size, weight=weight), wraplength=500, justify="left")
-        value_label.grid(row=row, column=column + 1, padx=10, pady=(5, 0), sticky="nw")
+class LoginRateLimiter:
+    """
+    Limita los intentos fallidos de inicio de sesión por nombre de usuario. Los fallos y
+    bloqueos vencidos se descartan, y se recuerdan como máximo max_tracked usuarios, así
+    que la memoria no crece con nombres de usuario inventados.
+    """
 
-    def display_report(self):
-        """Muestra la información detallada del reporte."""
-        
-        # --- Sección de Encabezado ---
-        header = self.report_data['header_data']
-        header_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
-        header_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
-        header_frame.grid_columnconfigure((0, 1), weight=1)
+    def __init__(self, max_attempts=LOGIN_MAX_ATTEMPTS, window_s=LOGIN_WINDOW_S, lockout_s=LOGIN_LOCKOUT_S,
+                 max_tracked=LOGIN_TRACKED_USERS):
+        self.max_attempts = max_attempts
+        self.window_s = window_s
+        self.lockout_s = lockout_s
+        self.max_tracked = max_tracked
+        self._failures = collections.OrderedDict()      # usuario -> deque de instantes de fallo (último fallo al final)
+        self._locked_until = collections.OrderedDict()  # usuario -> instante de fin del bloqueo (en orden de vencimiento)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._failures.keys() | self._locked_until.keys())
+
+    def _evict(self, now):
+        """Descarta lo vencido (los más antiguos están al principio) y lo que supere max_tracked."""
+        while self._failures and now - self._failures[next(iter(self._failures))][-1] > self.window_s:
+            self._failures.popitem(last=False)
+        while self._locked_until and self._locked_until[next(iter(self._locked_until))] <= now:
+            self._locked_until.popitem(last=False)
+        while len(self._failures) > self.max_tracked:
+            self._failures.popitem(last=False)
+        while len(self._locked_until) > self.max_tracked:
+            self._locked_until.popitem(last=False)
+
+    def seconds_locked(self, username):
+        """Segundos restantes de bloqueo para el usuario (0 si puede intentar)."""
+        with self._lock:
+            remaining = self._locked_until.get(username, 0) - time.monotonic()
+            if remaining <= 0:
+                self._locked_until.pop(username, None)
+                return 0
+            return int(remaining) + 1
+
+    def record_failure(self, username):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.pop(username, None) or collections.deque()
+            failures.append(now)
+            while failures and now - failures[0] > self.window_s:
+                failures.popleft()
+            if len(failures) >= self.max_attempts:
+                self._locked_until.pop(username, None)
+                self._locked_until[username] = now + self.lockout_s
+            else:
+                self._failures[username] = failures
+            self._evict(now)
 
-        ctk.CTkLabel(header_frame, text="Detalles del Vehículo y Piloto", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+            self._locked_until.pop(username, None)
 
-        row_counter = 1
-        # Mapeo de campos técnicos a nombres amigables
-        field_map = {
-            "placa": "Placa", "marca": "Marca", "promocion": "Promoción", "fecha": "Fecha", 
-            "km_actual": "Km Actual", "piloto_nombre": "Piloto", "piloto_id": "ID Piloto"
-        }
-        
-        for key, display_name in field_map.items():
-            value = header.get(key, 'N/A')
-            self.create_detail_label(header_frame, display_name, str(value), row_counter, 0)
-            row_counter += 1
+login_rate_limiter = LoginRateLimiter()
 
-        # --- Sección de Checklist ---
-        checklist_data = self.report_data['checklist_data']
-        checklist_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
-        checklist_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
-        checklist_frame.grid_columnconfigure(0, weight=3)
-        checklist_frame.grid_columnconfigure(1, weight=1)
+def login_limiter_key(username):
+    """Clave del límite de intentos: el mismo usuario puede existir en varios clientes."""
+    return (TENANT, username)
 
-        ctk.CTkLabel(checklist_frame, text="Checklist de Inspección", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
-        
-        # Encabezados de la tabla
-        ctk.CTkLabel(checklist_frame, text="Item", font=ctk.CTkFont(weight="bold")).grid(row=1, column=0, sticky="w", padx=10)
-        ctk.CTkLabel(checklist_frame, text="Resultado", font=ctk.CTkFont(weight="bold")).grid(row=1, column=1, sticky="w", padx=10)
-        
-        row_counter = 2
-        
-        # Reagrupar los ítems por categoría para una mejor visualización
-        categorized_checklist = {}
-        for cat, items in CHECKLIST_ITEMS:
-            for item in items:
-                if item in checklist_data:
-                    if cat not in categorized_checklist:
-                        categorized_checklist[cat] = {}
-                    categorized_checklist[cat][item] = checklist_data[item]
+def authenticate_user(username, password, db_name=None):
+    """
+    Valida las credenciales. Devuelve (id, full_name, role, is_active, must_change_password)
+    o None si son incorrectas.
+    Lanza ValueError si el usuario está bloqueado por demasiados intentos fallidos.
+    Las contraseñas en texto plano o con parámetros antiguos se re-hashean al validarse.
+    """
+    limiter_key = login_limiter_key(username)
+    locked = login_rate_limiter.seconds_locked(limiter_key)
+    if locked:
+        raise ValueError(f"Demasiados intentos fallidos. Intente de nuevo en {locked} segundos.")
 
-        for categoria, items in categorized_checklist.items():
-            # Etiqueta de Categoría
-            ctk.CTkLabel(checklist_frame, text=f"--- {categoria.upper()} ---", 
-                         font=ctk.CTkFont(weight="bold", size=13), text_color="gray").grid(row=row_counter, column=0, columnspan=2, sticky="w", padx=10, pady=(5, 0))
-            row_counter += 1
+    conn = open_db(db_name)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, full_name, role, is_active, must_change_password, password FROM users WHERE username = ?",
+                       (username,))
+        user_data = cursor.fetchone()
+        if user_data is None:
+            # Mismo costo que con un usuario existente (no revela qué usuarios existen)
+            verify_password(password, _get_dummy_password_hash())
+            login_rate_limiter.record_failure(limiter_key)
+            return None
 
-            for item, status in items.items():
-                ctk.CTkLabel(checklist_frame, text=item, anchor="w").grid(row=row_counter, column=0, sticky="w", padx=10, pady=2)
-                
-                # Color del estado: N/A en azul
-                color = "green" if status == "Buen estado" else "red" if status == "Mal estado" else "blue"
-                ctk.CTkLabel(checklist_frame, text=status, text_color=color, font=ctk.CTkFont(weight="bold")).grid(row=row_counter, column=1, sticky="w", padx=10, pady=2)
-                row_counter += 1
+        valid, needs_rehash = verify_password(password, user_data[5])
+        if not valid:
+            login_rate_limiter.record_failure(limiter_key)
+            return None
 
-        # --- Sección de Observaciones y Confirmación ---
-        obs_conf_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
-        obs_conf_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
-        obs_conf_frame.grid_columnconfigure(0, weight=1)
+        if needs_rehash:
+            cursor.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user_data[0]))
+            conn.commit()
+        login_rate_limiter.reset(limiter_key)
+        return user_data[:5]
+    finally:
+        conn.close()
 
-        # Observaciones
-        ctk.CTkLabel(obs_conf_frame, text="Observaciones", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, sticky="w", padx=10, pady=(10, 5))
-        obs_text = self.report_data['observations'] if self.report_data['observations'] else "Sin observaciones adicionales."
-        ctk.CTkLabel(obs_conf_frame, text=obs_text, justify="left", wraplength=600).grid(row=1, column=0, sticky="w", padx=10, pady=(0, 10))
+_dummy_password_hash = None
 
-        # Confirmación
-        ctk.CTkLabel(obs_conf_frame, text="Confirmación de Piloto (Firma)", font=ctk.CTkFont(size=16, weight="bold")).grid(row=2, column=0, sticky="w", padx=10, pady=(10, 5))
-        ctk.CTkLabel(obs_conf_frame, text=self.report_data['signature_confirmation'], justify="left", wraplength=600, text_color="green").grid(row=3, column=0, sticky="w", padx=10, pady=(0, 10))
+def _get_dummy_password_hash():
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password("")
+    return _dummy_password_hash
 
+def benchmark_login(iterations=20):
+    """
+    Mide la latencia de inicio de sesión con los parámetros de costo actuales, sobre una
+    base temporal. Devuelve un dict con tiempos en milisegundos.
+    """
+    import statistics
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "benchmark_login.db")
+        inicializar_db(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO users (username, password, full_name, role) VALUES (?, ?, ?, 'piloto')",
+                     ("benchmark_user", hash_password("benchmark_pass"), "Benchmark"))
+        conn.commit()
+        conn.close()
 
-# --- Clase de la Interfaz de Administración ---
+        def measure(password):
+            timings = []
+            for _ in range(iterations):
+                _verify_cache.clear()
+                login_rate_limiter.reset(login_limiter_key("benchmark_user"))
+                start = time.perf_counter()
+                authenticate_user("benchmark_user", password, db_path)
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+
+        ok_times = measure("benchmark_pass")
+        bad_times = measure("incorrecta")
+        authenticate_user("benchmark_user", "benchmark_pass", db_path)  # Deja la verificación en caché
+        start = time.perf_counter()
+        for _ in range(iterations):
+            authenticate_user("benchmark_user", "benchmark_pass", db_path)
+        cached_ms = (time.perf_counter() - start) * 1000 / iterations
+        login_rate_limiter.reset(login_limiter_key("benchmark_user"))
+
+    return {
+        "scrypt_n": PASSWORD_SCRYPT_N, "scrypt_r": PASSWORD_SCRYPT_R, "scrypt_p": PASSWORD_SCRYPT_P,
+        "login_ok_median_ms": statistics.median(ok_times),
+        "login_ok_max_ms": max(ok_times),
+        "login_failed_median_ms": statistics.median(bad_times),
+        "login_cached_ms": cached_ms,
+    }
+
+# --- Kilometraje por Vehículo (Odómetro) ---
+
+ODOMETER_MAX_KM_PER_DAY = 1500   # Más que esto entre dos lecturas se considera un salto improbable
+KM_PERIOD_FORMATS = {"dia": "%Y-%m-%d", "semana": "%Y-W%W", "mes": "%Y-%m"}
+
+def install_odometer_schema(cursor):
+    """Crea la serie de lecturas de odómetro (numérica e indexada) y la llena con los reportes existentes."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'odometer_readings'")
+    is_new = cursor.fetchone() is None
 
-class AdminFrame(ctk.CTkFrame):
-    def __init__(self, master, app_instance):
-        super().__init__(master)
-        self.app = app_instance
-        self.grid(row=0, column=0, sticky="nsew") 
-        self.grid_columnconfigure(0, weight=1)
-        
-        # --- Frame del encabezado (para el logo y el botón de Logout) ---
-        header_frame = ctk.CTkFrame(self, fg_color="transparent")
-        header_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(20, 0))
-        header_frame.grid_columnconfigure(0, weight=0) # Logo
-        header_frame.grid_columnconfigure(1, weight=1) # Título
-        header_frame.grid_columnconfigure(2, weight=0) # Botón Logout
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS odometer_readings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle_plate TEXT NOT NULL,
+        reading_date TEXT NOT NULL,
+        km INTEGER NOT NULL,
+        report_id INTEGER,
+        flag TEXT,
+        FOREIGN KEY (report_id) REFERENCES reports (id)
+    )
+    """)
+    # Búsqueda O(log n) de la lectura anterior/siguiente de un vehículo
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_odometer_plate_date ON odometer_readings (vehicle_plate, reading_date, id)")
+
+    if is_new:
+        cursor.execute("""
+            SELECT id, vehicle_plate, report_date, km_actual FROM reports
+            WHERE vehicle_plate IS NOT NULL AND km_actual GLOB '[0-9]*' AND km_actual NOT GLOB '*[^0-9]*'
+            ORDER BY report_date, id
+        """)
+        for report_id, plate, report_date, km in cursor.fetchall():
+            record_odometer_reading(cursor, plate, report_date, km, report_id)
+
+def check_odometer_reading(cursor, plate, reading_date, km):
+    """
+    Compara una lectura con la anterior y la siguiente del mismo vehículo (por fecha).
+    Devuelve una lista de (código, mensaje); vacía si la lectura es coherente.
+    """
+    km = int(km)
+    anomalies = []
 
-        # ⭐️ Logo en Admin
-        if self.app.logo_image:
-            ctk.CTkLabel(header_frame, text="", image=self.app.logo_image).grid(row=0, column=0, rowspan=2, padx=(0, 15), sticky="w")
-        
-        # Título 
-        ctk.CTkLabel(header_frame, text=f"Administrador: {self.app.current_user_name}", font=ctk.CTkFont(size=18, weight="bold")).grid(row=0, column=1, sticky="w")
-        
-        # Botón de Cerrar Sesión 
-        ctk.CTkButton(header_frame, text="Cerrar Sesión", command=self.app.logout, fg_color="darkred", hover_color="red").grid(row=0, column=2, sticky="e")
+    cursor.execute("""
+        SELECT km, reading_date FROM odometer_readings
+        WHERE vehicle_plate = ? AND reading_date <= ? AND flag IS NULL
+        ORDER BY reading_date DESC, id DESC LIMIT 1
+    """, (plate, reading_date))
+    previous = cursor.fetchone()
+    if previous:
+        prev_km, prev_date = previous
+        if km < prev_km:
+            anomalies.append(("regresion", f"El kilometraje ({km}) es menor que la lectura anterior ({prev_km}) del {prev_date}."))
+        else:
+            days = _days_between(prev_date, reading_date)
+            if km - prev_km > ODOMETER_MAX_KM_PER_DAY * max(days, 1):
+                anomalies.append(("salto", f"Aumento de {km - prev_km} km desde la lectura del {prev_date}; parece improbable."))
 
+    # Reporte con fecha anterior a una lectura ya registrada
+    cursor.execute("""
+        SELECT km, reading_date FROM odometer_readings
+        WHERE vehicle_plate = ? AND reading_date > ? AND flag IS NULL
+        ORDER BY reading_date, id LIMIT 1
+    """, (plate, reading_date))
+    following = cursor.fetchone()
+    if following and km > following[0]:
+        anomalies.append(("regresion", f"El kilometraje ({km}) es mayor que una lectura posterior ({following[0]}) del {following[1]}."))
+    return anomalies
+
+def _days_between(start, end):
+    try:
+        return (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+    except ValueError:
+        return 0
+
+def parse_km(value):
+    """Kilometraje como entero, o None si no son solo dígitos ASCII (isdigit acepta '²', que int rechaza)."""
+    text = str(value if value is not None else "").strip()
+    return int(text) if text.isascii() and text.isdigit() else None
+
+def record_odometer_reading(cursor, plate, reading_date, km, report_id=None):
+    """Guarda la lectura (marcando la anomalía si la hay). Ignora kilometrajes no numéricos."""
+    km = parse_km(km)
+    if not plate or km is None:
+        return None
+    anomalies = check_odometer_reading(cursor, plate, reading_date, km)
+    flag = ",".join(sorted({code for code, _ in anomalies})) or None
+    cursor.execute("INSERT INTO odometer_readings (vehicle_plate, reading_date, km, report_id, flag) VALUES (?, ?, ?, ?, ?)",
+                   (plate, reading_date, km, report_id, flag))
+    return flag
+
+def km_summary(period="mes", plate=None, db_name=None):
+    """
+    Kilómetros recorridos por vehículo y período ("dia", "semana" o "mes"), para planificar
+    mantenimientos. Las lecturas marcadas como anómalas no cuentan para la distancia.
+    """
+    fmt = KM_PERIOD_FORMATS[period]
+    plate_filter = "AND vehicle_plate = ?" if plate else ""
+    query = f"""
+    WITH readings AS (
+        SELECT vehicle_plate, strftime(?, reading_date) AS periodo,
+               km - LAG(km) OVER (PARTITION BY vehicle_plate ORDER BY reading_date, id) AS delta,
+               0 AS anomalia
+        FROM odometer_readings WHERE flag IS NULL {plate_filter}
+        UNION ALL
+        SELECT vehicle_plate, strftime(?, reading_date), NULL, 1
+        FROM odometer_readings WHERE flag IS NOT NULL {plate_filter}
+    )
+    SELECT vehicle_plate AS placa, periodo,
+           COALESCE(SUM(CASE WHEN delta > 0 THEN delta END), 0) AS km_recorridos,
+           SUM(1 - anomalia) AS lecturas,
+           SUM(anomalia) AS anomalias
+    FROM readings
+    GROUP BY vehicle_plate, periodo
+    ORDER BY vehicle_plate, periodo
+    """
+    params = [fmt] + ([plate] if plate else []) + [fmt] + ([plate] if plate else [])
+    conn = open_db(db_name)
+    try:
+        return read_sql_df(query, conn, params=params)
+    finally:
+        conn.close()
 
-        # Crear Tabs (Empiezan en la fila 1)
-        self.tabview = ctk.CTkTabview(self, width=850, height=650)
-        self.tabview.grid(row=1, column=0, sticky="nsew", padx=20, pady=20)
-        
-        self.tabview.add("Gestión de Pilotos")
-        self.tabview.add("Gestión de Vehículos") 
-        self.tabview.add("Revisión de Reportes")
-        
-        self.setup_pilot_management_tab()
-        self.setup_vehicle_management_tab() 
-        self.setup_report_review_tab()
+# --- Órdenes de Trabajo de Mantenimiento ---
 
-    # --- Pestaña de Gestión de Pilotos ---
+WORK_ORDER_OPEN = "abierta"
+WORK_ORDER_CLOSED = "cerrada"
 
-    def setup_pilot_management_tab(self):
-        tab = self.tabview.tab("Gestión de Pilotos")
-        tab.grid_columnconfigure(0, weight=1)
-        tab.grid_rowconfigure(0, weight=1)
+def install_work_order_schema(cursor):
+    """Crea la tabla de órdenes de trabajo y la llena una única vez con el historial existente."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'work_orders'")
+    is_new = cursor.fetchone() is None
 
-        # Frame para la tabla de usuarios
-        self.pilot_table_frame = ctk.CTkScrollableFrame(tab, label_text="Usuarios del Sistema")
-        self.pilot_table_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.pilot_table_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1) 
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS work_orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle_plate TEXT NOT NULL,
+        item TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'abierta',
+        opened_report_id INTEGER,
+        last_report_id INTEGER,
+        closed_report_id INTEGER,
+        opened_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        closed_at TEXT,
+        occurrences INTEGER NOT NULL DEFAULT 1,
+        FOREIGN KEY (opened_report_id) REFERENCES reports (id)
+    )
+    """)
+    # Una sola orden abierta por vehículo + ítem (deduplicación)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_work_orders_open_item
+        ON work_orders (vehicle_plate, item) WHERE status = 'abierta'
+    """)
+    # Cola del administrador: órdenes por estado y vehículo
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_work_orders_status_plate ON work_orders (status, vehicle_plate, opened_at)")
+
+    if is_new:
+        cursor.execute("SELECT id, vehicle_plate, report_date, checklist_data FROM reports ORDER BY report_date, id")
+        for report_id, plate, report_date, checklist_json in cursor.fetchall():
+            try:
+                checklist = json.loads(checklist_json) if checklist_json else {}
+            except json.JSONDecodeError:
+                continue
+            update_work_orders(cursor, report_id, plate, report_date, checklist)
+
+def update_work_orders(cursor, report_id, plate, report_date, checklist):
+    """
+    Aplica un reporte a las órdenes de trabajo del vehículo: cada ítem en "Mal estado" abre
+    una orden (o actualiza la ya abierta) y cada ítem en "Buen estado" cierra la suya.
+    Devuelve (órdenes abiertas o actualizadas, órdenes cerradas).
+    """
+    if not plate:
+        return 0, 0
+    failed = [item for item, status in checklist.items() if status == "Mal estado"]
+    cursor.executemany("""
+        INSERT INTO work_orders (vehicle_plate, item, status, opened_report_id, last_report_id, opened_at, updated_at)
+        VALUES (?, ?, 'abierta', ?, ?, ?, ?)
+        ON CONFLICT (vehicle_plate, item) WHERE status = 'abierta'
+        DO UPDATE SET last_report_id = excluded.last_report_id,
+                      updated_at = excluded.updated_at,
+                      occurrences = occurrences + 1
+    """, [(plate, item, report_id, report_id, report_date, report_date) for item in failed])
+
+    # Solo se revisan los ítems con orden abierta (índice parcial), no todo el historial
+    cursor.execute("SELECT item FROM work_orders WHERE vehicle_plate = ? AND status = 'abierta'", (plate,))
+    repaired = [item for (item,) in cursor.fetchall() if checklist.get(item) == "Buen estado"]
+    cursor.executemany("""
+        UPDATE work_orders SET status = 'cerrada', closed_report_id = ?, closed_at = ?, updated_at = ?
+        WHERE vehicle_plate = ? AND item = ? AND status = 'abierta'
+    """, [(report_id, report_date, report_date, plate, item) for item in repaired])
+    return len(failed), len(repaired)
+
+def _next_report_with_status(cursor, plate, item, status, after_id, before_id=None):
+    """Primer reporte del vehículo posterior a after_id (y anterior a before_id) con el ítem en ese estado."""
+    query = """
+        SELECT id, report_date FROM reports
+        WHERE vehicle_plate = ? AND id > ? AND json_valid(checklist_data) AND json_extract(checklist_data, ?) = ?
+    """
+    params = [plate, after_id, f'$."{item}"', status]
+    if before_id is not None:
+        query += " AND id < ?"
+        params.append(before_id)
+    cursor.execute(query + " ORDER BY id LIMIT 1", params)
+    return cursor.fetchone()
+
+def unapply_work_orders(cursor, report_id, plate, checklist):
+    """
+    Inverso de update_work_orders para un reporte que se va a borrar (p. ej. un duplicado):
+    deja las órdenes del vehículo como si ese reporte nunca se hubiera guardado. Los reportes
+    se aplican en orden de id, así que los siguientes del mismo vehículo deciden quién abre,
+    actualiza o cierra cada orden en su lugar.
+    """
+    if not plate:
+        return
+    for item, status in checklist.items():
+        if status == "Mal estado":
+            # La orden que este reporte abrió o actualizó
+            cursor.execute("""
+                SELECT id, opened_report_id, last_report_id, occurrences, status FROM work_orders
+                WHERE vehicle_plate = ? AND item = ? AND opened_report_id <= ? AND last_report_id >= ?
+            """, (plate, item, report_id, report_id))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            order_id, opened_id, last_id, occurrences, order_status = row
+            if occurrences <= 1:
+                cursor.execute("DELETE FROM work_orders WHERE id = ?", (order_id,))
+                continue
+            cursor.execute("UPDATE work_orders SET occurrences = occurrences - 1 WHERE id = ?", (order_id,))
+            if opened_id == report_id:
+                next_id, next_date = _next_report_with_status(cursor, plate, item, "Mal estado", report_id, last_id + 1)
+                cursor.execute("UPDATE work_orders SET opened_report_id = ?, opened_at = ? WHERE id = ?", (next_id, next_date, order_id))
+            if last_id == report_id:
+                cursor.execute("""
+                    SELECT id, report_date FROM reports
+                    WHERE vehicle_plate = ? AND id >= ? AND id < ? AND json_valid(checklist_data) AND json_extract(checklist_data, ?) = 'Mal estado'
+                    ORDER BY id DESC LIMIT 1
+                """, (plate, opened_id, report_id, f'$."{item}"'))
+                previous_id, previous_date = cursor.fetchone()
+                cursor.execute("UPDATE work_orders SET last_report_id = ? WHERE id = ?", (previous_id, order_id))
+                if order_status == "abierta":
+                    cursor.execute("UPDATE work_orders SET updated_at = ? WHERE id = ?", (previous_date, order_id))
+
+        elif status == "Buen estado":
+            cursor.execute("SELECT id FROM work_orders WHERE closed_report_id = ? AND item = ?", (report_id, item))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            order_id = row[0]
+            # Sin este reporte la orden siguió abierta hasta el próximo "Buen estado"; si antes
+            # otro reporte volvió a fallar el ítem, la orden que abrió es la misma
+            cursor.execute("""
+                SELECT id, opened_report_id, last_report_id, closed_report_id, status, updated_at, closed_at, occurrences
+                FROM work_orders WHERE vehicle_plate = ? AND item = ? AND opened_report_id > ? ORDER BY opened_report_id LIMIT 1
+            """, (plate, item, report_id))
+            next_order = cursor.fetchone()
+            next_good = _next_report_with_status(cursor, plate, item, "Buen estado", report_id,
+                                                 next_order[1] if next_order else None)
+            if next_good:
+                cursor.execute("UPDATE work_orders SET closed_report_id = ?, closed_at = ?, updated_at = ? WHERE id = ?",
+                               (next_good[0], next_good[1], next_good[1], order_id))
+            elif next_order:
+                cursor.execute("DELETE FROM work_orders WHERE id = ?", (next_order[0],))
+                cursor.execute("""
+                    UPDATE work_orders SET last_report_id = ?, closed_report_id = ?, status = ?, updated_at = ?, closed_at = ?,
+                                           occurrences = occurrences + ?
+                    WHERE id = ?
+                """, (*next_order[2:], order_id))
+            else:
+                cursor.execute("""
+                    UPDATE work_orders SET status = 'abierta', closed_report_id = NULL, closed_at = NULL,
+                                           updated_at = (SELECT report_date FROM reports WHERE id = last_report_id)
+                    WHERE id = ?
+                """, (order_id,))
+
+def get_open_work_orders(cursor, plate=None):
+    """Órdenes abiertas (todas o de una placa), ordenadas por vehículo y antigüedad."""
+    query = """
+        SELECT id, vehicle_plate, item, opened_at, updated_at, occurrences, last_report_id
+        FROM work_orders WHERE status = 'abierta'
+    """
+    params = []
+    if plate:
+        query += " AND vehicle_plate = ?"
+        params.append(plate)
+    query += " ORDER BY vehicle_plate, opened_at"
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def close_work_order(cursor, order_id):
+    """Cierre manual (p. ej. reparación confirmada por el taller). Devuelve True si estaba abierta."""
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    cursor.execute("UPDATE work_orders SET status = 'cerrada', closed_at = ?, updated_at = ? WHERE id = ? AND status = 'abierta'",
+                   (today, today, order_id))
+    return cursor.rowcount > 0
+
+# --- Cumplimiento de Inspecciones Diarias ---
+
+COMPLIANCE_GRID_DAYS = 7   # Días mostrados en la grilla de cumplimiento
+
+def install_compliance_schema(cursor):
+    """Crea el índice por fecha de reportes y el calendario diario de inspecciones por vehículo."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_date_plate ON reports (report_date, vehicle_plate)")
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inspection_calendar'")
+    is_new = cursor.fetchone() is None
+    # Una fila por día y vehículo inspeccionado (clave = día, placa: los rangos de fechas son búsquedas por índice)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS inspection_calendar (
+        day TEXT NOT NULL,
+        vehicle_plate TEXT NOT NULL,
+        driver_id INTEGER,
+        report_count INTEGER NOT NULL DEFAULT 1,
+        first_report_id INTEGER,
+        PRIMARY KEY (day, vehicle_plate)
+    ) WITHOUT ROWID
+    """)
+    if is_new:
+        cursor.execute("""
+            INSERT INTO inspection_calendar (day, vehicle_plate, driver_id, report_count, first_report_id)
+            SELECT report_date, vehicle_plate, driver_id, COUNT(*), MIN(id)
+            FROM reports WHERE vehicle_plate IS NOT NULL
+            GROUP BY report_date, vehicle_plate
+        """)
+
+def record_inspection_day(cursor, plate, day, driver_id, report_id):
+    """Marca el día como inspeccionado para el vehículo (llamado al guardar cada reporte)."""
+    if not plate or not day:
+        return
+    cursor.execute("""
+        INSERT INTO inspection_calendar (day, vehicle_plate, driver_id, report_count, first_report_id)
+        VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT (day, vehicle_plate) DO UPDATE SET report_count = report_count + 1
+    """, (day, plate, driver_id, report_id))
 
-        # Frame para las acciones (Añadir/Editar/Desactivar/Eliminar)
-        action_frame = ctk.CTkFrame(tab, border_width=1)
-        action_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
-        action_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5, 6), weight=1) 
+def _assignment_overlaps(alias, day_start, day_end):
+    """Condición SQL: la asignación estuvo vigente en algún momento de [day_start, day_end)."""
+    return f"{alias}.valid_from < {day_end} AND ({alias}.valid_to IS NULL OR {alias}.valid_to > {day_start})"
 
-        ctk.CTkLabel(action_frame, text="ID Usuario (Editar/Desactivar/Eliminar):").grid(row=0, column=0, padx=5, pady=5)
-        self.entry_user_id = ctk.CTkEntry(action_frame, width=50)
-        self.entry_user_id.grid(row=0, column=1, padx=5, pady=5, sticky="w")
-        
-        ctk.CTkLabel(action_frame, text="Nombre Completo:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
-        self.entry_full_name = ctk.CTkEntry(action_frame)
-        self.entry_full_name.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+def get_missing_inspections(cursor, day=None):
+    """
+    Vehículos asignados en el día indicado (hoy por defecto) según el historial de
+    asignaciones y sin reporte ese día: [(placa, piloto_id, piloto)]. Si el vehículo cambió
+    de piloto durante el día se muestra el último.
+    """
+    day = datetime.date.fromisoformat(day or datetime.date.today().strftime("%Y-%m-%d"))
+    day_start, day_end = f"{day.isoformat()}T00:00:00", (day + datetime.timedelta(days=1)).isoformat()
+    cursor.execute(f"""
+        SELECT a.plate, u.id, u.full_name
+        FROM assignments a
+        JOIN users u ON u.id = a.user_id
+        LEFT JOIN inspection_calendar c ON c.day = :day AND c.vehicle_plate = a.plate
+        WHERE c.vehicle_plate IS NULL AND {_assignment_overlaps("a", ":start", ":end")}
+          AND a.id = (SELECT a2.id FROM assignments a2 WHERE a2.plate = a.plate AND {_assignment_overlaps("a2", ":start", ":end")}
+                      ORDER BY a2.valid_from DESC, a2.id DESC LIMIT 1)
+        ORDER BY a.plate
+    """, {"day": day.isoformat(), "start": day_start, "end": day_end})
+    return cursor.fetchall()
+
+def compliance_grid(day_from, day_to, db_name=None):
+    """
+    Grilla de cumplimiento: una fila por vehículo con asignación en el rango y una columna
+    por día, con True si hubo inspección, False si estaba asignado y no la hubo, y <NA> los
+    días en que no tenía piloto (según el historial de asignaciones). Incluye la columna
+    'piloto' (el último del rango) y el porcentaje 'cumplimiento' sobre los días asignados.
+    """
+    days = pd.date_range(day_from, day_to, freq="D").strftime("%Y-%m-%d").tolist()
+    if not days:
+        return pd.DataFrame(columns=["piloto", "cumplimiento"])
+    day_starts = np.array([f"{day}T00:00:00" for day in days], dtype=object)
+    day_ends = np.array([(datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat() for day in days], dtype=object)
+    conn = open_db(db_name)
+    try:
+        assigned = read_sql_df(f"""
+            SELECT a.plate AS placa, u.full_name AS piloto, a.valid_from, a.valid_to
+            FROM assignments a LEFT JOIN users u ON u.id = a.user_id
+            WHERE {_assignment_overlaps("a", "?", "?")}
+            ORDER BY a.plate, a.valid_from, a.id
+        """, conn, params=(day_ends[-1], day_starts[0]))
+        done = read_sql_df("SELECT day, vehicle_plate FROM inspection_calendar WHERE day BETWEEN ? AND ?",
+                                 conn, params=(days[0], days[-1]))
+    finally:
+        conn.close()
 
-        ctk.CTkLabel(action_frame, text="Usuario (login):").grid(row=1, column=3, padx=5, pady=5, sticky="w")
-        self.entry_username = ctk.CTkEntry(action_frame)
-        self.entry_username.grid(row=1, column=4, padx=5, pady=5, sticky="ew")
+    # Días cubiertos por cada asignación (las de un vehículo no se solapan)
+    valid_from = assigned["valid_from"].to_numpy(dtype=object)[:, None]
+    valid_to = assigned["valid_to"].to_numpy(dtype=object)[:, None]
+    open_ended = assigned["valid_to"].isna().to_numpy()[:, None]
+    covered = (valid_from < day_ends) & (open_ended | (np.where(open_ended, "", valid_to) > day_starts))
+    plates = pd.Index(assigned["placa"].unique(), name="placa")
+    on_duty = pd.DataFrame(covered, columns=days).groupby(assigned["placa"].values).any().reindex(plates)
+
+    inspected = pd.DataFrame(False, index=plates, columns=days)
+    done = done[done["vehicle_plate"].isin(plates)]
+    for day, day_plates in done.groupby("day")["vehicle_plate"]:
+        inspected.loc[day_plates.values, day] = True
+    grid = inspected.astype("boolean").where(on_duty.values, pd.NA)
+    grid.insert(0, "piloto", assigned.groupby("placa")["piloto"].last().reindex(plates).values)
+    grid["cumplimiento"] = (grid[days].astype("Float64").mean(axis=1, skipna=True) * 100).round(1).astype(float)
+    return grid
+
+# --- Tendencias de Inspección (Agregados por Período) ---
+#
+# Conteos de estados por período (los mismos de KM_PERIOD_FORMATS), vehículo, promoción e
+# ítem, actualizados al guardar cada reporte: una tendencia de varios años lee unos miles
+# de filas indexadas en lugar de recorrer reports y decodificar cada checklist.
+# La fila con item = '' cuenta reportes: good = sin fallas, bad = con al menos una falla.
+
+ROLLUP_REPORT_ITEM = ""
+ROLLUP_CHUNK_SIZE = 5000
+TREND_CHART_BUCKETS = {"dia": 60, "semana": 52, "mes": 36}   # Períodos mostrados en el gráfico
+CHECKLIST_ITEM_CATEGORY = {item: category for category, items in CHECKLIST_ITEMS for item in items}
+
+def install_rollup_schema(cursor):
+    """Crea los agregados por período y los llena una única vez con los reportes existentes."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inspection_rollups'")
+    is_new = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS inspection_rollups (
+        period TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        vehicle_plate TEXT NOT NULL,
+        promotion TEXT NOT NULL DEFAULT '',
+        item TEXT NOT NULL,
+        reports INTEGER NOT NULL DEFAULT 0,
+        good INTEGER NOT NULL DEFAULT 0,
+        bad INTEGER NOT NULL DEFAULT 0,
+        na INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, vehicle_plate, item, bucket, promotion)
+    ) WITHOUT ROWID
+    """)
+    # Tendencias de toda la flota o de una promoción, por ítem, sin recorrer los vehículos
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rollups_item ON inspection_rollups (period, item, bucket)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rollups_promotion ON inspection_rollups (period, promotion, item, bucket)")
+
+    # Promoción del vehículo al momento del reporte: los agregados incrementales y los
+    # recalculados la usan por igual aunque después cambie la del vehículo
+    cursor.execute("PRAGMA table_info(reports)")
+    if "promotion" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE reports ADD COLUMN promotion TEXT")
+        # Los reportes existentes: la del encabezado guardado o, si no está, la actual del vehículo
+        cursor.execute("""
+            UPDATE reports SET promotion = COALESCE(
+                CASE WHEN json_valid(header_data) THEN NULLIF(NULLIF(json_extract(header_data, '$.promocion'), ''), 'N/A') END,
+                (SELECT v.promotion FROM vehicles v WHERE v.plate = reports.vehicle_plate), '')
+        """)
+        if not is_new:
+            cursor.execute("DELETE FROM inspection_rollups")  # Calculados con la promoción actual
+            is_new = True
+    if is_new:
+        _build_rollups(cursor)
+
+def _rollup_rows(plate, promotion, report_date, checklist, sign=1):
+    """Filas (period, bucket, placa, promoción, ítem, reports, good, bad, na) que aporta un reporte."""
+    try:
+        day = datetime.datetime.strptime(report_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return []
+    statuses = {item: STATUS_CODES.get(status, STATUS_NA) for item, status in checklist.items() if item in CHECKLIST_ITEM_CATEGORY}
+    has_defect = STATUS_BAD in statuses.values()
+    counts = [(ROLLUP_REPORT_ITEM, (sign, 0 if has_defect else sign, sign if has_defect else 0, 0))]
+    counts += [(item, (sign, sign if code == STATUS_GOOD else 0, sign if code == STATUS_BAD else 0, sign if code == STATUS_NA else 0))
+               for item, code in statuses.items()]
+    buckets = [(period, day.strftime(fmt)) for period, fmt in KM_PERIOD_FORMATS.items()]
+    return [(period, bucket, plate, promotion or "", item, *values) for period, bucket in buckets for item, values in counts]
+
+def record_inspection_rollup(cursor, plate, promotion, report_date, checklist, sign=1):
+    """
+    Suma un reporte a los agregados (sign=-1 lo descuenta, p. ej. al borrar un duplicado).
+    promotion es la guardada en el reporte (reports.promotion).
+    """
+    if not plate:
+        return
+    cursor.executemany("""
+        INSERT INTO inspection_rollups (period, bucket, vehicle_plate, promotion, item, reports, good, bad, na)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (period, vehicle_plate, item, bucket, promotion) DO UPDATE SET
+            reports = reports + excluded.reports, good = good + excluded.good,
+            bad = bad + excluded.bad, na = na + excluded.na
+    """, _rollup_rows(plate, promotion, report_date, checklist, sign))
+
+def _build_rollups(cursor):
+    """
+    Calcula todos los agregados recorriendo reports por bloques (solo el JSON se decodifica
+    fila a fila; los conteos se agrupan con pandas) y los inserta de una vez.
+    """
+    cursor.execute("SELECT vehicle_plate, report_date, checklist_data, COALESCE(promotion, '') FROM reports WHERE vehicle_plate IS NOT NULL")
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(ROLLUP_CHUNK_SIZE)
+        if not rows:
+            break
+        checklists = []
+        for _, _, checklist_data, _ in rows:
+            try:
+                checklists.append(json.loads(checklist_data) if checklist_data else {})
+            except json.JSONDecodeError:
+                checklists.append({})
+        chunk = pd.DataFrame.from_records(checklists, columns=CHECKLIST_ITEM_NAMES)
+        chunk["vehicle_plate"] = [row[0] for row in rows]
+        chunk["date"] = pd.to_datetime([row[1] for row in rows], format="%Y-%m-%d", errors="coerce")
+        chunk["promotion"] = [row[3] for row in rows]
+        chunks.append(chunk)
+    if not chunks:
+        return 0
+
+    df = pd.concat(chunks, ignore_index=True).dropna(subset=["date"])
+    status = df[CHECKLIST_ITEM_NAMES]
+    good, bad, present = status.eq("Buen estado"), status.eq("Mal estado"), status.notna()
+    has_defect = bad.any(axis=1)
+    measures = {"reports": present.assign(**{ROLLUP_REPORT_ITEM: True}),
+                "good": good.assign(**{ROLLUP_REPORT_ITEM: ~has_defect}),
+                "bad": bad.assign(**{ROLLUP_REPORT_ITEM: has_defect}),
+                "na": (present & ~good & ~bad).assign(**{ROLLUP_REPORT_ITEM: False})}
+
+    periods = []
+    for period, fmt in KM_PERIOD_FORMATS.items():
+        keys = [df["date"].dt.strftime(fmt).rename("bucket"), df["vehicle_plate"], df["promotion"]]
+        counts = pd.concat({name: frame.astype(np.int64).groupby(keys).sum().stack() for name, frame in measures.items()}, axis=1)
+        counts = counts[counts["reports"] > 0].rename_axis(["bucket", "vehicle_plate", "promotion", "item"]).reset_index()
+        counts.insert(0, "period", period)
+        periods.append(counts)
+    # En el orden de la clave primaria: la inserción recorre la tabla secuencialmente
+    rollups = pd.concat(periods).sort_values(["period", "vehicle_plate", "item", "bucket", "promotion"])
+    columns = ["period", "bucket", "vehicle_plate", "promotion", "item", "reports", "good", "bad", "na"]
+    cursor.executemany(f"INSERT INTO inspection_rollups ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                       rollups[columns].astype(object).to_numpy().tolist())
+    return len(rollups)
+
+def rebuild_inspection_rollups(db_name=None):
+    """
+    Recalcula los agregados desde reports (p. ej. tras corregir datos). Los reportes ya
+    archivados no están en la base y dejan de contar. Devuelve la cantidad de filas.
+    """
+    conn = open_db(db_name, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("DELETE FROM inspection_rollups")
+            rows = _build_rollups(cursor)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return rows
+    finally:
+        conn.close()
 
-        ctk.CTkLabel(action_frame, text="Contraseña:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
-        self.entry_password = ctk.CTkEntry(action_frame)
-        self.entry_password.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+def inspection_trend(period="mes", plate=None, promotion=None, category=None, item=None, since=None, until=None, db_name=None):
+    """
+    Tendencia por período: reportes, ítems evaluados, en buen/mal estado y tasa de defectos
+    (mal / evaluados, en %). Sin ítem ni categoría la tasa es de reportes con alguna falla.
+    since/until son etiquetas de período ("2024-01", "2024-W05", "2024-01-31"), inclusivas.
+    """
+    if period not in KM_PERIOD_FORMATS:
+        raise ValueError(f"Período inválido: {period} (opciones: {', '.join(KM_PERIOD_FORMATS)})")
+    if item:
+        items = [item]
+    elif category:
+        items = [name for name, item_category in CHECKLIST_ITEM_CATEGORY.items() if item_category == category]
+        if not items:
+            raise ValueError(f"Categoría desconocida: {category}")
+    else:
+        items = [ROLLUP_REPORT_ITEM]
+
+    conditions = ["period = ?", f"item IN ({', '.join('?' * len(items))})"]
+    params = [period, *items]
+    for column, value in (("vehicle_plate", plate), ("promotion", promotion)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        conditions.append("bucket >= ?")
+        params.append(since)
+    if until:
+        conditions.append("bucket <= ?")
+        params.append(until)
+
+    conn = open_db(db_name)
+    try:
+        df = read_sql_df(f"""
+            SELECT bucket AS periodo, SUM(good) AS buen_estado, SUM(bad) AS mal_estado, SUM(na) AS na,
+                   SUM(reports) AS registros
+            FROM inspection_rollups WHERE {' AND '.join(conditions)}
+            GROUP BY bucket ORDER BY bucket
+        """, conn, params=params)
+    finally:
+        conn.close()
+    evaluated = df["registros"] if items == [ROLLUP_REPORT_ITEM] else df["buen_estado"] + df["mal_estado"]
+    df["tasa_defectos"] = (100 * df["mal_estado"] / evaluated.where(evaluated > 0)).fillna(0).round(1)
+    return df
 
-        # Botones de Acción
-        ctk.CTkButton(action_frame, text="Añadir Nuevo Piloto", command=lambda: self.manage_user("add")).grid(row=3, column=0, padx=5, pady=10, sticky="ew")
-        ctk.CTkButton(action_frame, text="Actualizar Datos", command=lambda: self.manage_user("update")).grid(row=3, column=1, padx=5, pady=10, sticky="ew")
-        ctk.CTkButton(action_frame, text="Desactivar", fg_color="red", command=lambda: self.toggle_user_status(0)).grid(row=3, column=3, padx=5, pady=10, sticky="ew")
-        ctk.CTkButton(action_frame, text="Activar", fg_color="green", command=lambda: self.toggle_user_status(1)).grid(row=3, column=4, padx=5, pady=10, sticky="ew")
-        
-        # Nuevo botón de ELIMINAR
-        ctk.CTkButton(action_frame, text="ELIMINAR PILOTO", fg_color="darkred", hover_color="red", command=self.delete_user).grid(row=3, column=5, padx=5, pady=10, sticky="ew")
-        
-        self.load_pilot_data()
+# --- Evidencia Fotográfica (Almacén por Contenido) ---
 
-    def load_pilot_data(self):
-        """Carga y muestra la tabla de usuarios."""
-        for widget in self.pilot_table_frame.winfo_children():
-            widget.destroy()
+PHOTO_STORE_DIR = "evidencia_fotos"    # Fuera de la DB: la DB solo guarda el hash
+PHOTO_THUMB_SIZE = (160, 120)
+PHOTO_WORKERS = 2
+PHOTO_FILE_TYPES = [("Imágenes", "*.jpg *.jpeg *.png *.bmp *.gif *.webp"), ("Todos los archivos", "*.*")]
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        # Incluimos la placa asignada
+def install_photo_schema(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_photos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        report_id INTEGER NOT NULL,
+        item TEXT NOT NULL,
+        photo_hash TEXT NOT NULL,
+        original_name TEXT,
+        FOREIGN KEY (report_id) REFERENCES reports (id)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_photos_report ON report_photos (report_id)")
+
+class PhotoStore:
+    """
+    Guarda las fotos en disco con el SHA-256 de su contenido como nombre
+    (<raíz>/ab/abcdef...), de modo que la misma foto adjuntada dos veces se guarda una sola.
+    Las miniaturas se generan en hilos de fondo (<raíz>/miniaturas/ab/abcdef....png).
+    """
+
+    def __init__(self, root=None):
+        self.root = root or PHOTO_STORE_DIR
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=PHOTO_WORKERS, thread_name_prefix="fotos")
+        return self._executor
+
+    def blob_path(self, photo_hash):
+        return os.path.join(self.root, photo_hash[:2], photo_hash)
+
+    def thumbnail_path(self, photo_hash):
+        return os.path.join(self.root, "miniaturas", photo_hash[:2], photo_hash + ".png")
+
+    def ingest(self, source_path):
+        """Copia la foto al almacén (si no estaba ya) y genera su miniatura. Devuelve el hash."""
+        with Image.open(source_path) as image:
+            image.verify()  # Rechaza archivos que no son imágenes antes de guardarlos
+
+        os.makedirs(self.root, exist_ok=True)
+        sha256 = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as out, open(source_path, "rb") as src:
+                for block in iter(lambda: src.read(1024 * 1024), b""):
+                    sha256.update(block)
+                    out.write(block)
+            photo_hash = sha256.hexdigest()
+            target = self.blob_path(photo_hash)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_name, target)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+        self.ensure_thumbnail(photo_hash)
+        return photo_hash
+
+    def ensure_thumbnail(self, photo_hash):
+        """Genera la miniatura si aún no existe. Devuelve su ruta."""
+        thumb = self.thumbnail_path(photo_hash)
+        if not os.path.exists(thumb):
+            os.makedirs(os.path.dirname(thumb), exist_ok=True)
+            with Image.open(self.blob_path(photo_hash)) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail(PHOTO_THUMB_SIZE)
+                fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", suffix=".png", dir=os.path.dirname(thumb))
+                os.close(fd)
+                image.save(tmp_name, "PNG")
+                os.replace(tmp_name, thumb)
+        return thumb
+
+    def load_thumbnail(self, photo_hash):
+        """Devuelve la miniatura como imagen PIL ya cargada en memoria (para crear el CTkImage en la interfaz)."""
+        with Image.open(self.ensure_thumbnail(photo_hash)) as image:
+            image.load()
+            return image.copy()
+
+    def submit_ingest(self, source_path):
+        return self.executor.submit(self.ingest, source_path)
+
+    def submit_thumbnail(self, photo_hash):
+        return self.executor.submit(self.load_thumbnail, photo_hash)
+
+photo_store = PhotoStore()
+
+def attach_report_photos(cursor, report_id, photos):
+    """Guarda las referencias de fotos de un reporte. photos: {ítem: [(hash, nombre original), ...]}."""
+    # Idempotente: reenviar el mismo reporte no duplica sus fotos
+    cursor.executemany("""
+        INSERT INTO report_photos (report_id, item, photo_hash, original_name)
+        SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM report_photos WHERE report_id = ? AND item = ? AND photo_hash = ?)
+    """, [(report_id, item, photo_hash, name, report_id, item, photo_hash)
+          for item, entries in photos.items() for photo_hash, name in entries])
+
+def get_report_photos(cursor, report_id):
+    """[(ítem, hash)] de un reporte, en el orden en que se adjuntaron."""
+    cursor.execute("SELECT item, photo_hash FROM report_photos WHERE report_id = ? ORDER BY id", (report_id,))
+    return cursor.fetchall()
+
+# --- Reportes en PDF (Sin Dependencias Externas) ---
+#
+# Los PDF se escriben directamente (PDF 1.4, fuentes Helvetica estándar, texto en
+# WinAnsi/cp1252), sin bibliotecas externas, para que funcione sin conexión en cualquier
+# estación. La parte fija del formato (logo, títulos, nombres de los ítems, líneas) se
+# arma una sola vez y se cachea como un Form XObject que todas las páginas reutilizan;
+# cada página solo agrega los valores del reporte.
+
+PDF_PAGE_SIZE = (595, 842)     # A4 en puntos
+PDF_MARGIN = 40
+PDF_ROW_HEIGHT = 12
+PDF_RESULT_X = 400
+PDF_BATCH_CHUNK = 25           # Reportes por tarea del pool de procesos
+PDF_STATUS_COLORS = {"Buen estado": (0, 0.5, 0), "Mal estado": (0.8, 0, 0), "N/A": (0, 0, 0.8)}
+
+def _pdf_text(value):
+    """Cadena literal PDF en cp1252 (los caracteres sin equivalente se reemplazan por '?')."""
+    raw = str(value).encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _pdf_draw_text(ops, x, y, text, size=9, bold=False, color=(0, 0, 0)):
+    ops.append(b"%.3f %.3f %.3f rg BT /%s %d Tf %.1f %.1f Td %s Tj ET"
+               % (color[0], color[1], color[2], b"F2" if bold else b"F1", size, x, y, _pdf_text(text)))
+
+def _pdf_wrap(text, size, width):
+    """Corta el texto en líneas según un ancho promedio de carácter de Helvetica."""
+    max_chars = max(int(width / (size * 0.5)), 1)
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        lines.extend(textwrap.wrap(paragraph, max_chars) or [""])
+    return lines
+
+@functools.lru_cache(maxsize=4)
+def get_pdf_template(logo_path=LOGO_PATH):
+    """
+    Arma (una vez por proceso) la parte fija del formato PEM 360. Devuelve un dict con el
+    flujo de contenido comprimido, el logo en JPEG (si existe) y las posiciones de los campos.
+    """
+    width, height = PDF_PAGE_SIZE
+    ops = []
+    positions = {}
+
+    logo = None
+    try:
+        with Image.open(logo_path) as image:
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.split()[3])
+            buffer = io.BytesIO()
+            background.save(buffer, "JPEG", quality=90)
+            logo = (buffer.getvalue(), image.size[0], image.size[1])
+        scale = min(100 / image.size[0], 50 / image.size[1])  # Cabe en 100x50 sin deformarse
+        logo_w, logo_h = image.size[0] * scale, image.size[1] * scale
+        ops.append(b"q %.2f 0 0 %.2f %d %.2f cm /Logo Do Q" % (logo_w, logo_h, PDF_MARGIN, height - PDF_MARGIN - logo_h))
+    except (FileNotFoundError, OSError):
+        pass
+
+    _pdf_draw_text(ops, 160, height - 60, "Check List Inspección 360 Vehicular", size=16, bold=True)
+    _pdf_draw_text(ops, 160, height - 78, "Reporte ID:", size=10, bold=True)
+    positions["report_id"] = (225, height - 78)
+
+    # Encabezado del vehículo y piloto (dos columnas)
+    header_fields = [("placa", "Placa"), ("marca", "Marca"), ("promocion", "Promoción"),
+                     ("fecha", "Fecha"), ("km_actual", "Km Actual"), ("piloto_nombre", "Piloto")]
+    for index, (key, label) in enumerate(header_fields):
+        x = PDF_MARGIN if index < 3 else 320
+        y = height - 115 - (index % 3) * 15
+        _pdf_draw_text(ops, x, y, f"{label}:", bold=True)
+        positions[key] = (x + 65, y)
+
+    # Tabla del checklist
+    y = height - 175
+    _pdf_draw_text(ops, PDF_MARGIN, y, "Item", size=10, bold=True)
+    _pdf_draw_text(ops, PDF_RESULT_X, y, "Resultado", size=10, bold=True)
+    ops.append(b"0 0 0 RG 0.5 w %d %.1f m %d %.1f l S" % (PDF_MARGIN, y - 4, width - PDF_MARGIN, y - 4))
+    y -= PDF_ROW_HEIGHT + 4
+    for categoria, items in CHECKLIST_ITEMS:
+        _pdf_draw_text(ops, PDF_MARGIN, y, f"--- {categoria.upper()} ---", bold=True, color=(0.4, 0.4, 0.4))
+        y -= PDF_ROW_HEIGHT
+        for item in items:
+            _pdf_draw_text(ops, PDF_MARGIN + 10, y, item)
+            positions[("item", item)] = (PDF_RESULT_X, y)
+            y -= PDF_ROW_HEIGHT
+
+    # Observaciones y firma
+    ops.append(b"0 0 0 RG 0.5 w %d %.1f m %d %.1f l S" % (PDF_MARGIN, y + 4, width - PDF_MARGIN, y + 4))
+    _pdf_draw_text(ops, PDF_MARGIN, y - 8, "Observaciones:", size=10, bold=True)
+    positions["observations"] = (PDF_MARGIN, y - 22)
+    _pdf_draw_text(ops, PDF_MARGIN, PDF_MARGIN + 12, "Confirmación de Piloto (Firma):", size=10, bold=True)
+    positions["signature"] = (PDF_MARGIN, PDF_MARGIN)
+
+    return {"content": zlib.compress(b"\n".join(ops)), "logo": logo, "positions": positions}
+
+def render_report_page(report, template=None):
+    """Contenido (comprimido) de la página de un reporte: solo los valores variables."""
+    template = template or get_pdf_template()
+    positions = template["positions"]
+    header = report["header_data"]
+    ops = [b"/Tpl Do"]
+
+    _pdf_draw_text(ops, *positions["report_id"], report["ID"], size=10)
+    for key in ("placa", "marca", "promocion", "fecha", "km_actual", "piloto_nombre"):
+        _pdf_draw_text(ops, *positions[key], header.get(key, "N/A"))
+
+    for item, status in report["checklist_data"].items():
+        if ("item", item) in positions:
+            _pdf_draw_text(ops, *positions[("item", item)], status, bold=True, color=PDF_STATUS_COLORS.get(status, (0, 0, 0)))
+
+    x, y = positions["observations"]
+    lines = _pdf_wrap(report["observations"] or "Sin observaciones adicionales.", 9, PDF_PAGE_SIZE[0] - 2 * PDF_MARGIN)
+    max_lines = max(int((y - positions["signature"][1] - 24) / 11) + 1, 1)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines - 1] + [lines[max_lines - 1] + " [...]"]
+    for line in lines:
+        _pdf_draw_text(ops, x, y, line)
+        y -= 11
+    _pdf_draw_text(ops, *positions["signature"], report["signature_confirmation"] or "", color=(0, 0.5, 0))
+    return zlib.compress(b"\n".join(ops))
+
+def write_pdf(output_path, pages, template=None):
+    """Escribe un PDF con una página por contenido de `pages`, todas sobre el mismo formato cacheado."""
+    template = template or get_pdf_template()
+    width, height = PDF_PAGE_SIZE
+    objects = {}
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    objects[4] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"
+    fonts = b"/Font << /F1 3 0 R /F2 4 0 R >>"
+
+    logo_ref = b""
+    if template["logo"]:
+        data, logo_w, logo_h = template["logo"]
+        objects[6] = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                      b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n" % (logo_w, logo_h, len(data))
+                      + data + b"\nendstream")
+        logo_ref = b" /XObject << /Logo 6 0 R >>"
+    content = template["content"]
+    objects[5] = (b"<< /Type /XObject /Subtype /Form /BBox [0 0 %d %d] /Resources << %s%s >> /Filter /FlateDecode /Length %d >>\nstream\n"
+                  % (width, height, fonts, logo_ref, len(content)) + content + b"\nendstream")
+
+    page_refs = []
+    next_id = 7
+    for page_content in pages:
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = (b"<< /Filter /FlateDecode /Length %d >>\nstream\n" % len(page_content)
+                               + page_content + b"\nendstream")
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << %s /XObject << /Tpl 5 0 R >> >> /Contents %d 0 R >>"
+                            % (width, height, fonts, content_id))
+        page_refs.append(b"%d 0 R" % page_id)
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    with AtomicExportWriter(output_path) as writer:
+        offsets = {}
+        position = 0
+
+        def emit(data):
+            nonlocal position
+            writer.write_bytes(data)
+            position += len(data)
+
+        emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for object_id in sorted(objects):
+            offsets[object_id] = position
+            emit(b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n")
+        xref_position = position
+        size = max(objects) + 1
+        emit(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for object_id in range(1, size):
+            emit(b"%010d 00000 n \n" % offsets[object_id] if object_id in offsets else b"0000000000 65535 f \n")
+        emit(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_position))
+    return output_path
+
+def _render_pdf_chunk(db_name, report_ids, output_dir=None, storage=None):
+    """
+    Tarea del pool de procesos: renderiza un bloque de reportes. Si output_dir está definido
+    escribe un PDF por reporte y devuelve las rutas; si no, devuelve los contenidos de página.
+    storage = (STORAGE_BACKEND, BACKEND_TOKEN) del proceso que reparte el trabajo: los
+    procesos del pool no siempre heredan la configuración (en Windows arrancan de cero).
+    """
+    backend = create_storage_backend(*storage) if storage else get_storage_backend()
+    conn = backend.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        template = get_pdf_template()
+        results = []
+        for report_id in report_ids:
+            page = render_report_page(load_report_detail(cursor, report_id), template)
+            if output_dir:
+                results.append(write_pdf(os.path.join(output_dir, f"reporte_{report_id}.pdf"), [page], template))
+            else:
+                results.append(page)
+        return results
+    finally:
+        conn.close()
+        if storage:
+            backend.close()
+
+def render_report_pdf(report_id, output_path, db_name=None):
+    """PDF de un único reporte."""
+    return write_pdf(output_path, _render_pdf_chunk(db_name or DB_NAME, [report_id]))
+
+def render_reports_pdf_batch(report_ids, output_path=None, output_dir=None, processes=None, db_name=None):
+    """
+    Renderiza muchos reportes usando un pool de procesos (escala con los núcleos).
+    - output_path: un solo PDF con una página por reporte (en el orden de report_ids).
+    - output_dir: un PDF por reporte dentro del directorio.
+    Devuelve la ruta del PDF o la lista de rutas generadas.
+    """
+    if bool(output_path) == bool(output_dir):
+        raise ValueError("Indique output_path (un PDF) o output_dir (un PDF por reporte).")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    db_name = os.path.abspath(db_name or DB_NAME)
+    chunks = [list(report_ids[i:i + PDF_BATCH_CHUNK]) for i in range(0, len(report_ids), PDF_BATCH_CHUNK)]
+
+    if len(chunks) <= 1:
+        results = [_render_pdf_chunk(db_name, chunk, output_dir) for chunk in chunks]
+    else:
+        storage = (STORAGE_BACKEND, BACKEND_TOKEN)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_render_pdf_chunk, [db_name] * len(chunks), chunks, [output_dir] * len(chunks),
+                                    [storage] * len(chunks)))
+
+    flat = [item for chunk_result in results for item in chunk_result]
+    if output_dir:
+        return flat
+    return write_pdf(output_path, flat)
+
+# --- Historial de Asignaciones (Tabla Temporal) ---
+#
+# assignments es la fuente de verdad de qué piloto tiene qué vehículo y desde/hasta cuándo
+# (valid_to NULL = asignación vigente). users.assigned_vehicle_plate y
+# vehicles.assigned_to_user_id quedan como caché de las asignaciones vigentes: solo se
+# escriben a través de assign_vehicle/end_assignments, en la misma transacción.
+
+def install_assignment_schema(cursor):
+    """Crea la tabla temporal de asignaciones y sus índices por intervalo."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS assignments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plate TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT,
+        CHECK (valid_to IS NULL OR valid_to >= valid_from)
+    )
+    """)
+    # "¿Quién manejaba X el día D?" = búsqueda por (placa, inicio) hacia atrás desde D
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_plate_from ON assignments (plate, valid_from)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_user_from ON assignments (user_id, valid_from)")
+    # Relación 1 a 1 garantizada por la DB: una asignación vigente por vehículo y por piloto
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_open_plate ON assignments (plate) WHERE valid_to IS NULL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_open_user ON assignments (user_id) WHERE valid_to IS NULL")
+
+def migrate_legacy_assignments(cursor):
+    """
+    Registra como vigentes las asignaciones de las columnas heredadas que aún no están en
+    assignments (DB anteriores y datos de ejemplo): primero vehicles.assigned_to_user_id y
+    luego users.assigned_vehicle_plate, por si las dos columnas dejaron de coincidir (si se
+    contradicen, manda la del vehículo). El inicio real se desconoce: se usa el primer
+    reporte del piloto con ese vehículo o, si no hay, el momento actual.
+    Las fechas se guardan como 'YYYY-MM-DDTHH:MM:SS', igual que las asignaciones nuevas
+    (report_date es solo la fecha); una fecha inválida cuenta como "sin reporte". También
+    corrige las filas que versiones anteriores migraron con solo la fecha. Luego alinea las
+    columnas de caché.
+    """
+    # date(x, '+0 days') normaliza (2024-02-30 -> 2024-03-01): si no coincide, la fecha no existe
+    valid_date = "date({0}, '+0 days') = substr({0}, 1, 10)"
+    for column in ("valid_to", "valid_from"):  # En este orden se cumple siempre valid_to >= valid_from
+        cursor.execute(f"""
+            UPDATE assignments SET {column} = strftime('%Y-%m-%dT%H:%M:%S', {column})
+            WHERE {column} NOT LIKE '____-__-__T__:__:__' AND {valid_date.format(column)}
+        """)
+
+    # (placa, piloto) de cada columna heredada; una sola asignación por piloto y por vehículo
+    legacy_sources = (
+        """SELECT v.plate AS plate, v.assigned_to_user_id AS user_id FROM vehicles v
+           WHERE v.assigned_to_user_id IN (SELECT id FROM users)
+             AND v.plate = (SELECT MIN(v2.plate) FROM vehicles v2 WHERE v2.assigned_to_user_id = v.assigned_to_user_id)""",
+        """SELECT u.assigned_vehicle_plate AS plate, u.id AS user_id FROM users u
+           WHERE u.assigned_vehicle_plate IN (SELECT plate FROM vehicles)
+             AND u.id = (SELECT MIN(u2.id) FROM users u2 WHERE u2.assigned_vehicle_plate = u.assigned_vehicle_plate)""",
+    )
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    for source in legacy_sources:
+        cursor.execute(f"""
+            INSERT INTO assignments (plate, user_id, valid_from)
+            SELECT plate, user_id,
+                   CASE WHEN {valid_date.format('first_report')} THEN strftime('%Y-%m-%dT%H:%M:%S', first_report) ELSE ? END
+            FROM (
+                SELECT legacy.plate, legacy.user_id,
+                       (SELECT MIN(r.report_date) FROM reports r
+                        WHERE r.vehicle_plate = legacy.plate AND r.driver_id = legacy.user_id) AS first_report
+                FROM ({source}) legacy
+                WHERE NOT EXISTS (SELECT 1 FROM assignments a WHERE a.valid_to IS NULL
+                                  AND (a.plate = legacy.plate OR a.user_id = legacy.user_id))
+            )
+        """, (now,))
+    refresh_assignment_cache(cursor)
+
+def refresh_assignment_cache(cursor, plates=None, user_ids=None):
+    """Recalcula las columnas heredadas a partir de las asignaciones vigentes (todas, o las indicadas)."""
+    vehicle_filter = user_filter = ""
+    vehicle_params, user_params = [], []
+    if plates is not None:
+        vehicle_filter = f" AND plate IN ({','.join('?' * len(plates))})"
+        vehicle_params = list(plates)
+    if user_ids is not None:
+        user_filter = f" AND id IN ({','.join('?' * len(user_ids))})"
+        user_params = list(user_ids)
+    # Solo se escriben las filas que cambian (cada UPDATE de vehicles queda en change_log)
+    cursor.execute(f"""
+        UPDATE vehicles SET assigned_to_user_id = (
+            SELECT a.user_id FROM assignments a WHERE a.plate = vehicles.plate AND a.valid_to IS NULL)
+        WHERE assigned_to_user_id IS NOT (
+            SELECT a.user_id FROM assignments a WHERE a.plate = vehicles.plate AND a.valid_to IS NULL){vehicle_filter}
+    """, vehicle_params)
+    cursor.execute(f"""
+        UPDATE users SET assigned_vehicle_plate = (
+            SELECT a.plate FROM assignments a WHERE a.user_id = users.id AND a.valid_to IS NULL)
+        WHERE assigned_vehicle_plate IS NOT (
+            SELECT a.plate FROM assignments a WHERE a.user_id = users.id AND a.valid_to IS NULL){user_filter}
+    """, user_params)
+
+def end_assignments(cursor, plate=None, user_id=None, at=None):
+    """Cierra la asignación vigente del vehículo y/o del piloto. Devuelve (placas, pilotos) afectados."""
+    at = at or datetime.datetime.now().isoformat(timespec="seconds")
+    cursor.execute("SELECT id, plate, user_id FROM assignments WHERE valid_to IS NULL AND (plate = ? OR user_id = ?)",
+                   (plate, user_id))
+    rows = cursor.fetchall()
+    for assignment_id, _, _ in rows:
+        cursor.execute("UPDATE assignments SET valid_to = MAX(valid_from, ?) WHERE id = ?", (at, assignment_id))
+    plates = {row[1] for row in rows}
+    user_ids = {row[2] for row in rows}
+    refresh_assignment_cache(cursor, plates, user_ids)
+    return plates, user_ids
+
+def assign_vehicle(cursor, plate, user_id, at=None):
+    """
+    Asigna el vehículo al piloto (o lo deja sin asignar si user_id es None) manteniendo la
+    relación 1 a 1: se cierran la asignación vigente del vehículo y la del piloto y se abre
+    la nueva. Usa el cursor de la transacción del llamador. Devuelve False si no había cambio.
+    """
+    cursor.execute("SELECT user_id FROM assignments WHERE plate = ? AND valid_to IS NULL", (plate,))
+    current = cursor.fetchone()
+    if (current[0] if current else None) == user_id:
+        return False
+    at = at or datetime.datetime.now().isoformat(timespec="seconds")
+    plates, user_ids = end_assignments(cursor, plate, user_id, at)
+    if user_id is not None:
+        cursor.execute("INSERT INTO assignments (plate, user_id, valid_from) VALUES (?, ?, ?)", (plate, user_id, at))
+    refresh_assignment_cache(cursor, plates | {plate}, user_ids | ({user_id} if user_id is not None else set()))
+    return True
+
+def drivers_on(cursor, plate, day):
+    """
+    Pilotos asignados al vehículo en algún momento del día 'YYYY-MM-DD', en orden cronológico:
+    lista de (user_id, nombre, valid_from, valid_to). Recorre el índice (placa, inicio) hacia
+    atrás desde el fin del día y se detiene en la primera asignación que terminó antes: O(log n).
+    """
+    day_start = f"{datetime.date.fromisoformat(day).isoformat()}T00:00:00"
+    next_day = (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+    cursor.execute("""
+        SELECT a.user_id, u.full_name, a.valid_from, a.valid_to
+        FROM assignments a LEFT JOIN users u ON u.id = a.user_id
+        WHERE a.plate = ? AND a.valid_from < ?
+        ORDER BY a.valid_from DESC, a.id DESC
+    """, (plate, next_day))
+    drivers = []
+    for row in cursor:
+        if row[3] is not None and row[3] <= day_start:
+            break  # Los intervalos de un vehículo no se solapan: los anteriores también terminaron
+        drivers.append(row)
+    return drivers[::-1]
+
+def assignment_history(cursor, plate=None, user_id=None):
+    """Historial de asignaciones de un vehículo o de un piloto (más recientes primero)."""
+    column, value = ("a.plate", plate) if plate is not None else ("a.user_id", user_id)
+    cursor.execute(f"""
+        SELECT a.plate, a.user_id, u.full_name, a.valid_from, a.valid_to
+        FROM assignments a LEFT JOIN users u ON u.id = a.user_id
+        WHERE {column} = ?
+        ORDER BY a.valid_from DESC, a.id DESC
+    """, (value,))
+    return cursor.fetchall()
+
+# --- Auditoría de Cambios Administrativos ---
+#
+# Cada alta, edición, baja o asignación hecha desde AdminFrame deja una entrada en
+# audit_log (quién, qué acción, sobre qué entidad, estado antes y después) dentro de la
+# misma transacción que el cambio: si el cambio se revierte, la entrada también.
+# La tabla es de solo inserción (triggers). Las entradas con más de AUDIT_HOT_DAYS días
+# se pasan a particiones mensuales comprimidas (audit_partitions); solo entonces se
+# permite borrarlas de audit_log.
+
+AUDIT_HOT_DAYS = 90          # Entradas recientes consultables por índice
+AUDIT_VIEW_LIMIT = 200       # Entradas mostradas en la pestaña de auditoría
+AUDIT_USER_FIELDS = ("username", "full_name", "role", "is_active", "assigned_vehicle_plate")
+AUDIT_VEHICLE_FIELDS = ("brand", "promotion", "assigned_to_user_id")
+
+def install_audit_schema(cursor):
+    """Crea la bitácora de auditoría, sus índices y las particiones comprimidas."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        at TEXT NOT NULL,
+        actor_id INTEGER,
+        actor_name TEXT,
+        action TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        entity_key TEXT NOT NULL,
+        before TEXT,
+        after TEXT
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_at ON audit_log (at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log (entity, entity_key, at)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS audit_partitions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        period TEXT NOT NULL,
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        first_at TEXT NOT NULL,
+        last_at TEXT NOT NULL,
+        entries INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        data BLOB NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_partitions_at ON audit_partitions (first_at, last_at)")
+
+    # Solo inserción: nada se edita, y solo se borra lo que ya quedó en una partición
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log
+    BEGIN SELECT RAISE(ABORT, 'audit_log es de solo inserción'); END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log
+    WHEN NOT EXISTS (SELECT 1 FROM audit_partitions WHERE OLD.id BETWEEN first_id AND last_id)
+    BEGIN SELECT RAISE(ABORT, 'audit_log es de solo inserción'); END
+    """)
+    for operation in ("UPDATE", "DELETE"):
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS audit_partitions_no_{operation.lower()} BEFORE {operation} ON audit_partitions
+        BEGIN SELECT RAISE(ABORT, 'audit_partitions es de solo inserción'); END
+        """)
+
+def audit_snapshot(cursor, entity, entity_key):
+    """Estado actual (sin contraseña) de un usuario (por id) o vehículo (por placa); None si no existe."""
+    if entity == "user":
+        fields = AUDIT_USER_FIELDS
+        cursor.execute(f"SELECT {', '.join(fields)} FROM users WHERE id = ?", (entity_key,))
+    else:
+        fields = AUDIT_VEHICLE_FIELDS
+        cursor.execute(f"SELECT {', '.join(fields)} FROM vehicles WHERE plate = ?", (entity_key,))
+    row = cursor.fetchone()
+    return dict(zip(fields, row)) if row else None
+
+def record_audit(cursor, actor, action, entity, entity_key, before=None, after=None):
+    """
+    Agrega una entrada a audit_log con el cursor de la transacción del cambio.
+    actor es (id, nombre) del administrador. before/after son dicts (o None).
+    """
+    actor_id, actor_name = actor
+    cursor.execute("""
+        INSERT INTO audit_log (at, actor_id, actor_name, action, entity, entity_key, before, after)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (datetime.datetime.now().isoformat(timespec="milliseconds"), actor_id, actor_name, action, entity,
+          str(entity_key),
+          json.dumps(before, ensure_ascii=False) if before is not None else None,
+          json.dumps(after, ensure_ascii=False) if after is not None else None))
+
+def record_audit_changes(cursor, actor, before_states, action):
+    """
+    Compara los estados previos {(entidad, clave): snapshot} con los actuales y registra
+    una entrada por cada entidad que cambió. action es un texto o una función
+    (entidad, antes, después) -> texto.
+    """
+    for (entity, entity_key), before in before_states.items():
+        after = audit_snapshot(cursor, entity, entity_key)
+        if after != before:
+            record_audit(cursor, actor, action(entity, before, after) if callable(action) else action,
+                         entity, entity_key, before, after)
+
+AUDIT_COLUMNS = ("id", "at", "actor_id", "actor_name", "action", "entity", "entity_key", "before", "after")
+
+def _audit_entry(row):
+    entry = dict(zip(AUDIT_COLUMNS, row))
+    for key in ("before", "after"):
+        entry[key] = json.loads(entry[key]) if entry[key] else None
+    return entry
+
+def _audit_matches(entry, entity, entity_key, since, until):
+    return ((entity is None or entry["entity"] == entity)
+            and (entity_key is None or entry["entity_key"] == str(entity_key))
+            and (since is None or entry["at"] >= since)
+            and (until is None or entry["at"] < until))
+
+def query_audit_log(cursor, entity=None, entity_key=None, since=None, until=None, limit=None, include_archived=False):
+    """
+    Entradas de auditoría (más recientes primero), filtradas por entidad/clave y rango de
+    fechas ISO [since, until). Las recientes se leen por índice; con include_archived también
+    se descomprimen las particiones cuyo rango de fechas se superpone con el pedido.
+    """
+    conditions, params = [], []
+    if entity is not None:
+        conditions.append("entity = ?")
+        params.append(entity)
+    if entity_key is not None:
+        conditions.append("entity_key = ?")
+        params.append(str(entity_key))
+    if since is not None:
+        conditions.append("at >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("at < ?")
+        params.append(until)
+    query = f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY at DESC, id DESC"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    cursor.execute(query, params)
+    entries = [_audit_entry(row) for row in cursor.fetchall()]
+    if not include_archived or (limit and len(entries) >= limit):
+        return entries
+
+    cursor.execute("""
+        SELECT data FROM audit_partitions
+        WHERE (? IS NULL OR last_at >= ?) AND (? IS NULL OR first_at < ?)
+        ORDER BY last_at DESC
+    """, (since, since, until, until))
+    for (data,) in cursor.fetchall():
+        archived = [_audit_entry(row) for row in json.loads(zlib.decompress(data).decode("utf-8"))]
+        entries.extend(entry for entry in archived if _audit_matches(entry, entity, entity_key, since, until))
+    entries.sort(key=lambda entry: (entry["at"], entry["id"]), reverse=True)
+    return entries[:limit] if limit else entries
+
+def compact_audit_log(conn, deadline=None, hot_days=None):
+    """
+    Pasa las entradas anteriores al mes de (hoy - hot_days) a particiones mensuales
+    comprimidas con zlib y las borra de audit_log, todo en una transacción.
+    Devuelve un texto con lo compactado (también es una tarea de mantenimiento).
+    """
+    cutoff_day = datetime.date.today() - datetime.timedelta(days=hot_days or AUDIT_HOT_DAYS)
+    boundary = cutoff_day.replace(day=1).isoformat()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute(f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log WHERE at < ? ORDER BY id", (boundary,))
+        partitions = collections.defaultdict(list)
+        for row in cursor.fetchall():
+            partitions[row[1][:7]].append(row)
+        total = 0
+        for period, rows in sorted(partitions.items()):
+            data = zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+            cursor.execute("""
+                INSERT INTO audit_partitions (period, first_id, last_id, first_at, last_at, entries, sha256, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (period, min(row[0] for row in rows), max(row[0] for row in rows), min(row[1] for row in rows),
+                  max(row[1] for row in rows), len(rows), hashlib.sha256(data).hexdigest(), data))
+            total += len(rows)
+        cursor.execute("DELETE FROM audit_log WHERE at < ?", (boundary,))
+        cursor.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    return f"{total} entradas en {len(partitions)} partición(es)"
+
+# --- Mantenimiento de la Base de Datos ---
+#
+# Tareas periódicas (estadísticas del planificador, vacuum incremental, verificación de
+# integridad y respaldo en línea) que corren cuando la aplicación está inactiva o desde la
+# línea de comandos. Cada ejecución tiene un presupuesto de tiempo: las tareas largas se
+# interrumpen al agotarlo y se retoman en la próxima oportunidad. Los resultados quedan en
+# la tabla maintenance_log.
+
+MAINTENANCE_IDLE_S = 300            # Inactividad de la interfaz antes de correr el mantenimiento
+MAINTENANCE_CHECK_MS = 60_000       # Cada cuánto la interfaz revisa si corresponde
+MAINTENANCE_BUDGET_S = 2.0          # Tiempo máximo por ejecución
+MAINTENANCE_BUSY_TIMEOUT_S = 0.2    # Si un piloto está escribiendo, el mantenimiento cede
+MAINTENANCE_ANALYSIS_LIMIT = 400    # Filas muestreadas por índice en ANALYZE (acota su duración)
+VACUUM_PAGES_PER_STEP = 256         # Páginas liberadas por paso de incremental_vacuum
+BACKUP_DIR = "respaldos"
+BACKUP_KEEP = 7                     # Respaldos conservados (los más antiguos se borran)
+BACKUP_PAGES_PER_STEP = 1024
+MAINTENANCE_INTERVALS = {           # Segundos entre ejecuciones exitosas, en orden de ejecución
+    "quick_check": 86_400,
+    "backup": 86_400,
+    "optimize": 86_400,
+    "incremental_vacuum": 86_400,
+    "integrity_check": 7 * 86_400,
+    "audit_rollover": 86_400,
+    "dedupe_scan": 7 * 86_400,
+}
+
+class MaintenanceTimeout(Exception):
+    """Se agotó el presupuesto de tiempo de una tarea de mantenimiento."""
+
+def install_maintenance_schema(cursor):
+    """Crea la bitácora de mantenimiento."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        duration_ms INTEGER NOT NULL,
+        ok INTEGER NOT NULL,
+        result TEXT
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log (task, ok, started_at)")
+
+def _interrupt_after(conn, deadline):
+    """Aborta la sentencia en curso (OperationalError 'interrupted') al pasar el límite de tiempo."""
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 1000)
+
+def maintenance_optimize(conn, deadline):
+    """PRAGMA optimize con ANALYZE acotado por muestreo (analysis_limit)."""
+    conn.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+    _interrupt_after(conn, deadline)
+    conn.execute("PRAGMA optimize = 0x10002")  # 0x10000: revisar todas las tablas, no solo las consultadas
+    return "estadísticas actualizadas"
+
+def maintenance_incremental_vacuum(conn, deadline):
+    """Devuelve al sistema las páginas libres, por pasos cortos (cada paso es una transacción breve)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return "auto_vacuum no es INCREMENTAL (ejecute 'optimize --vacuum' una vez para convertir la DB)"
+    freed = 0
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            break
+        if time.monotonic() > deadline:
+            raise MaintenanceTimeout(f"{freed} páginas liberadas, {free_pages} pendientes")
+        # executescript avanza la sentencia hasta el final (execute solo liberaría una página)
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});")
+        freed += min(free_pages, VACUUM_PAGES_PER_STEP)
+    return f"{freed} páginas liberadas"
+
+def _maintenance_check(conn, deadline, pragma):
+    _interrupt_after(conn, deadline)
+    problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}")]
+    if problems != ["ok"]:
+        raise sqlite3.DatabaseError("; ".join(problems[:10]))
+    return "ok"
+
+def maintenance_quick_check(conn, deadline):
+    return _maintenance_check(conn, deadline, "quick_check")
+
+def maintenance_integrity_check(conn, deadline):
+    return _maintenance_check(conn, deadline, "integrity_check")
+
+def maintenance_backup(conn, deadline, backup_dir=None):
+    """
+    Respaldo en línea con la API de backup de SQLite (copia consistente aunque haya
+    escrituras), a un temporal que se renombra al terminar. Conserva los BACKUP_KEEP más recientes.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    target = os.path.join(backup_dir, datetime.datetime.now().strftime("respaldo-%Y%m%d-%H%M%S.db"))
+    fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", suffix=".db", dir=backup_dir)
+    os.close(fd)
+
+    def progress(status, remaining, total):
+        if time.monotonic() > deadline:
+            raise MaintenanceTimeout(f"respaldo incompleto ({total - remaining}/{total} páginas)")
+
+    try:
+        backup_conn = sqlite3.connect(tmp_name)
+        try:
+            conn.backup(backup_conn, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=0.05)
+        finally:
+            backup_conn.close()
+        os.replace(tmp_name, target)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+    backups = sorted(name for name in os.listdir(backup_dir) if name.startswith("respaldo-") and name.endswith(".db"))
+    for name in backups[:-BACKUP_KEEP]:
+        os.remove(os.path.join(backup_dir, name))
+    return f"{target} ({os.path.getsize(target) / 1024:.0f} KB)"
+
+MAINTENANCE_TASKS = {
+    "quick_check": maintenance_quick_check,
+    "backup": maintenance_backup,
+    "optimize": maintenance_optimize,
+    "incremental_vacuum": maintenance_incremental_vacuum,
+    "integrity_check": maintenance_integrity_check,
+    "audit_rollover": compact_audit_log,
+}
+
+def due_maintenance_tasks(cursor, now=None):
+    """Tareas cuya última ejecución exitosa es más antigua que su intervalo."""
+    now = now or datetime.datetime.now()
+    due = []
+    for task, interval in MAINTENANCE_INTERVALS.items():
+        cursor.execute("SELECT MAX(started_at) FROM maintenance_log WHERE task = ? AND ok = 1", (task,))
+        last_ok = cursor.fetchone()[0]
+        if last_ok is None or (now - datetime.datetime.fromisoformat(last_ok)).total_seconds() >= interval:
+            due.append(task)
+    return due
+
+def run_maintenance(tasks=None, budget_s=None, db_name=None):
+    """
+    Ejecuta las tareas indicadas (o las que correspondan según MAINTENANCE_INTERVALS)
+    dentro del presupuesto de tiempo y registra cada resultado en maintenance_log.
+    Si una verificación de integridad falla, no se hace respaldo (no se pisa uno bueno con uno dañado).
+    Devuelve una lista de dicts {task, ok, duration_ms, result}.
+    """
+    deadline = time.monotonic() + (budget_s or MAINTENANCE_BUDGET_S)
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=MAINTENANCE_BUSY_TIMEOUT_S, isolation_level=None)
+    results = []
+    try:
+        cursor = conn.cursor()
+        install_maintenance_schema(cursor)
+        pending = tasks if tasks is not None else due_maintenance_tasks(cursor)
+        check_failed = False
+        for task in pending:
+            if time.monotonic() > deadline:
+                break
+            if task == "backup" and check_failed:
+                continue
+            started_at = datetime.datetime.now().isoformat(timespec="seconds")
+            start = time.perf_counter()
+            try:
+                result, ok = MAINTENANCE_TASKS[task](conn, deadline), True
+            except MaintenanceTimeout as e:
+                result, ok = f"tiempo agotado: {e}", False
+            except sqlite3.OperationalError as e:
+                # 'interrupted' (presupuesto agotado) o 'database is locked' (un piloto está guardando)
+                result, ok = f"pospuesto: {e}", False
+            except sqlite3.DatabaseError as e:
+                result, ok = f"ERROR: {e}", False
+                check_failed = check_failed or task.endswith("check")
+            finally:
+                conn.set_progress_handler(None, 0)
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            try:
+                cursor.execute("INSERT INTO maintenance_log (task, started_at, duration_ms, ok, result) VALUES (?, ?, ?, ?, ?)",
+                               (task, started_at, duration_ms, int(ok), result))
+            except sqlite3.OperationalError:
+                pass  # DB ocupada: el resultado igual se devuelve
+            results.append({"task": task, "ok": ok, "duration_ms": duration_ms, "result": result})
+    finally:
+        conn.close()
+    return results
+
+def enable_incremental_vacuum(db_name=None):
+    """
+    Convierte la DB a auto_vacuum=INCREMENTAL. Requiere un VACUUM completo (reescribe el
+    archivo y necesita acceso exclusivo), por eso no forma parte del mantenimiento automático.
+    """
+    conn = sqlite3.connect(db_name or DB_NAME, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+# --- Observaciones: Etiquetas e Índice Invertido ---
+#
+# El texto libre de las observaciones se normaliza (sin tildes, minúsculas), se reduce a
+# raíces simples (plurales) y se etiqueta contra un diccionario armado con CHECKLIST_ITEMS.
+# Cada etiqueta queda en observation_terms (término, reporte): "reportes que mencionan X"
+# es una búsqueda por índice en lugar de leer todas las observaciones.
+#   item:<ítem>       todas las palabras del nombre del ítem aparecen (ej: "freno de mano")
+#   categoria:<cat>   se nombra la categoría o alguno de sus ítems
+#   placa:<placa>     se menciona otra placa (C + 6 caracteres)
+#   palabra:<raíz>    cada palabra significativa
+
+OBSERVATION_STOPWORDS = frozenset("""
+    a al ambos ante con de del el en entre es esta este hay la las lado le lo los mas muy no o para pero
+    por que se sin su sus un una uno y ya
+""".split())
+OBSERVATION_MIN_WORD = 3
+OBSERVATION_CHUNK_SIZE = 2000
+PLATE_MENTION_PATTERN = re.compile(r"\bc[\s-]?([0-9a-z]{6})\b")
+
+def normalize_observation(text):
+    """Minúsculas, sin tildes ni signos: "Revisar FRENOS (lado izq.)" -> "revisar frenos lado izq"."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+def _stem(word):
+    """Raíz por plural: luces -> luz, niveles -> nivel, frenos -> freno."""
+    if len(word) > 4 and word.endswith("ces"):
+        return word[:-3] + "z"
+    if len(word) > 5 and word.endswith("es") and word[-3] not in "aeiou":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+def _significant_stems(normalized):
+    return [_stem(word) for word in normalized.split() if len(word) >= OBSERVATION_MIN_WORD and word not in OBSERVATION_STOPWORDS]
+
+@functools.lru_cache(maxsize=1)
+def observation_dictionary():
+    """
+    Diccionario de ítems y categorías: [(etiqueta, raíces requeridas)]. Del nombre de un
+    ítem cuentan las palabras antes del paréntesis ("Llantas (presión, desgaste)" -> llanta).
+    """
+    entries = []
+    for category, items in CHECKLIST_ITEMS:
+        entries.append((f"categoria:{category}", frozenset(_significant_stems(normalize_observation(category)))))
+        for item in items:
+            stems = frozenset(_significant_stems(normalize_observation(item.split("(")[0])))
+            if stems:
+                entries.append((f"item:{item}", stems))
+    return entries
+
+def observation_terms(text):
+    """Etiquetas de un texto de observaciones (conjunto de términos del índice)."""
+    normalized = normalize_observation(text)
+    if not normalized:
+        return set()
+    plates = {"C" + match.upper() for match in PLATE_MENTION_PATTERN.findall(normalized) if any(ch.isdigit() for ch in match)}
+    stems = {stem for stem in _significant_stems(normalized) if stem.upper() not in plates and "C" + stem.upper() not in plates}
+    terms = {f"placa:{plate}" for plate in plates} | {f"palabra:{stem}" for stem in stems}
+    for tag, required in observation_dictionary():
+        if required <= stems:
+            terms.add(tag)
+            if tag.startswith("item:"):
+                terms.add(f"categoria:{CHECKLIST_ITEM_CATEGORY[tag[5:]]}")
+    return terms
+
+def install_observation_schema(cursor):
+    """Crea el índice invertido de observaciones y lo llena una única vez con los reportes existentes."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'observation_terms'")
+    is_new = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS observation_terms (
+        term TEXT NOT NULL,
+        report_id INTEGER NOT NULL,
+        PRIMARY KEY (term, report_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_observation_terms_report ON observation_terms (report_id)")
+    if is_new:
+        cursor.execute("SELECT id, observations FROM reports WHERE observations IS NOT NULL AND observations != ''")
+        rows = cursor.fetchall()
+        cursor.executemany("INSERT INTO observation_terms (term, report_id) VALUES (?, ?)",
+                           [(term, report_id) for report_id, text in rows for term in observation_terms(text)])
+
+def index_report_observations(cursor, report_id, observations):
+    """Etiqueta las observaciones de un reporte (reemplaza sus etiquetas anteriores)."""
+    cursor.execute("DELETE FROM observation_terms WHERE report_id = ?", (report_id,))
+    cursor.executemany("INSERT INTO observation_terms (term, report_id) VALUES (?, ?)",
+                       [(term, report_id) for term in observation_terms(observations)])
+
+def reindex_observations(db_name=None):
+    """
+    Vuelve a etiquetar todas las observaciones (p. ej. tras cambiar CHECKLIST_ITEMS), por
+    bloques de OBSERVATION_CHUNK_SIZE reportes, una transacción corta por bloque. Devuelve los reportes procesados.
+    """
+    conn = open_db(db_name, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        last_id, total = 0, 0
+        while True:
+            cursor.execute("SELECT id, observations FROM reports WHERE id > ? ORDER BY id LIMIT ?", (last_id, OBSERVATION_CHUNK_SIZE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute("DELETE FROM observation_terms WHERE report_id > ? AND report_id <= ?", (last_id, rows[-1][0]))
+                cursor.executemany("INSERT INTO observation_terms (term, report_id) VALUES (?, ?)",
+                                   [(term, report_id) for report_id, text in rows for term in observation_terms(text)])
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            last_id = rows[-1][0]
+            total += len(rows)
+        return total
+    finally:
+        conn.close()
+
+def observation_query_terms(query):
+    """
+    Traduce una búsqueda a rangos de términos [desde, hasta). Un nombre de ítem o categoría
+    o una placa se buscan exactos; si no, cada palabra busca las raíces que empiezan con ella.
+    """
+    normalized = normalize_observation(query)
+    if not normalized:
+        return []
+    for tag, _ in observation_dictionary():
+        if normalize_observation(tag.split(":", 1)[1]) == normalized:
+            return [(tag, tag + "\0")]
+    plate = PLATE_MENTION_PATTERN.fullmatch(normalized)
+    if plate:
+        term = f"placa:C{plate.group(1).upper()}"
+        return [(term, term + "\0")]
+    return [(f"palabra:{stem}", f"palabra:{stem}\uffff") for stem in _significant_stems(normalized)]
+
+def observation_match_sql(query):
+    """Subconsulta (sql, params) con los ids de reportes que mencionan la búsqueda; (None, []) si no filtra nada."""
+    ranges = observation_query_terms(query)
+    if not ranges:
+        return None, []
+    sql = " INTERSECT ".join("SELECT report_id FROM observation_terms WHERE term >= ? AND term < ?" for _ in ranges)
+    return sql, [bound for pair in ranges for bound in pair]
+
+def reports_mentioning(cursor, query):
+    """Ids de los reportes cuyas observaciones mencionan todo lo buscado (más recientes primero)."""
+    sql, params = observation_match_sql(query)
+    if sql is None:
+        return []
+    cursor.execute(f"SELECT report_id FROM ({sql}) ORDER BY report_id DESC", params)
+    return [row[0] for row in cursor.fetchall()]
+
+# --- Instantáneas de Reportes ---
+#
+# Al guardar un reporte se escribe su versión resuelta y lista para mostrar: la fila con
+# los JSON decodificados (mismo formato que la exportación) más un "resumen" con el piloto,
+# la marca y promoción del vehículo en ese momento. El checklist queda ordenado por categoría
+# y el resumen guarda cuántos ítems tiene cada una ([["Niveles", 5], ...]), sin repetirlos.
+# La vista de detalle, los PDF y la exportación la leen tal cual (sin joins ni recategorizar),
+# y un piloto renombrado o eliminado después no cambia lo que muestra el reporte.
+
+SNAPSHOT_VERSION = 1   # Subirlo si cambia el contenido; rebuild_report_snapshots regenera las anteriores
+SNAPSHOT_CHUNK_SIZE = 1000
+
+def install_snapshot_schema(cursor):
+    """Crea la tabla de instantáneas y la llena una única vez con los reportes existentes."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_snapshots'")
+    is_new = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_snapshots (
+        report_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        FOREIGN KEY (report_id) REFERENCES reports (id)
+    )
+    """)
+    # Generación de las instantáneas: cambia cada vez que se regeneran, para que la exportación lo detecte
+    cursor.execute("CREATE TABLE IF NOT EXISTS snapshot_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO snapshot_state (key, value) VALUES ('generation', 0)")
+    if is_new:
+        cursor.execute("SELECT id FROM reports ORDER BY id")
+        for (report_id,) in cursor.fetchall():
+            write_report_snapshot(cursor, report_id)
+
+def build_report_snapshot(cursor, report_id):
+    """Arma la instantánea de un reporte con los datos actuales de pilotos y vehículos (None si no existe)."""
+    cursor.execute("SELECT * FROM reports WHERE id = ?", (report_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    report = _decode_report_row([description[0] for description in cursor.description], row)
+    cursor.execute("SELECT full_name, username FROM users WHERE id = ?", (report["driver_id"],))
+    user = cursor.fetchone() or (None, None)
+    cursor.execute("SELECT brand, promotion FROM vehicles WHERE plate = ?", (report["vehicle_plate"],))
+    vehicle = cursor.fetchone() or (None, None)
+
+    header = report["header_data"] if isinstance(report["header_data"], dict) else {}
+    checklist = report["checklist_data"] if isinstance(report["checklist_data"], dict) else {}
+    ordered, categories = {}, []
+    for category, items in CHECKLIST_ITEMS:
+        present = [item for item in items if item in checklist]
+        if present:
+            ordered.update((item, checklist[item]) for item in present)
+            categories.append([category, len(present)])
+    if isinstance(report["checklist_data"], dict):
+        # Los ítems que no están en CHECKLIST_ITEMS van al final, fuera de las categorías
+        report["checklist_data"] = {**ordered, **checklist}
+    report["resumen"] = {
+        "piloto": user[0] or header.get("piloto_nombre"),
+        "usuario": user[1],
+        "marca": vehicle[0] if vehicle[0] is not None else header.get("marca"),
+        "promocion": vehicle[1] if vehicle[1] is not None else header.get("promocion"),
+        "fallas": sum(1 for status in checklist.values() if status == "Mal estado"),
+        "categorias": categories,
+    }
+    return report
+
+def write_report_snapshot(cursor, report_id):
+    """Guarda (o reemplaza) la instantánea de un reporte en JSON compacto."""
+    snapshot = build_report_snapshot(cursor, report_id)
+    if snapshot is None:
+        return
+    cursor.execute("INSERT OR REPLACE INTO report_snapshots (report_id, version, data) VALUES (?, ?, ?)",
+                   (report_id, SNAPSHOT_VERSION, json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))))
+
+def get_report_snapshot(cursor, report_id):
+    """Instantánea de un reporte; si falta (o es de una versión anterior) se arma en el momento."""
+    cursor.execute("SELECT version, data FROM report_snapshots WHERE report_id = ?", (report_id,))
+    row = cursor.fetchone()
+    if row and row[0] == SNAPSHOT_VERSION:
+        return json.loads(row[1])
+    return build_report_snapshot(cursor, report_id)
+
+def snapshot_generation(cursor):
+    """Contador que sube cada vez que rebuild_report_snapshots reescribe instantáneas."""
+    cursor.execute("SELECT value FROM snapshot_state WHERE key = 'generation'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def rebuild_report_snapshots(db_name=None, all_reports=False):
+    """
+    Regenera las instantáneas faltantes o de versiones anteriores (todas con all_reports=True),
+    por bloques. Usa los nombres actuales de pilotos y vehículos. Devuelve cuántas escribió.
+    """
+    conn = open_db(db_name, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        outdated = "" if all_reports else "WHERE s.report_id IS NULL OR s.version < ?"
+        cursor.execute(f"""
+            SELECT r.id FROM reports r LEFT JOIN report_snapshots s ON s.report_id = r.id {outdated} ORDER BY r.id
+        """, () if all_reports else (SNAPSHOT_VERSION,))
+        report_ids = [row[0] for row in cursor.fetchall()]
+        for start in range(0, len(report_ids), SNAPSHOT_CHUNK_SIZE):
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for report_id in report_ids[start:start + SNAPSHOT_CHUNK_SIZE]:
+                    write_report_snapshot(cursor, report_id)
+                cursor.execute("UPDATE snapshot_state SET value = value + 1 WHERE key = 'generation'")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        return len(report_ids)
+    finally:
+        conn.close()
+
+def load_report_detail(cursor, report_id):
+    """Datos de un reporte para ReportDetailWindow y los PDF, leídos de su instantánea."""
+    snapshot = get_report_snapshot(cursor, report_id)
+    if snapshot is None:
+        raise ValueError(f"No existe el reporte ID {report_id}.")
+    checklist = snapshot['checklist_data'] if isinstance(snapshot['checklist_data'], dict) else {}
+    statuses = iter(checklist.items())
+    grouped = {category: dict(itertools.islice(statuses, count)) for category, count in snapshot['resumen']['categorias']}
+    return {
+        'ID': snapshot['id'],
+        'header_data': snapshot['header_data'] if isinstance(snapshot['header_data'], dict) else {},
+        'checklist_data': checklist,
+        'checklist_por_categoria': grouped,
+        'observations': snapshot['observations'] or "",
+        'signature_confirmation': snapshot['signature_confirmation'],
+    }
+
+# --- Guardado de Reportes ---
+#
+# Un envío se identifica por el submission_id que genera la estación al confirmar el
+# formulario (firma). Guardar dos veces el mismo envío (doble clic, reintento tras un
+# error, reenvío desde la cola local o la sincronización) no crea un segundo reporte:
+# insert_report devuelve el id del que ya existe. El hash del contenido solo identifica
+# envíos sin submission_id (reportes anteriores): dos inspecciones iguales del mismo día con
+# ids distintos son dos reportes.
+
+REPORT_HASH_FIELDS = ("driver_id", "report_date", "vehicle_plate", "km_actual", "header_data", "checklist_data", "observations")
+DEDUPE_CHUNK_SIZE = 2000
+
+def install_submission_schema(cursor):
+    """Agrega a reports el id de envío (único) y el hash de contenido, con sus índices."""
+    cursor.execute("PRAGMA table_info(reports)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "submission_id" not in columns:
+        cursor.execute("ALTER TABLE reports ADD COLUMN submission_id TEXT")
+    if "content_hash" not in columns:
+        cursor.execute("ALTER TABLE reports ADD COLUMN content_hash TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_submission ON reports (submission_id) WHERE submission_id IS NOT NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_content_hash ON reports (content_hash)")
+
+def report_content_hash(driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations):
+    """
+    SHA-256 del contenido del reporte. header_data y checklist_data se normalizan (claves
+    ordenadas) para que el mismo contenido dé el mismo hash aunque se haya serializado distinto.
+    La firma no entra: lleva la hora de confirmación.
+    """
+    def canonical(value):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                return value
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+    content = [driver_id, report_date, vehicle_plate, km_actual, canonical(header_data), canonical(checklist_data),
+               observations or ""]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def find_existing_submission(cursor, submission_id, content_hash):
+    """
+    Id del reporte ya guardado para este envío, o None: el del mismo submission_id o, si el
+    envío no trae id, el primero con el mismo contenido.
+    """
+    if submission_id:
+        cursor.execute("SELECT id FROM reports WHERE submission_id = ?", (submission_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    cursor.execute("SELECT id FROM reports WHERE content_hash = ? ORDER BY id LIMIT 1", (content_hash,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def insert_report(cursor, driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data,
+                  observations, signature_confirmation, submission_id=None):
+    """
+    Inserta un reporte y actualiza las tablas derivadas (lecturas de odómetro, órdenes de
+    trabajo, calendario de inspecciones) en la misma transacción. header_data y checklist_data se reciben como texto JSON.
+    Si el envío ya estaba guardado no inserta nada. Devuelve el id.
+    """
+    content_hash = report_content_hash(driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations)
+    existing_id = find_existing_submission(cursor, submission_id, content_hash)
+    if existing_id is not None:
+        return existing_id
+
+    cursor.execute("SELECT COALESCE(promotion, '') FROM vehicles WHERE plate = ?", (vehicle_plate,))
+    row = cursor.fetchone()
+    promotion = row[0] if row else ""
+    cursor.execute("""
+        INSERT INTO reports (driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations,
+                             signature_confirmation, submission_id, content_hash, promotion)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations, signature_confirmation,
+          submission_id, content_hash, promotion))
+    report_id = cursor.lastrowid
+    record_odometer_reading(cursor, vehicle_plate, report_date, km_actual, report_id)
+    record_inspection_day(cursor, vehicle_plate, report_date, driver_id, report_id)
+
+    try:
+        checklist = json.loads(checklist_data) if checklist_data else {}
+    except json.JSONDecodeError:
+        checklist = {}
+    update_work_orders(cursor, report_id, vehicle_plate, report_date, checklist)
+    record_inspection_rollup(cursor, vehicle_plate, promotion, report_date, checklist)
+    index_report_observations(cursor, report_id, observations)
+    write_report_snapshot(cursor, report_id)
+    return report_id
+
+def backfill_content_hashes(conn, deadline=None):
+    """
+    Calcula el hash de los reportes guardados antes de que existiera la columna, por bloques
+    (una transacción corta por bloque). Se detiene al pasar `deadline`. Devuelve cuántos calculó.
+    """
+    cursor = conn.cursor()
+    total = 0
+    while deadline is None or time.monotonic() < deadline:
+        cursor.execute(f"SELECT id, {', '.join(REPORT_HASH_FIELDS)} FROM reports WHERE content_hash IS NULL LIMIT ?",
+                       (DEDUPE_CHUNK_SIZE,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        updates = [(report_content_hash(*row[1:]), row[0]) for row in rows]
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany("UPDATE reports SET content_hash = ? WHERE id = ?", updates)
+        cursor.execute("COMMIT")
+        total += len(updates)
+    return total
+
+def find_duplicate_reports(cursor):
+    """
+    Grupos de reportes con el mismo contenido: [[id a conservar, duplicado, ...], ...].
+    Se agrupa por hash (un recorrido del índice de hashes), sin comparar reportes de a pares.
+    Se conserva el más antiguo; solo son duplicados los posteriores sin submission_id (los
+    que tienen uno son envíos distintos confirmados por la estación).
+    """
+    cursor.execute("""
+        SELECT GROUP_CONCAT(id || ':' || (submission_id IS NULL)) FROM reports
+        WHERE content_hash IS NOT NULL
+        GROUP BY content_hash HAVING COUNT(*) > 1
+    """)
+    groups = []
+    for (members,) in cursor.fetchall():
+        reports = sorted(tuple(map(int, member.split(":"))) for member in members.split(","))
+        duplicates = [report_id for report_id, without_id in reports[1:] if without_id]
+        if duplicates:
+            groups.append([reports[0][0], *duplicates])
+    return groups
+
+def remove_duplicate_reports(conn, groups):
+    """
+    Elimina los duplicados de cada grupo y conserva el reporte más antiguo. Sus fotos pasan al
+    conservado; se borran sus lecturas de odómetro, se descuentan del calendario y de los
+    agregados, y las órdenes de trabajo quedan como si nunca se hubieran guardado (aperturas,
+    ocurrencias y cierres). Una sola transacción. Devuelve cuántos borró.
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        removed = 0
+        for keep_id, *duplicate_ids in groups:
+            for duplicate_id in duplicate_ids:
+                cursor.execute("""
+                    INSERT INTO report_photos (report_id, item, photo_hash, original_name)
+                    SELECT ?, item, photo_hash, original_name FROM report_photos p WHERE p.report_id = ?
+                    AND NOT EXISTS (SELECT 1 FROM report_photos k WHERE k.report_id = ? AND k.item = p.item AND k.photo_hash = p.photo_hash)
+                """, (keep_id, duplicate_id, keep_id))
+                cursor.execute("DELETE FROM report_photos WHERE report_id = ?", (duplicate_id,))
+                cursor.execute("DELETE FROM odometer_readings WHERE report_id = ?", (duplicate_id,))
+                cursor.execute("""
+                    UPDATE inspection_calendar SET report_count = report_count - 1
+                    WHERE (day, vehicle_plate) = (SELECT report_date, vehicle_plate FROM reports WHERE id = ?) AND report_count > 1
+                """, (duplicate_id,))
+                cursor.execute("UPDATE inspection_calendar SET first_report_id = ? WHERE first_report_id = ?", (keep_id, duplicate_id))
+                cursor.execute("SELECT vehicle_plate, report_date, checklist_data, COALESCE(promotion, '') FROM reports WHERE id = ?",
+                               (duplicate_id,))
+                row = cursor.fetchone()
+                if row:
+                    try:
+                        checklist = json.loads(row[2]) if row[2] else {}
+                    except json.JSONDecodeError:
+                        checklist = {}
+                    record_inspection_rollup(cursor, row[0], row[3], row[1], checklist, sign=-1)
+                    unapply_work_orders(cursor, duplicate_id, row[0], checklist)
+                cursor.execute("DELETE FROM observation_terms WHERE report_id = ?", (duplicate_id,))
+                cursor.execute("DELETE FROM report_snapshots WHERE report_id = ?", (duplicate_id,))
+                cursor.execute("DELETE FROM reports WHERE id = ?", (duplicate_id,))
+                removed += cursor.rowcount
+        cursor.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    return removed
+
+def maintenance_dedupe_scan(conn, deadline):
+    """Tarea de mantenimiento: completa hashes y cuenta duplicados (no borra nada)."""
+    hashed = backfill_content_hashes(conn, deadline)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM reports WHERE content_hash IS NULL LIMIT 1")
+    if cursor.fetchone():
+        raise MaintenanceTimeout(f"{hashed} hashes calculados, quedan reportes sin hash")
+    groups = find_duplicate_reports(cursor)
+    return f"{hashed} hashes calculados, {len(groups)} grupo(s) de reportes duplicados"
+
+MAINTENANCE_TASKS["dedupe_scan"] = maintenance_dedupe_scan
+
+# --- Cola de Escritura de Reportes ---
+#
+# Varias estaciones comparten la DB (p. ej. en una carpeta de red) y SQLite admite un solo
+# escritor a la vez. Los reportes no se escriben desde la interfaz: se guardan primero en
+# una cola local en disco (REPORT_SPOOL_DIR) y un único hilo escritor los confirma en
+# transacciones agrupadas. Si la DB está bloqueada, reintenta con espera creciente
+# (nada se pierde: la cola local sobrevive a un cierre de la aplicación). La exportación
+# JSON se hace una vez por lote, no una vez por reporte.
+
+REPORT_SPOOL_DIR = "cola_reportes"
+WRITE_BATCH_MAX = 50            # Reportes por transacción
+WRITE_BATCH_WAIT_MS = 50        # Espera para juntar los envíos que llegan casi a la vez
+WRITE_LOCK_TIMEOUT_S = 1.0      # Espera por el bloqueo de escritura en cada intento
+WRITE_RETRY_MAX_DELAY_S = 5.0   # Tope de la espera entre reintentos
+WRITE_RETRY_MAX_S = 120.0       # Tiempo máximo reintentando un lote con la DB bloqueada
+SAVE_POLL_MS = 50
+SAVE_QUEUED_NOTICE_S = 10       # Tras esto se avisa al piloto que el reporte quedó en la cola local
+
+def _is_lock_error(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+class ReportWriter:
+    """
+    Escritor único de reportes con cola local persistente.
+
+        future = report_writer.submit(report, photos)   # report: argumentos de insert_report
+        report_id, export_error = future.result()
+    """
+
+    def __init__(self, db_name=None, spool_dir=None, export=True, export_file=None):
+        self.db_name = db_name
+        self.spool_dir = spool_dir or REPORT_SPOOL_DIR
+        self.export = export
+        self.export_file = export_file
+        self.stats = {"reports": 0, "batches": 0, "lock_retries": 0, "exports": 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Inicia el hilo escritor (una vez) y reencola lo que haya quedado en la cola local."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if os.path.isdir(self.spool_dir):
+                for name in sorted(os.listdir(self.spool_dir)):
+                    if name.endswith(".json"):
+                        with open(os.path.join(self.spool_dir, name), "r", encoding="utf-8") as f:
+                            self._queue.put((name, json.load(f), concurrent.futures.Future()))
+            self._thread = threading.Thread(target=self._run, daemon=True, name="escritor-reportes")
+            self._thread.start()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, report, photos=None):
+        """
+        Guarda el envío en la cola local (fsync) y lo encola para el escritor. Devuelve un
+        Future que se resuelve con (report_id, error de exportación o None).
+        """
+        self.start()  # Antes de escribir en la cola local: start() reencola lo que ya está en ella
+        entry = {"report": report, "photos": {item: [list(photo) for photo in entries] for item, entries in (photos or {}).items()}}
+        os.makedirs(self.spool_dir, exist_ok=True)
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex}.json"
+        with AtomicExportWriter(os.path.join(self.spool_dir, name)) as writer:
+            writer.write(json.dumps(entry, ensure_ascii=False))
+        future = concurrent.futures.Future()
+        self._queue.put((name, entry, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + WRITE_BATCH_WAIT_MS / 1000
+            while len(batch) < WRITE_BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                committed = self._commit_with_retry(batch)
+            except Exception as e:
+                # Falla inesperada (p. ej. disco): los envíos siguen en la cola local para el próximo inicio
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            export_error = None
+            if self.export and committed and self._queue.empty():
+                try:
+                    export_all_reports_to_json(self.export_file, db_name=self.db_name)
+                    self.stats["exports"] += 1
+                except Exception as e:
+                    export_error = e
+            for future, report_id in committed:
+                future.set_result((report_id, export_error))
+
+    def _commit_with_retry(self, batch):
+        """
+        Confirma el lote; reintenta mientras la DB esté bloqueada, hasta WRITE_RETRY_MAX_S.
+        Pasado ese tiempo el lote queda en la cola local (se reintenta al próximo inicio) y
+        se lanza el error. Devuelve [(future, report_id)].
+        """
+        delay = 0.05
+        give_up_at = time.monotonic() + WRITE_RETRY_MAX_S
+        while True:
+            try:
+                report_ids = self._commit(batch)
+                break
+            except Exception as e:
+                if _is_lock_error(e):
+                    if time.monotonic() >= give_up_at:
+                        logger.error("Lote de %d reportes sin guardar: DB bloqueada por más de %.0f s (%s). Queda en %s",
+                                     len(batch), WRITE_RETRY_MAX_S, e, self.spool_dir)
+                        raise sqlite3.OperationalError(
+                            f"Base de datos bloqueada por más de {WRITE_RETRY_MAX_S:.0f} s; el reporte quedó en la cola "
+                            "local y se guardará al reiniciar la aplicación.") from e
+                    self.stats["lock_retries"] += 1
+                    # Espera con variación: las estaciones no chocan al unísono
+                    time.sleep(min(delay * random.uniform(0.5, 1.5), max(give_up_at - time.monotonic(), 0)))
+                    delay = min(delay * 2, WRITE_RETRY_MAX_DELAY_S)
+                    continue
+                if len(batch) > 1:
+                    # Un envío con datos inválidos no debe bloquear al resto: se separan
+                    return [result for item in batch for result in self._commit_with_retry([item])]
+                name, _, future = batch[0]
+                os.replace(os.path.join(self.spool_dir, name), os.path.join(self.spool_dir, name + ".error"))
+                future.set_exception(e)
+                return []
+
+        for name, _, _ in batch:
+            os.remove(os.path.join(self.spool_dir, name))
+        self.stats["reports"] += len(batch)
+        self.stats["batches"] += 1
+        return [(future, report_id) for (_, _, future), report_id in zip(batch, report_ids)]
+
+    def _commit(self, batch):
+        conn = open_db(self.db_name, timeout=WRITE_LOCK_TIMEOUT_S, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                report_ids = []
+                for _, entry, _ in batch:
+                    report_id = insert_report(cursor, **entry["report"])
+                    attach_report_photos(cursor, report_id, {item: [tuple(photo) for photo in photos]
+                                                             for item, photos in entry["photos"].items()})
+                    report_ids.append(report_id)
+                cursor.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return report_ids
+
+report_writer = ReportWriter()
+
+def _stress_station(db_name, work_dir, station, report_count, mode, think_ms, results):
+    """Proceso de una estación para stress_test_submissions (modo 'direct' o 'coalesced')."""
+    rng = np.random.default_rng(station)
+    checklist = json.dumps({item: "Buen estado" for item in CHECKLIST_ITEM_NAMES})
+    export_file = os.path.join(work_dir, "export.json")
+    latencies, lock_errors = [], 0
+    writer = None
+    if mode == "coalesced":
+        writer = ReportWriter(db_name, os.path.join(work_dir, f"cola-{station}"), export_file=export_file)
+    pending = []
+
+    for i in range(report_count):
+        time.sleep(rng.uniform(*think_ms) / 1000)
+        report = dict(driver_id=station + 2, report_date="2026-01-01", vehicle_plate=f"S{station:06d}", km_actual=str(1000 + i),
+                      header_data="{}", checklist_data=checklist, observations="stress", signature_confirmation=f"stress-{station}-{i}")
+        start = time.perf_counter()
+        if writer:
+            future = writer.submit(report)
+            # La latencia es hasta que el reporte queda confirmado (se mide al resolverse el Future)
+            future.add_done_callback(lambda done, start=start: latencies.append(time.perf_counter() - start))
+            pending.append(future)
+            continue
+        # Ruta anterior: una transacción y una exportación completa por reporte
+        try:
+            conn = sqlite3.connect(db_name)
+            try:
+                insert_report(conn.cursor(), **report)
+                conn.commit()
+            finally:
+                conn.close()
+            export_all_reports_to_json(export_file, db_name=db_name)
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            lock_errors += 1  # El reporte se perdió
+
+    concurrent.futures.wait(pending)
+    stats = writer.stats if writer else {}
+    results.put((latencies, lock_errors, stats))
+
+def stress_test_submissions(stations=4, reports_per_station=50, mode="coalesced", think_ms=(0, 20), preload=2000):
+    """
+    Simula `stations` estaciones (procesos) enviando reportes a una misma DB temporal y mide
+    rendimiento, latencia p50/p99 por envío y errores de bloqueo. mode: 'direct' (ruta
+    anterior: commit + exportación por reporte) o 'coalesced' (ReportWriter).
+    """
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "stress.db")
+        inicializar_db(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO users (username, password, full_name, role) VALUES (?, '', ?, 'piloto')",
+                         ((f"stress{i}", f"Estación {i}") for i in range(stations)))
+        checklist = json.dumps({item: "Buen estado" for item in CHECKLIST_ITEM_NAMES})
+        conn.executemany("INSERT INTO reports (driver_id, report_date, vehicle_plate, km_actual, checklist_data) VALUES (2, '2025-12-31', 'C123456', ?, ?)",
+                         ((str(i), checklist) for i in range(preload)))
+        conn.commit()
+        conn.close()
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_stress_station, args=(db_path, tmp_dir, station, reports_per_station, mode, think_ms, results))
+                     for station in range(stations)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM reports WHERE observations = 'stress'").fetchone()[0]
+        conn.close()
+
+    latencies = np.array([latency for outcome in outcomes for latency in outcome[0]]) * 1000
+    totals = collections.Counter()
+    for _, _, stats in outcomes:
+        totals.update(stats)
+    return {
+        "mode": mode, "stations": stations, "submitted": stations * reports_per_station, "stored": stored,
+        "seconds": round(elapsed, 2), "throughput_per_s": round(stored / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+        "lock_errors": sum(outcome[1] for outcome in outcomes),
+        "lock_retries": totals["lock_retries"], "batches": totals["batches"], "exports": totals["exports"],
+    }
+
+# --- Consultas de Reportes ---
+
+REPORT_LIST_QUERY = """
+SELECT 
+    r.id, 
+    COALESCE(u.full_name, json_extract(s.data, '$.resumen.piloto')) AS piloto, 
+    r.vehicle_plate, 
+    r.report_date, 
+    r.km_actual,
+    r.header_data,
+    r.checklist_data,
+    r.observations,
+    r.signature_confirmation
+FROM reports r
+LEFT JOIN users u ON r.driver_id = u.id 
+LEFT JOIN report_snapshots s ON s.report_id = r.id
+"""
+
+_ASCII_UPPER = str.maketrans("abcdefghijklmnopqrstuvwxyz", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+def search_key(text):
+    """Mayúsculas solo en ASCII, igual que UPPER de SQLite: la búsqueda en SQL y en memoria coinciden."""
+    return text.translate(_ASCII_UPPER)
+
+def escape_like(text):
+    """Escapa los comodines de LIKE (%, _) para buscar el texto literal (con ESCAPE '\\')."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def build_report_search_query(search_term="", mentions=None):
+    """
+    Arma la consulta de reportes (más recientes primero), filtrando por placa o piloto si hay
+    término y por lo que mencionan sus observaciones si se indica `mentions`.
+    """
+    query = REPORT_LIST_QUERY
+    conditions = []
+    params = []
+    
+    if search_term:
+        # Buscar el texto literal en placa o nombre del piloto (case-insensitive usando UPPER)
+        conditions.append("(UPPER(r.vehicle_plate) LIKE ? ESCAPE '\\' "
+                          "OR UPPER(COALESCE(u.full_name, json_extract(s.data, '$.resumen.piloto'))) LIKE ? ESCAPE '\\')")
+        search_pattern = f"%{escape_like(search_key(search_term))}%"
+        params.append(search_pattern)
+        params.append(search_pattern)
+    if mentions:
+        mention_sql, mention_params = observation_match_sql(mentions)
+        if mention_sql:
+            conditions.append(f"r.id IN ({mention_sql})")
+            params.extend(mention_params)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+        
+    query += " ORDER BY r.id DESC"
+    return query, params
+
+def query_reports_df(conn, search_term=""):
+    """Consulta los reportes (más recientes primero), filtrando por placa o piloto si hay término."""
+    query, params = build_report_search_query(search_term)
+    return read_sql_df(query, conn, params=params)
+
+def filter_reports_df(df, key):
+    """Filtra en memoria un resultado previo (mismo criterio que la consulta SQL; key viene de search_key)."""
+    if not key or df.empty:
+        return df
+    mask = (df['vehicle_plate'].fillna("").str.translate(_ASCII_UPPER).str.contains(key, regex=False)
+            | df['piloto'].fillna("").str.translate(_ASCII_UPPER).str.contains(key, regex=False))
+    return df[mask]
+
+REPORT_FEED_POLL_MS = 1000   # Revisión de reportes nuevos en la pestaña de revisión
+
+class ReportChangeFeed:
+    """
+    Detecta cambios en reportes sin repetir la consulta completa. PRAGMA data_version solo
+    cambia cuando otra conexión (otra estación, el escritor de reportes) confirmó una
+    escritura, así que revisar "¿hubo cambios?" cuesta una lectura del encabezado de la DB.
+    Los reportes solo se insertan y sus ids crecen: lo nuevo es id > última marca.
+    """
+
+    def __init__(self, db_name=None):
+        self.db_name = db_name
+        self.last_id = 0
+        self._count = 0
+        self._data_version = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = open_db(self.db_name)
+        return self._conn
+
+    def reset(self):
+        """Toma el estado actual como punto de partida (lo ya mostrado)."""
+        conn = self._connection()
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._count, self.last_id = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM reports").fetchone()
+
+    def poll(self):
+        """
+        None si nada cambió; "reset" si desaparecieron reportes (p. ej. se archivaron) y hay
+        que recargar; si no, un DataFrame con los reportes nuevos (más recientes primero).
+        """
+        conn = self._connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return None
+        self._data_version = version
+
+        new_rows = read_sql_df(REPORT_LIST_QUERY + " WHERE r.id > ? ORDER BY r.id DESC", conn, params=[self.last_id])
+        count = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+        expected = self._count + len(new_rows)
+        self._count = count
+        if not new_rows.empty:
+            self.last_id = int(new_rows["id"].max())
+        if count != expected:
+            self.reset()
+            return "reset"
+        return new_rows if not new_rows.empty else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+# --- Salud de la Flota (Análisis Vectorizado con NumPy) ---
+
+STATUS_NA = 0
+STATUS_GOOD = 1
+STATUS_BAD = 2
+STATUS_CODES = {"N/A": STATUS_NA, "Buen estado": STATUS_GOOD, "Mal estado": STATUS_BAD}
+
+HEALTH_WINDOW = 10              # Últimas inspecciones consideradas para la tasa de defectos
+HEALTH_PENALTY_REPEATED = 10    # Puntos por ítem en "Mal estado" en las dos últimas inspecciones
+HEALTH_PENALTY_PER_DAY = 2      # Puntos por día sin una inspección sin defectos...
+HEALTH_MAX_DAYS = 30            # ...hasta este máximo de días
+HEALTH_LOAD_CHUNK = 5000
+HEALTH_MAX_ROWS = 200           # Vehículos mostrados en la pestaña (los de mayor riesgo)
+
+CHECKLIST_ITEM_NAMES = [item for _, items in CHECKLIST_ITEMS for item in items]
+CHECKLIST_ITEM_INDEX = {name: i for i, name in enumerate(CHECKLIST_ITEM_NAMES)}
+
+def checklist_status_matrix(checklist_jsons):
+    """Matriz int8 (reportes × ítems, en el orden de CHECKLIST_ITEM_NAMES) con los códigos de estado."""
+    status = np.zeros((len(checklist_jsons), len(CHECKLIST_ITEM_NAMES)), dtype=np.int8)
+    for row_index, checklist_json in enumerate(checklist_jsons):
+        try:
+            checklist = json.loads(checklist_json) if checklist_json else {}
+        except json.JSONDecodeError:
+            continue
+        for item, value in checklist.items():
+            col = CHECKLIST_ITEM_INDEX.get(item)
+            if col is not None:
+                status[row_index, col] = STATUS_CODES.get(value, STATUS_NA)
+    return status
+
+class FleetHealthEngine:
+    """
+    Mantiene en memoria una matriz reportes × ítems (int8, columnas en el orden de
+    CHECKLIST_ITEMS) y calcula puntajes de salud por vehículo con operaciones vectorizadas.
+    refresh() solo lee los reportes nuevos (los reportes no se editan).
+    """
+
+    def __init__(self, db_name=None):
+        self.db_name = db_name
+        self.item_index = CHECKLIST_ITEM_INDEX
+        self.plates = []            # código de vehículo -> placa
+        self._plate_codes = {}      # placa -> código de vehículo
+        self.report_ids = np.empty(0, dtype=np.int64)
+        self.vehicle_codes = np.empty(0, dtype=np.int32)
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.status = np.empty((0, len(CHECKLIST_ITEM_NAMES)), dtype=np.int8)
+        self.last_report_id = 0
+
+    def _plate_code(self, plate):
+        code = self._plate_codes.get(plate)
+        if code is None:
+            code = self._plate_codes[plate] = len(self.plates)
+            self.plates.append(plate)
+        return code
+
+    def refresh(self):
+        """Agrega a la matriz los reportes posteriores al último cargado. Devuelve cuántos se agregaron."""
+        conn = open_db(self.db_name)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, vehicle_plate, report_date, checklist_data FROM reports WHERE id > ? ORDER BY id",
+                           (self.last_report_id,))
+            chunks = []
+            while True:
+                rows = cursor.fetchmany(HEALTH_LOAD_CHUNK)
+                if not rows:
+                    break
+                chunks.append(self._chunk_arrays(rows))
+        finally:
+            conn.close()
+        self._extend(chunks)  # Una sola copia de la matriz, no una por bloque
+        return sum(len(chunk[0]) for chunk in chunks)
+
+    def append_rows(self, rows):
+        """Agrega filas (id, placa, fecha 'YYYY-MM-DD', checklist_data JSON) a la matriz."""
+        if rows:
+            self._extend([self._chunk_arrays(rows)])
+
+    def _chunk_arrays(self, rows):
+        """(ids, códigos de vehículo, fechas, estados) de un bloque de filas."""
+        dates = pd.to_datetime(pd.Series([row[2] for row in rows]), format="%Y-%m-%d", errors="coerce")
+        return (np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+                np.fromiter((self._plate_code(row[1]) for row in rows), np.int32, len(rows)),
+                dates.to_numpy().astype("datetime64[D]"),
+                checklist_status_matrix([row[3] for row in rows]))
+
+    def _extend(self, chunks):
+        if not chunks:
+            return
+        ids, codes, dates, status = zip(*chunks)
+        self.report_ids = np.concatenate([self.report_ids, *ids])
+        self.vehicle_codes = np.concatenate([self.vehicle_codes, *codes])
+        self.dates = np.concatenate([self.dates, *dates])
+        self.status = np.concatenate([self.status, *status])
+        self.last_report_id = max(self.last_report_id, int(self.report_ids[-1]))
+
+    def compute_scores(self, window=HEALTH_WINDOW, today=None):
+        """
+        Calcula el puntaje de salud (0-100) de cada vehículo y devuelve un DataFrame
+        ordenado de mayor a menor riesgo, con:
+          - tasa_defectos: ítems "Mal estado" / ítems evaluados en las últimas `window` inspecciones
+          - fallas_repetidas: ítems en "Mal estado" en la última y la penúltima inspección
+          - dias_sin_ok: días desde la última inspección sin ningún ítem en "Mal estado"
+        """
+        columns = ["placa", "puntaje", "tasa_defectos", "fallas_repetidas", "dias_sin_ok", "ultimo_reporte", "reportes"]
+        if len(self.report_ids) == 0:
+            return pd.DataFrame(columns=columns)
+        today = np.datetime64(today or datetime.date.today(), "D")
+
+        # Ordenar por vehículo, fecha e id: cada vehículo queda en un bloque contiguo
+        order = np.lexsort((self.report_ids, self.dates, self.vehicle_codes))
+        codes = self.vehicle_codes[order]
+        dates = self.dates[order]
+        bad = self.status[order] == STATUS_BAD
+        bad_count = bad.sum(axis=1, dtype=np.int64)
+        evaluated = (self.status[order] != STATUS_NA).sum(axis=1, dtype=np.int64)
+
+        n = len(codes)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+
+        # Tasa de defectos en la ventana de las últimas `window` inspecciones (sumas acumuladas)
+        lo = np.maximum(ends - window + 1, starts)
+        cs_bad = np.cumsum(bad_count)
+        cs_eval = np.cumsum(evaluated)
+        window_bad = cs_bad[ends] - np.where(lo > 0, cs_bad[lo - 1], 0)
+        window_eval = cs_eval[ends] - np.where(lo > 0, cs_eval[lo - 1], 0)
+        defect_rate = window_bad / np.maximum(window_eval, 1)
+
+        # Mismo ítem en "Mal estado" en las dos últimas inspecciones
+        prev = ends - 1
+        has_prev = prev >= starts
+        repeated = np.where(has_prev, (bad[ends] & bad[np.maximum(prev, 0)]).sum(axis=1), 0)
+
+        # Días desde la última inspección sin defectos (o desde la primera si nunca hubo una)
+        day_numbers = dates.astype(np.int64)
+        never = np.iinfo(np.int64).min
+        last_good = np.maximum.reduceat(np.where(bad_count == 0, day_numbers, never), starts)
+        reference = np.where(last_good == never, day_numbers[starts], last_good)
+        days_without_ok = np.maximum(today.astype(np.int64) - reference, 0)
+
+        score = (100 * (1 - defect_rate)
+                 - HEALTH_PENALTY_REPEATED * repeated
+                 - HEALTH_PENALTY_PER_DAY * np.minimum(days_without_ok, HEALTH_MAX_DAYS))
+        score = np.clip(score, 0, 100)
+
+        plates = np.array(self.plates, dtype=object)[codes[starts]]
+        df = pd.DataFrame({
+            "placa": plates,
+            "puntaje": score.round(1),
+            "tasa_defectos": defect_rate.round(3),
+            "fallas_repetidas": repeated,
+            "dias_sin_ok": days_without_ok,
+            "ultimo_reporte": dates[ends],
+            "reportes": ends - starts + 1,
+        }, columns=columns)
+        return df.sort_values(["puntaje", "tasa_defectos"], ascending=[True, False], kind="stable").reset_index(drop=True)
+
+def benchmark_fleet_health(report_count=1_000_000, vehicle_count=2000, seed=0):
+    """Mide compute_scores() sobre una matriz sintética (sin DB). Devuelve segundos y tamaño."""
+    rng = np.random.default_rng(seed)
+    engine = FleetHealthEngine()
+    engine.plates = [f"C{100000 + i}" for i in range(vehicle_count)]
+    engine.report_ids = np.arange(1, report_count + 1, dtype=np.int64)
+    engine.vehicle_codes = rng.integers(0, vehicle_count, report_count, dtype=np.int32)
+    engine.dates = np.datetime64("2024-01-01") + rng.integers(0, 700, report_count).astype("timedelta64[D]")
+    engine.status = rng.choice(np.array([STATUS_NA, STATUS_GOOD, STATUS_BAD], dtype=np.int8),
+                               size=(report_count, len(CHECKLIST_ITEM_NAMES)), p=[0.1, 0.85, 0.05])
+    start = time.perf_counter()
+    ranking = engine.compute_scores(today="2025-12-31")
+    return {"reports": report_count, "vehicles": len(ranking), "seconds": round(time.perf_counter() - start, 3)}
+
+# --- Modo Análisis (Instantánea Columnar en Disco) ---
+#
+# Para análisis pesados en el puesto del administrador sin competir con los pilotos por la
+# DB: los reportes se copian a columnas de ancho fijo en ANALYTICS_DIR (un archivo por
+# columna) y se leen con np.memmap, sin copiarlos a memoria y sin abrir SQLite.
+# La actualización es incremental (los reportes solo se insertan): se agregan al final de
+# cada archivo las filas nuevas y después se reescribe el manifiesto (escritura atómica),
+# que dice cuántas filas son válidas. Un lector nunca ve filas a medio escribir. Si se
+# borraron reportes (archivo histórico, duplicados) se regenera todo en otra "generación".
+
+ANALYTICS_DIR = "analitica"
+ANALYTICS_MODE = False          # True: el tablero de riesgo lee la instantánea (ver --analytics)
+ANALYTICS_REFRESH_MS = 5 * 60 * 1000
+ANALYTICS_KM_MISSING = -1
+ANALYTICS_COLUMNS = {           # columna -> tipo (status tiene una columna por ítem)
+    "ids": np.int64,            # id del reporte
+    "dates": np.int64,          # días desde 1970-01-01 (se leen como datetime64[D] sin copiar)
+    "km": np.int64,
+    "plates": np.int32,         # código de placa (índice en manifest["plates"])
+    "status": np.int8,
+}
+
+_analytics_lock = threading.Lock()
+
+def _analytics_manifest_path(directory):
+    return os.path.join(directory, "manifest.json")
+
+def _analytics_column_path(directory, generation, column):
+    return os.path.join(directory, f"{generation:06d}-{column}.bin")
+
+def read_analytics_manifest(directory=None):
+    """Manifiesto de la instantánea (None si todavía no se generó)."""
+    try:
+        with open(_analytics_manifest_path(directory or ANALYTICS_DIR), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def refresh_analytics_snapshot(db_name=None, directory=None):
+    """
+    Agrega a la instantánea los reportes nuevos (o la regenera si se borraron reportes o
+    cambió CHECKLIST_ITEMS). Lee la DB en modo solo lectura y por bloques.
+    Devuelve {"rows", "added", "rebuilt"}.
+    """
+    directory = directory or ANALYTICS_DIR
+    db_path = os.path.abspath(db_name or DB_NAME)
+    with _analytics_lock:
+        os.makedirs(directory, exist_ok=True)
+        manifest = read_analytics_manifest(directory)
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            cursor = conn.cursor()
+            rebuild = manifest is None or manifest["items"] != CHECKLIST_ITEM_NAMES
+            if not rebuild:
+                cursor.execute("SELECT COUNT(*) FROM reports WHERE id <= ?", (manifest["max_id"],))
+                rebuild = cursor.fetchone()[0] != manifest["rows"]
+            old_generation = manifest["generation"] if manifest else 0
+            if rebuild:
+                manifest = {"generation": old_generation + 1, "rows": 0, "max_id": 0, "items": CHECKLIST_ITEM_NAMES, "plates": []}
+            generation, rows = manifest["generation"], manifest["rows"]
+            plate_codes = {plate: code for code, plate in enumerate(manifest["plates"])}
+
+            files = {}
+            try:
+                for column, dtype in ANALYTICS_COLUMNS.items():
+                    path = _analytics_column_path(directory, generation, column)
+                    width = np.dtype(dtype).itemsize * (len(CHECKLIST_ITEM_NAMES) if column == "status" else 1)
+                    files[column] = open(path, "r+b" if os.path.exists(path) else "w+b")
+                    files[column].truncate(rows * width)  # Descarta lo que haya quedado de una actualización interrumpida
+                    files[column].seek(rows * width)
+
+                cursor.execute("SELECT id, vehicle_plate, report_date, km_actual, checklist_data FROM reports WHERE id > ? ORDER BY id",
+                               (manifest["max_id"],))
+                added = 0
+                while True:
+                    chunk = cursor.fetchmany(HEALTH_LOAD_CHUNK)
+                    if not chunk:
+                        break
+                    for plate in {row[1] for row in chunk} - plate_codes.keys():
+                        plate_codes[plate] = len(manifest["plates"])
+                        manifest["plates"].append(plate)
+                    dates = pd.to_datetime(pd.Series([row[2] for row in chunk]), format="%Y-%m-%d", errors="coerce")
+                    columns = {
+                        "ids": np.fromiter((row[0] for row in chunk), np.int64, len(chunk)),
+                        "dates": dates.to_numpy().astype("datetime64[D]").astype(np.int64),
+                        "km": np.fromiter((ANALYTICS_KM_MISSING if (km := parse_km(row[3])) is None else km for row in chunk),
+                                          np.int64, len(chunk)),
+                        "plates": np.fromiter((plate_codes[row[1]] for row in chunk), np.int32, len(chunk)),
+                        "status": checklist_status_matrix([row[4] for row in chunk]),
+                    }
+                    for column, values in columns.items():
+                        files[column].write(np.ascontiguousarray(values, dtype=ANALYTICS_COLUMNS[column]).tobytes())
+                    added += len(chunk)
+                    manifest["max_id"] = int(columns["ids"][-1])
+                for f in files.values():
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                for f in files.values():
+                    f.close()
+        finally:
+            conn.close()
+
+        manifest["rows"] = rows + added
+        manifest["refreshed_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        with AtomicExportWriter(_analytics_manifest_path(directory)) as writer:
+            writer.write(json.dumps(manifest, ensure_ascii=False))
+        if rebuild and old_generation:
+            for column in ANALYTICS_COLUMNS:
+                try:
+                    os.remove(_analytics_column_path(directory, old_generation, column))
+                except OSError:
+                    pass  # Windows: un lector todavía la tiene mapeada
+    return {"rows": manifest["rows"], "added": added, "rebuilt": rebuild}
+
+class AnalyticsSnapshot:
+    """
+    Vista de solo lectura de la instantánea: arreglos np.memmap (sin copia, sin SQLite)
+    con las filas que el manifiesto da por válidas al abrirla.
+    """
+
+    def __init__(self, directory=None):
+        directory = directory or ANALYTICS_DIR
+        manifest = read_analytics_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No hay instantánea de análisis en {directory} (ejecute: analytics --refresh)")
+        self.rows = manifest["rows"]
+        self.max_id = manifest["max_id"]
+        self.plates = manifest["plates"]
+        self.refreshed_at = manifest.get("refreshed_at")
+        arrays = {}
+        for column, dtype in ANALYTICS_COLUMNS.items():
+            shape = (self.rows, len(manifest["items"])) if column == "status" else (self.rows,)
+            if self.rows == 0:
+                arrays[column] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[column] = np.memmap(_analytics_column_path(directory, manifest["generation"], column),
+                                           dtype=dtype, mode="r", shape=shape)
+        self.report_ids = arrays["ids"]
+        self.dates = arrays["dates"].view("datetime64[D]")
+        self.km = arrays["km"]
+        self.vehicle_codes = arrays["plates"]
+        self.status = arrays["status"]
+
+    def health_engine(self):
+        """FleetHealthEngine sobre los arreglos mapeados (para compute_scores, sin refresh)."""
+        engine = FleetHealthEngine()
+        engine.plates = list(self.plates)
+        engine.report_ids = self.report_ids
+        engine.vehicle_codes = self.vehicle_codes
+        engine.dates = self.dates
+        engine.status = self.status
+        engine.last_report_id = self.max_id
+        return engine
+
+    def select(self, plate=None, since=None, until=None, item=None, status=None):
+        """
+        Ids de los reportes que cumplen los filtros (fechas 'YYYY-MM-DD' inclusivas; item y
+        status: ej. "Freno de Mano", "Mal estado"). Solo compara arreglos mapeados.
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        if plate is not None:
+            if plate not in self.plates:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.vehicle_codes == self.plates.index(plate)
+        if since:
+            mask &= self.dates >= np.datetime64(since, "D")
+        if until:
+            mask &= self.dates <= np.datetime64(until, "D")
+        if item is not None or status is not None:
+            codes = self.status if item is None else self.status[:, CHECKLIST_ITEM_INDEX[item]]
+            matches = codes == STATUS_CODES[status or "Mal estado"]
+            mask &= matches if matches.ndim == 1 else matches.any(axis=1)
+        return self.report_ids[mask]
+
+# --- Ventana de Detalles de Reporte (Para Admin) ---
+
+class ReportDetailWindow(ctk.CTkToplevel):
+    def __init__(self, master, report_data):
+        super().__init__(master)
+        self.title(f"Detalles del Reporte ID: {report_data['ID']}")
+        self.geometry("700x600")
+        self.transient(master)  
+        self.report_data = report_data
+        
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.scrollable_frame = ctk.CTkScrollableFrame(self)
+        self.scrollable_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.scrollable_frame.grid_columnconfigure(0, weight=1)
+
+        self.display_report()
+
+    def create_detail_label(self, parent, text, value, row, column=0, font_size=14, weight="normal"):
+        """Función auxiliar para crear etiquetas de detalle."""
+        label_text = f"{text}:"
+        label = ctk.CTkLabel(parent, text=label_text, font=ctk.CTkFont(size=font_size, weight="bold"))
+        label.grid(row=row, column=column, padx=10, pady=(5, 0), sticky="nw")
+        
+        value_label = ctk.CTkLabel(parent, text=value, font=ctk.CTkFont(size=font_size, weight=weight), wraplength=500, justify="left")
+        value_label.grid(row=row, column=column + 1, padx=10, pady=(5, 0), sticky="nw")
+
+    def display_report(self):
+        """Muestra la información detallada del reporte."""
+        
+        # --- Sección de Encabezado ---
+        header = self.report_data['header_data']
+        header_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
+        header_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
+        header_frame.grid_columnconfigure((0, 1), weight=1)
+
+        ctk.CTkLabel(header_frame, text="Detalles del Vehículo y Piloto", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
+
+        row_counter = 1
+        # Mapeo de campos técnicos a nombres amigables
+        field_map = {
+            "placa": "Placa", "marca": "Marca", "promocion": "Promoción", "fecha": "Fecha", 
+            "km_actual": "Km Actual", "piloto_nombre": "Piloto", "piloto_id": "ID Piloto"
+        }
+        
+        for key, display_name in field_map.items():
+            value = header.get(key, 'N/A')
+            self.create_detail_label(header_frame, display_name, str(value), row_counter, 0)
+            row_counter += 1
+
+        # --- Sección de Checklist ---
+        checklist_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
+        checklist_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
+        checklist_frame.grid_columnconfigure(0, weight=3)
+        checklist_frame.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(checklist_frame, text="Checklist de Inspección", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
+        
+        # Encabezados de la tabla
+        ctk.CTkLabel(checklist_frame, text="Item", font=ctk.CTkFont(weight="bold")).grid(row=1, column=0, sticky="w", padx=10)
+        ctk.CTkLabel(checklist_frame, text="Resultado", font=ctk.CTkFont(weight="bold")).grid(row=1, column=1, sticky="w", padx=10)
+        
+        row_counter = 2
+        
+        # Ítems ya agrupados por categoría en la instantánea del reporte
+        categorized_checklist = self.report_data['checklist_por_categoria']
+
+        for categoria, items in categorized_checklist.items():
+            # Etiqueta de Categoría
+            ctk.CTkLabel(checklist_frame, text=f"--- {categoria.upper()} ---", 
+                         font=ctk.CTkFont(weight="bold", size=13), text_color="gray").grid(row=row_counter, column=0, columnspan=2, sticky="w", padx=10, pady=(5, 0))
+            row_counter += 1
+
+            for item, status in items.items():
+                ctk.CTkLabel(checklist_frame, text=item, anchor="w").grid(row=row_counter, column=0, sticky="w", padx=10, pady=2)
+                
+                # Color del estado: N/A en azul
+                color = "green" if status == "Buen estado" else "red" if status == "Mal estado" else "blue"
+                ctk.CTkLabel(checklist_frame, text=status, text_color=color, font=ctk.CTkFont(weight="bold")).grid(row=row_counter, column=1, sticky="w", padx=10, pady=2)
+                row_counter += 1
+
+        # --- Sección de Observaciones y Confirmación ---
+        obs_conf_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
+        obs_conf_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
+        obs_conf_frame.grid_columnconfigure(0, weight=1)
+
+        # Observaciones
+        ctk.CTkLabel(obs_conf_frame, text="Observaciones", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, sticky="w", padx=10, pady=(10, 5))
+        obs_text = self.report_data['observations'] if self.report_data['observations'] else "Sin observaciones adicionales."
+        ctk.CTkLabel(obs_conf_frame, text=obs_text, justify="left", wraplength=600).grid(row=1, column=0, sticky="w", padx=10, pady=(0, 10))
+
+        # Confirmación
+        ctk.CTkLabel(obs_conf_frame, text="Confirmación de Piloto (Firma)", font=ctk.CTkFont(size=16, weight="bold")).grid(row=2, column=0, sticky="w", padx=10, pady=(10, 5))
+        ctk.CTkLabel(obs_conf_frame, text=self.report_data['signature_confirmation'], justify="left", wraplength=600, text_color="green").grid(row=3, column=0, sticky="w", padx=10, pady=(0, 10))
+
+        # --- Sección de Evidencia Fotográfica ---
+        self.display_photos()
+
+    def display_photos(self):
+        """Muestra las fotos del reporte. Las miniaturas se cargan en segundo plano."""
+        conn = open_db()
+        try:
+            photos = get_report_photos(conn.cursor(), int(self.report_data['ID']))
+        finally:
+            conn.close()
+        if not photos:
+            return
+
+        photos_frame = ctk.CTkFrame(self.scrollable_frame, border_width=2)
+        photos_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=10)
+        ctk.CTkLabel(photos_frame, text="Evidencia Fotográfica", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=4, sticky="w", padx=10, pady=(10, 5))
+
+        self.pending_thumbnails = []
+        for index, (item, photo_hash) in enumerate(photos):
+            cell = ctk.CTkFrame(photos_frame, fg_color="transparent")
+            cell.grid(row=1 + index // 4, column=index % 4, padx=5, pady=5)
+            image_label = ctk.CTkLabel(cell, text="Cargando...", width=PHOTO_THUMB_SIZE[0], height=PHOTO_THUMB_SIZE[1])
+            image_label.pack()
+            ctk.CTkLabel(cell, text=item, wraplength=PHOTO_THUMB_SIZE[0], font=ctk.CTkFont(size=11)).pack()
+            self.pending_thumbnails.append((photo_store.submit_thumbnail(photo_hash), image_label))
+
+        self.after(50, self._poll_thumbnails)
+
+    def _poll_thumbnails(self):
+        """Coloca en la interfaz las miniaturas que ya terminaron de cargarse."""
+        if not self.winfo_exists():
+            return
+        still_pending = []
+        for future, image_label in self.pending_thumbnails:
+            if not future.done():
+                still_pending.append((future, image_label))
+            elif future.exception() is not None:
+                image_label.configure(text="Foto no disponible")
+            else:
+                image = future.result()
+                image_label.configure(text="", image=ctk.CTkImage(light_image=image, dark_image=image, size=image.size))
+        self.pending_thumbnails = still_pending
+        if still_pending:
+            self.after(50, self._poll_thumbnails)
+
+
+# --- Clase de la Interfaz de Administración ---
+
+class AdminFrame(ctk.CTkFrame):
+    def __init__(self, master, app_instance):
+        super().__init__(master)
+        self.app = app_instance
+        self.grid(row=0, column=0, sticky="nsew") 
+        self.grid_columnconfigure(0, weight=1)
+        
+        # --- Frame del encabezado (para el logo y el botón de Logout) ---
+        header_frame = ctk.CTkFrame(self, fg_color="transparent")
+        header_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(20, 0))
+        header_frame.grid_columnconfigure(0, weight=0) # Logo
+        header_frame.grid_columnconfigure(1, weight=1) # Título
+        header_frame.grid_columnconfigure(2, weight=0) # Botón Logout
+
+        # ⭐️ Logo en Admin
+        if self.app.logo_image:
+            ctk.CTkLabel(header_frame, text="", image=self.app.logo_image).grid(row=0, column=0, rowspan=2, padx=(0, 15), sticky="w")
+        
+        # Título 
+        ctk.CTkLabel(header_frame, text=f"Administrador: {self.app.current_user_name}", font=ctk.CTkFont(size=18, weight="bold")).grid(row=0, column=1, sticky="w")
+        
+        # Botón de Cerrar Sesión 
+        ctk.CTkButton(header_frame, text="Cerrar Sesión", command=self.app.logout, fg_color="darkred", hover_color="red").grid(row=0, column=2, sticky="e")
+
+
+        # Crear Tabs (Empiezan en la fila 1)
+        self.tabview = ctk.CTkTabview(self, width=850, height=650)
+        self.tabview.grid(row=1, column=0, sticky="nsew", padx=20, pady=20)
+        
+        self.tabview.add("Gestión de Pilotos")
+        self.tabview.add("Gestión de Vehículos") 
+        self.tabview.add("Revisión de Reportes")
+        self.tabview.add("Vehículos en Riesgo")
+        self.tabview.add("Kilometraje")
+        self.tabview.add("Órdenes de Trabajo")
+        self.tabview.add("Cumplimiento")
+        self.tabview.add("Auditoría")
+        self.tabview.add("Tendencias")
+        
+        self.setup_pilot_management_tab()
+        self.setup_vehicle_management_tab() 
+        self.setup_report_review_tab()
+        self.setup_fleet_health_tab()
+        self.setup_km_tab()
+        self.setup_work_orders_tab()
+        self.setup_compliance_tab()
+        self.setup_audit_tab()
+        self.setup_trends_tab()
+
+    @property
+    def audit_actor(self):
+        """Administrador en sesión, tal como queda en la auditoría."""
+        return self.app.current_user_id, self.app.current_user_name
+
+    # --- Pestaña de Gestión de Pilotos ---
+
+    def setup_pilot_management_tab(self):
+        tab = self.tabview.tab("Gestión de Pilotos")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(0, weight=1)
+
+        # Frame para la tabla de usuarios
+        self.pilot_table_frame = ctk.CTkScrollableFrame(tab, label_text="Usuarios del Sistema")
+        self.pilot_table_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.pilot_table_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1) 
+
+        # Frame para las acciones (Añadir/Editar/Desactivar/Eliminar)
+        action_frame = ctk.CTkFrame(tab, border_width=1)
+        action_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
+        action_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5, 6), weight=1) 
+
+        ctk.CTkLabel(action_frame, text="ID Usuario (Editar/Desactivar/Eliminar):").grid(row=0, column=0, padx=5, pady=5)
+        self.entry_user_id = ctk.CTkEntry(action_frame, width=50)
+        self.entry_user_id.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        
+        ctk.CTkLabel(action_frame, text="Nombre Completo:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.entry_full_name = ctk.CTkEntry(action_frame)
+        self.entry_full_name.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Usuario (login):").grid(row=1, column=3, padx=5, pady=5, sticky="w")
+        self.entry_username = ctk.CTkEntry(action_frame)
+        self.entry_username.grid(row=1, column=4, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Contraseña:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.entry_password = ctk.CTkEntry(action_frame)
+        self.entry_password.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+
+        # Botones de Acción
+        ctk.CTkButton(action_frame, text="Añadir Nuevo Piloto", command=lambda: self.manage_user("add")).grid(row=3, column=0, padx=5, pady=10, sticky="ew")
+        ctk.CTkButton(action_frame, text="Actualizar Datos", command=lambda: self.manage_user("update")).grid(row=3, column=1, padx=5, pady=10, sticky="ew")
+        ctk.CTkButton(action_frame, text="Desactivar", fg_color="red", command=lambda: self.toggle_user_status(0)).grid(row=3, column=3, padx=5, pady=10, sticky="ew")
+        ctk.CTkButton(action_frame, text="Activar", fg_color="green", command=lambda: self.toggle_user_status(1)).grid(row=3, column=4, padx=5, pady=10, sticky="ew")
+        
+        # Nuevo botón de ELIMINAR
+        ctk.CTkButton(action_frame, text="ELIMINAR PILOTO", fg_color="darkred", hover_color="red", command=self.delete_user).grid(row=3, column=5, padx=5, pady=10, sticky="ew")
+        
+        self.load_pilot_data()
+
+    def load_pilot_data(self):
+        """Carga y muestra la tabla de usuarios."""
+        for widget in self.pilot_table_frame.winfo_children():
+            widget.destroy()
+
+        conn = open_db()
+        cursor = conn.cursor()
+        # Incluimos la placa asignada
         cursor.execute("SELECT id, full_name, username, role, is_active, assigned_vehicle_plate FROM users ORDER BY id")
         users = cursor.fetchall()
         conn.close()
 
-        # Encabezados de la tabla
-        headers = ["ID", "Nombre Completo", "Usuario", "Rol", "Estado", "Vehículo Asignado"]
+        # Encabezados de la tabla
+        headers = ["ID", "Nombre Completo", "Usuario", "Rol", "Estado", "Vehículo Asignado"]
+        for col, header in enumerate(headers):
+            self.pilot_table_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.pilot_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
+
+        # Filas de datos
+        for row, user in enumerate(users):
+            status = "ACTIVO" if user[4] == 1 else "INACTIVO (Deshabilitado)"
+            status_color = "green" if user[4] == 1 else "red"
+            placa = user[5] if user[5] else "Ninguno"
+
+            # Columnas 0 a 3 (ID, Nombre, Usuario, Rol)
+            for col, data in enumerate(user[:4]):
+                ctk.CTkLabel(self.pilot_table_frame, text=str(data)).grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
+            
+            # Columna 4 (Estado)
+            ctk.CTkLabel(self.pilot_table_frame, text=status, text_color=status_color, font=ctk.CTkFont(weight="bold")).grid(row=row + 1, column=4, padx=10, pady=2, sticky="w")
+            
+            # Columna 5 (Vehículo Asignado)
+            ctk.CTkLabel(self.pilot_table_frame, text=placa).grid(row=row + 1, column=5, padx=10, pady=2, sticky="w")
+
+
+    def manage_user(self, action):
+        """Añade o actualiza un usuario (Piloto)."""
+        user_id = self.entry_user_id.get()
+        full_name = self.entry_full_name.get()
+        username = self.entry_username.get()
+        password = self.entry_password.get()
+
+        conn = open_db()
+        cursor = conn.cursor()
+        
+        try:
+            if action == "add":
+                if not all([full_name, username, password]):
+                    raise ValueError("Faltan datos para añadir un nuevo piloto.")
+                cursor.execute("INSERT INTO users (full_name, username, password, role) VALUES (?, ?, ?, 'piloto')", 
+                               (full_name, username, hash_password(password)))
+                new_id = cursor.lastrowid
+                record_audit(cursor, self.audit_actor, "crear", "user", new_id, None, audit_snapshot(cursor, "user", new_id))
+                messagebox.showinfo("Éxito", f"Piloto '{username}' añadido correctamente.")
+            
+            elif action == "update":
+                if not user_id:
+                    raise ValueError("Ingrese un ID para actualizar.")
+                
+                updates = []
+                params = []
+                if full_name:
+                    updates.append("full_name = ?")
+                    params.append(full_name)
+                if username:
+                    updates.append("username = ?")
+                    params.append(username)
+                if password:
+                    updates.append("password = ?")
+                    params.append(hash_password(password))
+
+                if not updates:
+                    raise ValueError("No hay campos para actualizar.")
+                
+                params.append(user_id)
+                before = audit_snapshot(cursor, "user", user_id)
+                cursor.execute(f"UPDATE users SET {', '.join(updates)} WHERE id = ?", tuple(params))
+                
+                if cursor.rowcount == 0:
+                    raise ValueError(f"No se encontró usuario con ID {user_id}.")
+                after = audit_snapshot(cursor, "user", user_id)
+                if password:
+                    after["password"] = "(cambiada)"  # Nunca se registra el hash
+                record_audit(cursor, self.audit_actor, "actualizar", "user", user_id, before, after)
+
+                messagebox.showinfo("Éxito", f"Usuario ID {user_id} actualizado correctamente.")
+            
+            conn.commit()
+            self.load_pilot_data()
+            self.entry_user_id.delete(0, 'end')
+            self.entry_full_name.delete(0, 'end')
+            self.entry_username.delete(0, 'end')
+            self.entry_password.delete(0, 'end')
+
+        except ValueError as e:
+            messagebox.showerror("Error de Validación", str(e))
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Error de DB", f"El usuario '{username}' ya existe.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
+        finally:
+            conn.close()
+
+    def toggle_user_status(self, status):
+        """Activa o desactiva un usuario por ID."""
+        user_id = self.entry_user_id.get()
+        if not user_id:
+            messagebox.showerror("Error", "Ingrese un ID de usuario para cambiar el estado.")
+            return
+
+        conn = open_db()
+        cursor = conn.cursor()
+        
+        try:
+            # Evita desactivar al admin (ID 1 es por defecto el admin en la primera ejecución)
+            before = audit_snapshot(cursor, "user", user_id)
+            cursor.execute("UPDATE users SET is_active = ? WHERE id = ? AND role = 'piloto' AND id != 1", (status, user_id))
+            if cursor.rowcount == 0:
+                messagebox.showerror("Error", f"No se encontró un piloto con ID {user_id} o está intentando modificar al administrador principal.")
+            else:
+                record_audit(cursor, self.audit_actor, "activar" if status == 1 else "deshabilitar", "user", user_id,
+                             before, audit_snapshot(cursor, "user", user_id))
+                conn.commit()
+                self.load_pilot_data()
+                action = "activado" if status == 1 else "deshabilitado"
+                messagebox.showinfo("Éxito", f"Piloto ID {user_id} ha sido {action}.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Ocurrió un error: {e}")
+        finally:
+            conn.close()
+
+    def delete_user(self):
+        """Elimina un piloto solo si no tiene reportes ni vehículos asignados."""
+        user_id = self.entry_user_id.get()
+        if not user_id:
+            messagebox.showerror("Error", "Ingrese un ID de usuario para ELIMINAR.")
+            return
+
+        if not messagebox.askyesno("Confirmar Eliminación", 
+                                   f"ADVERTENCIA: ¿Está seguro de que desea ELIMINAR permanentemente al piloto ID {user_id}? "
+                                   "Esto no se puede deshacer. (Recomendado solo si no tiene reportes históricos)."):
+            return
+
+        conn = open_db()
+        cursor = conn.cursor()
+        
+        try:
+            user_id_int = int(user_id)
+            
+            # 1. Verificar si es el administrador
+            cursor.execute("SELECT role FROM users WHERE id = ?", (user_id_int,))
+            user_data = cursor.fetchone()
+            if not user_data or user_data[0] == 'admin':
+                raise ValueError(f"No se puede eliminar el usuario ID {user_id}. Es el administrador principal o no existe.")
+
+            # 2. Verificar reportes existentes
+            cursor.execute("SELECT COUNT(*) FROM reports WHERE driver_id = ?", (user_id_int,))
+            if cursor.fetchone()[0] > 0:
+                raise ValueError(f"No se puede eliminar al piloto ID {user_id_int}. Tiene reportes históricos asociados. Use 'Desactivar'.")
+
+            # 3. Verificar vehículo asignado
+            cursor.execute("SELECT assigned_vehicle_plate FROM users WHERE id = ?", (user_id_int,))
+            assigned_plate = cursor.fetchone()[0]
+            if assigned_plate:
+                # Si está asignado, primero lo desasigna del vehículo para evitar errores de FK
+                cursor.execute("SELECT plate FROM vehicles WHERE assigned_to_user_id = ?", (user_id_int,))
+                vehicle_states = {("vehicle", plate): audit_snapshot(cursor, "vehicle", plate) for (plate,) in cursor.fetchall()}
+                end_assignments(cursor, user_id=user_id_int)
+                record_audit_changes(cursor, self.audit_actor, vehicle_states, "desasignar")
+            
+            # 4. Eliminar el usuario
+            before = audit_snapshot(cursor, "user", user_id_int)
+            cursor.execute("DELETE FROM users WHERE id = ?", (user_id_int,))
+            
+            if cursor.rowcount > 0:
+                record_audit(cursor, self.audit_actor, "eliminar", "user", user_id_int, before, None)
+                conn.commit()
+                messagebox.showinfo("Éxito", f"Piloto ID {user_id} ELIMINADO permanentemente.")
+                self.load_pilot_data()
+                self.entry_user_id.delete(0, 'end')
+            else:
+                raise ValueError(f"No se encontró un piloto con ID {user_id}.")
+
+        except ValueError as e:
+            messagebox.showerror("Error de Eliminación", str(e))
+        except Exception as e:
+            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
+        finally:
+            conn.close()
+            
+    # --- Función de Validación para Placas ---
+    def validate_placa(self, var):
+        """Asegura que la placa comience con 'C', esté en mayúsculas y tenga un máximo de 7 caracteres."""
+        current_value = var.get()
+        corrected_value = current_value.upper()
+
+        # 1. Asegurar que comience con 'C'
+        if not corrected_value.startswith('C'):
+            # Si el usuario intenta borrar la 'C' inicial, la reponemos o la corregimos
+            corrected_value = 'C' + corrected_value.lstrip('C')
+            if not corrected_value: # Si por alguna razón se queda vacío, forzar a 'C'
+                corrected_value = 'C'
+
+        # 2. Limitar a 7 caracteres (C + 6 más)
+        if len(corrected_value) > 7:
+            corrected_value = corrected_value[:7]
+
+        if corrected_value != current_value:
+            var.set(corrected_value)
+
+
+    # --- Pestaña de Gestión de Vehículos ---
+
+    def setup_vehicle_management_tab(self):
+        tab = self.tabview.tab("Gestión de Vehículos")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(0, weight=1)
+
+        # --- Variables de Placa con Validación ---
+        self.placa_var = ctk.StringVar(value="C")
+        self.placa_var._trace_name = self.placa_var.trace_add("write", lambda name, index, mode, var=self.placa_var: self.validate_placa(var))
+        # Se elimina self.placa_asignar_var 
+        # ----------------------------------------------------
+
+
+        # Frame para la tabla de vehículos
+        self.vehicle_table_frame = ctk.CTkScrollableFrame(tab, label_text="Catálogo de Vehículos")
+        # NOTA: Se ajusta el número de columnas a 4 (Placa, Marca, Promoción, Piloto Asignado)
+        self.vehicle_table_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.vehicle_table_frame.grid_columnconfigure((0, 1, 2, 3), weight=1) 
+
+        # Frame para las acciones (Añadir/Editar/Eliminar)
+        action_frame = ctk.CTkFrame(tab, border_width=1)
+        action_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
+        action_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1) 
+
+        # Controles para añadir y editar vehículo
+        ctk.CTkLabel(action_frame, text="Placa:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.entry_placa = ctk.CTkEntry(action_frame, width=100, textvariable=self.placa_var)
+        self.entry_placa.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Marca:").grid(row=0, column=2, padx=5, pady=5, sticky="w")
+        self.entry_marca_vehiculo = ctk.CTkEntry(action_frame, width=100)
+        self.entry_marca_vehiculo.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Promoción:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.entry_promocion = ctk.CTkEntry(action_frame, width=300)
+        self.entry_promocion.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky="ew")
+
+        # Control para eliminar (Eliminada la segunda entrada de texto para la placa de eliminación)
+        # ctk.CTkLabel(action_frame, text="Eliminar Vehículo (Placa):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        # self.entry_placa_eliminar = ctk.CTkEntry(action_frame, width=100)
+        # self.entry_placa_eliminar.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+
+        ctk.CTkButton(action_frame, text="Añadir Vehículo", command=lambda: self.manage_vehicle("add")).grid(row=0, column=5, padx=5, pady=5, sticky="ew")
+        ctk.CTkButton(action_frame, text="Actualizar Promoción/Marca", command=lambda: self.manage_vehicle("update")).grid(row=1, column=5, padx=5, pady=5, sticky="ew")
+        
+        # El botón de ELIMINAR sigue usando la posición anterior
+        ctk.CTkButton(action_frame, text="ELIMINAR VEHÍCULO", fg_color="darkred", hover_color="red", command=self.delete_vehicle).grid(row=2, column=5, padx=5, pady=5, sticky="ew")
+        ctk.CTkButton(action_frame, text="Historial de Asignaciones", command=self.show_assignment_history).grid(row=2, column=3, padx=5, pady=5, sticky="ew")
+        
+        # Se eliminaron los controles de asignación manual
+        
+        self.load_vehicle_data()
+
+    def load_vehicle_data(self):
+        """Carga y muestra la tabla de vehículos, incluyendo ComboBox para asignación."""
+        for widget in self.vehicle_table_frame.winfo_children():
+            widget.destroy()
+
+        conn = open_db()
+        cursor = conn.cursor()
+        
+        # --- NUEVO: Obtener lista de pilotos para el ComboBox ---
+        # Se buscan solo pilotos activos
+        cursor.execute("SELECT id, full_name FROM users WHERE role = 'piloto' AND is_active = 1 ORDER BY full_name")
+        pilots = cursor.fetchall()
+        
+        # Mapeo: Nombre Completo -> ID
+        # Opciones ComboBox: Lista de nombres, incluyendo "SIN ASIGNAR"
+        self.pilot_id_map = {"SIN ASIGNAR": None}
+        combo_options = ["SIN ASIGNAR"]
+        for id, full_name in pilots:
+            self.pilot_id_map[full_name] = id
+            combo_options.append(full_name)
+        # ----------------------------------------------------
+
+        # Traemos todos los vehículos y el nombre del piloto asignado
+        query = """
+        SELECT v.plate, v.brand, v.promotion, u.id, u.full_name
+        FROM vehicles v
+        LEFT JOIN users u ON v.assigned_to_user_id = u.id
+        ORDER BY v.plate
+        """
+        cursor.execute(query)
+        vehicles = cursor.fetchall()
+        conn.close()
+
+        # Encabezados de la tabla (Ajustado para 4 columnas: Placa, Marca, Promoción, Piloto Asignado)
+        headers = ["Placa", "Marca", "Promoción", "Piloto Asignado"] 
         for col, header in enumerate(headers):
-            self.pilot_table_frame.grid_columnconfigure(col, weight=1)
-            ctk.CTkLabel(self.pilot_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
+            self.vehicle_table_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.vehicle_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
 
         # Filas de datos
-        for row, user in enumerate(users):
-            status = "ACTIVO" if user[4] == 1 else "INACTIVO (Deshabilitado)"
-            status_color = "green" if user[4] == 1 else "red"
-            placa = user[5] if user[5] else "Ninguno"
-
-            # Columnas 0 a 3 (ID, Nombre, Usuario, Rol)
-            for col, data in enumerate(user[:4]):
-                ctk.CTkLabel(self.pilot_table_frame, text=str(data)).grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
+        for row, vehicle in enumerate(vehicles):
+            placa, marca, promocion, piloto_id, piloto_nombre = vehicle
             
-            # Columna 4 (Estado)
-            ctk.CTkLabel(self.pilot_table_frame, text=status, text_color=status_color, font=ctk.CTkFont(weight="bold")).grid(row=row + 1, column=4, padx=10, pady=2, sticky="w")
+            # --- NUEVO: Usar ComboBox ---
+            current_pilot_name = piloto_nombre if piloto_nombre else "SIN ASIGNAR"
+
+            # Columnas 0 a 2 (Placa, Marca, Promoción)
+            data_to_display = [placa, marca, promocion]
             
-            # Columna 5 (Vehículo Asignado)
-            ctk.CTkLabel(self.pilot_table_frame, text=placa).grid(row=row + 1, column=5, padx=10, pady=2, sticky="w")
+            for col, data in enumerate(data_to_display):
+                ctk.CTkLabel(self.vehicle_table_frame, text=str(data), anchor="w").grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
 
+            # Columna 3 (Piloto Asignado - ComboBox)
+            combobox = ctk.CTkComboBox(self.vehicle_table_frame, values=combo_options, 
+                                       command=lambda selection, plate=placa: self.update_vehicle_assignment(plate, selection))
+            combobox.set(current_pilot_name) # Establecer el valor actual
+            combobox.grid(row=row + 1, column=3, padx=10, pady=2, sticky="ew")
+    
+    def manage_vehicle(self, action):
+        """Añade o actualiza un vehículo."""
+        placa = self.placa_var.get().strip()
+        marca = self.entry_marca_vehiculo.get().strip()
+        promocion = self.entry_promocion.get().strip()
 
-    def manage_user(self, action):
-        """Añade o actualiza un usuario (Piloto)."""
-        user_id = self.entry_user_id.get()
-        full_name = self.entry_full_name.get()
-        username = self.entry_username.get()
-        password = self.entry_password.get()
+        if len(placa) != 7:
+            messagebox.showerror("Error", "La Placa debe tener exactamente 7 caracteres (ej. C123456).")
+            return
 
-        conn = sqlite3.connect(DB_NAME)
+        conn = open_db()
         cursor = conn.cursor()
         
         try:
             if action == "add":
-                if not all([full_name, username, password]):
-                    raise ValueError("Faltan datos para añadir un nuevo piloto.")
-                cursor.execute("INSERT INTO users (full_name, username, password, role) VALUES (?, ?, ?, 'piloto')", 
-                               (full_name, username, password))
-                messagebox.showinfo("Éxito", f"Piloto '{username}' añadido correctamente.")
+                if not marca or not promocion:
+                    raise ValueError("La Marca y la Promoción son obligatorias para añadir un vehículo.")
+                cursor.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES (?, ?, ?)", (placa, marca, promocion))
+                record_audit(cursor, self.audit_actor, "crear", "vehicle", placa, None, audit_snapshot(cursor, "vehicle", placa))
+                messagebox.showinfo("Éxito", f"Vehículo con placa {placa} añadido.")
             
             elif action == "update":
-                if not user_id:
-                    raise ValueError("Ingrese un ID para actualizar.")
-                
                 updates = []
                 params = []
-                if full_name:
-                    updates.append("full_name = ?")
-                    params.append(full_name)
-                if username:
-                    updates.append("username = ?")
-                    params.append(username)
-                if password:
-                    updates.append("password = ?")
-                    params.append(password)
-
+                if marca:
+                    updates.append("brand = ?")
+                    params.append(marca)
+                if promocion:
+                    updates.append("promotion = ?")
+                    params.append(promocion)
+                
                 if not updates:
-                    raise ValueError("No hay campos para actualizar.")
+                    raise ValueError("No hay campos (Marca o Promoción) para actualizar.")
                 
-                params.append(user_id)
-                cursor.execute(f"UPDATE users SET {', '.join(updates)} WHERE id = ?", tuple(params))
+                params.append(placa)
+                before = audit_snapshot(cursor, "vehicle", placa)
+                cursor.execute(f"UPDATE vehicles SET {', '.join(updates)} WHERE plate = ?", tuple(params))
                 
                 if cursor.rowcount == 0:
-                    raise ValueError(f"No se encontró usuario con ID {user_id}.")
+                    raise ValueError(f"No se encontró vehículo con placa {placa} para actualizar.")
+                record_audit(cursor, self.audit_actor, "actualizar", "vehicle", placa, before, audit_snapshot(cursor, "vehicle", placa))
 
-                messagebox.showinfo("Éxito", f"Usuario ID {user_id} actualizado correctamente.")
+                messagebox.showinfo("Éxito", f"Vehículo con placa {placa} actualizado.")
             
             conn.commit()
-            self.load_pilot_data()
-            self.entry_user_id.delete(0, 'end')
-            self.entry_full_name.delete(0, 'end')
-            self.entry_username.delete(0, 'end')
-            self.entry_password.delete(0, 'end')
+            self.load_vehicle_data()
+            self.placa_var.set("C") 
+            self.entry_marca_vehiculo.delete(0, 'end')
+            self.entry_promocion.delete(0, 'end')
 
         except ValueError as e:
             messagebox.showerror("Error de Validación", str(e))
         except sqlite3.IntegrityError:
-            messagebox.showerror("Error de DB", f"El usuario '{username}' ya existe.")
+            messagebox.showerror("Error de DB", f"La placa '{placa}' ya existe.")
         except Exception as e:
             messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
         finally:
             conn.close()
 
-    def toggle_user_status(self, status):
-        """Activa o desactiva un usuario por ID."""
-        user_id = self.entry_user_id.get()
-        if not user_id:
-            messagebox.showerror("Error", "Ingrese un ID de usuario para cambiar el estado.")
+    def update_vehicle_assignment(self, plate, pilot_name):
+        """
+        Asigna o desasigna un vehículo a un piloto basado en la selección del ComboBox.
+        La relación 1 a 1 y el historial los mantiene assign_vehicle.
+        """
+        
+        # 1. Obtener el ID del piloto (será None si se selecciona "SIN ASIGNAR")
+        piloto_id = self.pilot_id_map.get(pilot_name) 
+
+        conn = open_db()
+        cursor = conn.cursor()
+
+        try:
+            # Estado previo de todo lo que la asignación puede tocar (para la auditoría)
+            cursor.execute("SELECT plate FROM vehicles WHERE plate = ? OR assigned_to_user_id = ?", (plate, piloto_id))
+            before_states = {("vehicle", row[0]): None for row in cursor.fetchall()}
+            cursor.execute("SELECT id FROM users WHERE assigned_vehicle_plate = ? OR id = ?", (plate, piloto_id))
+            before_states.update({("user", row[0]): None for row in cursor.fetchall()})
+            for entity, entity_key in before_states:
+                before_states[(entity, entity_key)] = audit_snapshot(cursor, entity, entity_key)
+
+            # Cierra las asignaciones vigentes del vehículo y del piloto y abre la nueva (relación 1 a 1)
+            assign_vehicle(cursor, plate, piloto_id)
+
+            def assignment_action(entity, before, after):
+                field = "assigned_to_user_id" if entity == "vehicle" else "assigned_vehicle_plate"
+                return "asignar" if after and after[field] is not None else "desasignar"
+            record_audit_changes(cursor, self.audit_actor, before_states, assignment_action)
+            
+            # 5. Commit y notificar
+            conn.commit()
+            
+            if piloto_id:
+                messagebox.showinfo("Éxito", f"Vehículo {plate} asignado a {pilot_name}.")
+            else:
+                messagebox.showinfo("Éxito", f"Vehículo {plate} ha sido desasignado (SIN ASIGNAR).")
+            
+            # Recargar la tabla de vehículos y pilotos
+            self.load_vehicle_data()
+            # ⭐️ CORRECCIÓN: Llamar directamente al método de la clase AdminFrame
+            self.load_pilot_data() 
+
+        except Exception as e:
+            messagebox.showerror("Error de Asignación", f"Ocurrió un error inesperado: {e}")
+        finally:
+            conn.close()
+
+    def show_assignment_history(self):
+        """Muestra quién tuvo asignado el vehículo del campo 'Placa:' y en qué períodos."""
+        placa = self.placa_var.get().strip()
+        if len(placa) != 7:
+            messagebox.showerror("Error", "Ingrese una Placa de vehículo válida (ej. C123456) en el campo 'Placa:'.")
+            return
+        conn = open_db()
+        try:
+            history = assignment_history(conn.cursor(), plate=placa)
+        finally:
+            conn.close()
+        if not history:
+            messagebox.showinfo("Historial de Asignaciones", f"El vehículo {placa} no tiene asignaciones registradas.")
             return
+        lines = [f"{valid_from[:16].replace('T', ' ')}  →  {(valid_to or 'vigente')[:16].replace('T', ' ')}   {full_name or f'PILOTO ELIMINADO (ID {user_id})'}"
+                 for _, user_id, full_name, valid_from, valid_to in history]
+        messagebox.showinfo("Historial de Asignaciones", f"Vehículo {placa}:\n\n" + "\n".join(lines))
 
-        conn = sqlite3.connect(DB_NAME)
+    def delete_vehicle(self):
+        """Elimina un vehículo solo si no tiene reportes asociados, usando la placa del campo principal."""
+        
+        # ⭐️ CAMBIO AQUÍ: Usamos la placa del campo principal (self.placa_var)
+        placa = self.placa_var.get().strip() 
+        
+        if len(placa) != 7: 
+            messagebox.showerror("Error", "Ingrese una Placa de vehículo válida (ej. C123456) en el campo 'Placa:' superior para ELIMINAR.")
+            return
+
+        if not messagebox.askyesno("Confirmar Eliminación", 
+                                   f"ADVERTENCIA: ¿Está seguro de que desea ELIMINAR permanentemente el vehículo {placa}? "
+                                   "Esto no se puede deshacer. (Recomendado solo si no tiene reportes históricos)."):
+            return
+
+        conn = open_db()
         cursor = conn.cursor()
         
         try:
-            # Evita desactivar al admin (ID 1 es por defecto el admin en la primera ejecución)
-            cursor.execute("UPDATE users SET is_active = ? WHERE id = ? AND role = 'piloto' AND id != 1", (status, user_id))
-            if cursor.rowcount == 0:
-                messagebox.showerror("Error", f"No se encontró un piloto con ID {user_id} o está intentando modificar al administrador principal.")
-            else:
+            # 1. Verificar reportes existentes
+            cursor.execute("SELECT COUNT(*) FROM reports WHERE vehicle_plate = ?", (placa,))
+            if cursor.fetchone()[0] > 0:
+                raise ValueError(f"No se puede eliminar el vehículo {placa}. Tiene reportes históricos asociados.")
+
+            # 2. Desasignar el vehículo de cualquier piloto (actualiza users)
+            cursor.execute("SELECT id FROM users WHERE assigned_vehicle_plate = ?", (placa,))
+            user_states = {("user", user_id): audit_snapshot(cursor, "user", user_id) for (user_id,) in cursor.fetchall()}
+            end_assignments(cursor, plate=placa)
+            record_audit_changes(cursor, self.audit_actor, user_states, "desasignar")
+            
+            # 3. Eliminar el vehículo (actualiza vehicles)
+            before = audit_snapshot(cursor, "vehicle", placa)
+            cursor.execute("DELETE FROM vehicles WHERE plate = ?", (placa,))
+            
+            if cursor.rowcount > 0:
+                record_audit(cursor, self.audit_actor, "eliminar", "vehicle", placa, before, None)
                 conn.commit()
+                messagebox.showinfo("Éxito", f"Vehículo {placa} ELIMINADO permanentemente.")
+                self.load_vehicle_data()
                 self.load_pilot_data()
-                action = "activado" if status == 1 else "deshabilitado"
-                messagebox.showinfo("Éxito", f"Piloto ID {user_id} ha sido {action}.")
+                
+                # ⭐️ CAMBIO AQUÍ: Limpiamos el campo de placa principal
+                self.placa_var.set("C") 
+            else:
+                raise ValueError(f"No se encontró un vehículo con placa {placa}.")
+
+        except ValueError as e:
+            messagebox.showerror("Error de Eliminación", str(e))
         except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error: {e}")
+            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
         finally:
             conn.close()
 
-    def delete_user(self):
-        """Elimina un piloto solo si no tiene reportes ni vehículos asignados."""
-        user_id = self.entry_user_id.get()
-        if not user_id:
-            messagebox.showerror("Error", "Ingrese un ID de usuario para ELIMINAR.")
+    # --- Pestaña de Revisión de Reportes ---
+
+    def setup_report_review_tab(self):
+        tab = self.tabview.tab("Revisión de Reportes")
+        tab.grid_columnconfigure(0, weight=1)
+        
+        # ⭐️ CAMBIO CRÍTICO: La Fila 1 (lista de reportes) toma todo el espacio vertical.
+        tab.grid_rowconfigure(1, weight=1) 
+        # Se elimina la línea 'tab.grid_rowconfigure(0, weight=1)' que empujaba el contenido hacia abajo.
+
+        # ⭐️ NUEVO: Frame de Búsqueda
+        search_frame = ctk.CTkFrame(tab)
+        # ⭐️ CAMBIO: Reducir pady superior de 10 a 5.
+        search_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5)) 
+        search_frame.grid_columnconfigure(0, weight=0)
+        search_frame.grid_columnconfigure(1, weight=1)
+        search_frame.grid_columnconfigure(2, weight=0)
+
+        ctk.CTkLabel(search_frame, text="Buscar Placa o Piloto:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Ej: C123456 o Juan Pérez")
+        self.search_entry.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkButton(search_frame, text="🔍 Buscar", command=self.load_report_data).grid(row=0, column=2, padx=10, pady=5)
+
+        # ⭐️ NUEVO: Búsqueda mientras se escribe (con debounce)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Return>", lambda event: self.load_report_data())
+
+        # Filtro por lo que mencionan las observaciones (índice invertido de etiquetas)
+        ctk.CTkLabel(search_frame, text="Observaciones mencionan:").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.mention_entry = ctk.CTkEntry(search_frame, placeholder_text="Ej: freno de mano, luces, C654321")
+        self.mention_entry.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        self.mention_entry.bind("<Return>", lambda event: self.apply_mention_filter())
+        ctk.CTkButton(search_frame, text="Filtrar", command=self.apply_mention_filter).grid(row=1, column=2, padx=10, pady=5)
+        self.mention_ids = None  # Ids que cumplen el filtro de observaciones (None = sin filtro)
+        # -------------------------------------
+
+        # Estado de la búsqueda incremental
+        self._search_after_id = None
+        self._search_generation = 0
+        self._search_conn = None
+        self._search_lock = threading.Lock()  # Protege _search_conn y _search_generation (hilo de búsqueda / interfaz)
+        self._search_pending = None  # Generación de la consulta a la DB en curso
+        self._search_polling = False
+        self._search_results = queue.Queue()
+        self._search_cache = collections.OrderedDict()  # LRU: término -> DataFrame
+        self._last_search = None  # (término, DataFrame) del último resultado mostrado
+
+        # Reportes nuevos: se agregan a la tabla sin recargarla (ver poll_report_feed)
+        self.report_feed = ReportChangeFeed()
+
+        # Usamos un frame para contener la tabla y botones (Ahora en fila 1)
+        self.report_container = ctk.CTkFrame(tab)
+        # ⭐️ CAMBIO: Reducir pady inferior de 10 a 5.
+        self.report_container.grid(row=1, column=0, sticky="nsew", padx=10, pady=(5, 5)) 
+        self.report_container.grid_columnconfigure(0, weight=1)
+        self.report_container.grid_rowconfigure(0, weight=1)
+
+        # La tabla se crea una sola vez; las filas se reutilizan entre búsquedas
+        self.report_data_frame = ctk.CTkScrollableFrame(self.report_container, label_text="Reportes Enviados")
+        self.report_data_frame.grid(row=0, column=0, sticky="nsew")
+        self.report_selection_var = ctk.StringVar(value="0") 
+        self.selected_report_id = None
+        self.report_df = None
+        self.report_row_widgets = []
+
+        table_headers = ["", "ID", "Piloto", "Placa", "Fecha", "Km Actual"]
+        for col, header in enumerate(table_headers):
+            self.report_data_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.report_data_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w" if col > 0 else "")
+
+        self.report_empty_label = ctk.CTkLabel(self.report_data_frame, text="")
+
+        action_frame = ctk.CTkFrame(tab)
+        # ⭐️ CAMBIO: Reducir pady superior de 10 a 5.
+        action_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=(5, 10)) # Ahora en fila 2
+        action_frame.grid_columnconfigure((0, 1), weight=1)
+        
+        ctk.CTkButton(action_frame, text="Ver Detalles del Reporte Seleccionado", command=self.show_report_details).grid(row=0, column=1, padx=10, pady=5, sticky="e")
+        ctk.CTkButton(action_frame, text="PDF del Reporte Seleccionado", command=self.export_selected_report_pdf).grid(row=1, column=1, padx=10, pady=5, sticky="e")
+        ctk.CTkButton(action_frame, text="PDF de Todos los Resultados", command=self.export_search_results_pdf).grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        # ⭐️ CAMBIO: Botón Recargar ahora limpia la búsqueda y la caché
+        ctk.CTkButton(action_frame, text="Recargar Reportes (Limpiar Búsqueda)", command=self.reload_reports).grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        
+        self.report_feed.reset()
+        self.load_report_data()
+        self.after(REPORT_FEED_POLL_MS, self.poll_report_feed)
+
+    def poll_report_feed(self):
+        """
+        Revisa (cada REPORT_FEED_POLL_MS) si llegaron reportes y los agrega a la tabla visible
+        y a las búsquedas en caché. Si no hubo cambios no se consulta nada más.
+        """
+        if not self.winfo_exists():
+            self.report_feed.close()
+            return
+        if self._search_pending is None:
+            try:
+                change = self.report_feed.poll()
+            except sqlite3.Error:
+                change = None  # DB ocupada: se reintenta en la próxima revisión
+            if isinstance(change, str):
+                # Se eliminaron reportes: las búsquedas guardadas ya no son válidas
+                self._search_cache.clear()
+                self._last_search = None
+                self.load_report_data()
+            elif change is not None:
+                self.patch_new_reports(change)
+        self.after(REPORT_FEED_POLL_MS, self.poll_report_feed)
+
+    def patch_new_reports(self, new_rows):
+        """Agrega reportes nuevos al principio de los resultados en caché y del resultado visible."""
+        def merge(df, key):
+            matching = filter_reports_df(new_rows, key)
+            if matching.empty:
+                return df
+            # Un reporte puede estar ya en un resultado que se consultó después de la última revisión
+            return pd.concat([matching, df[~df["id"].isin(matching["id"])]], ignore_index=True)
+
+        for key, df in self._search_cache.items():
+            self._search_cache[key] = merge(df, key)
+        if self._last_search is not None:
+            key, df = self._last_search
+            merged = merge(df, key)
+            if merged is not df:
+                if self.mention_ids is not None:
+                    self.refresh_mention_ids()  # Los reportes nuevos también pueden mencionar lo filtrado
+                self.show_search_result(self.search_entry.get().strip(), merged, keep_selection=True)
+
+    def on_search_key(self, event=None):
+        """
+        Actualiza la búsqueda mientras se escribe. Si el resultado puede salir de memoria
+        (caché o refinamiento del término anterior) se muestra de inmediato; si requiere
+        consultar la DB se espera a que el usuario deje de escribir (debounce).
+        """
+        if self._search_after_id:
+            self.after_cancel(self._search_after_id)
+            self._search_after_id = None
+
+        key = search_key(self.search_entry.get().strip())
+        if self._last_search and key == self._last_search[0] and self._search_pending is None:
+            return  # Teclas que no cambian el término (flechas, Shift...)
+        if key in self._search_cache or (self._last_search and key.startswith(self._last_search[0])):
+            self.load_report_data()
+        else:
+            self._search_after_id = self.after(SEARCH_DEBOUNCE_MS, self.load_report_data)
+
+    def apply_mention_filter(self):
+        """
+        Filtra la tabla por lo que mencionan las observaciones. Se aplica sobre el resultado
+        de la búsqueda por placa/piloto, que sigue en caché sin el filtro.
+        """
+        self.refresh_mention_ids()
+        if self._last_search is not None:
+            self.show_search_result(self.search_entry.get().strip(), self._last_search[1])
+
+    def refresh_mention_ids(self):
+        mention = self.mention_entry.get().strip()
+        if not observation_query_terms(mention):
+            self.mention_ids = None
+            return
+        conn = open_db()
+        try:
+            self.mention_ids = set(reports_mentioning(conn.cursor(), mention))
+        finally:
+            conn.close()
+
+    def reload_reports(self):
+        """Limpia la búsqueda y la caché, y vuelve a consultar la DB."""
+        self.search_entry.delete(0, 'end')
+        self.mention_entry.delete(0, 'end')
+        self.mention_ids = None
+        self._search_cache.clear()
+        self._last_search = None
+        self.load_report_data()
+
+    def load_report_data(self):
+        """
+        Carga los reportes aplicando el filtro de búsqueda si existe.
+        Si el término ya está en caché, o si extiende el último término buscado,
+        se filtra en memoria sin volver a consultar la DB.
+        """
+        self._search_after_id = None
+        search_term = self.search_entry.get().strip()
+        key = search_key(search_term)
+
+        # Cualquier búsqueda nueva deja obsoleta (y cancela) la consulta en curso
+        with self._search_lock:
+            self._search_generation += 1
+            if self._search_conn is not None:
+                self._search_conn.interrupt()
+
+        # 1. Resultado reciente en la caché LRU
+        if key in self._search_cache:
+            self._search_cache.move_to_end(key)
+            self._search_pending = None
+            self.show_search_result(search_term, self._search_cache[key])
             return
 
-        if not messagebox.askyesno("Confirmar Eliminación", 
-                                   f"ADVERTENCIA: ¿Está seguro de que desea ELIMINAR permanentemente al piloto ID {user_id}? "
-                                   "Esto no se puede deshacer. (Recomendado solo si no tiene reportes históricos)."):
+        # 2. Refinamiento: el nuevo término extiende el anterior -> filtrar en memoria
+        if self._last_search and key.startswith(self._last_search[0]):
+            df = filter_reports_df(self._last_search[1], key)
+            self.cache_search_result(key, df)
+            self._search_pending = None
+            self.show_search_result(search_term, df)
             return
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
+        # 3. Consulta a la DB en segundo plano
+        self._search_pending = self._search_generation
+        threading.Thread(target=self._run_search_query, args=(self._search_generation, search_term), daemon=True).start()
+        if not self._search_polling:
+            self._search_polling = True
+            self.after(SEARCH_POLL_MS, self._poll_search_results)
+
+    def _run_search_query(self, generation, search_term):
+        """Ejecuta la consulta de búsqueda (hilo de fondo) y deja el resultado en la cola."""
+        conn = open_db()
+        with self._search_lock:
+            if generation != self._search_generation:
+                conn.close()  # Superada antes de empezar: no hay nada que cancelar
+                return
+            self._search_conn = conn
         try:
-            user_id_int = int(user_id)
-            
-            # 1. Verificar si es el administrador
-            cursor.execute("SELECT role FROM users WHERE id = ?", (user_id_int,))
-            user_data = cursor.fetchone()
-            if not user_data or user_data[0] == 'admin':
-                raise ValueError(f"No se puede eliminar el usuario ID {user_id}. Es el administrador principal o no existe.")
+            df = query_reports_df(conn, search_term)
+            self._search_results.put((generation, search_term, df, None))
+        except Exception as e:
+            self._search_results.put((generation, search_term, None, e))
+        finally:
+            # Bajo el lock: la interfaz nunca interrumpe una conexión ya cerrada
+            with self._search_lock:
+                if self._search_conn is conn:
+                    self._search_conn = None
+                conn.close()
+
+    def _poll_search_results(self):
+        """Recoge los resultados del hilo de búsqueda en el hilo de la interfaz."""
+        while not self._search_results.empty():
+            generation, search_term, df, error = self._search_results.get_nowait()
+            if generation != self._search_pending:
+                continue  # Resultado obsoleto (búsqueda cancelada o superada)
+            self._search_pending = None
+            if error is not None:
+                messagebox.showerror("Error de Búsqueda", f"No se pudieron cargar los reportes: {error}")
+            else:
+                self.cache_search_result(search_key(search_term), df)
+                self.show_search_result(search_term, df)
 
-            # 2. Verificar reportes existentes
-            cursor.execute("SELECT COUNT(*) FROM reports WHERE driver_id = ?", (user_id_int,))
-            if cursor.fetchone()[0] > 0:
-                raise ValueError(f"No se puede eliminar al piloto ID {user_id_int}. Tiene reportes históricos asociados. Use 'Desactivar'.")
+        if self._search_pending is None:
+            self._search_polling = False
+        else:
+            self.after(SEARCH_POLL_MS, self._poll_search_results)
+
+    def cache_search_result(self, key, df):
+        """Guarda un resultado en la caché LRU de búsquedas recientes."""
+        self._search_cache[key] = df
+        self._search_cache.move_to_end(key)
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+
+    def show_search_result(self, search_term, df, keep_selection=False):
+        """Muestra un resultado reutilizando las filas ya creadas en la tabla."""
+        self._last_search = (search_key(search_term), df)
+        if self.mention_ids is not None:
+            df = df[df["id"].isin(self.mention_ids)]
+        if not (keep_selection and self.selected_report_id is not None and (df["id"] == self.selected_report_id).any()):
+            self.report_selection_var.set("0")
+            self.selected_report_id = None
 
-            # 3. Verificar vehículo asignado
-            cursor.execute("SELECT assigned_vehicle_plate FROM users WHERE id = ?", (user_id_int,))
-            assigned_plate = cursor.fetchone()[0]
-            if assigned_plate:
-                # Si está asignado, primero lo desasigna del vehículo para evitar errores de FK
-                cursor.execute("UPDATE vehicles SET assigned_to_user_id = NULL WHERE assigned_to_user_id = ?", (user_id_int,))
-            
-            # 4. Eliminar el usuario
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id_int,))
-            
-            if cursor.rowcount > 0:
-                conn.commit()
-                messagebox.showinfo("Éxito", f"Piloto ID {user_id} ELIMINADO permanentemente.")
-                self.load_pilot_data()
-                self.entry_user_id.delete(0, 'end')
+        if df.empty:
+            self.report_df = None
+            for row_widgets in self.report_row_widgets:
+                for widget in row_widgets:
+                    widget.grid_remove()
+            if self.mention_ids is not None:
+                self.report_empty_label.configure(text=f"No se encontraron reportes que mencionen '{self.mention_entry.get().strip()}'.")
+            elif search_term:
+                self.report_empty_label.configure(text=f"No se encontraron reportes para '{search_term}'.")
             else:
-                raise ValueError(f"No se encontró un piloto con ID {user_id}.")
+                self.report_empty_label.configure(text="No hay reportes para mostrar.")
+            self.report_empty_label.grid(row=1, column=0, columnspan=6, padx=20, pady=20)
+            return
+
+        self.report_df = df
+        self.report_empty_label.grid_remove()
+
+        # Mapeamos las filas del DataFrame a widgets (se crean solo las que falten)
+        for row_index, row_data in enumerate(df.itertuples(index=False)):
+            if row_index >= len(self.report_row_widgets):
+                self.report_row_widgets.append(self.create_report_row_widgets())
+            rb, *labels = self.report_row_widgets[row_index]
+
+            rb.configure(value=str(row_data.id), command=lambda id=row_data.id: self.select_report(id))
+            rb.grid(row=row_index + 1, column=0, padx=10, pady=2)
+
+            piloto_nombre = row_data.piloto if pd.notna(row_data.piloto) else "PILOTO ELIMINADO"
+            data_to_display = [
+                row_data.id,
+                piloto_nombre,
+                row_data.vehicle_plate,
+                row_data.report_date,
+                row_data.km_actual
+            ]
+            for col_index, (label, data) in enumerate(zip(labels, data_to_display)):
+                label.configure(text=str(data))
+                label.grid(row=row_index + 1, column=col_index + 1, padx=10, pady=2, sticky="w")
+
+        # Ocultar las filas sobrantes de una búsqueda anterior más amplia
+        for row_widgets in self.report_row_widgets[len(df):]:
+            for widget in row_widgets:
+                widget.grid_remove()
+
+    def create_report_row_widgets(self):
+        """Crea los widgets de una fila de la tabla de reportes (RadioButton + 5 columnas)."""
+        rb = ctk.CTkRadioButton(self.report_data_frame, text="", variable=self.report_selection_var, value="0")
+        labels = [ctk.CTkLabel(self.report_data_frame, text="", anchor="w") for _ in range(5)]
+        return [rb] + labels
+
+    def select_report(self, report_id):
+        """Maneja la selección de un reporte en la tabla."""
+        self.selected_report_id = report_id
+        
+    def show_report_details(self):
+        """Abre la ventana de detalles para el reporte seleccionado."""
+        if not self.selected_report_id:
+            messagebox.showerror("Error", "Seleccione un reporte de la lista para ver los detalles.")
+            return
 
+        conn = open_db()
+        try:
+            report_data_for_display = load_report_detail(conn.cursor(), int(self.selected_report_id))
         except ValueError as e:
-            messagebox.showerror("Error de Eliminación", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
+            messagebox.showerror("Error", str(e))
+            return
         finally:
             conn.close()
-            
-    # --- Función de Validación para Placas ---
-    def validate_placa(self, var):
-        """Asegura que la placa comience con 'C', esté en mayúsculas y tenga un máximo de 7 caracteres."""
-        current_value = var.get()
-        corrected_value = current_value.upper()
+        
+        ReportDetailWindow(self.app, report_data_for_display)
 
-        # 1. Asegurar que comience con 'C'
-        if not corrected_value.startswith('C'):
-            # Si el usuario intenta borrar la 'C' inicial, la reponemos o la corregimos
-            corrected_value = 'C' + corrected_value.lstrip('C')
-            if not corrected_value: # Si por alguna razón se queda vacío, forzar a 'C'
-                corrected_value = 'C'
+    def export_selected_report_pdf(self):
+        """Genera el PDF del reporte seleccionado."""
+        if not self.selected_report_id:
+            messagebox.showerror("Error", "Seleccione un reporte de la lista para generar el PDF.")
+            return
+        output_path = filedialog.asksaveasfilename(parent=self, defaultextension=".pdf", filetypes=[("PDF", "*.pdf")],
+                                                   initialfile=f"reporte_{self.selected_report_id}.pdf")
+        if not output_path:
+            return
+        try:
+            render_report_pdf(int(self.selected_report_id), output_path)
+            messagebox.showinfo("Éxito", f"PDF generado: {output_path}")
+        except Exception as e:
+            messagebox.showerror("Error de PDF", f"No se pudo generar el PDF: {e}")
 
-        # 2. Limitar a 7 caracteres (C + 6 más)
-        if len(corrected_value) > 7:
-            corrected_value = corrected_value[:7]
+    def export_search_results_pdf(self):
+        """Genera los PDF de todos los reportes de la búsqueda actual (p. ej. un mes de una placa)."""
+        if self.report_df is None or self.report_df.empty:
+            messagebox.showerror("Error", "No hay reportes en la lista para exportar.")
+            return
+        report_ids = [int(report_id) for report_id in self.report_df['id']]
+        single_file = messagebox.askyesno("PDF por Lote", f"Se exportarán {len(report_ids)} reportes.\n\n"
+                                          "¿Generar un solo PDF? (No = un PDF por reporte en una carpeta)")
+        if single_file:
+            target = filedialog.asksaveasfilename(parent=self, defaultextension=".pdf", filetypes=[("PDF", "*.pdf")],
+                                                  initialfile="reportes.pdf")
+        else:
+            target = filedialog.askdirectory(parent=self, title="Carpeta para los PDF")
+        if not target:
+            return
 
-        if corrected_value != current_value:
-            var.set(corrected_value)
+        results = queue.Queue()
+
+        def worker():
+            try:
+                if single_file:
+                    render_reports_pdf_batch(report_ids, output_path=target)
+                else:
+                    render_reports_pdf_batch(report_ids, output_dir=target)
+                results.put(None)
+            except Exception as e:
+                results.put(e)
+
+        def poll():
+            if results.empty():
+                self.after(100, poll)
+                return
+            error = results.get_nowait()
+            if error is None:
+                messagebox.showinfo("Éxito", f"{len(report_ids)} reportes exportados a PDF en: {target}")
+            else:
+                messagebox.showerror("Error de PDF", f"No se pudieron generar los PDF: {error}")
 
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, poll)
 
-    # --- Pestaña de Gestión de Vehículos ---
+    # --- Pestaña de Vehículos en Riesgo ---
 
-    def setup_vehicle_management_tab(self):
-        tab = self.tabview.tab("Gestión de Vehículos")
+    def setup_fleet_health_tab(self):
+        tab = self.tabview.tab("Vehículos en Riesgo")
         tab.grid_columnconfigure(0, weight=1)
-        tab.grid_rowconfigure(0, weight=1)
+        tab.grid_rowconfigure(1, weight=1)
 
-        # --- Variables de Placa con Validación ---
-        self.placa_var = ctk.StringVar(value="C")
-        self.placa_var._trace_name = self.placa_var.trace_add("write", lambda name, index, mode, var=self.placa_var: self.validate_placa(var))
-        # Se elimina self.placa_asignar_var 
-        # ----------------------------------------------------
+        top_frame = ctk.CTkFrame(tab)
+        top_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
+        top_frame.grid_columnconfigure(0, weight=1)
 
+        self.health_status_label = ctk.CTkLabel(top_frame, text="Puntaje 0-100 (menor = mayor riesgo)")
+        self.health_status_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        ctk.CTkButton(top_frame, text="Recalcular", command=self.load_fleet_health).grid(row=0, column=1, padx=10, pady=5)
 
-        # Frame para la tabla de vehículos
-        self.vehicle_table_frame = ctk.CTkScrollableFrame(tab, label_text="Catálogo de Vehículos")
-        # NOTA: Se ajusta el número de columnas a 4 (Placa, Marca, Promoción, Piloto Asignado)
-        self.vehicle_table_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.vehicle_table_frame.grid_columnconfigure((0, 1, 2, 3), weight=1) 
+        self.health_table_frame = ctk.CTkScrollableFrame(tab, label_text="Vehículos en Riesgo")
+        self.health_table_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=(5, 10))
 
-        # Frame para las acciones (Añadir/Editar/Eliminar)
-        action_frame = ctk.CTkFrame(tab, border_width=1)
-        action_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
-        action_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1) 
+        self.health_engine = FleetHealthEngine()
+        self._health_results = queue.Queue()
+        self._health_running = False
+        self.load_fleet_health()
 
-        # Controles para añadir y editar vehículo
-        ctk.CTkLabel(action_frame, text="Placa:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.entry_placa = ctk.CTkEntry(action_frame, width=100, textvariable=self.placa_var)
-        self.entry_placa.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+    def load_fleet_health(self):
+        """Actualiza la matriz con los reportes nuevos y recalcula el ranking en segundo plano."""
+        if self._health_running:
+            return
+        self._health_running = True
+        self.health_status_label.configure(text="Calculando...")
+
+        def worker():
+            try:
+                if ANALYTICS_MODE:
+                    # Modo análisis: lee la instantánea mapeada en memoria, sin tocar la DB
+                    snapshot = AnalyticsSnapshot()
+                    note = f" (instantánea de análisis: {snapshot.refreshed_at.replace('T', ' ')})"
+                    self._health_results.put((snapshot.health_engine().compute_scores(), None, note))
+                    return
+                self.health_engine.refresh()
+                self._health_results.put((self.health_engine.compute_scores(), None, ""))
+            except Exception as e:
+                self._health_results.put((None, e, ""))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(SEARCH_POLL_MS, self._show_fleet_health)
+
+    def _show_fleet_health(self):
+        if self._health_results.empty():
+            self.after(SEARCH_POLL_MS, self._show_fleet_health)
+            return
+        ranking, error, note = self._health_results.get_nowait()
+        self._health_running = False
+        if error is not None:
+            self.health_status_label.configure(text=f"Error al calcular: {error}")
+            return
 
-        ctk.CTkLabel(action_frame, text="Marca:").grid(row=0, column=2, padx=5, pady=5, sticky="w")
-        self.entry_marca_vehiculo = ctk.CTkEntry(action_frame, width=100)
-        self.entry_marca_vehiculo.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+        for widget in self.health_table_frame.winfo_children():
+            widget.destroy()
+        self.health_status_label.configure(text=f"{len(ranking)} vehículos evaluados. Puntaje 0-100 (menor = mayor riesgo){note}")
 
-        ctk.CTkLabel(action_frame, text="Promoción:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
-        self.entry_promocion = ctk.CTkEntry(action_frame, width=300)
-        self.entry_promocion.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky="ew")
+        headers = ["Placa", "Puntaje", "Tasa de Defectos", "Fallas Repetidas", "Días sin Inspección OK", "Último Reporte", "Reportes"]
+        for col, header in enumerate(headers):
+            self.health_table_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.health_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
 
-        # Control para eliminar (Eliminada la segunda entrada de texto para la placa de eliminación)
-        # ctk.CTkLabel(action_frame, text="Eliminar Vehículo (Placa):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
-        # self.entry_placa_eliminar = ctk.CTkEntry(action_frame, width=100)
-        # self.entry_placa_eliminar.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+        for row, vehicle in enumerate(ranking.head(HEALTH_MAX_ROWS).itertuples(index=False)):
+            color = "red" if vehicle.puntaje < 50 else "orange" if vehicle.puntaje < 80 else "green"
+            data_to_display = [vehicle.placa, f"{vehicle.puntaje:.1f}", f"{vehicle.tasa_defectos:.1%}", vehicle.fallas_repetidas,
+                               vehicle.dias_sin_ok, str(vehicle.ultimo_reporte)[:10], vehicle.reportes]
+            for col, data in enumerate(data_to_display):
+                ctk.CTkLabel(self.health_table_frame, text=str(data), text_color=color if col == 1 else None).grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
 
-        ctk.CTkButton(action_frame, text="Añadir Vehículo", command=lambda: self.manage_vehicle("add")).grid(row=0, column=5, padx=5, pady=5, sticky="ew")
-        ctk.CTkButton(action_frame, text="Actualizar Promoción/Marca", command=lambda: self.manage_vehicle("update")).grid(row=1, column=5, padx=5, pady=5, sticky="ew")
-        
-        # El botón de ELIMINAR sigue usando la posición anterior
-        ctk.CTkButton(action_frame, text="ELIMINAR VEHÍCULO", fg_color="darkred", hover_color="red", command=self.delete_vehicle).grid(row=2, column=5, padx=5, pady=5, sticky="ew")
-        
-        # Se eliminaron los controles de asignación manual
-        
-        self.load_vehicle_data()
+    # --- Pestaña de Kilometraje ---
 
-    def load_vehicle_data(self):
-        """Carga y muestra la tabla de vehículos, incluyendo ComboBox para asignación."""
-        for widget in self.vehicle_table_frame.winfo_children():
-            widget.destroy()
+    def setup_km_tab(self):
+        tab = self.tabview.tab("Kilometraje")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(1, weight=1)
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        # --- NUEVO: Obtener lista de pilotos para el ComboBox ---
-        # Se buscan solo pilotos activos
-        cursor.execute("SELECT id, full_name FROM users WHERE role = 'piloto' AND is_active = 1 ORDER BY full_name")
-        pilots = cursor.fetchall()
-        
-        # Mapeo: Nombre Completo -> ID
-        # Opciones ComboBox: Lista de nombres, incluyendo "SIN ASIGNAR"
-        self.pilot_id_map = {"SIN ASIGNAR": None}
-        combo_options = ["SIN ASIGNAR"]
-        for id, full_name in pilots:
-            self.pilot_id_map[full_name] = id
-            combo_options.append(full_name)
-        # ----------------------------------------------------
+        filter_frame = ctk.CTkFrame(tab)
+        filter_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
+        filter_frame.grid_columnconfigure(2, weight=1)
 
-        # Traemos todos los vehículos y el nombre del piloto asignado
-        query = """
-        SELECT v.plate, v.brand, v.promotion, u.id, u.full_name
-        FROM vehicles v
-        LEFT JOIN users u ON v.assigned_to_user_id = u.id
-        ORDER BY v.plate
-        """
-        cursor.execute(query)
-        vehicles = cursor.fetchall()
-        conn.close()
+        ctk.CTkLabel(filter_frame, text="Placa (opcional):").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.km_plate_entry = ctk.CTkEntry(filter_frame, width=120, placeholder_text="C123456")
+        self.km_plate_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
-        # Encabezados de la tabla (Ajustado para 4 columnas: Placa, Marca, Promoción, Piloto Asignado)
-        headers = ["Placa", "Marca", "Promoción", "Piloto Asignado"] 
-        for col, header in enumerate(headers):
-            self.vehicle_table_frame.grid_columnconfigure(col, weight=1)
-            ctk.CTkLabel(self.vehicle_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
+        self.km_period_var = ctk.StringVar(value="mes")
+        ctk.CTkSegmentedButton(filter_frame, values=list(KM_PERIOD_FORMATS), variable=self.km_period_var,
+                               command=lambda value: self.load_km_summary()).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(filter_frame, text="Consultar", command=self.load_km_summary).grid(row=0, column=3, padx=10, pady=5)
 
-        # Filas de datos
-        for row, vehicle in enumerate(vehicles):
-            placa, marca, promocion, piloto_id, piloto_nombre = vehicle
-            
-            # --- NUEVO: Usar ComboBox ---
-            current_pilot_name = piloto_nombre if piloto_nombre else "SIN ASIGNAR"
+        self.km_table_frame = ctk.CTkScrollableFrame(tab, label_text="Kilómetros Recorridos por Período")
+        self.km_table_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=(5, 10))
 
-            # Columnas 0 a 2 (Placa, Marca, Promoción)
-            data_to_display = [placa, marca, promocion]
-            
+        self.load_km_summary()
+
+    def load_km_summary(self):
+        """Muestra los km recorridos por vehículo y período (las lecturas anómalas se cuentan aparte)."""
+        for widget in self.km_table_frame.winfo_children():
+            widget.destroy()
+
+        plate = self.km_plate_entry.get().strip().upper() or None
+        df = km_summary(self.km_period_var.get(), plate)
+        if df.empty:
+            ctk.CTkLabel(self.km_table_frame, text="No hay lecturas de kilometraje para mostrar.").grid(row=0, column=0, padx=20, pady=20)
+            return
+
+        headers = ["Placa", "Período", "Km Recorridos", "Lecturas", "Anomalías"]
+        for col, header in enumerate(headers):
+            self.km_table_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.km_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
+
+        for row, summary in enumerate(df.itertuples(index=False)):
+            data_to_display = [summary.placa, summary.periodo, f"{summary.km_recorridos:,}", summary.lecturas, summary.anomalias]
             for col, data in enumerate(data_to_display):
-                ctk.CTkLabel(self.vehicle_table_frame, text=str(data), anchor="w").grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
+                color = "red" if col == 4 and summary.anomalias else None
+                ctk.CTkLabel(self.km_table_frame, text=str(data), text_color=color).grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
 
-            # Columna 3 (Piloto Asignado - ComboBox)
-            combobox = ctk.CTkComboBox(self.vehicle_table_frame, values=combo_options, 
-                                       command=lambda selection, plate=placa: self.update_vehicle_assignment(plate, selection))
-            combobox.set(current_pilot_name) # Establecer el valor actual
-            combobox.grid(row=row + 1, column=3, padx=10, pady=2, sticky="ew")
-    
-    def manage_vehicle(self, action):
-        """Añade o actualiza un vehículo."""
-        placa = self.placa_var.get().strip()
-        marca = self.entry_marca_vehiculo.get().strip()
-        promocion = self.entry_promocion.get().strip()
+    # --- Pestaña de Órdenes de Trabajo ---
 
-        if len(placa) != 7:
-            messagebox.showerror("Error", "La Placa debe tener exactamente 7 caracteres (ej. C123456).")
+    def setup_work_orders_tab(self):
+        tab = self.tabview.tab("Órdenes de Trabajo")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(1, weight=1)
+
+        filter_frame = ctk.CTkFrame(tab)
+        filter_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
+        filter_frame.grid_columnconfigure(2, weight=1)
+
+        ctk.CTkLabel(filter_frame, text="Placa (opcional):").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.wo_plate_entry = ctk.CTkEntry(filter_frame, width=120, placeholder_text="C123456")
+        self.wo_plate_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        ctk.CTkButton(filter_frame, text="Filtrar", command=self.load_work_orders).grid(row=0, column=3, padx=10, pady=5)
+
+        self.wo_table_frame = ctk.CTkScrollableFrame(tab, label_text="Órdenes de Trabajo Abiertas")
+        self.wo_table_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+
+        action_frame = ctk.CTkFrame(tab)
+        action_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=(5, 10))
+        ctk.CTkLabel(action_frame, text="ID Orden:").grid(row=0, column=0, padx=10, pady=5)
+        self.entry_work_order_id = ctk.CTkEntry(action_frame, width=80)
+        self.entry_work_order_id.grid(row=0, column=1, padx=5, pady=5)
+        ctk.CTkButton(action_frame, text="Cerrar Orden (Reparado)", fg_color="green", command=self.close_selected_work_order).grid(row=0, column=2, padx=10, pady=5)
+
+        self.load_work_orders()
+
+    def load_work_orders(self):
+        """Muestra la cola de órdenes abiertas (consulta indexada por estado y placa)."""
+        for widget in self.wo_table_frame.winfo_children():
+            widget.destroy()
+
+        plate = self.wo_plate_entry.get().strip().upper() or None
+        conn = open_db()
+        try:
+            orders = get_open_work_orders(conn.cursor(), plate)
+        finally:
+            conn.close()
+
+        if not orders:
+            ctk.CTkLabel(self.wo_table_frame, text="No hay órdenes de trabajo abiertas.").grid(row=0, column=0, padx=20, pady=20)
             return
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
+        headers = ["ID", "Placa", "Ítem", "Abierta", "Última Falla", "Veces Reportado", "Último Reporte"]
+        for col, header in enumerate(headers):
+            self.wo_table_frame.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(self.wo_table_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
+
+        for row, order in enumerate(orders):
+            for col, data in enumerate(order):
+                color = "red" if col == 5 and order[5] > 1 else None
+                ctk.CTkLabel(self.wo_table_frame, text=str(data), text_color=color).grid(row=row + 1, column=col, padx=10, pady=2, sticky="w")
+
+    def close_selected_work_order(self):
+        """Cierra manualmente la orden indicada."""
+        order_id = self.entry_work_order_id.get().strip()
+        if not (order_id.isascii() and order_id.isdigit()):
+            messagebox.showerror("Error", "Ingrese el ID numérico de la orden a cerrar.")
+            return
+
+        conn = open_db()
         try:
-            if action == "add":
-                if not marca or not promocion:
-                    raise ValueError("La Marca y la Promoción son obligatorias para añadir un vehículo.")
-                cursor.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES (?, ?, ?)", (placa, marca, promocion))
-                messagebox.showinfo("Éxito", f"Vehículo con placa {placa} añadido.")
-            
-            elif action == "update":
-                updates = []
-                params = []
-                if marca:
-                    updates.append("brand = ?")
-                    params.append(marca)
-                if promocion:
-                    updates.append("promotion = ?")
-                    params.append(promocion)
-                
-                if not updates:
-                    raise ValueError("No hay campos (Marca o Promoción) para actualizar.")
-                
-                params.append(placa)
-                cursor.execute(f"UPDATE vehicles SET {', '.join(updates)} WHERE plate = ?", tuple(params))
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"No se encontró vehículo con placa {placa} para actualizar.")
+            closed = close_work_order(conn.cursor(), int(order_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if closed:
+            messagebox.showinfo("Éxito", f"Orden de trabajo {order_id} cerrada.")
+            self.entry_work_order_id.delete(0, 'end')
+            self.load_work_orders()
+        else:
+            messagebox.showerror("Error", f"No se encontró una orden abierta con ID {order_id}.")
+
+    # --- Pestaña de Cumplimiento ---
+
+    def setup_compliance_tab(self):
+        tab = self.tabview.tab("Cumplimiento")
+        tab.grid_columnconfigure((0, 1), weight=1)
+        tab.grid_rowconfigure(1, weight=1)
 
-                messagebox.showinfo("Éxito", f"Vehículo con placa {placa} actualizado.")
-            
-            conn.commit()
-            self.load_vehicle_data()
-            self.placa_var.set("C") 
-            self.entry_marca_vehiculo.delete(0, 'end')
-            self.entry_promocion.delete(0, 'end')
+        ctk.CTkButton(tab, text="Actualizar", command=self.load_compliance).grid(row=0, column=1, padx=10, pady=(5, 5), sticky="e")
+        self.compliance_summary_label = ctk.CTkLabel(tab, text="", font=ctk.CTkFont(weight="bold"))
+        self.compliance_summary_label.grid(row=0, column=0, padx=10, pady=(5, 5), sticky="w")
 
-        except ValueError as e:
-            messagebox.showerror("Error de Validación", str(e))
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error de DB", f"La placa '{placa}' ya existe.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
+        self.missing_frame = ctk.CTkScrollableFrame(tab, label_text="Sin Inspección Hoy")
+        self.missing_frame.grid(row=1, column=0, sticky="nsew", padx=(10, 5), pady=(5, 10))
+        self.compliance_grid_frame = ctk.CTkScrollableFrame(tab, label_text=f"Últimos {COMPLIANCE_GRID_DAYS} Días")
+        self.compliance_grid_frame.grid(row=1, column=1, sticky="nsew", padx=(5, 10), pady=(5, 10))
+
+        self.load_compliance()
+
+    def load_compliance(self):
+        """Muestra los vehículos sin inspección hoy y la grilla de los últimos días."""
+        for frame in (self.missing_frame, self.compliance_grid_frame):
+            for widget in frame.winfo_children():
+                widget.destroy()
+
+        today = datetime.date.today()
+        conn = open_db()
+        try:
+            missing = get_missing_inspections(conn.cursor(), today.strftime("%Y-%m-%d"))
         finally:
             conn.close()
+        grid = compliance_grid(today - datetime.timedelta(days=COMPLIANCE_GRID_DAYS - 1), today)
+
+        assigned_today = int(grid[today.strftime("%Y-%m-%d")].notna().sum()) if len(grid) else 0
+        self.compliance_summary_label.configure(
+            text=f"Hoy: {assigned_today - len(missing)} de {assigned_today} vehículos asignados inspeccionados")
+
+        # Lista de faltantes de hoy
+        if not missing:
+            ctk.CTkLabel(self.missing_frame, text="✔ Todos los vehículos asignados tienen inspección hoy.", text_color="green").grid(row=0, column=0, padx=10, pady=10)
+        for row, (plate, _, pilot_name) in enumerate(missing):
+            ctk.CTkLabel(self.missing_frame, text=plate, text_color="red", font=ctk.CTkFont(weight="bold")).grid(row=row, column=0, padx=10, pady=2, sticky="w")
+            ctk.CTkLabel(self.missing_frame, text=pilot_name).grid(row=row, column=1, padx=10, pady=2, sticky="w")
+
+        # Grilla vehículo × día
+        days = [col for col in grid.columns if col not in ("piloto", "cumplimiento")]
+        headers = ["Placa"] + [day[5:] for day in days] + ["%"]
+        for col, header in enumerate(headers):
+            ctk.CTkLabel(self.compliance_grid_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=4, pady=5)
+        for row, (plate, values) in enumerate(grid.iterrows()):
+            ctk.CTkLabel(self.compliance_grid_frame, text=plate).grid(row=row + 1, column=0, padx=4, pady=1, sticky="w")
+            for col, day in enumerate(days):
+                done = values[day]
+                if pd.isna(done):  # Sin piloto asignado ese día
+                    ctk.CTkLabel(self.compliance_grid_frame, text="—", text_color="gray").grid(row=row + 1, column=col + 1, padx=4, pady=1)
+                    continue
+                ctk.CTkLabel(self.compliance_grid_frame, text="✔" if done else "✘",
+                             text_color="green" if done else "red").grid(row=row + 1, column=col + 1, padx=4, pady=1)
+            ctk.CTkLabel(self.compliance_grid_frame, text=f"{values['cumplimiento']:.0f}").grid(row=row + 1, column=len(days) + 1, padx=4, pady=1)
+
+    # --- Pestaña de Tendencias ---
+
+    def setup_trends_tab(self):
+        tab = self.tabview.tab("Tendencias")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(2, weight=1)
 
-    def update_vehicle_assignment(self, plate, pilot_name):
-        """
-        Asigna o desasigna un vehículo a un piloto basado en la selección del ComboBox.
-        Esta función reemplaza a 'assign_vehicle' y maneja la lógica de 1 a 1.
-        """
-        
-        # 1. Obtener el ID del piloto (será None si se selecciona "SIN ASIGNAR")
-        piloto_id = self.pilot_id_map.get(pilot_name) 
+        filter_frame = ctk.CTkFrame(tab)
+        filter_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        conn = open_db()
+        try:
+            promotions = [row[0] for row in conn.execute("SELECT DISTINCT promotion FROM vehicles WHERE promotion != '' ORDER BY promotion")]
+        finally:
+            conn.close()
 
+        self.trend_period_var = ctk.StringVar(value="mes")
+        ctk.CTkSegmentedButton(filter_frame, values=list(KM_PERIOD_FORMATS), variable=self.trend_period_var,
+                               command=lambda value: self.load_trend()).grid(row=0, column=0, padx=10, pady=5)
+        self.trend_promotion_var = ctk.StringVar(value="Todas")
+        ctk.CTkOptionMenu(filter_frame, variable=self.trend_promotion_var, values=["Todas"] + promotions, width=130,
+                          command=lambda value: self.load_trend()).grid(row=0, column=1, padx=5, pady=5)
+        self.trend_category_var = ctk.StringVar(value="Todas")
+        ctk.CTkOptionMenu(filter_frame, variable=self.trend_category_var, values=["Todas"] + [c for c, _ in CHECKLIST_ITEMS],
+                          width=110, command=self.on_trend_category_change).grid(row=0, column=2, padx=5, pady=5)
+        self.trend_item_var = ctk.StringVar(value="Todos")
+        self.trend_item_menu = ctk.CTkOptionMenu(filter_frame, variable=self.trend_item_var, values=["Todos"], width=180,
+                                                 command=lambda value: self.load_trend())
+        self.trend_item_menu.grid(row=0, column=3, padx=5, pady=5)
+        self.trend_plate_entry = ctk.CTkEntry(filter_frame, width=100, placeholder_text="Placa")
+        self.trend_plate_entry.grid(row=0, column=4, padx=5, pady=5)
+        ctk.CTkButton(filter_frame, text="Consultar", width=90, command=self.load_trend).grid(row=0, column=5, padx=10, pady=5)
+
+        self.trend_summary_label = ctk.CTkLabel(tab, text="", font=ctk.CTkFont(weight="bold"))
+        self.trend_summary_label.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
+        self.trend_canvas = tk.Canvas(tab, background="white", highlightthickness=0, height=380)
+        self.trend_canvas.grid(row=2, column=0, sticky="nsew", padx=10, pady=(0, 10))
+        self.trend_canvas.bind("<Configure>", lambda event: self.draw_trend_chart())
+        self.trend_df = None
+
+        self.load_trend()
+
+    def on_trend_category_change(self, category):
+        items = [] if category == "Todas" else dict(CHECKLIST_ITEMS)[category]
+        self.trend_item_menu.configure(values=["Todos"] + items)
+        self.trend_item_var.set("Todos")
+        self.load_trend()
+
+    def load_trend(self):
+        """Consulta los agregados con los filtros elegidos (últimos TREND_CHART_BUCKETS períodos) y dibuja el gráfico."""
+        period = self.trend_period_var.get()
+        promotion = self.trend_promotion_var.get()
+        category = self.trend_category_var.get()
+        item = self.trend_item_var.get()
         try:
-            # Lógica para hacer cumplir la relación 1 a 1:
+            df = inspection_trend(period, plate=self.trend_plate_entry.get().strip().upper() or None,
+                                  promotion=None if promotion == "Todas" else promotion,
+                                  category=None if category == "Todas" else category,
+                                  item=None if item == "Todos" else item)
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"No se pudo consultar la tendencia: {e}")
+            return
+        self.trend_df = df.tail(TREND_CHART_BUCKETS[period])
+        subject = item if item != "Todos" else category if category != "Todas" else "reportes con fallas"
+        self.trend_summary_label.configure(
+            text=f"Tasa de defectos ({subject}): {len(self.trend_df)} período(s), "
+                 f"{int(self.trend_df['mal_estado'].sum())} en mal estado" if not self.trend_df.empty else "Sin datos para los filtros elegidos.")
+        self.draw_trend_chart()
+
+    def draw_trend_chart(self):
+        """Barras de la tasa de defectos por período (rojo si supera el promedio del rango mostrado)."""
+        canvas = self.trend_canvas
+        canvas.delete("all")
+        df = self.trend_df
+        if df is None or df.empty:
+            return
+        width, height = max(canvas.winfo_width(), 200), max(canvas.winfo_height(), 150)
+        left, right, top, bottom = 40, 10, 10, 40
+        plot_w, plot_h = width - left - right, height - top - bottom
+        max_rate = max(float(df["tasa_defectos"].max()), 1.0)
+        mean_rate = float(df["tasa_defectos"].mean())
+
+        canvas.create_line(left, top, left, top + plot_h, fill="gray")
+        canvas.create_line(left, top + plot_h, left + plot_w, top + plot_h, fill="gray")
+        for fraction in (0, 0.5, 1):
+            y = top + plot_h * (1 - fraction)
+            canvas.create_text(left - 4, y, text=f"{max_rate * fraction:.0f}%", anchor="e", font=("Arial", 8))
+
+        slot = plot_w / len(df)
+        label_every = max(1, int(len(df) / (plot_w / 60)))
+        for index, row in enumerate(df.itertuples(index=False)):
+            x0 = left + index * slot + slot * 0.15
+            x1 = left + (index + 1) * slot - slot * 0.15
+            y = top + plot_h * (1 - row.tasa_defectos / max_rate)
+            color = "#c0392b" if row.tasa_defectos > mean_rate else "#2e86c1"
+            canvas.create_rectangle(x0, y, x1, top + plot_h, fill=color, outline="")
+            if index % label_every == 0:
+                canvas.create_text((x0 + x1) / 2, top + plot_h + 12, text=row.periodo, font=("Arial", 8))
+        y_mean = top + plot_h * (1 - mean_rate / max_rate)
+        canvas.create_line(left, y_mean, left + plot_w, y_mean, fill="gray", dash=(4, 2))
+
+    # --- Pestaña de Auditoría ---
+
+    def setup_audit_tab(self):
+        tab = self.tabview.tab("Auditoría")
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(1, weight=1)
+
+        filter_frame = ctk.CTkFrame(tab, fg_color="transparent")
+        filter_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
+        self.audit_entity_var = ctk.StringVar(value="Todos")
+        ctk.CTkOptionMenu(filter_frame, variable=self.audit_entity_var, values=["Todos", "Pilotos", "Vehículos"],
+                          width=120).grid(row=0, column=0, padx=5)
+        self.audit_key_entry = ctk.CTkEntry(filter_frame, placeholder_text="ID de piloto o placa", width=160)
+        self.audit_key_entry.grid(row=0, column=1, padx=5)
+        self.audit_since_entry = ctk.CTkEntry(filter_frame, placeholder_text="Desde (YYYY-MM-DD)", width=140)
+        self.audit_since_entry.grid(row=0, column=2, padx=5)
+        self.audit_archived_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(filter_frame, text="Incluir archivadas", variable=self.audit_archived_var).grid(row=0, column=3, padx=5)
+        ctk.CTkButton(filter_frame, text="Buscar", width=90, command=self.load_audit_log).grid(row=0, column=4, padx=5)
+
+        self.audit_frame = ctk.CTkScrollableFrame(tab, label_text=f"Cambios Administrativos (últimos {AUDIT_VIEW_LIMIT})")
+        self.audit_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=(5, 10))
+        self.load_audit_log()
+
+    def load_audit_log(self):
+        """Muestra las entradas de auditoría que cumplen los filtros, con los campos que cambiaron."""
+        for widget in self.audit_frame.winfo_children():
+            widget.destroy()
 
-            # 2. Si hay un piloto, desasignar CUALQUIER otro vehículo que tenga asignado.
-            if piloto_id:
-                # Actualiza la tabla vehicles: Desasigna cualquier OTRO vehículo que este piloto pudiera tener
-                cursor.execute("UPDATE vehicles SET assigned_to_user_id = NULL WHERE assigned_to_user_id = ? AND plate != ?", (piloto_id, plate))
-            
-            # 3. Desasignar el vehículo 'plate' de CUALQUIER otro piloto.
-            # En users: Si piloto_id es None, se desasigna de todos.
-            cursor.execute("UPDATE users SET assigned_vehicle_plate = NULL WHERE assigned_vehicle_plate = ? AND id != ?", (plate, piloto_id if piloto_id else 0)) 
-                
-            # 4. Asignar/Desasignar (Actualizar ambas tablas)
-            
-            # Asignación de vehículo al piloto (si piloto_id es None, se asigna NULL, desasignando)
-            cursor.execute("UPDATE users SET assigned_vehicle_plate = ? WHERE id = ?", (plate, piloto_id))
-            
-            # Asignación de piloto al vehículo (si piloto_id es None, se asigna NULL, desasignando)
-            cursor.execute("UPDATE vehicles SET assigned_to_user_id = ? WHERE plate = ?", (piloto_id, plate))
-            
-            # 5. Commit y notificar
-            conn.commit()
-            
-            if piloto_id:
-                messagebox.showinfo("Éxito", f"Vehículo {plate} asignado a {pilot_name}.")
-            else:
-                messagebox.showinfo("Éxito", f"Vehículo {plate} ha sido desasignado (SIN ASIGNAR).")
-            
-            # Recargar la tabla de vehículos y pilotos
-            self.load_vehicle_data()
-            # ⭐️ CORRECCIÓN: Llamar directamente al método de la clase AdminFrame
-            self.load_pilot_data() 
+        entity = {"Pilotos": "user", "Vehículos": "vehicle"}.get(self.audit_entity_var.get())
+        entity_key = self.audit_key_entry.get().strip() or None
+        since = self.audit_since_entry.get().strip() or None
+        if since:
+            try:
+                datetime.date.fromisoformat(since)
+            except ValueError:
+                messagebox.showerror("Error", "La fecha 'Desde' debe tener el formato YYYY-MM-DD.")
+                return
 
-        except Exception as e:
-            messagebox.showerror("Error de Asignación", f"Ocurrió un error inesperado: {e}")
+        conn = open_db()
+        try:
+            entries = query_audit_log(conn.cursor(), entity, entity_key.upper() if entity == "vehicle" and entity_key else entity_key,
+                                      since, limit=AUDIT_VIEW_LIMIT, include_archived=self.audit_archived_var.get())
         finally:
             conn.close()
 
-    def delete_vehicle(self):
-        """Elimina un vehículo solo si no tiene reportes asociados, usando la placa del campo principal."""
-        
-        # ⭐️ CAMBIO AQUÍ: Usamos la placa del campo principal (self.placa_var)
-        placa = self.placa_var.get().strip() 
-        
-        if len(placa) != 7: 
-            messagebox.showerror("Error", "Ingrese una Placa de vehículo válida (ej. C123456) en el campo 'Placa:' superior para ELIMINAR.")
-            return
+        headers = ["Fecha", "Administrador", "Acción", "Entidad", "Cambios"]
+        for col, header in enumerate(headers):
+            ctk.CTkLabel(self.audit_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=8, pady=5, sticky="w")
+        if not entries:
+            ctk.CTkLabel(self.audit_frame, text="No hay cambios registrados con esos filtros.").grid(row=1, column=0, columnspan=5, padx=10, pady=10)
+        for row, entry in enumerate(entries, start=1):
+            before, after = entry["before"] or {}, entry["after"] or {}
+            changes = [f"{field}: {before.get(field)} → {after.get(field)}"
+                       for field in dict.fromkeys(list(before) + list(after)) if before.get(field) != after.get(field)]
+            entity_label = ("Piloto " if entry["entity"] == "user" else "Vehículo ") + entry["entity_key"]
+            values = [entry["at"][:19].replace("T", " "), entry["actor_name"] or "-", entry["action"], entity_label, "\n".join(changes)]
+            for col, value in enumerate(values):
+                ctk.CTkLabel(self.audit_frame, text=value, justify="left").grid(row=row, column=col, padx=8, pady=2, sticky="nw")
 
-        if not messagebox.askyesno("Confirmar Eliminación", 
-                                   f"ADVERTENCIA: ¿Está seguro de que desea ELIMINAR permanentemente el vehículo {placa}? "
-                                   "Esto no se puede deshacer. (Recomendado solo si no tiene reportes históricos)."):
-            return
 
-        conn = sqlite3.connect(DB_NAME)
+# --- Función de Exportación Automática a JSON ---
+
+EXPORT_FILE_NAME = "reportes_camiones_auto.json"
+EXPORT_COMPRESSION = None   # None, "gzip" o "zstd" (requiere el paquete opcional 'zstandard')
+EXPORT_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+EXPORT_COMPACT = False      # True: JSON sin sangría (más pequeño); False: legible (indent=4)
+EXPORT_CHUNK_SIZE = 500     # Reportes leídos por bloque
+
+class _HashingWriter:
+    """Envuelve un archivo binario y calcula el SHA-256 y el tamaño de lo escrito."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+class AtomicExportWriter:
+    """
+    Escribe un archivo de exportación de forma segura ante caídas: el contenido va a un
+    archivo temporal en el mismo directorio, se sincroniza a disco (fsync) y solo entonces
+    reemplaza al destino con un rename atómico. Un lector nunca ve un archivo truncado.
+
+        with AtomicExportWriter("salida.json", compression="gzip") as writer:
+            writer.write('{"a": 1}')
+        writer.checksum, writer.size
+    """
+
+    def __init__(self, file_name, compression=None):
+        if compression not in EXPORT_SUFFIXES:
+            raise ValueError(f"Compresión no soportada: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("La compresión 'zstd' requiere el paquete 'zstandard'.")
+        self.file_name = file_name
+        self.compression = compression
+        self.checksum = None
+        self.size = 0
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.file_name))
+        fd, self._tmp_name = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.basename(self.file_name), dir=directory)
+        if hasattr(os, "fchmod"):
+            # mkstemp crea el archivo con 0600: se deja con los permisos que tendría un open() normal
+            os.fchmod(fd, _export_file_mode(self.file_name))
+        self._raw = os.fdopen(fd, "wb")
+        self._hashing = _HashingWriter(self._raw)
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._hashing, mode="wb", mtime=0)
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._hashing, closefd=False)
+        else:
+            self._stream = self._hashing
+        return self
+
+    def write(self, text):
+        self._stream.write(text.encode("utf-8"))
+
+    def write_bytes(self, data):
+        self._stream.write(data)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._stream is not self._hashing:
+                self._stream.close()  # Escribe el final del formato comprimido
+            if exc_type is None:
+                self._raw.flush()
+                os.fsync(self._raw.fileno())
+            self._raw.close()
+            if exc_type is None:
+                os.replace(self._tmp_name, self.file_name)
+                _fsync_directory(os.path.dirname(os.path.abspath(self.file_name)))
+                self.checksum = self._hashing.sha256.hexdigest()
+                self.size = self._hashing.size
+        finally:
+            if os.path.exists(self._tmp_name):
+                os.remove(self._tmp_name)
+        return False
+
+def _export_file_mode(file_name):
+    """Permisos del destino si ya existe; si no, 0666 menos la umask del proceso."""
+    try:
+        return stat.S_IMODE(os.stat(file_name).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def _fsync_directory(directory):
+    """Asegura que el rename quede en disco (no disponible en Windows)."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def export_path(file_name=None, compression=EXPORT_COMPRESSION):
+    return (file_name or EXPORT_FILE_NAME) + EXPORT_SUFFIXES[compression]
+
+def manifest_path(export_file):
+    return export_file + ".manifest.json"
+
+def read_export_manifest(export_file):
+    """Lee el manifiesto de una exportación (None si no existe o está dañado)."""
+    try:
+        with open(manifest_path(export_file), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def export_is_unchanged(export_file, known_checksum):
+    """Para consumidores: True si la exportación sigue siendo la ya procesada (mismo checksum)."""
+    manifest = read_export_manifest(export_file)
+    return manifest is not None and manifest.get("sha256") == known_checksum
+
+def _decode_report_row(col_names, row):
+    """Convierte una fila de reports en dict, deserializando las columnas JSON."""
+    report_dict = {}
+    for col_name, value in zip(col_names, row):
+        # Deserializar las cadenas JSON para que sean objetos JSON reales
+        if col_name in ('header_data', 'checklist_data') and value:
+            try:
+                report_dict[col_name] = json.loads(value)
+            except json.JSONDecodeError:
+                report_dict[col_name] = f"ERROR DE JSON: {value}" 
+        else:
+            report_dict[col_name] = value
+    return report_dict
+
+def iter_report_snapshots(conn, chunk_size=None):
+    """
+    Recorre las instantáneas de todos los reportes por bloques: (id, JSON compacto). Las que
+    faltan o son de una versión anterior se arman en el momento.
+    """
+    cursor = conn.cursor()
+    lookup = conn.cursor()
+    cursor.execute("SELECT r.id, s.version, s.data FROM reports r LEFT JOIN report_snapshots s ON s.report_id = r.id ORDER BY r.id")
+    while True:
+        rows = cursor.fetchmany(chunk_size or EXPORT_CHUNK_SIZE)
+        if not rows:
+            break
+        for report_id, version, data in rows:
+            if version != SNAPSHOT_VERSION:
+                data = json.dumps(build_report_snapshot(lookup, report_id), ensure_ascii=False, separators=(",", ":"))
+            yield report_id, data
+
+def write_reports_json(writer, reports, compact=False):
+    """
+    Escribe la lista JSON de reportes elemento por elemento. En modo legible el resultado
+    es idéntico a json.dump(lista, indent=4); en modo compacto no lleva espacios.
+    Los reportes pueden ser dicts o pares (id, JSON compacto) de iter_report_snapshots,
+    que en modo compacto se copian sin decodificarlos.
+    Devuelve (cantidad de reportes, id máximo).
+    """
+    count = 0
+    max_id = 0
+    for report in reports:
+        if isinstance(report, tuple):
+            report_id, text = report
+            if compact:
+                writer.write(("[" if count == 0 else ",") + text)
+            else:
+                chunk = json.dumps(json.loads(text), ensure_ascii=False, indent=4).replace("\n", "\n    ")
+                writer.write(("[\n    " if count == 0 else ",\n    ") + chunk)
+            count += 1
+            max_id = max(max_id, report_id)
+            continue
+        if compact:
+            chunk = json.dumps(report, ensure_ascii=False, separators=(",", ":"))
+            writer.write(("[" if count == 0 else ",") + chunk)
+        else:
+            chunk = json.dumps(report, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+            writer.write(("[\n    " if count == 0 else ",\n    ") + chunk)
+        count += 1
+        max_id = max(max_id, report["id"])
+    if count == 0:
+        writer.write("[]")
+    else:
+        writer.write("]" if compact else "\n]")
+    return count, max_id
+
+def export_all_reports_to_json(file_name=None, compression=EXPORT_COMPRESSION, force=False, db_name=None, compact=EXPORT_COMPACT):
+    """
+    Exporta todos los reportes de la DB (sus instantáneas: cadenas JSON convertidas a objetos
+    y el resumen con piloto y vehículo) a un archivo JSON estático. Los reportes se leen por bloques y se escriben uno a uno, de modo
+    que la memoria usada no crece con la cantidad de reportes.
+    El archivo se reemplaza de forma atómica y se acompaña de un manifiesto
+    (<archivo>.manifest.json) con filas, id máximo y SHA-256.
+    Si la DB no cambió desde la última exportación no se reescribe nada (salvo force=True).
+    Devuelve el manifiesto escrito, o None si se omitió por no haber cambios.
+    """
+    target = export_path(file_name, compression)
+    conn = open_db(db_name)
+    try:
         cursor = conn.cursor()
-        
+
+        # Huella barata del contenido: los reportes solo se insertan, nunca se editan; sus
+        # instantáneas sí se regeneran (nueva versión o rebuild_report_snapshots)
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM reports")
+        row_count, max_id = cursor.fetchone()
+        generation = snapshot_generation(cursor)
+        previous = read_export_manifest(target)
+        if (not force and previous and os.path.exists(target)
+                and previous.get("row_count") == row_count and previous.get("max_id") == max_id
+                and previous.get("snapshot_version") == SNAPSHOT_VERSION
+                and previous.get("snapshot_generation") == generation
+                and previous.get("compact", False) == compact):
+            return None
+
+        # Escritura atómica (temporal + fsync + rename), reporte por reporte
+        with AtomicExportWriter(target, compression) as writer:
+            row_count, max_id = write_reports_json(writer, iter_report_snapshots(conn), compact)
+    finally:
+        conn.close()
+
+    # Manifiesto (también atómico) para que los consumidores detecten cambios
+    manifest = {
+        "file": os.path.basename(target),
+        "row_count": row_count,
+        "max_id": max_id,
+        "snapshot_version": SNAPSHOT_VERSION,
+        "snapshot_generation": generation,
+        "sha256": writer.checksum,
+        "size_bytes": writer.size,
+        "compression": compression,
+        "compact": compact,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    with AtomicExportWriter(manifest_path(target)) as manifest_writer:
+        manifest_writer.write(json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+IMPORT_READ_SIZE = 1 << 16   # Bytes leídos por bloque al importar
+ARCHIVE_COMPRESSION = "gzip"
+
+def open_export_for_reading(file_name):
+    """Abre una exportación (o archivo histórico) como texto, descomprimiendo según la extensión."""
+    if file_name.endswith(".gz"):
+        return gzip.open(file_name, "rt", encoding="utf-8")
+    if file_name.endswith(".zst"):
+        if zstandard is None:
+            raise ValueError("Leer archivos '.zst' requiere el paquete 'zstandard'.")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_name, "rb"), closefd=True), encoding="utf-8")
+    return open(file_name, "r", encoding="utf-8")
+
+def iter_json_array(stream, read_size=None):
+    """Recorre los elementos de una lista JSON leyendo el archivo por bloques (sin cargarla entera)."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Saltar espacios y separadores hasta el próximo elemento
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("El archivo no contiene una lista JSON de reportes.")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Un número al final del bloque podría estar incompleto: se espera a leer más
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+        if eof:
+            raise ValueError("La lista JSON está incompleta.")
+        chunk = stream.read(read_size or IMPORT_READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+def _import_driver_id(cursor, report):
+    """Piloto del reporte importado: el mismo id si existe; si no, un usuario deshabilitado con su nombre."""
+    driver_id = report.get("driver_id")
+    cursor.execute("SELECT id FROM users WHERE id = ?", (driver_id,))
+    if cursor.fetchone():
+        return driver_id
+    header = report.get("header_data") if isinstance(report.get("header_data"), dict) else {}
+    username = f"importado-{driver_id}"
+    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("INSERT INTO users (username, password, full_name, role, is_active) VALUES (?, '', ?, 'piloto', 0)",
+                   (username, header.get("piloto_nombre")))
+    return cursor.lastrowid
+
+def import_reports_from_json(file_name, db_name=None):
+    """
+    Importa los reportes de una exportación o archivo histórico (.json, .json.gz o .json.zst)
+    usando insert_report, de modo que las tablas derivadas quedan al día. Los reportes que ya
+    existen (misma placa, fecha, km y firma) se omiten. Todo ocurre en una sola transacción.
+    Devuelve (importados, omitidos).
+    """
+    imported = skipped = 0
+    conn = open_db(db_name)
+    try:
+        cursor = conn.cursor()
+        with open_export_for_reading(file_name) as stream:
+            for report in iter_json_array(stream):
+                cursor.execute("""
+                    SELECT 1 FROM reports
+                    WHERE vehicle_plate IS ? AND report_date = ? AND km_actual IS ? AND signature_confirmation IS ?
+                """, (report.get("vehicle_plate"), report.get("report_date"), report.get("km_actual"),
+                      report.get("signature_confirmation")))
+                if cursor.fetchone():
+                    skipped += 1
+                    continue
+                header = report.get("header_data")
+                checklist = report.get("checklist_data")
+                report_id = insert_report(
+                    cursor, _import_driver_id(cursor, report), report.get("report_date"), report.get("vehicle_plate"),
+                    report.get("km_actual"),
+                    json.dumps(header) if isinstance(header, dict) else header,
+                    json.dumps(checklist) if isinstance(checklist, dict) else checklist,
+                    report.get("observations"), report.get("signature_confirmation"), report.get("submission_id"))
+                photos = {}
+                for photo in report.get("photos") or []:
+                    photos.setdefault(photo["item"], []).append((photo["photo_hash"], photo.get("original_name")))
+                attach_report_photos(cursor, report_id, photos)
+                imported += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return imported, skipped
+
+def _iter_archived_reports(cursor, report_ids):
+    """Reportes a archivar, con sus referencias a fotos (los archivos de fotos no se mueven)."""
+    photo_cursor = cursor.connection.cursor()
+    col_names = None
+    for start in range(0, len(report_ids), EXPORT_CHUNK_SIZE):
+        chunk = report_ids[start:start + EXPORT_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT * FROM reports WHERE id IN ({placeholders}) ORDER BY id", chunk)
+        col_names = col_names or [description[0] for description in cursor.description]
+        for row in cursor.fetchall():
+            report = _decode_report_row(col_names, row)
+            photo_cursor.execute("SELECT item, photo_hash, original_name FROM report_photos WHERE report_id = ? ORDER BY id",
+                                 (report["id"],))
+            photos = [{"item": item, "photo_hash": photo_hash, "original_name": name}
+                      for item, photo_hash, name in photo_cursor.fetchall()]
+            if photos:
+                report["photos"] = photos
+            yield report
+
+def archive_reports(before, file_name, compression=ARCHIVE_COMPRESSION, db_name=None):
+    """
+    Mueve a un archivo histórico (JSON, comprimido por defecto) los reportes con fecha anterior
+    a `before` ('YYYY-MM-DD') y los elimina de la DB. El archivo se escribe de forma atómica
+    antes de borrar, y el borrado es una sola transacción. Las tablas derivadas (odómetro,
+    órdenes de trabajo, calendario) se conservan como historial. Si el depósito sincroniza con
+    la central, los reportes aún no enviados no se archivan.
+    Devuelve {"file", "archived", "max_id"}; el archivo se puede volver a cargar con
+    import_reports_from_json.
+    """
+    datetime.date.fromisoformat(before)  # Valida el formato
+    conn = open_db(db_name, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
         try:
-            # 1. Verificar reportes existentes
-            cursor.execute("SELECT COUNT(*) FROM reports WHERE vehicle_plate = ?", (placa,))
-            if cursor.fetchone()[0] > 0:
-                raise ValueError(f"No se puede eliminar el vehículo {placa}. Tiene reportes históricos asociados.")
+            last_pushed = get_sync_value(cursor, "last_pushed_seq")
+            if last_pushed is None:
+                cursor.execute("SELECT id FROM reports WHERE report_date < ? ORDER BY id", (before,))
+            else:
+                cursor.execute("""
+                    SELECT id FROM reports WHERE report_date < ?
+                    AND id NOT IN (SELECT CAST(entity_key AS INTEGER) FROM change_log WHERE entity = 'report' AND seq > ?)
+                    ORDER BY id
+                """, (before, int(last_pushed)))
+            report_ids = [row[0] for row in cursor.fetchall()]
+            if not report_ids:
+                cursor.execute("ROLLBACK")
+                return {"file": None, "archived": 0, "max_id": 0}
+
+            with AtomicExportWriter(file_name, compression) as writer:
+                archived, max_id = write_reports_json(writer, _iter_archived_reports(cursor, report_ids), compact=True)
+
+            for start in range(0, len(report_ids), EXPORT_CHUNK_SIZE):
+                chunk = report_ids[start:start + EXPORT_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"DELETE FROM report_photos WHERE report_id IN ({placeholders})", chunk)
+                cursor.execute(f"DELETE FROM observation_terms WHERE report_id IN ({placeholders})", chunk)
+                cursor.execute(f"DELETE FROM report_snapshots WHERE report_id IN ({placeholders})", chunk)
+                cursor.execute(f"DELETE FROM reports WHERE id IN ({placeholders})", chunk)
+            cursor.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return {"file": file_name, "archived": archived, "max_id": max_id}
 
-            # 2. Desasignar el vehículo de cualquier piloto (actualiza users)
-            cursor.execute("UPDATE users SET assigned_vehicle_plate = NULL WHERE assigned_vehicle_plate = ?", (placa,))
-            
-            # 3. Eliminar el vehículo (actualiza vehicles)
-            cursor.execute("DELETE FROM vehicles WHERE plate = ?", (placa,))
-            
-            if cursor.rowcount > 0:
-                conn.commit()
-                messagebox.showinfo("Éxito", f"Vehículo {placa} ELIMINADO permanentemente.")
-                self.load_vehicle_data()
-                self.tabview.tab("Gestión de Pilotos").load_pilot_data() 
-                
-                # ⭐️ CAMBIO AQUÍ: Limpiamos el campo de placa principal
-                self.placa_var.set("C") 
+def _legacy_export(db_name, file_name):
+    """Exportación anterior (todo en memoria + indent=4). Solo como referencia para benchmark_export."""
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM reports")
+    rows = cursor.fetchall()
+    col_names = [description[0] for description in cursor.description]
+    reports_list = [_decode_report_row(col_names, row) for row in rows]
+    conn.close()
+    with open(file_name, 'w', encoding='utf-8') as f:
+        json.dump(reports_list, f, ensure_ascii=False, indent=4)
+
+BENCHMARK_EXPORT_TIMEOUT_S = 600  # Por variante; un proceso hijo colgado no bloquea el benchmark
+
+def _peak_memory_kb():
+    """
+    Pico de memoria del proceso en KB y cómo se midió: RSS con el módulo resource (solo
+    POSIX; ru_maxrss está en bytes en macOS) o, si no existe, memoria de Python con tracemalloc.
+    """
+    try:
+        import resource
+    except ImportError:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return tracemalloc.get_traced_memory()[1] / 1024, "python"
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak / 1024 if sys.platform == "darwin" else peak), "rss"
+
+def _measure_export(variant, db_name, file_name, results):
+    """Ejecuta una variante de exportación en un proceso hijo y mide tiempo y pico de memoria."""
+    baseline, _ = _peak_memory_kb()
+    start = time.perf_counter()
+    if variant == "legacy":
+        _legacy_export(db_name, file_name)
+    else:
+        export_all_reports_to_json(file_name, force=True, db_name=db_name, compact=(variant == "streaming_compact"))
+    elapsed = time.perf_counter() - start
+    peak, metric = _peak_memory_kb()
+    results.put((variant, elapsed, peak - baseline, metric, os.path.getsize(file_name)))
+
+def _wait_for_result(process, results, timeout):
+    """Resultado del proceso hijo, o None si terminó sin enviarlo o superó `timeout` segundos."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                # Pudo enviar justo antes de terminar
+                with contextlib.suppress(queue.Empty):
+                    return results.get(timeout=1)
+                return None
+            if time.monotonic() > deadline:
+                process.terminate()
+                return None
+
+def benchmark_export(report_count=20000):
+    """
+    Compara la exportación anterior con la exportación por bloques (legible y compacta)
+    sobre una base temporal con `report_count` reportes. Cada variante corre en su propio
+    proceso para medir el crecimiento del pico de memoria (RSS, o memoria de Python donde no
+    hay módulo resource). Devuelve {variante: {seconds, peak_rss_mb | peak_python_mb, size_mb}}
+    o {variante: {error}} si el proceso falló o no terminó a tiempo.
+    """
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "benchmark_export.db")
+        inicializar_db(db_path)
+        conn = sqlite3.connect(db_path)
+        checklist = json.dumps({item: "Buen estado" for _, items in CHECKLIST_ITEMS for item in items})
+        header = json.dumps({"placa": "C123456", "marca": "FOTON", "promocion": "Promo A (Lanzamiento)", "km_actual": "1000"})
+        conn.executemany(
+            "INSERT INTO reports (driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations) "
+            "VALUES (2, '2026-01-01', 'C123456', ?, ?, ?, 'Sin novedad')",
+            ((str(i), header, checklist) for i in range(report_count)))
+        conn.commit()
+        conn.close()
+        rebuild_report_snapshots(db_path)  # Como si se hubieran guardado con insert_report
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        summary = {}
+        for variant in ("legacy", "streaming", "streaming_compact"):
+            file_name = os.path.join(tmp_dir, f"{variant}.json")
+            process = ctx.Process(target=_measure_export, args=(variant, db_path, file_name, results))
+            process.start()
+            result = _wait_for_result(process, results, BENCHMARK_EXPORT_TIMEOUT_S)
+            process.join()
+            if result is None:
+                summary[variant] = {"error": f"el proceso terminó con código {process.exitcode}" if process.exitcode
+                                    else f"sin resultado después de {BENCHMARK_EXPORT_TIMEOUT_S} s"}
+                continue
+            name, elapsed, peak_kb, metric, size = result
+            summary[name] = {"seconds": round(elapsed, 3), f"peak_{metric}_mb": round(peak_kb / 1024, 1),
+                             "size_mb": round(size / 1024 / 1024, 2)}
+    return summary
+    
+# --- Sincronización entre Depósitos y Base Central ---
+#
+# Cada depósito registra sus cambios (reportes nuevos, altas/ediciones de usuarios y
+# vehículos) en la tabla change_log mediante triggers. sync_with_central() envía esos
+# cambios por lotes comprimidos al servidor central (create_sync_server) y luego trae
+# de vuelta los datos de referencia (usuarios y vehículos) que cambiaron en la central.
+#
+# Reglas de conflicto: usuarios y vehículos usan "gana la última escritura" según la
+# fecha del cambio (con el id de sitio como desempate). Una asignación de vehículo
+# siempre mantiene la relación 1 a 1: el piloto queda desasignado de cualquier otro
+# vehículo. Los reportes no generan conflictos: se identifican por (sitio, id de origen).
+
+SYNC_TRIGGERS = [
+    ("trg_sync_reports_ins", "AFTER INSERT ON reports",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('report', NEW.id)"),
+    ("trg_sync_users_ins", "AFTER INSERT ON users",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('user', NEW.username)"),
+    ("trg_sync_users_upd", "AFTER UPDATE OF username, password, full_name, role, is_active ON users",
+     "INSERT INTO change_log (entity, entity_key, old_key) VALUES ('user', NEW.username, OLD.username)"),
+    ("trg_sync_users_del", "AFTER DELETE ON users",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('user', OLD.username)"),
+    ("trg_sync_vehicles_ins", "AFTER INSERT ON vehicles",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('vehicle', NEW.plate)"),
+    ("trg_sync_vehicles_upd", "AFTER UPDATE ON vehicles",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('vehicle', NEW.plate)"),
+    ("trg_sync_vehicles_del", "AFTER DELETE ON vehicles",
+     "INSERT INTO change_log (entity, entity_key) VALUES ('vehicle', OLD.plate)"),
+]
+
+def install_sync_schema(cursor):
+    """Crea las tablas y triggers de sincronización. Registra los datos ya existentes como cambios."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+    is_new = cursor.fetchone() is None
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_key TEXT NOT NULL,
+        old_key TEXT,
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    )
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+    # Última versión aplicada de cada usuario/vehículo (regla "gana la última escritura")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sync_clock (
+        entity TEXT NOT NULL,
+        entity_key TEXT NOT NULL,
+        changed_at TEXT NOT NULL,
+        site_id TEXT NOT NULL,
+        PRIMARY KEY (entity, entity_key)
+    )
+    """)
+    # Origen de los reportes recibidos por la central (evita duplicados en reintentos)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sync_report_origin (
+        origin_site TEXT NOT NULL,
+        origin_id INTEGER NOT NULL,
+        report_id INTEGER NOT NULL,
+        PRIMARY KEY (origin_site, origin_id)
+    )
+    """)
+
+    for name, event, statement in SYNC_TRIGGERS:
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {statement}; END")
+
+    if is_new:
+        cursor.execute("INSERT INTO change_log (entity, entity_key) SELECT 'user', username FROM users ORDER BY id")
+        cursor.execute("INSERT INTO change_log (entity, entity_key) SELECT 'vehicle', plate FROM vehicles ORDER BY plate")
+        cursor.execute("INSERT INTO change_log (entity, entity_key) SELECT 'report', id FROM reports ORDER BY id")
+
+def get_sync_value(cursor, key, default=None):
+    cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+def set_sync_value(cursor, key, value):
+    cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+def get_site_id(cursor):
+    """Identificador único de esta instalación (se genera la primera vez)."""
+    site_id = get_sync_value(cursor, "site_id")
+    if not site_id:
+        site_id = uuid.uuid4().hex
+        set_sync_value(cursor, "site_id", site_id)
+    return site_id
+
+def encode_sync_payload(data):
+    """Serializa un lote como JSON compacto comprimido con zlib."""
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+def decode_sync_payload(raw, max_size=SYNC_MAX_PAYLOAD_BYTES):
+    """Inverso de encode_sync_payload; rechaza (ValueError) lo que descomprimido supere max_size."""
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(raw, max_size)
+    if decompressor.unconsumed_tail:
+        raise ValueError("Lote demasiado grande")
+    if not decompressor.eof:
+        raise ValueError("Lote comprimido incompleto")
+    return json.loads(data.decode("utf-8"))
+
+def collect_changes(cursor, after_seq, limit, entities=("report", "user", "vehicle")):
+    """
+    Lee hasta `limit` entradas de change_log posteriores a `after_seq` y devuelve
+    (cambios, último seq leído). Las entradas repetidas de una misma entidad se
+    agrupan: solo se envía el estado actual de la fila.
+    """
+    cursor.execute("SELECT seq, entity, entity_key, old_key, changed_at FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                   (after_seq, limit))
+    log_rows = cursor.fetchall()
+    if not log_rows:
+        return [], after_seq
+
+    latest = {}
+    for seq, entity, entity_key, old_key, changed_at in log_rows:
+        if entity not in entities:
+            continue
+        previous_key = old_key if old_key and old_key != entity_key else None
+        group = (entity, entity_key, previous_key)
+        latest.pop(group, None)  # Reinsertar para conservar el orden del último cambio
+        latest[group] = changed_at
+
+    changes = []
+    for (entity, entity_key, previous_key), changed_at in latest.items():
+        if entity == "report":
+            change = _collect_report(cursor, entity_key)
+        elif entity == "user":
+            change = _collect_user(cursor, entity_key, previous_key)
+        else:
+            change = _collect_vehicle(cursor, entity_key)
+        if change is not None:
+            change["changed_at"] = changed_at
+            changes.append(change)
+    return changes, log_rows[-1][0]
+
+def _collect_report(cursor, report_id):
+    cursor.execute("""
+        SELECT r.id, u.username, u.full_name, r.report_date, r.vehicle_plate, r.km_actual,
+               r.header_data, r.checklist_data, r.observations, r.signature_confirmation, r.submission_id
+        FROM reports r LEFT JOIN users u ON r.driver_id = u.id
+        WHERE r.id = ?
+    """, (report_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    keys = ("origin_id", "driver_username", "driver_full_name", "report_date", "vehicle_plate", "km_actual",
+            "header_data", "checklist_data", "observations", "signature_confirmation", "submission_id")
+    change = dict(zip(keys, row))
+    change["entity"] = "report"
+    return change
+
+def _collect_user(cursor, username, previous_username=None):
+    cursor.execute("SELECT username, password, full_name, role, is_active FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    if row is None:
+        return {"entity": "user", "username": username, "deleted": True}
+    change = dict(zip(("username", "password", "full_name", "role", "is_active"), row))
+    change.update(entity="user", previous_username=previous_username, deleted=False)
+    return change
+
+def _collect_vehicle(cursor, plate):
+    cursor.execute("""
+        SELECT v.plate, v.brand, v.promotion, u.username
+        FROM vehicles v LEFT JOIN users u ON v.assigned_to_user_id = u.id
+        WHERE v.plate = ?
+    """, (plate,))
+    row = cursor.fetchone()
+    if row is None:
+        return {"entity": "vehicle", "plate": plate, "deleted": True}
+    change = dict(zip(("plate", "brand", "promotion", "assigned_username"), row))
+    change.update(entity="vehicle", deleted=False)
+    return change
+
+def _is_newer_change(cursor, entity, entity_key, changed_at, site_id):
+    """Regla "gana la última escritura": True si el cambio es más reciente que el ya aplicado."""
+    cursor.execute("SELECT changed_at, site_id FROM sync_clock WHERE entity = ? AND entity_key = ?", (entity, entity_key))
+    row = cursor.fetchone()
+    if row and (changed_at, site_id) <= tuple(row):
+        return False
+    cursor.execute("INSERT OR REPLACE INTO sync_clock (entity, entity_key, changed_at, site_id) VALUES (?, ?, ?, ?)",
+                   (entity, entity_key, changed_at, site_id))
+    return True
+
+def _user_id_for(cursor, username):
+    if not username:
+        return None
+    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def _valid_user_change(change):
+    """
+    Un usuario recibido solo se aplica con una contraseña ya hasheada (o vacía: no puede
+    iniciar sesión) y un rol conocido. Una contraseña en texto plano se aceptaría al
+    iniciar sesión, así que nunca se copia desde otra base.
+    """
+    if change.get("deleted"):
+        return True
+    password = change.get("password")
+    return (isinstance(password, str) and (password == "" or is_password_hash(password))
+            and change.get("role") in ("admin", "piloto") and isinstance(change.get("username"), str))
+
+def _apply_user_change(cursor, change):
+    username = change["username"]
+    if change.get("deleted"):
+        # Igual que delete_user: no se elimina un usuario con reportes o un administrador
+        user_id = _user_id_for(cursor, username)
+        cursor.execute("SELECT COUNT(*) FROM reports WHERE driver_id = ?", (user_id,))
+        if user_id is not None and cursor.fetchone()[0] == 0:
+            end_assignments(cursor, user_id=user_id)
+            cursor.execute("DELETE FROM users WHERE id = ? AND role != 'admin'", (user_id,))
+        return
+
+    previous = change.get("previous_username")
+    if previous and _user_id_for(cursor, username) is None:
+        # Cambio de nombre de usuario: se conserva el mismo registro (y sus reportes)
+        cursor.execute("UPDATE users SET username = ? WHERE username = ?", (username, previous))
+
+    values = (change["password"], change["full_name"], change["role"], change["is_active"], username)
+    cursor.execute("UPDATE users SET password = ?, full_name = ?, role = ?, is_active = ? WHERE username = ?", values)
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO users (password, full_name, role, is_active, username) VALUES (?, ?, ?, ?, ?)", values)
+
+def _apply_vehicle_change(cursor, change):
+    plate = change["plate"]
+    if change.get("deleted"):
+        end_assignments(cursor, plate=plate)
+        cursor.execute("DELETE FROM vehicles WHERE plate = ?", (plate,))
+        return
+
+    values = (change["brand"], change["promotion"], plate)
+    cursor.execute("UPDATE vehicles SET brand = ?, promotion = ? WHERE plate = ?", values)
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO vehicles (brand, promotion, plate) VALUES (?, ?, ?)", values)
+    # Relación 1 a 1 e historial: el piloto deja cualquier otro vehículo
+    assign_vehicle(cursor, plate, _user_id_for(cursor, change.get("assigned_username")))
+
+def _apply_report_change(cursor, site_id, change):
+    cursor.execute("SELECT 1 FROM sync_report_origin WHERE origin_site = ? AND origin_id = ?", (site_id, change["origin_id"]))
+    if cursor.fetchone():
+        return False  # Ya recibido (reintento)
+
+    driver_username = change["driver_username"] or f"desconocido-{site_id[:8]}"
+    driver_id = _user_id_for(cursor, driver_username)
+    if driver_id is None:
+        # Piloto desconocido en la central: se crea deshabilitado para conservar el reporte
+        cursor.execute("INSERT INTO users (username, password, full_name, role, is_active) VALUES (?, '', ?, 'piloto', 0)",
+                       (driver_username, change["driver_full_name"]))
+        driver_id = cursor.lastrowid
+
+    report_id = insert_report(cursor, driver_id, change["report_date"], change["vehicle_plate"], change["km_actual"],
+                              change["header_data"], change["checklist_data"], change["observations"],
+                              change["signature_confirmation"], change.get("submission_id"))
+    cursor.execute("INSERT INTO sync_report_origin (origin_site, origin_id, report_id) VALUES (?, ?, ?)",
+                   (site_id, change["origin_id"], report_id))
+    return True
+
+SYNC_APPLY_ORDER = {"user": 0, "vehicle": 1, "report": 2}
+
+def _in_apply_order(changes):
+    """
+    Usuarios antes que vehículos y reportes: un vehículo asignado (o un reporte) a un piloto
+    que llega en el mismo lote encuentra al piloto ya creado o renombrado.
+    """
+    return sorted(changes, key=lambda change: SYNC_APPLY_ORDER.get(change["entity"], len(SYNC_APPLY_ORDER)))
+
+def apply_pushed_changes(conn, site_id, changes):
+    """Aplica en la base central un lote enviado por un depósito. Devuelve (aplicados, rechazados)."""
+    cursor = conn.cursor()
+    applied = rejected = 0
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for change in _in_apply_order(changes):
+            entity = change["entity"]
+            if entity == "report":
+                applied += _apply_report_change(cursor, site_id, change)
+                continue
+
+            if entity == "user" and not _valid_user_change(change):
+                rejected += 1
+                continue
+            entity_key = change["username"] if entity == "user" else change["plate"]
+            if not _is_newer_change(cursor, entity, entity_key, change["changed_at"], site_id):
+                # La central tiene una versión más reciente: se vuelve a publicar para que el depósito la reciba
+                cursor.execute("INSERT INTO change_log (entity, entity_key) VALUES (?, ?)", (entity, entity_key))
+                rejected += 1
+                continue
+
+            if entity == "user":
+                _apply_user_change(cursor, change)
             else:
-                raise ValueError(f"No se encontró un vehículo con placa {placa}.")
+                _apply_vehicle_change(cursor, change)
+            applied += 1
 
-        except ValueError as e:
-            messagebox.showerror("Error de Eliminación", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error inesperado: {e}")
+        refresh_assignment_cache(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied, rejected
+
+def apply_pulled_changes(conn, changes):
+    """Aplica en el depósito los datos de referencia recibidos de la central (la central manda)."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+        last_local_seq = cursor.fetchone()[0]
+
+        for change in _in_apply_order(changes):
+            if change["entity"] == "user":
+                if _valid_user_change(change):
+                    _apply_user_change(cursor, change)
+            elif change["entity"] == "vehicle":
+                _apply_vehicle_change(cursor, change)
+        refresh_assignment_cache(cursor)
+
+        # Los triggers registraron estos cambios como locales: se descartan para no reenviarlos
+        cursor.execute("DELETE FROM change_log WHERE seq > ?", (last_local_seq,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# --- Servidor Central de Sincronización ---
+
+class SyncRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    POST /push           -> cuerpo: lote comprimido {"site_id", "changes"}; responde {"applied", "rejected"}
+    GET  /pull?since=N   -> responde {"changes", "last_seq", "more"} con usuarios/vehículos posteriores a N
+    Ambas requieren la clave compartida (Authorization: Bearer <clave>): los lotes llevan
+    usuarios con sus roles y hashes de contraseña.
+    """
+    central_db = None
+    write_lock = None
+    token = None
+
+    def _authorized(self):
+        if hmac.compare_digest(self.headers.get("Authorization", "").encode(), f"Bearer {self.token}".encode()):
+            return True
+        self.send_error(401)
+        return False
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path != "/push":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if not 0 <= length <= SYNC_MAX_BODY_BYTES:
+                self.send_error(413, "Lote demasiado grande")
+                return
+            batch = decode_sync_payload(self.rfile.read(length))
+            conn = sqlite3.connect(self.central_db, timeout=SYNC_TIMEOUT_S, isolation_level=None)
+            try:
+                with self.write_lock:
+                    applied, rejected = apply_pushed_changes(conn, batch["site_id"], batch["changes"])
+            finally:
+                conn.close()
+        except (ValueError, KeyError, TypeError, zlib.error, sqlite3.IntegrityError) as e:
+            self.send_error(400, f"Lote inválido: {e}")
+            return
+        except sqlite3.Error as e:
+            self.send_error(503, f"Base central no disponible: {e}")
+            return
+        self._send_payload({"applied": applied, "rejected": rejected})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path, _, query = self.path.partition("?")
+        if path != "/pull":
+            self.send_error(404)
+            return
+        params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+        try:
+            since = int(params.get("since", 0))
+        except ValueError:
+            self.send_error(400, "Parámetro 'since' inválido")
+            return
+
+        conn = sqlite3.connect(self.central_db, timeout=SYNC_TIMEOUT_S)
+        try:
+            changes, last_seq = collect_changes(conn.cursor(), since, SYNC_BATCH_SIZE, entities=("user", "vehicle"))
+            more = last_seq > since and conn.execute("SELECT 1 FROM change_log WHERE seq > ? LIMIT 1", (last_seq,)).fetchone() is not None
+        except sqlite3.Error as e:
+            self.send_error(503, f"Base central no disponible: {e}")
+            return
         finally:
             conn.close()
+        self._send_payload({"changes": changes, "last_seq": last_seq, "more": more})
 
-# --- Función de Exportación Automática a JSON ---
+    def _send_payload(self, data):
+        body = encode_sync_payload(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-def export_all_reports_to_json():
+    def log_message(self, format, *args):
+        pass  # Sin salida por consola por cada petición
+
+def create_sync_server(central_db, host="127.0.0.1", port=8765, token=None):
+    """
+    Crea (sin iniciar) el servidor HTTP de la base central. Se inicia con serve_forever(),
+    por ejemplo en un hilo: threading.Thread(target=server.serve_forever, daemon=True).start()
+    La clave (token o SYNC_TOKEN) es obligatoria: los depósitos deben enviar la misma.
     """
-    Consulta todos los reportes de la DB, convierte las cadenas JSON a objetos
-    y exporta el conjunto completo de datos a un archivo JSON estático.
-    Este archivo se sobrescribe con el estado actual de la DB en cada llamada.
+    token = token or SYNC_TOKEN
+    if not token:
+        raise ValueError("El servidor central requiere una clave compartida (--token o SYNC_TOKEN).")
+    inicializar_db(central_db)
+    handler = type("CentralSyncHandler", (SyncRequestHandler,), {"central_db": central_db, "write_lock": threading.Lock(),
+                                                                 "token": token})
+    return http.server.ThreadingHTTPServer((host, port), handler)
+
+# --- Cliente de Sincronización (Depósito) ---
+
+def _sync_request(url, token, body=None):
+    request = urllib.request.Request(url, data=body, method="POST" if body is not None else "GET",
+                                     headers={"Content-Type": "application/octet-stream", "Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(request, timeout=SYNC_TIMEOUT_S) as response:
+        return decode_sync_payload(response.read())
+
+def sync_with_central(server_url=None, db_name=None, token=None):
     """
+    Envía los cambios locales pendientes a la central (por lotes) y trae los usuarios
+    y vehículos que cambiaron allí. Devuelve un resumen con los totales.
+    """
+    server_url = (server_url or SYNC_SERVER_URL).rstrip("/")
+    token = token or SYNC_TOKEN
+    if not token:
+        raise ValueError("Falta la clave de la base central (--token o SYNC_TOKEN).")
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=SYNC_TIMEOUT_S, isolation_level=None)
+    cursor = conn.cursor()
+    summary = {"pushed": 0, "rejected": 0, "pulled": 0}
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        site_id = get_site_id(cursor)
+
+        # 1. Push: lotes de cambios locales
+        last_pushed = int(get_sync_value(cursor, "last_pushed_seq", 0))
+        while True:
+            changes, last_seq = collect_changes(cursor, last_pushed, SYNC_BATCH_SIZE)
+            if last_seq == last_pushed:
+                break
+            if changes:
+                result = _sync_request(f"{server_url}/push", token, encode_sync_payload({"site_id": site_id, "changes": changes}))
+                summary["pushed"] += result["applied"]
+                summary["rejected"] += result["rejected"]
+            last_pushed = last_seq
+            set_sync_value(cursor, "last_pushed_seq", last_pushed)
+
+        # 2. Pull: datos de referencia cambiados en la central
+        last_pulled = int(get_sync_value(cursor, "last_pulled_seq", 0))
+        while True:
+            result = _sync_request(f"{server_url}/pull?since={last_pulled}", token)
+            if result["changes"]:
+                apply_pulled_changes(conn, result["changes"])
+                summary["pulled"] += len(result["changes"])
+            last_pulled = result["last_seq"]
+            set_sync_value(cursor, "last_pulled_seq", last_pulled)
+            if not result["more"]:
+                break
+    finally:
+        conn.close()
+    return summary
 
-        # 1. Obtener todos los reportes
-        cursor.execute("SELECT * FROM reports")
-        rows = cursor.fetchall()
-        
-        # 2. Obtener los nombres de las columnas
-        col_names = [description[0] for description in cursor.description]
-        reports_list = []
+def sync_in_background():
+    """
+    Sincroniza con la central sin interrumpir al piloto. Los errores se reintentan en la
+    próxima; cada intento queda en la bitácora de mantenimiento (maintenance --log).
+    """
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+    try:
+        ok, result = True, json.dumps(sync_with_central())
+    except Exception as e:
+        ok, result = False, f"{type(e).__name__}: {e}"
+        print(f"Error de sincronización: {result}", file=sys.stderr)
+    try:
+        conn = sqlite3.connect(DB_NAME, timeout=MAINTENANCE_BUSY_TIMEOUT_S)
+        try:
+            conn.execute("INSERT INTO maintenance_log (task, started_at, duration_ms, ok, result) VALUES ('sync', ?, ?, ?, ?)",
+                         (started_at, round((time.perf_counter() - start) * 1000), int(ok), result))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass  # DB ocupada: el error ya se informó por consola
+
+# --- Backends de Almacenamiento ---
+#
+# La interfaz y el guardado no abren el archivo SQLite directamente: piden una conexión con
+# open_db(), que la obtiene del backend configurado en STORAGE_BACKEND. Ambos backends
+# entregan objetos con la API de sqlite3 (cursor, execute, executemany, fetch*, commit,
+# rollback, in_transaction) y los mismos tipos de error (sqlite3.Error), así que el resto
+# del código no cambia:
+#   - SQLiteBackend: el archivo local de siempre (un solo escritor a la vez).
+#   - RemoteBackend: un servidor de datos (backend-server) que atiende a todas las estaciones
+#     por HTTP. Cada conexión del cliente es una sesión con su propia conexión en el servidor;
+#     las sesiones se reutilizan (pool) y executemany viaja en una sola petición.
+# Las tareas propias del archivo SQLite (respaldo, vacuum, instantánea de análisis,
+# sincronización entre depósitos) siguen usando sqlite3 y, con un servidor de datos, se
+# ejecutan en el servidor.
+
+STORAGE_BACKEND = None             # None = archivo SQLite local; URL = servidor de datos (ej: "http://servidor:8766")
+BACKEND_TOKEN = None               # Clave compartida con el servidor de datos (obligatoria en el servidor)
+BACKEND_POOL_SIZE = 4              # Conexiones inactivas conservadas para reutilizar
+BACKEND_TIMEOUT_S = 30
+BACKEND_BUSY_TIMEOUT_S = 5.0       # Espera del servidor por el bloqueo de escritura de SQLite
+BACKEND_FETCH_ROWS = 2000          # Filas por respuesta; el resto se pide a medida que se leen
+BACKEND_BULK_CHUNK = 5000          # Filas por petición en las inserciones masivas
+BACKEND_SESSION_IDLE_S = 600       # Segundos sin uso tras los que el servidor cierra una sesión
+_SQL_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+class StorageBackend:
+    """
+    Interfaz común. connect() devuelve una conexión con la API de sqlite3 (cerrarla la libera);
+    connection() la toma del pool y confirma o revierte al salir del bloque `with`.
+    """
 
-        # 3. Procesar y Deserializar JSON
-        for row in rows:
-            report_dict = {}
-            for i, col_name in enumerate(col_names):
-                value = row[i]
-                
-                # Deserializar las cadenas JSON para que sean objetos JSON reales
-                if col_name in ('header_data', 'checklist_data') and value:
-                    try:
-                        report_dict[col_name] = json.loads(value)
-                    except json.JSONDecodeError:
-                        report_dict[col_name] = f"ERROR DE JSON: {value}" 
-                else:
-                    report_dict[col_name] = value
-            
-            reports_list.append(report_dict)
+    def __init__(self, pool_size=None):
+        self.pool_size = BACKEND_POOL_SIZE if pool_size is None else pool_size   # Por base / tipo de conexión
+        self.stats = {"opened": 0, "reused": 0}
+        self._pool = collections.defaultdict(list)
+        self._pool_lock = threading.Lock()
+
+    def connect(self, db_name=None, **options):
+        raise NotImplementedError
+
+    def _open_pooled(self, db_name):
+        raise NotImplementedError
+
+    def _pool_key(self, db_name):
+        return db_name
+
+    def _acquire(self, db_name=None):
+        key = self._pool_key(db_name)
+        with self._pool_lock:
+            if self._pool[key]:
+                self.stats["reused"] += 1
+                return self._pool[key].pop()
+        self.stats["opened"] += 1
+        return self._open_pooled(db_name)
+
+    def _release(self, conn, db_name=None, broken=False):
+        """Devuelve una conexión al pool (sin transacción abierta) o la cierra si sobra."""
+        if not broken:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                broken = True
+        key = self._pool_key(db_name)
+        with self._pool_lock:
+            if not broken and len(self._pool[key]) < self.pool_size:
+                self._pool[key].append(conn)
+                return
+        self._discard(conn)
 
-        conn.close()
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self, db_name=None):
+        conn = self._acquire(db_name)
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+            broken = broken or not isinstance(e, Exception)
+            raise
+        finally:
+            self._release(conn, db_name, broken)
+
+    def bulk_insert(self, table, columns, rows, db_name=None, on_conflict=None, chunk_size=None):
+        """
+        Inserta muchas filas en una sola transacción, en bloques de chunk_size (una petición
+        por bloque con el servidor de datos). on_conflict: None, "IGNORE" o "REPLACE".
+        Devuelve la cantidad de filas insertadas.
+        """
+        for name in (table, *columns):
+            if not _SQL_IDENTIFIER.fullmatch(name):
+                raise ValueError(f"Identificador SQL inválido: {name!r}")
+        if on_conflict not in (None, "IGNORE", "REPLACE"):
+            raise ValueError(f"on_conflict inválido: {on_conflict!r}")
+        verb = f"INSERT OR {on_conflict}" if on_conflict else "INSERT"
+        sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        rows = iter(rows)
+        inserted = 0
+        with self.connection(db_name) as conn:
+            cursor = conn.cursor()
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size or BACKEND_BULK_CHUNK))
+                if not chunk:
+                    break
+                cursor.executemany(sql, chunk)
+                inserted += cursor.rowcount
+        return inserted
+
+    def close(self):
+        """Cierra las conexiones inactivas del pool."""
+        with self._pool_lock:
+            pooled = [conn for conns in self._pool.values() for conn in conns]
+            self._pool.clear()
+        for conn in pooled:
+            self._discard(conn)
+
+class SQLiteBackend(StorageBackend):
+    """Archivo SQLite local. connect() abre una conexión nueva (abrir un archivo local es barato)."""
+
+    name = "sqlite"
+
+    def connect(self, db_name=None, **options):
+        return sqlite3.connect(db_name or DB_NAME, **options)
+
+    def _pool_key(self, db_name):
+        return os.path.abspath(db_name or DB_NAME)
+
+    def _open_pooled(self, db_name):
+        # Las conexiones del pool pueden pasar de un hilo a otro (nunca dos a la vez)
+        return sqlite3.connect(db_name or DB_NAME, timeout=BACKEND_BUSY_TIMEOUT_S, check_same_thread=False)
+
+def _encode_backend_value(value):
+    """Los BLOB viajan en base64 (JSON no tiene bytes)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"b64": base64.b64encode(bytes(value)).decode("ascii")}
+    return value
+
+def _decode_backend_value(value):
+    return base64.b64decode(value["b64"]) if isinstance(value, dict) else value
+
+def _encode_backend_params(params):
+    if isinstance(params, dict):
+        return {key: _encode_backend_value(value) for key, value in params.items()}
+    return [_encode_backend_value(value) for value in params]
+
+def _decode_backend_params(params):
+    if isinstance(params, dict):
+        return {key: _decode_backend_value(value) for key, value in params.items()}
+    return [_decode_backend_value(value) for value in params]
+
+def _backend_error(error):
+    """Reconstruye en el cliente la excepción de sqlite3 que ocurrió en el servidor."""
+    name, message = error
+    error_class = getattr(sqlite3, name, None)
+    if not (isinstance(error_class, type) and issubclass(error_class, sqlite3.Error)):
+        error_class = sqlite3.DatabaseError
+    return error_class(message)
+
+class RemoteCursor:
+    """Cursor con la API de sqlite3 sobre una sesión del servidor de datos."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 1
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = collections.deque()
+        self._cursor_id = None
+
+    def _load(self, result):
+        self.description = tuple(tuple(column) for column in result["description"]) if result["description"] else None
+        self.rowcount = result["rowcount"]
+        self.lastrowid = result["lastrowid"]
+        self._rows = collections.deque(tuple(_decode_backend_value(value) for value in row) for row in result["rows"])
+        self._cursor_id = result.get("cursor")
+
+    def execute(self, sql, params=()):
+        self.close()
+        self._load(self.connection._request("execute", {"sql": sql, "params": _encode_backend_params(params)}))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.close()
+        self._load(self.connection._request("executemany", {"sql": sql, "params": [_encode_backend_params(params) for params in seq_of_params]}))
+        return self
+
+    def _fill(self, size):
+        """Pide más filas al servidor si las recibidas no alcanzan."""
+        while self._cursor_id is not None and (size is None or len(self._rows) < size):
+            result = self.connection._request("fetch", {"cursor": self._cursor_id})
+            self._rows.extend(tuple(_decode_backend_value(value) for value in row) for row in result["rows"])
+            self._cursor_id = result.get("cursor")
+
+    def fetchone(self):
+        self._fill(1)
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        self._fill(size)
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    def fetchall(self):
+        self._fill(None)
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
 
-        # 4. Escribir en el archivo JSON (Nombre fijo para que siempre se sobrescriba)
-        file_name = "reportes_camiones_auto.json"
+    def close(self):
+        if self._cursor_id is not None:
+            cursor_id, self._cursor_id = self._cursor_id, None
+            self.connection._request("close_cursor", {"cursor": cursor_id})
+        self._rows.clear()
 
-        with open(file_name, 'w', encoding='utf-8') as f:
-            # Usamos indent=4 para una fácil lectura y ensure_ascii=False para acentos
-            json.dump(reports_list, f, ensure_ascii=False, indent=4)
-        
-        # Opcional: puedes descomentar esto para ver una confirmación en la consola
-        # print(f"Exportación automática exitosa. Total reportes: {len(reports_list)}. Archivo: {file_name}")
+BACKEND_RETRYABLE_OPERATIONS = ("open", "close_cursor")   # Repetirlas no cambia el resultado
+
+def _socket_closed_by_peer(sock):
+    """True si el otro extremo cerró la conexión (hay EOF o datos inesperados para leer)."""
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+class RemoteConnection:
+    """
+    Conexión con la API de sqlite3 sobre una sesión del servidor de datos (HTTP persistente).
+    close() la devuelve al pool del backend; la sesión en el servidor sigue abierta.
+    """
+
+    def __init__(self, backend, isolation_level="", tenant=None):
+        self.backend = backend
+        self.isolation_level = isolation_level
+        self.tenant = tenant
+        self.in_transaction = False
+        self._released = False
+        self._http = None
+        self._session = None
+        self._session = self._request("open", {"autocommit": isolation_level is None, "tenant": tenant})["session"]
+
+    def _request(self, operation, payload):
+        body = encode_sync_payload({**payload, "session": self._session})
+        headers = {"Content-Type": "application/octet-stream"}
+        if self.backend.token:
+            headers["Authorization"] = f"Bearer {self.backend.token}"
+        if self._http is not None and _socket_closed_by_peer(self._http.sock):
+            # El servidor cerró la conexión HTTP inactiva: se abre otra antes de enviar
+            self._http.close()
+            self._http = None
+        for attempt in (0, 1):
+            reused = self._http is not None
+            if self._http is None:
+                self._http = http.client.HTTPConnection(self.backend.host, self.backend.port, timeout=BACKEND_TIMEOUT_S)
+            sent = False
+            try:
+                self._http.request("POST", f"/{operation}", body, headers)
+                sent = True
+                response = self._http.getresponse()
+                raw = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                # Se reintenta una vez en una conexión nueva solo si no pudo haberse ejecutado dos veces:
+                # falló el envío (el servidor no recibió la petición completa) o la operación es idempotente
+                self._http.close()
+                self._http = None
+                if not reused or attempt or (sent and operation not in BACKEND_RETRYABLE_OPERATIONS):
+                    raise sqlite3.OperationalError(f"Servidor de datos no disponible: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._http.close()
+                self._http = None
+                raise sqlite3.OperationalError(f"Servidor de datos no disponible: {e}") from e
+        if response.status != 200:
+            if response.status == 404 and operation != "open":
+                self._session = None  # Sesión expirada en el servidor: la conexión no vuelve al pool
+            raise sqlite3.OperationalError(f"Servidor de datos: {response.status} {response.reason}")
+        result = decode_sync_payload(raw)
+        self.in_transaction = result.get("in_transaction", False)
+        if "error" in result:
+            raise _backend_error(result["error"])
+        return result
+
+    def cursor(self):
+        return RemoteCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        if self.in_transaction:
+            self._request("commit", {})
+
+    def rollback(self):
+        if self.in_transaction:
+            self._request("rollback", {})
+
+    def interrupt(self):
+        """Cancela la consulta en curso de esta sesión (desde otro hilo, con su propia conexión HTTP)."""
+        interrupter = http.client.HTTPConnection(self.backend.host, self.backend.port, timeout=BACKEND_TIMEOUT_S)
+        headers = {"Authorization": f"Bearer {self.backend.token}"} if self.backend.token else {}
+        try:
+            interrupter.request("POST", "/interrupt", encode_sync_payload({"session": self._session}), headers)
+            interrupter.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            interrupter.close()
 
-    except Exception:
-        # En caso de error, fallamos silenciosamente para no interrumpir al piloto
-        pass
-    
-def setup_report_review_tab(self):
-        tab = self.tabview.tab("Revisión de Reportes")
-        tab.grid_columnconfigure(0, weight=1)
-        
-        # ⭐️ CAMBIO CRÍTICO: La Fila 1 (lista de reportes) toma todo el espacio vertical.
-        tab.grid_rowconfigure(1, weight=1) 
-        # Se elimina la línea 'tab.grid_rowconfigure(0, weight=1)' que empujaba el contenido hacia abajo.
+    def close(self):
+        self.backend._release(self, self.isolation_level)
 
-        # ⭐️ NUEVO: Frame de Búsqueda
-        search_frame = ctk.CTkFrame(tab)
-        # ⭐️ CAMBIO: Reducir pady superior de 10 a 5.
-        search_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5)) 
-        search_frame.grid_columnconfigure(0, weight=0)
-        search_frame.grid_columnconfigure(1, weight=1)
-        search_frame.grid_columnconfigure(2, weight=0)
+    def _close_session(self):
+        if self._session is None:
+            return
+        try:
+            self._request("close", {})
+        except sqlite3.Error:
+            pass
+        finally:
+            self._session = None
+            if self._http is not None:
+                self._http.close()
+                self._http = None
 
-        ctk.CTkLabel(search_frame, text="Buscar Placa o Piloto:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
-        
-        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Ej: C123456 o Juan Pérez")
-        self.search_entry.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
-        
-        ctk.CTkButton(search_frame, text="🔍 Buscar", command=self.load_report_data).grid(row=0, column=2, padx=10, pady=5)
-        # -------------------------------------
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
 
-        # Usamos un frame para contener la tabla y botones (Ahora en fila 1)
-        self.report_container = ctk.CTkFrame(tab)
-        # ⭐️ CAMBIO: Reducir pady inferior de 10 a 5.
-        self.report_container.grid(row=1, column=0, sticky="nsew", padx=10, pady=(5, 5)) 
-        self.report_container.grid_columnconfigure(0, weight=1)
-        self.report_container.grid_rowconfigure(0, weight=1)
+class RemoteBackend(StorageBackend):
+    """
+    Servidor de datos (ver create_backend_server). connect() entrega una sesión del pool
+    sobre la base del cliente activo (TENANT); db_name se ignora: el servidor decide qué
+    archivo corresponde a cada cliente.
+    """
 
-        self.report_data_frame = None 
+    name = "remote"
+
+    def __init__(self, url, token=None, pool_size=None):
+        super().__init__(pool_size)
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme != "http" or not parsed.hostname:
+            raise ValueError(f"URL de servidor de datos inválida: {url!r} (ej: http://servidor:8766)")
+        self.url = url
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.token = token if token is not None else BACKEND_TOKEN
+
+    def _pool_key(self, target):
+        return target  # (cliente, isolation_level): las sesiones de un cliente no se prestan a otro
+
+    def _open_pooled(self, target):
+        tenant, isolation_level = target
+        return RemoteConnection(self, isolation_level, tenant)
+
+    def _acquire(self, db_name=None, isolation_level=""):
+        conn = super()._acquire((TENANT, isolation_level))
+        conn._released = False
+        return conn
+
+    def _release(self, conn, db_name=None, broken=False):
+        if conn._released:
+            return  # close() repetido
+        conn._released = True
+        super()._release(conn, (conn.tenant, conn.isolation_level), broken or conn._session is None)
+
+    def _discard(self, conn):
+        conn._close_session()
+
+    def connect(self, db_name=None, isolation_level="", **options):
+        # timeout y demás opciones de sqlite3 las aplica el servidor
+        return self._acquire(isolation_level=isolation_level)
+
+def create_storage_backend(spec=None, token=None):
+    """None o "sqlite" = archivo local; "http://host:puerto" = servidor de datos."""
+    if spec is None or spec == "sqlite":
+        return SQLiteBackend()
+    return RemoteBackend(spec, token)
+
+_storage_backend = (None, None)
+
+def get_storage_backend():
+    """Backend configurado en STORAGE_BACKEND (se crea una vez por valor)."""
+    global _storage_backend
+    spec, backend = _storage_backend
+    if backend is None or spec != (STORAGE_BACKEND, BACKEND_TOKEN):
+        if backend is not None:
+            backend.close()
+        backend = create_storage_backend(STORAGE_BACKEND, BACKEND_TOKEN)
+        _storage_backend = ((STORAGE_BACKEND, BACKEND_TOKEN), backend)
+    return backend
+
+def open_db(db_name=None, **options):
+    """Conexión del backend configurado (por defecto, a DB_NAME). Se libera con close()."""
+    return get_storage_backend().connect(db_name, **options)
+
+def read_sql_df(query, conn, params=None):
+    """pd.read_sql_query para conexiones de cualquier backend."""
+    if isinstance(conn, sqlite3.Connection):
+        return pd.read_sql_query(query, conn, params=params)
+    cursor = conn.execute(query, params or ())
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=[column[0] for column in cursor.description], coerce_float=True)
+
+# --- Servidor de Datos ---
+
+class _BackendSession:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.cursors = {}
+        self.next_cursor = 1
+        self.last_used = time.monotonic()
+
+class BackendRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Un POST por operación; cuerpo y respuesta comprimidos como en la sincronización.
+    /open {"autocommit", "tenant"} -> {"session"}; /execute y /executemany {"sql", "params"};
+    /fetch y /close_cursor {"cursor"}; /commit, /rollback, /interrupt, /close.
+    Los errores de SQLite se responden como {"error": [clase, mensaje]} para relanzarlos en el cliente.
+    """
+    protocol_version = "HTTP/1.1"   # Conexiones persistentes: una sesión no reconecta por cada consulta
+    disable_nagle_algorithm = True  # Respuestas pequeñas y seguidas: sin esperar el ACK de la anterior
+    timeout = BACKEND_SESSION_IDLE_S
+    db_name = None
+    tenants_dir = None
+    token = None
+    sessions = None
+    sessions_lock = None
+
+    def do_POST(self):
+        if not self.token or not hmac.compare_digest(self.headers.get("Authorization", "").encode(), f"Bearer {self.token}".encode()):
+            self.send_error(401)
+            return
+        operation = self.path.lstrip("/")
+        if operation not in ("open", "execute", "executemany", "fetch", "close_cursor", "commit", "rollback", "interrupt", "close"):
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if not 0 <= length <= SYNC_MAX_BODY_BYTES:
+                self.send_error(413, "Petición demasiado grande")
+                return
+            request = decode_sync_payload(self.rfile.read(length))
+        except (ValueError, zlib.error) as e:
+            self.send_error(400, f"Petición inválida: {e}")
+            return
 
-        action_frame = ctk.CTkFrame(tab)
-        # ⭐️ CAMBIO: Reducir pady superior de 10 a 5.
-        action_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=(5, 10)) # Ahora en fila 2
-        action_frame.grid_columnconfigure((0, 1), weight=1)
-        
-        ctk.CTkButton(action_frame, text="Ver Detalles del Reporte Seleccionado", command=self.show_report_details).grid(row=0, column=1, padx=10, pady=5, sticky="e")
-        # ⭐️ CAMBIO: Botón Recargar ahora limpia la búsqueda
-        ctk.CTkButton(action_frame, text="Recargar Reportes (Limpiar Búsqueda)", command=lambda: (self.search_entry.delete(0, 'end'), self.load_report_data())).grid(row=0, column=0, padx=10, pady=5, sticky="w")
-        
-        self.load_report_data()
+        if operation == "open":
+            try:
+                db_name = self._tenant_db(request.get("tenant"))
+            except ValueError as e:
+                self.send_error(404, str(e))
+                return
+            self._send_payload({"session": self._open_session(db_name, request.get("autocommit", False))})
+            return
+        with self.sessions_lock:
+            session = self.sessions.get(request.get("session"))
+        if session is None:
+            self.send_error(404, "Sesión inexistente o expirada")
+            return
+        if operation == "interrupt":
+            session.conn.interrupt()  # Sin tomar el lock: la consulta a cancelar lo tiene
+            self._send_payload({})
+            return
+        with session.lock:
+            session.last_used = time.monotonic()
+            try:
+                result = self._run(session, operation, request)
+            except sqlite3.Error as e:
+                result = {"error": [type(e).__name__, str(e)]}
+            except (KeyError, TypeError, ValueError) as e:
+                result = {"error": ["ProgrammingError", f"Petición inválida: {e}"]}
+            result["in_transaction"] = session.conn.in_transaction
+        if operation == "close":
+            with self.sessions_lock:
+                self.sessions.pop(request["session"], None)
+            session.conn.close()
+        self._send_payload(result)
+
+    def _tenant_db(self, tenant):
+        """Base que atiende una sesión: la del servidor o, con cliente, la de ese cliente (debe existir)."""
+        if tenant is None:
+            return self.db_name
+        db_name = os.path.join(self.tenants_dir, validate_tenant_id(tenant), _SINGLE_TENANT_STORAGE["db_name"])
+        if not os.path.isfile(db_name):
+            raise ValueError(f"No existe el cliente {tenant} en el servidor de datos")
+        return db_name
+
+    def _open_session(self, db_name, autocommit):
+        now = time.monotonic()
+        with self.sessions_lock:
+            for session_id, session in list(self.sessions.items()):
+                # Sesiones abandonadas (estación apagada): se revierten y cierran
+                if now - session.last_used > BACKEND_SESSION_IDLE_S and session.lock.acquire(blocking=False):
+                    del self.sessions[session_id]
+                    session.conn.close()
+                    session.lock.release()
+        conn = sqlite3.connect(db_name, timeout=BACKEND_BUSY_TIMEOUT_S, check_same_thread=False,
+                               isolation_level=None if autocommit else "")
+        if db_name != self.db_name:
+            conn.execute("PRAGMA journal_mode = WAL")  # Persistente: solo cambia algo la primera vez
+        session_id = uuid.uuid4().hex
+        with self.sessions_lock:
+            self.sessions[session_id] = _BackendSession(conn)
+        return session_id
+
+    def _run(self, session, operation, request):
+        if operation in ("commit", "rollback", "close"):
+            if operation == "commit":
+                session.conn.commit()
+            elif session.conn.in_transaction:
+                session.conn.rollback()
+            session.cursors.clear()
+            return {}
+        if operation == "close_cursor":
+            session.cursors.pop(request["cursor"], None)
+            return {}
+        if operation == "fetch":
+            cursor_id = request["cursor"]
+            return self._rows(session, session.cursors.pop(cursor_id), cursor_id)
+
+        cursor = session.conn.cursor()
+        if operation == "execute":
+            cursor.execute(request["sql"], _decode_backend_params(request["params"]))
+        else:
+            cursor.executemany(request["sql"], (_decode_backend_params(params) for params in request["params"]))
+        result = {"description": [list(column) for column in cursor.description] if cursor.description else None,
+                  "rowcount": cursor.rowcount, "lastrowid": cursor.lastrowid}
+        if cursor.description is None:
+            return {**result, "rows": []}
+        session.next_cursor += 1
+        return {**result, **self._rows(session, cursor, session.next_cursor)}
+
+    def _rows(self, session, cursor, cursor_id):
+        """Hasta BACKEND_FETCH_ROWS filas; si puede haber más, el cursor queda abierto en la sesión."""
+        rows = cursor.fetchmany(BACKEND_FETCH_ROWS)
+        result = {"rows": [[_encode_backend_value(value) for value in row] for row in rows]}
+        if len(rows) == BACKEND_FETCH_ROWS:
+            session.cursors[cursor_id] = cursor
+            result["cursor"] = cursor_id
+        return result
+
+    def _send_payload(self, data):
+        body = encode_sync_payload(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Sin salida por consola por cada petición
+
+def create_backend_server(db_name, host="127.0.0.1", port=8766, token=None, tenants_dir=None):
+    """
+    Crea (sin iniciar) el servidor de datos sobre db_name. Se inicia con serve_forever(),
+    por ejemplo en un hilo: threading.Thread(target=server.serve_forever, daemon=True).start()
+    La clave (token o BACKEND_TOKEN) es obligatoria: las estaciones deben enviar la misma.
+    Las estaciones con --tenant trabajan sobre tenants_dir/CLIENTE/ (por defecto TENANTS_DIR),
+    creado en el servidor con tenants create.
+    """
+    token = token or BACKEND_TOKEN
+    if not token:
+        raise ValueError("El servidor de datos requiere una clave compartida (--token o BACKEND_TOKEN).")
+    inicializar_db(db_name, backend=SQLiteBackend())
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")  # Las sesiones leen mientras otra escribe
+    finally:
+        conn.close()
+    handler = type("DataServerHandler", (BackendRequestHandler,), {
+        "db_name": db_name, "tenants_dir": tenants_dir or TENANTS_DIR, "token": token,
+        "sessions": {}, "sessions_lock": threading.Lock()})
+    return http.server.ThreadingHTTPServer((host, port), handler)
+
+# --- Pruebas de Conformidad de Backends ---
+#
+# Lo que el resto de la aplicación espera de cualquier backend. Se ejecutan con el comando
+# backend-check: contra un archivo SQLite temporal y contra un servidor de datos levantado en
+# este mismo proceso (127.0.0.1), o contra un servidor real con --url. Trabajan en una tabla
+# de prueba propia y los reportes de prueba se revierten: no dejan datos.
+
+CONFORMANCE_TABLE = "backend_conformance"
+CONFORMANCE_THREADS = 8
+
+def _expect(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+def _conformance_types(backend, db_name):
+    conn = backend.connect(db_name)
+    try:
+        values = ("ñandú ✓", 2 ** 40, 1.5, b"\x00\xff", None)
+        cursor = conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto, entero, real, datos, nulo) VALUES (?, ?, ?, ?, ?)", values)
+        row_id = cursor.lastrowid
+        _expect(isinstance(row_id, int) and row_id > 0, f"lastrowid inválido: {row_id!r}")
+        conn.commit()
+        row = conn.execute(f"SELECT texto, entero, real, datos, nulo FROM {CONFORMANCE_TABLE} WHERE id = ?", (row_id,)).fetchone()
+        _expect(row == values, f"los valores no se conservan: {row!r}")
+        _expect([type(value) for value in row] == [type(value) for value in values], f"tipos distintos: {row!r}")
+        named = conn.execute(f"SELECT entero FROM {CONFORMANCE_TABLE} WHERE texto = :texto", {"texto": values[0]}).fetchone()
+        _expect(named == (values[1],), f"parámetros con nombre: {named!r}")
+    finally:
+        conn.close()
 
-def load_report_data(self):
-        """Carga los reportes desde la DB y los muestra en una tabla, aplicando un filtro de búsqueda si existe."""
-        
-        # ⭐️ NUEVO: Obtener término de búsqueda
-        search_term = self.search_entry.get().strip()
-        
-        if self.report_data_frame:
-            self.report_data_frame.destroy()
-        
-        self.report_data_frame = ctk.CTkScrollableFrame(self.report_container, label_text="Reportes Enviados")
-        self.report_data_frame.grid(row=0, column=0, sticky="nsew")
-        
-        self.report_selection_var = ctk.StringVar(value="0") 
-        self.selected_report_id = None
-        
-        conn = sqlite3.connect(DB_NAME)
-        
-        # Construcción de la consulta SQL y parámetros
-        query = """
-        SELECT 
-            r.id, 
-            u.full_name AS piloto, 
-            r.vehicle_plate, 
-            r.report_date, 
-            r.km_actual,
-            r.header_data,
-            r.checklist_data,
-            r.observations,
-            r.signature_confirmation
-        FROM reports r
-        LEFT JOIN users u ON r.driver_id = u.id 
-        """
-        params = []
-        
-        if search_term:
-            # Añadir la cláusula WHERE para buscar en placa o nombre del piloto (case-insensitive usando UPPER)
-            query += """
-            WHERE UPPER(r.vehicle_plate) LIKE ? OR UPPER(u.full_name) LIKE ?
-            """
-            search_pattern = f"%{search_term.upper()}%"
-            params.append(search_pattern)
-            params.append(search_pattern)
-            
-        query += " ORDER BY r.id DESC"
-        
-        # Ejecutar la consulta con parámetros
-        df = pd.read_sql_query(query, conn, params=params)
+def _conformance_transactions(backend, db_name):
+    conn, other = backend.connect(db_name), backend.connect(db_name)
+    try:
+        count = lambda c: c.execute(f"SELECT COUNT(*) FROM {CONFORMANCE_TABLE}").fetchone()[0]
+        before = count(other)
+        conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('revertido')")
+        _expect(conn.in_transaction, "in_transaction debería ser True tras un INSERT")
+        conn.rollback()
+        _expect(not conn.in_transaction and count(conn) == before, "rollback no descartó el INSERT")
+        conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('confirmado')")
+        conn.commit()
+        _expect(count(other) == before + 1, "el commit no es visible desde otra conexión")
+        try:
+            with conn:
+                conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('con-error')")
+                raise KeyError("prueba")
+        except KeyError:
+            pass
+        _expect(count(other) == before + 1, "`with conn` no revirtió ante una excepción")
+
+        # Como el escritor de reportes: sin transacción implícita y BEGIN IMMEDIATE explícito
+        writer = backend.connect(db_name, timeout=WRITE_LOCK_TIMEOUT_S, isolation_level=None)
+        try:
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('inmediato')")
+            _expect(writer.in_transaction, "BEGIN IMMEDIATE no abrió una transacción")
+            writer.execute("COMMIT")
+            _expect(not writer.in_transaction and count(other) == before + 2, "COMMIT explícito no confirmó")
+        finally:
+            writer.close()
+    finally:
         conn.close()
+        other.close()
 
-        if df.empty:
-            if search_term:
-                 ctk.CTkLabel(self.report_data_frame, text=f"No se encontraron reportes para '{search_term}'.").pack(padx=20, pady=20)
-            else:
-                 ctk.CTkLabel(self.report_data_frame, text="No hay reportes para mostrar.").pack(padx=20, pady=20)
-            self.report_df = None
-            return
+def _conformance_errors(backend, db_name):
+    conn = backend.connect(db_name)
+    try:
+        conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('único')")
+        try:
+            conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto) VALUES ('único')")
+            raise AssertionError("no se detectó la clave duplicada")
+        except sqlite3.IntegrityError:
+            pass
+        try:
+            conn.execute("SELECT * FROM tabla_que_no_existe")
+            raise AssertionError("no se detectó la tabla inexistente")
+        except sqlite3.OperationalError:
+            pass
+        conn.rollback()
+        _expect(conn.execute("SELECT 1").fetchone() == (1,), "la conexión no sigue usable tras un error")
+    finally:
+        conn.close()
 
-        self.report_df = df 
-        
-        # Headers y configuración de columnas para la tabla
-        table_headers = ["", "ID", "Piloto", "Placa", "Fecha", "Km Actual"]
-        
-        for col, header in enumerate(table_headers):
-            self.report_data_frame.grid_columnconfigure(col, weight=1)
-            ctk.CTkLabel(self.report_data_frame, text=header, font=ctk.CTkFont(weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w" if col > 0 else "")
+def _conformance_cursors(backend, db_name):
+    total = BACKEND_FETCH_ROWS * 2 + 7   # Más de una página de filas en el servidor de datos
+    conn = backend.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(f"INSERT INTO {CONFORMANCE_TABLE} (texto, entero) VALUES (?, ?)",
+                           ((f"fila-{i}", i) for i in range(total)))
+        _expect(cursor.rowcount == total, f"rowcount de executemany: {cursor.rowcount}")
+        conn.commit()
+        query = f"SELECT entero, texto FROM {CONFORMANCE_TABLE} WHERE texto LIKE 'fila-%' ORDER BY entero"
+        cursor = conn.execute(query)
+        _expect([column[0] for column in cursor.description] == ["entero", "texto"], f"description: {cursor.description!r}")
+        first = cursor.fetchone()
+        some = cursor.fetchmany(10)
+        rest = cursor.fetchall()
+        _expect(first == (0, "fila-0") and len(some) == 10 and len(rest) == total - 11, "fetchone/fetchmany/fetchall")
+        _expect(cursor.fetchone() is None and cursor.fetchall() == [], "el cursor agotado debería estar vacío")
+        _expect(sum(1 for _ in conn.execute(query)) == total, "iterar el cursor no recorre todas las filas")
+        partial = conn.execute(query)
+        partial.fetchmany(3)
+        partial.close()  # Cerrar a medio leer libera el cursor
+        _expect(conn.execute("SELECT COUNT(*) FROM (" + query + ")").fetchone()[0] == total, "conteo tras cerrar un cursor")
+        df = read_sql_df(query + " LIMIT ?", conn, params=[5])
+        _expect(list(df.columns) == ["entero", "texto"] and len(df) == 5, f"read_sql_df: {df.shape}")
+    finally:
+        conn.close()
 
-        
-        # Mapeamos las filas del DataFrame a widgets
-        for row_index, row_data in self.report_df.iterrows():
-            
-            # Crear RadioButton (cuadrado) para selección de fila
-            rb = ctk.CTkRadioButton(self.report_data_frame, text="", variable=self.report_selection_var, value=str(row_data['id']), 
-                                    command=lambda id=row_data['id']: self.select_report(id))
-            rb.grid(row=row_index + 1, column=0, padx=10, pady=2) 
-            
-            piloto_nombre = row_data['piloto'] if pd.notna(row_data['piloto']) else "PILOTO ELIMINADO"
-            
-            data_to_display = [
-                row_data['id'],
-                piloto_nombre,
-                row_data['vehicle_plate'],
-                row_data['report_date'],
-                row_data['km_actual']
-            ]
-            
-            for col_index, data in enumerate(data_to_display):
-                display_col = col_index + 1 
-                label = ctk.CTkLabel(self.report_data_frame, text=str(data), anchor="w")
-                label.grid(row=row_index + 1, column=display_col, padx=10, pady=2, sticky="w")
-            
+def _conformance_bulk(backend, db_name):
+    rows = [(f"masivo-{i}", i) for i in range(BACKEND_BULK_CHUNK * 2 + 1)]
+    inserted = backend.bulk_insert(CONFORMANCE_TABLE, ("texto", "entero"), iter(rows), db_name=db_name)
+    _expect(inserted == len(rows), f"bulk_insert insertó {inserted} de {len(rows)}")
+    again = backend.bulk_insert(CONFORMANCE_TABLE, ("texto", "entero"), rows[:100], db_name=db_name, on_conflict="IGNORE")
+    _expect(again == 0, f"on_conflict=IGNORE insertó {again} duplicados")
+    try:
+        backend.bulk_insert(CONFORMANCE_TABLE, ("texto); DROP TABLE users; --",), [("x",)], db_name=db_name)
+        raise AssertionError("se aceptó un identificador inválido")
+    except ValueError:
+        pass
+    try:
+        backend.bulk_insert(CONFORMANCE_TABLE, ("texto",), [("masivo-5",), ("nuevo",)], db_name=db_name)
+        raise AssertionError("no se detectó la clave duplicada")
+    except sqlite3.IntegrityError:
+        pass
+    with backend.connection(db_name) as conn:
+        count = conn.execute(f"SELECT COUNT(*) FROM {CONFORMANCE_TABLE} WHERE texto = 'nuevo'").fetchone()[0]
+    _expect(count == 0, "un bulk_insert fallido dejó filas a medias")
 
-def select_report(self, report_id):
-        """Maneja la selección de un reporte en la tabla."""
-        self.selected_report_id = report_id
-        
-def show_report_details(self):
-        """Abre la ventana de detalles para el reporte seleccionado."""
-        if not self.selected_report_id:
-            messagebox.showerror("Error", "Seleccione un reporte de la lista para ver los detalles.")
-            return
+def _conformance_pool(backend, db_name):
+    with backend.connection(db_name):
+        pass
+    reused = backend.stats["reused"]
+    with backend.connection(db_name) as conn:
+        conn.execute("SELECT 1").fetchone()
+    _expect(backend.stats["reused"] == reused + 1, "connection() no reutilizó la conexión del pool")
 
-        selected_row = self.report_df[self.report_df['id'] == int(self.selected_report_id)].iloc[0]
-        
-        report_data_for_display = {
-            'ID': selected_row['id'],
-            'header_data': json.loads(selected_row['header_data']),
-            'checklist_data': json.loads(selected_row['checklist_data']),
-            'observations': selected_row['observations'] if pd.notna(selected_row['observations']) else "",
-            'signature_confirmation': selected_row['signature_confirmation']
-        }
-        
-        ReportDetailWindow(self.app, report_data_for_display)
+    errors = []
+    def worker(thread):
+        try:
+            for i in range(20):
+                with backend.connection(db_name) as conn:
+                    conn.execute(f"INSERT INTO {CONFORMANCE_TABLE} (texto, entero) VALUES (?, ?)", (f"hilo-{thread}-{i}", thread))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(CONFORMANCE_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _expect(not errors, f"error con conexiones simultáneas: {errors[:1]!r}")
+    with backend.connection(db_name) as conn:
+        count = conn.execute(f"SELECT COUNT(*) FROM {CONFORMANCE_TABLE} WHERE texto LIKE 'hilo-%'").fetchone()[0]
+    _expect(count == CONFORMANCE_THREADS * 20, f"se guardaron {count} de {CONFORMANCE_THREADS * 20} filas concurrentes")
+    idle = max(len(conns) for conns in backend._pool.values())
+    _expect(idle <= backend.pool_size, f"el pool conserva {idle} conexiones (máximo {backend.pool_size})")
+
+def _conformance_reports(backend, db_name):
+    """Las consultas de la aplicación sobre el esquema real (el reporte de prueba se revierte)."""
+    conn = backend.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        checklist = {item: "Buen estado" for item in CHECKLIST_ITEM_NAMES}
+        checklist[CHECKLIST_ITEM_NAMES[0]] = "Mal estado"
+        report_id = insert_report(cursor, driver_id=1, report_date="2000-01-01 08:00:00", vehicle_plate="CPRUEBA",
+                                  km_actual="100", header_data=json.dumps({"Placa": "CPRUEBA"}),
+                                  checklist_data=json.dumps(checklist), observations="prueba de conformidad",
+                                  signature_confirmation="conformidad", submission_id=uuid.uuid4().hex)
+        detail = load_report_detail(cursor, report_id)
+        _expect(detail["ID"] == report_id and detail["header_data"] == {"Placa": "CPRUEBA"}, "load_report_detail no coincide")
+        query, params = build_report_search_query("CPRUEBA")
+        df = read_sql_df(query, conn, params=params)
+        _expect(df["id"].tolist() == [report_id], f"la búsqueda devolvió {df['id'].tolist()}")
+        _expect(get_open_work_orders(cursor, "CPRUEBA"), "no se generó la orden de trabajo")
+    finally:
+        conn.rollback()
+        conn.close()
 
+CONFORMANCE_CHECKS = {
+    "tipos": _conformance_types,
+    "transacciones": _conformance_transactions,
+    "errores": _conformance_errors,
+    "cursores": _conformance_cursors,
+    "masivo": _conformance_bulk,
+    "pool": _conformance_pool,
+    "reportes": _conformance_reports,
+}
+
+def run_backend_conformance(backend, db_name=None):
+    """Ejecuta las pruebas sobre un backend. Devuelve [{"check", "ok", "ms", "error"}]."""
+    inicializar_db(db_name, backend=backend)
+    with backend.connection(db_name) as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {CONFORMANCE_TABLE}")
+        conn.execute(f"""CREATE TABLE {CONFORMANCE_TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, texto TEXT UNIQUE,
+                         entero INTEGER, real REAL, datos BLOB, nulo TEXT)""")
+    results = []
+    try:
+        for name, check in CONFORMANCE_CHECKS.items():
+            start = time.perf_counter()
+            try:
+                check(backend, db_name)
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.append({"check": name, "ok": error is None, "ms": round((time.perf_counter() - start) * 1000, 1), "error": error})
+    finally:
+        with backend.connection(db_name) as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {CONFORMANCE_TABLE}")
+        backend.close()
+    return results
+
+def backend_conformance_suite(url=None):
+    """
+    Sin url: pruebas contra un archivo SQLite temporal y contra un servidor de datos de
+    prueba en este proceso. Con url: solo contra ese servidor. Devuelve {backend: resultados}.
+    """
+    if url:
+        return {url: run_backend_conformance(RemoteBackend(url))}
+    with tempfile.TemporaryDirectory() as work_dir:
+        suite = {"sqlite": run_backend_conformance(SQLiteBackend(), os.path.join(work_dir, "local.db"))}
+        token = uuid.uuid4().hex
+        server = create_backend_server(os.path.join(work_dir, "servidor.db"), port=0, token=token)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            suite["remote"] = run_backend_conformance(RemoteBackend(f"http://127.0.0.1:{server.server_address[1]}", token))
+        finally:
+            server.shutdown()
+            server.server_close()
+    return suite
+
+# --- Clientes (Multi-inquilino) ---
+#
+# Un archivo de base de datos por cliente, en lugar de una columna de cliente en cada tabla:
+# todas las consultas quedan acotadas al cliente sin tocarlas, y el tamaño (o los bloqueos
+# de escritura) de un cliente no afecta a los demás. use_storage() es el enrutador: apunta
+# DB_NAME y las carpetas de datos al cliente activo y reemplaza los objetos que las usan.
+
+_SINGLE_TENANT_STORAGE = {"db_name": DB_NAME, "photo_dir": PHOTO_STORE_DIR, "spool_dir": REPORT_SPOOL_DIR,
+                          "backup_dir": BACKUP_DIR, "export_file": EXPORT_FILE_NAME, "analytics_dir": ANALYTICS_DIR}
+
+def validate_tenant_id(tenant):
+    """Los ids de cliente se usan como nombre de carpeta: letras, números, '-' y '_'."""
+    if not tenant or tenant[0] in "-_" or not all(ch.isalnum() or ch in "-_" for ch in tenant):
+        raise ValueError(f"Id de cliente inválido: {tenant!r} (use letras, números, '-' y '_')")
+    return tenant
+
+def tenant_storage(tenant=None):
+    """Rutas de datos de un cliente (None = instalación de un solo cliente)."""
+    if tenant is None:
+        return dict(_SINGLE_TENANT_STORAGE)
+    base = os.path.join(TENANTS_DIR, validate_tenant_id(tenant))
+    return {key: os.path.join(base, value) for key, value in _SINGLE_TENANT_STORAGE.items()}
+
+def list_tenants():
+    """Clientes con base de datos creada, en orden alfabético."""
+    if not os.path.isdir(TENANTS_DIR):
+        return []
+    return sorted(name for name in os.listdir(TENANTS_DIR)
+                  if os.path.isfile(os.path.join(TENANTS_DIR, name, _SINGLE_TENANT_STORAGE["db_name"])))
+
+def use_storage(tenant=None, db_name=None):
+    """
+    Activa un cliente: DB_NAME, fotos, cola de envíos, respaldos, exportación e instantánea
+    de análisis pasan a sus rutas. db_name reemplaza solo la ruta de la base. Los envíos que el escritor anterior
+    tenga pendientes se siguen guardando en la base del cliente anterior.
+    """
+    global TENANT, DB_NAME, PHOTO_STORE_DIR, REPORT_SPOOL_DIR, BACKUP_DIR, EXPORT_FILE_NAME, ANALYTICS_DIR, photo_store, report_writer
+    storage = tenant_storage(tenant)
+    if db_name:
+        storage["db_name"] = db_name
+    if (tenant, storage["db_name"], storage["spool_dir"]) == (TENANT, DB_NAME, REPORT_SPOOL_DIR):
+        return
+    if tenant is not None:
+        os.makedirs(os.path.dirname(storage["db_name"]), exist_ok=True)
+
+    # El escritor anterior queda atado a sus rutas (sus envíos no cambian de cliente)
+    report_writer.db_name = report_writer.db_name or DB_NAME
+    report_writer.export_file = report_writer.export_file or EXPORT_FILE_NAME
+
+    TENANT = tenant
+    DB_NAME = storage["db_name"]
+    PHOTO_STORE_DIR = storage["photo_dir"]
+    REPORT_SPOOL_DIR = storage["spool_dir"]
+    BACKUP_DIR = storage["backup_dir"]
+    EXPORT_FILE_NAME = storage["export_file"]
+    ANALYTICS_DIR = storage["analytics_dir"]
+    photo_store = PhotoStore()
+    report_writer = ReportWriter()
+
+def create_tenant(tenant, source_db=None):
+    """
+    Crea la base de un cliente. Con source_db copia una base existente (p. ej. la copia
+    separada que se usaba para ese cliente) con la API de respaldo antes de actualizar el esquema.
+    """
+    db_name = tenant_storage(tenant)["db_name"]
+    if os.path.exists(db_name):
+        raise ValueError(f"El cliente {tenant} ya existe: {db_name}")
+    os.makedirs(os.path.dirname(db_name), exist_ok=True)
+    if source_db:
+        if not os.path.isfile(source_db):
+            raise FileNotFoundError(source_db)
+        source = sqlite3.connect(source_db)
+        target = sqlite3.connect(db_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    inicializar_db(db_name)
+    return db_name
+
+# --- Captura Rápida del Checklist ---
+#
+# El piloto no marca los ~37 ítems uno por uno con el mouse: puede copiar los estados del
+# último reporte del vehículo (buscado por índice), marcar una categoría completa en
+# "Buen estado" y recorrer los ítems con el teclado. Los ítems que quedan distintos al
+# último reporte se resaltan, para que un cambio no pase desapercibido.
+
+CHECKLIST_KEY_STATUS = {"b": "Buen estado", "1": "Buen estado", "m": "Mal estado", "2": "Mal estado", "n": "N/A", "3": "N/A"}
+CHECKLIST_FOCUS_COLOR = "#1f6aa5"     # Borde del ítem seleccionado con el teclado
+CHECKLIST_CHANGED_COLOR = "#fff3cd"   # Fondo de los ítems distintos al último reporte
+
+def install_quick_entry_schema(cursor):
+    # Sin este índice, buscar el último reporte de un vehículo poco inspeccionado recorre la tabla
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_plate ON reports (vehicle_plate)")
+
+def last_vehicle_checklist(cursor, plate):
+    """(id, fecha, {ítem: estado}) del último reporte del vehículo, o None si no tiene."""
+    cursor.execute("SELECT id, report_date, checklist_data FROM reports WHERE vehicle_plate = ? ORDER BY id DESC LIMIT 1", (plate,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    try:
+        checklist = json.loads(row[2]) if row[2] else {}
+    except json.JSONDecodeError:
+        checklist = {}
+    if not isinstance(checklist, dict):
+        checklist = {}
+    # Solo ítems y estados vigentes (los reportes antiguos pueden tener otros)
+    return row[0], row[1], {item: status for item, status in checklist.items() if item in CHECKLIST_ITEM_INDEX and status in STATUS_CODES}
+
+def checklist_changes(previous, current):
+    """Ítems cuyo estado cambió respecto del reporte anterior: {ítem: (antes, ahora)}."""
+    return {item: (previous[item], status) for item, status in current.items() if item in previous and previous[item] != status}
 
 # --- Clase de la Interfaz de Piloto (Formulario) ---
 
@@ -971,6 +6650,7 @@ class PilotFrame(ctk.CTkFrame):
 
         self.signature_confirmation_text = None 
         self.signature_process_completed = False 
+        self.submission_id = None
         self.assigned_vehicle = {} 
 
         # --- Encabezado y Botón de Cerrar Sesión ---
@@ -1038,13 +6718,38 @@ class PilotFrame(ctk.CTkFrame):
         self.entry_placa.insert(0, self.assigned_vehicle['plate'])
         self.entry_placa.configure(state="readonly")
         
+        # --- Captura rápida: copiar el último reporte, todo en buen estado, atajos de teclado ---
+        quick_frame = ctk.CTkFrame(self)
+        quick_frame.pack(fill="x", padx=20, pady=(5, 0))
+        quick_frame.grid_columnconfigure(2, weight=1)
+
+        self.prefill_button = ctk.CTkButton(quick_frame, text="Copiar Último Reporte (Ctrl+R)", state="disabled",
+                                            command=self.prefill_from_last_report)
+        self.prefill_button.grid(row=0, column=0, padx=5, pady=5)
+        ctk.CTkButton(quick_frame, text="Todo en Buen Estado", fg_color="green",
+                      command=lambda: self.mark_items(CHECKLIST_ITEM_NAMES, "Buen estado")).grid(row=0, column=1, padx=5, pady=5)
+        self.previous_label = ctk.CTkLabel(quick_frame, text="", anchor="w")
+        self.previous_label.grid(row=0, column=2, padx=10, sticky="w")
+        ctk.CTkLabel(quick_frame, text="Teclado: ↑/↓ elegir ítem · B/M/N (o 1/2/3) marcar y avanzar · Mayús+B toda la categoría en buen estado",
+                     text_color="gray40", font=ctk.CTkFont(size=11)).grid(row=1, column=0, columnspan=3, padx=5, pady=(0, 5), sticky="w")
+
         # --- Frame Principal del Checklist (Scrollable) ---
         self.checklist_frame = ctk.CTkScrollableFrame(self)
         self.checklist_frame.pack(fill="both", expand=True, padx=20, pady=10)
         self.checklist_frame.grid_columnconfigure(0, weight=1)
 
         self.checklist_items = {} 
+        self.photo_buttons = {}
+        self.photo_attachments = {}  # ítem -> [(Future con el hash, nombre original)]
+        self.item_rows = {}          # ítem -> (frame de la fila, etiqueta con el estado anterior)
+        self.evaluated_items = set() # Ítems marcados en este reporte (los demás no se comparan)
+        self.previous_checklist = None  # (fecha, {ítem: estado}) del último reporte del vehículo
+        self.focus_index = None      # Ítem seleccionado con el teclado (posición en CHECKLIST_ITEM_NAMES)
         self.create_checklist()
+        self.load_previous_checklist()
+
+        self._key_binding = self.app.bind("<Key>", self.on_checklist_key, add="+")
+        self.bind("<Destroy>", self.on_destroy)
 
         # --- Observaciones ---
         obs_label = ctk.CTkLabel(self, text="Observaciones Adicionales:", font=ctk.CTkFont(size=14, weight="bold"))
@@ -1082,7 +6787,7 @@ class PilotFrame(ctk.CTkFrame):
 
     def load_assigned_vehicle(self):
         """Busca el vehículo asignado al piloto actual."""
-        conn = sqlite3.connect(DB_NAME)
+        conn = open_db()
         cursor = conn.cursor()
         
         cursor.execute("SELECT assigned_vehicle_plate FROM users WHERE id = ?", (self.app.current_user_id,))
@@ -1100,7 +6805,7 @@ class PilotFrame(ctk.CTkFrame):
                 }
             else:
                 self.assigned_vehicle = {}
-                cursor.execute("UPDATE users SET assigned_vehicle_plate = NULL WHERE id = ?", (self.app.current_user_id,))
+                end_assignments(cursor, user_id=self.app.current_user_id)
                 conn.commit()
                 messagebox.showwarning("Atención", "Su vehículo asignado no existe. Se ha desasignado automáticamente. Contacte al administrador.")
         else:
@@ -1118,18 +6823,25 @@ class PilotFrame(ctk.CTkFrame):
         
         header_frame.grid_columnconfigure(0, weight=3) # Item
         header_frame.grid_columnconfigure((1, 2, 3), weight=1) # Buen, Mal, N/A
+        header_frame.grid_columnconfigure(4, weight=0) # Fotos
+        header_frame.grid_columnconfigure(5, weight=0) # Estado anterior
 
         ctk.CTkLabel(header_frame, text="Item a evaluar", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=5, sticky="w")
         ctk.CTkLabel(header_frame, text="Buen estado", font=ctk.CTkFont(weight="bold")).grid(row=0, column=1, padx=5)
         ctk.CTkLabel(header_frame, text="Mal estado", font=ctk.CTkFont(weight="bold")).grid(row=0, column=2, padx=5)
         ctk.CTkLabel(header_frame, text="N/A", font=ctk.CTkFont(weight="bold")).grid(row=0, column=3, padx=5)
+        ctk.CTkLabel(header_frame, text="Fotos", font=ctk.CTkFont(weight="bold"), width=60).grid(row=0, column=4, padx=5)
+        ctk.CTkLabel(header_frame, text="Último reporte", font=ctk.CTkFont(weight="bold"), width=130).grid(row=0, column=5, padx=5)
         
         row_counter = 1
         global CHECKLIST_ITEMS
         for categoria, sub_items in CHECKLIST_ITEMS:
-            # Etiqueta de Categoría
-            cat_label = ctk.CTkLabel(self.checklist_frame, text=categoria.upper(), font=ctk.CTkFont(size=14, weight="bold"))
-            cat_label.grid(row=row_counter, column=0, sticky="w", padx=5, pady=(10, 5))
+            # Etiqueta de Categoría (con el botón para marcarla completa en buen estado)
+            cat_frame = ctk.CTkFrame(self.checklist_frame, fg_color="transparent")
+            cat_frame.grid(row=row_counter, column=0, sticky="ew", padx=5, pady=(10, 5))
+            ctk.CTkLabel(cat_frame, text=categoria.upper(), font=ctk.CTkFont(size=14, weight="bold")).pack(side="left")
+            ctk.CTkButton(cat_frame, text="✓ Todo en buen estado", width=150, height=24, fg_color="green",
+                          command=lambda items=sub_items: self.mark_items(items, "Buen estado")).pack(side="left", padx=10)
             row_counter += 1
             
             for item_name in sub_items:
@@ -1139,36 +6851,184 @@ class PilotFrame(ctk.CTkFrame):
     def add_checklist_row(self, item_name, row):
         """Añade una fila individual al checklist, con botones centrados y color N/A azul."""
         
-        item_frame = ctk.CTkFrame(self.checklist_frame, fg_color="transparent")
+        item_frame = ctk.CTkFrame(self.checklist_frame, fg_color="transparent", border_width=0, border_color=CHECKLIST_FOCUS_COLOR)
         item_frame.grid(row=row, column=0, sticky="ew", pady=2)
         
         item_frame.grid_columnconfigure(0, weight=3) # Item (para el label)
         item_frame.grid_columnconfigure((1, 2, 3), weight=1) # Buen, Mal, N/A (para los radio buttons)
+        item_frame.grid_columnconfigure(4, weight=0) # Botón de fotos
+        item_frame.grid_columnconfigure(5, weight=0) # Estado en el último reporte (si cambió)
 
         var = ctk.StringVar(value="N/A")
         self.checklist_items[item_name] = var 
+        var.trace_add("write", lambda *_, item=item_name: self.on_item_status_change(item))
+        select = lambda item=item_name: self.focus_item(CHECKLIST_ITEM_INDEX[item])
         
-        # Etiqueta del Item
+        # Etiqueta del Item (un clic la selecciona para seguir con el teclado)
         label = ctk.CTkLabel(item_frame, text=item_name, anchor="w")
         label.grid(row=0, column=0, padx=5, sticky="w")
+        label.bind("<Button-1>", lambda event: select())
         
         # --- Botones de Opción Cuadrados CENTRADOS ---
         
         # Columna 1: Buen estado
         rb_bueno = ctk.CTkRadioButton(item_frame, text="", variable=var, value="Buen estado", 
-                                     width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="green")
+                                     width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="green",
+                                     command=select)
         rb_bueno.grid(row=0, column=1, padx=5, sticky="") # sticky="" centra
 
         # Columna 2: Mal estado
         rb_malo = ctk.CTkRadioButton(item_frame, text="", variable=var, value="Mal estado",
-                                    width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="red")
+                                    width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="red",
+                                     command=select)
         rb_malo.grid(row=0, column=2, padx=5, sticky="") # sticky="" centra
 
         # Columna 3: N/A - COLOR AZUL
         rb_na = ctk.CTkRadioButton(item_frame, text="", variable=var, value="N/A",
-                                  width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="blue")
+                                  width=20, height=20, border_width_checked=5, border_width_unchecked=2, fg_color="blue",
+                                     command=select)
         rb_na.grid(row=0, column=3, padx=5, sticky="") # sticky="" centra
 
+        # Columna 4: Adjuntar fotos de evidencia
+        photo_button = ctk.CTkButton(item_frame, text="📷", width=60, fg_color="gray60",
+                                     command=lambda item=item_name: self.attach_photos(item))
+        photo_button.grid(row=0, column=4, padx=5)
+        self.photo_buttons[item_name] = photo_button
+
+        diff_label = ctk.CTkLabel(item_frame, text="", width=130, anchor="w", text_color="darkorange3", font=ctk.CTkFont(size=11))
+        diff_label.grid(row=0, column=5, padx=5)
+        self.item_rows[item_name] = (item_frame, diff_label)
+
+    def mark_items(self, items, status):
+        """
+        Marca varios ítems con el mismo estado (una categoría o el checklist completo). Los que
+        ya están en "Mal estado" se respetan: un defecto no se borra con un atajo.
+        """
+        for item in items:
+            if self.checklist_items[item].get() != "Mal estado":
+                self.checklist_items[item].set(status)
+
+    def load_previous_checklist(self):
+        """Busca (por índice) el último reporte del vehículo para copiarlo y resaltar los cambios."""
+        conn = open_db()
+        try:
+            previous = last_vehicle_checklist(conn.cursor(), self.assigned_vehicle['plate'])
+        finally:
+            conn.close()
+        self.set_previous_checklist(previous[1:] if previous else None)
+
+    def set_previous_checklist(self, previous):
+        self.previous_checklist = previous
+        self.prefill_button.configure(state="normal" if previous else "disabled")
+        for item in self.checklist_items:
+            self.update_item_highlight(item)
+        self.update_previous_summary()
+
+    def prefill_from_last_report(self):
+        """Copia los estados del último reporte del vehículo (los ítems nuevos quedan en N/A)."""
+        if self.previous_checklist is None:
+            return
+        statuses = self.previous_checklist[1]
+        for item, var in self.checklist_items.items():
+            var.set(statuses.get(item, "N/A"))
+
+    def on_item_status_change(self, item):
+        self.evaluated_items.add(item)
+        self.update_item_highlight(item)
+        self.update_previous_summary()
+
+    def update_item_highlight(self, item):
+        """Resalta el ítem si quedó distinto al último reporte, mostrando el estado anterior."""
+        frame, diff_label = self.item_rows[item]
+        previous = self.previous_checklist[1].get(item) if self.previous_checklist and item in self.evaluated_items else None
+        changed = previous is not None and previous != self.checklist_items[item].get()
+        frame.configure(fg_color=CHECKLIST_CHANGED_COLOR if changed else "transparent")
+        diff_label.configure(text=f"Antes: {previous}" if changed else "")
+
+    def update_previous_summary(self):
+        if self.previous_checklist is None:
+            self.previous_label.configure(text="Sin reportes anteriores de este vehículo")
+            return
+        report_date, statuses = self.previous_checklist
+        changes = checklist_changes(statuses, {item: self.checklist_items[item].get() for item in self.evaluated_items})
+        self.previous_label.configure(text=f"Último reporte: {report_date} · {len(changes)} cambio(s) resaltado(s)")
+
+    def focus_item(self, index):
+        """Selecciona un ítem para el teclado y lo desplaza a la vista si hace falta."""
+        index = max(0, min(index, len(CHECKLIST_ITEM_NAMES) - 1))
+        if self.focus_index is not None:
+            self.item_rows[CHECKLIST_ITEM_NAMES[self.focus_index]][0].configure(border_width=0)
+        self.focus_index = index
+        frame = self.item_rows[CHECKLIST_ITEM_NAMES[index]][0]
+        frame.configure(border_width=2)
+        self.checklist_frame.focus_set()  # Las teclas dejan de ir al campo de Km u observaciones
+
+        canvas = self.checklist_frame._parent_canvas
+        height = self.checklist_frame.winfo_height()
+        if height <= 1:
+            return  # Aún sin dibujar
+        top, bottom = canvas.yview()
+        row_top, row_bottom = frame.winfo_y() / height, (frame.winfo_y() + frame.winfo_height()) / height
+        if row_top < top:
+            canvas.yview_moveto(row_top)
+        elif row_bottom > bottom:
+            canvas.yview_moveto(row_bottom - (bottom - top))
+
+    def on_checklist_key(self, event):
+        """
+        Atajos del checklist: ↑/↓ eligen el ítem; B/M/N (o 1/2/3) lo marcan y pasan al siguiente;
+        Mayús+B marca su categoría en buen estado y pasa a la siguiente; Ctrl+R copia el último reporte.
+        No actúan mientras se escribe en un campo de texto.
+        """
+        if not self.winfo_exists() or isinstance(event.widget, (tk.Entry, tk.Text)):
+            return None
+        key = event.keysym.lower()
+        if event.state & 0x4:  # Control
+            if key == "r":
+                self.prefill_from_last_report()
+                return "break"
+            return None
+        if key in ("up", "down"):
+            if self.focus_index is None:
+                self.focus_item(0)
+            else:
+                self.focus_item(self.focus_index + (1 if key == "down" else -1))
+            return "break"
+        status = CHECKLIST_KEY_STATUS.get(key)
+        if status is None:
+            return None
+        if self.focus_index is None:
+            self.focus_item(0)
+        item = CHECKLIST_ITEM_NAMES[self.focus_index]
+        if key == "b" and event.state & 0x1:  # Mayús
+            category = CHECKLIST_ITEM_CATEGORY[item]
+            items = next(items for name, items in CHECKLIST_ITEMS if name == category)
+            self.mark_items(items, status)
+            self.focus_item(CHECKLIST_ITEM_INDEX[items[-1]] + 1)
+        else:
+            self.checklist_items[item].set(status)
+            self.focus_item(self.focus_index + 1)
+        return "break"
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.app.unbind("<Key>", self._key_binding)
+
+    def attach_photos(self, item_name):
+        """Adjunta fotos a un ítem. La copia al almacén y la miniatura se hacen en segundo plano."""
+        paths = filedialog.askopenfilenames(parent=self, title=f"Fotos: {item_name}", filetypes=PHOTO_FILE_TYPES)
+        if not paths:
+            return
+        pending = self.photo_attachments.setdefault(item_name, [])
+        for path in paths:
+            pending.append((photo_store.submit_ingest(path), os.path.basename(path)))
+        self.photo_buttons[item_name].configure(text=f"📷 {len(pending)}", fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+
+    def reset_photo_attachments(self):
+        self.photo_attachments = {}
+        for button in self.photo_buttons.values():
+            button.configure(text="📷", fg_color="gray60")
+
     def confirm_report_dialog(self):
         """Muestra un diálogo de confirmación (Firma)."""
         
@@ -1184,10 +7044,23 @@ class PilotFrame(ctk.CTkFrame):
 
         # Validación rápida para Km
         km = self.entry_km.get().strip()
-        if not km or not km.isdigit():
+        if parse_km(km) is None:
              messagebox.showerror("Error", "Debe ingresar el kilometraje actual y debe ser un número.")
              return
 
+        # Validación contra el historial del odómetro (regresiones o saltos improbables)
+        conn = open_db()
+        try:
+            anomalies = check_odometer_reading(conn.cursor(), self.assigned_vehicle['plate'], self.entry_fecha.get().strip(), km)
+        finally:
+            conn.close()
+        if anomalies:
+            detail = "\n".join(f"• {message}" for _, message in anomalies)
+            if not messagebox.askyesno("Kilometraje Sospechoso",
+                                       f"{detail}\n\nVerifique el odómetro. ¿Desea continuar de todas formas? "
+                                       "(La lectura quedará marcada para revisión del administrador)."):
+                return
+
         msg = (f"DECLARACIÓN DE RESPONSABILIDAD\n\n"
                f"Yo, {self.app.current_user_name} (ID: {self.app.current_user_id}), confirmo bajo mi responsabilidad "
                f"que la inspección 360 del vehículo con placa **{self.assigned_vehicle['plate']}** "
@@ -1200,6 +7073,7 @@ class PilotFrame(ctk.CTkFrame):
             self.signature_process_completed = True
             
             now = datetime.datetime.now()
+            self.submission_id = uuid.uuid4().hex  # Identifica este envío: guardarlo de nuevo no lo duplica
             self.signature_confirmation_text = f"CONFIRMADO | Piloto: {self.app.current_user_name} | ID: {self.app.current_user_id} | Fecha/Hora: {now.strftime('%Y-%m-%d %H:%M:%S')}"
             
             self.save_button.configure(state="normal")
@@ -1240,49 +7114,93 @@ class PilotFrame(ctk.CTkFrame):
         # 3. Observaciones
         observations = self.obs_textbox.get("1.0", "end-1c").strip()
 
-        # 4. Guardar en DB
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        # 3b. Fotos de evidencia (se esperan las que aún se están copiando)
+        if any(not future.done() for entries in self.photo_attachments.values() for future, _ in entries):
+            messagebox.showinfo("Fotos", "Las fotos adjuntas aún se están procesando. Intente guardar nuevamente en unos segundos.")
+            return
+        photos = {}
+        failed_photos = []
+        for item, entries in self.photo_attachments.items():
+            for future, name in entries:
+                if future.exception() is not None:
+                    failed_photos.append(name)
+                else:
+                    photos.setdefault(item, []).append((future.result(), name))
+        if failed_photos and not messagebox.askyesno("Fotos", "No se pudieron leer estas fotos (¿no son imágenes?):\n"
+                                                     + "\n".join(failed_photos) + "\n\n¿Guardar el reporte sin ellas?"):
+            return
 
+        # 4. Guardar en DB (a través de la cola local: un solo escritor, reintentos si la DB está ocupada)
+        report = dict(
+            driver_id=self.app.current_user_id,
+            report_date=fecha,
+            vehicle_plate=placa,
+            km_actual=km,
+            header_data=json.dumps(header_data),
+            checklist_data=json.dumps(checklist_data),
+            observations=observations,
+            signature_confirmation=self.signature_confirmation_text,
+            submission_id=self.submission_id,
+        )
         try:
-            cursor.execute("""
-                INSERT INTO reports (driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, observations, signature_confirmation)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                self.app.current_user_id,
-                fecha,
-                placa,
-                km,
-                json.dumps(header_data),
-                json.dumps(checklist_data),
-                observations,
-                self.signature_confirmation_text
-            ))
-            
-            conn.commit()
-            
-            # ⭐️ INSERCIÓN CLAVE: Actualiza el archivo JSON
-            export_all_reports_to_json() 
-            
-            messagebox.showinfo("Éxito", "Reporte de inspección guardado correctamente.")
-            
-            # Resetear el formulario
-            self.entry_km.delete(0, 'end')
-            self.obs_textbox.delete("1.0", "end")
-            self.signature_process_completed = False
-            self.signature_confirmation_text = None
-            self.save_button.configure(state="disabled")
-            original_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
-            self.confirm_button.configure(text="1. Confirmar Reporte (Firma)", fg_color=original_color)
-            
-            # Resetear los radio buttons a N/A
-            for var in self.checklist_items.values():
-                var.set("N/A")
-
+            future = report_writer.submit(report, photos)
         except Exception as e:
             messagebox.showerror("Error de Guardado", f"Error al guardar el reporte: {e}")
-        finally:
-            conn.close()
+            return
+
+        self.save_button.configure(state="disabled", text="Guardando...")
+        self._finish_save(future, fecha, checklist_data, time.monotonic())
+
+    def _finish_save(self, future, report_date, checklist_data, submitted_at):
+        """Espera (sin bloquear la interfaz) a que el escritor confirme el reporte."""
+        if not future.done() and time.monotonic() - submitted_at < SAVE_QUEUED_NOTICE_S:
+            self.after(SAVE_POLL_MS, self._finish_save, future, report_date, checklist_data, submitted_at)
+            return
+        failed_items = sum(1 for status in checklist_data.values() if status == "Mal estado")
+        self.save_button.configure(text="2. Guardar Reporte")
+
+        if not future.done():
+            # La DB sigue ocupada: el reporte está a salvo en la cola local y se guardará solo
+            messagebox.showinfo("Guardado en Cola", "La base de datos está ocupada. El reporte quedó guardado en este equipo "
+                                                   "y se registrará automáticamente en cuanto esté disponible.")
+        elif future.exception() is not None:
+            self.save_button.configure(state="normal")
+            messagebox.showerror("Error de Guardado", f"Error al guardar el reporte: {future.exception()}")
+            return
+        else:
+            _, export_error = future.result()
+            if export_error is not None:
+                # El reporte ya está guardado: se avisa sin interrumpir al piloto
+                messagebox.showwarning("Exportación", f"El reporte se guardó, pero no se pudo actualizar el archivo JSON: {export_error}")
+
+            # Envía el reporte a la base central en segundo plano (si está configurada)
+            if SYNC_SERVER_URL:
+                threading.Thread(target=sync_in_background, daemon=True).start()
+
+            if failed_items:
+                messagebox.showinfo("Éxito", f"Reporte de inspección guardado correctamente.\n"
+                                             f"Se registraron {failed_items} ítem(s) en mal estado en las órdenes de trabajo.")
+            else:
+                messagebox.showinfo("Éxito", "Reporte de inspección guardado correctamente.")
+
+        # Resetear el formulario
+        self.entry_km.delete(0, 'end')
+        self.obs_textbox.delete("1.0", "end")
+        self.signature_process_completed = False
+        self.signature_confirmation_text = None
+        self.save_button.configure(state="disabled")
+        original_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+        self.confirm_button.configure(text="1. Confirmar Reporte (Firma)", fg_color=original_color)
+        
+        # Resetear los radio buttons a N/A; el reporte guardado pasa a ser el "último" del vehículo
+        for var in self.checklist_items.values():
+            var.set("N/A")
+        self.evaluated_items.clear()
+        self.set_previous_checklist((report_date, checklist_data))
+        if self.focus_index is not None:
+            self.item_rows[CHECKLIST_ITEM_NAMES[self.focus_index]][0].configure(border_width=0)
+            self.focus_index = None
+        self.reset_photo_attachments()
 
 
 # --- Clase de la Aplicación Principal ---
@@ -1301,10 +7219,44 @@ class App(ctk.CTk):
         self.current_user_role = ""
         
         # ⭐️ Cargar el logo al inicio de la aplicación
-        self.logo_image = self.load_logo("logo.png", size=(100, 50))
+        self.logo_image = self.load_logo(LOGO_PATH, size=(100, 50))
         
         self.show_login_frame()
 
+        # Mantenimiento de la DB cuando nadie está usando la aplicación
+        self.last_activity = time.monotonic()
+        self.maintenance_thread = None
+        self.bind_all("<Any-KeyPress>", self.register_activity, add="+")
+        self.bind_all("<Motion>", self.register_activity, add="+")
+        self.after(MAINTENANCE_CHECK_MS, self._maintenance_tick)
+
+        # Modo análisis: la instantánea columnar se actualiza en segundo plano
+        self.analytics_thread = None
+        if ANALYTICS_MODE:
+            self._analytics_tick()
+
+    def _analytics_tick(self):
+        """Actualiza la instantánea de análisis cada ANALYTICS_REFRESH_MS (una actualización a la vez)."""
+        if not (self.analytics_thread and self.analytics_thread.is_alive()):
+            self.analytics_thread = threading.Thread(target=refresh_analytics_snapshot, daemon=True)
+            self.analytics_thread.start()
+        self.after(ANALYTICS_REFRESH_MS, self._analytics_tick)
+
+    def register_activity(self, event=None):
+        self.last_activity = time.monotonic()
+
+    def _maintenance_tick(self):
+        """
+        Lanza el mantenimiento en segundo plano tras MAINTENANCE_IDLE_S sin actividad. Con un
+        servidor de datos el archivo no está en esta estación: el mantenimiento se corre allá.
+        """
+        idle = time.monotonic() - self.last_activity
+        if STORAGE_BACKEND is None and idle >= MAINTENANCE_IDLE_S and not (self.maintenance_thread and self.maintenance_thread.is_alive()):
+            self.maintenance_thread = threading.Thread(target=run_maintenance, daemon=True)
+            self.maintenance_thread.start()
+            self.last_activity = time.monotonic()  # Próximo intento tras otro período de inactividad
+        self.after(MAINTENANCE_CHECK_MS, self._maintenance_tick)
+
     def load_logo(self, path, size):
         """Carga y redimensiona la imagen del logo."""
         try:
@@ -1333,14 +7285,22 @@ class App(ctk.CTk):
         label = ctk.CTkLabel(self.login_frame, text="Inicio de Sesión", font=ctk.CTkFont(size=20, weight="bold"))
         label.pack(pady=(0, 20))
 
+        # Con varios clientes se elige primero el cliente (cada uno tiene sus propios usuarios)
+        tenants = list_tenants()
+        self.tenant_var = None
+        if tenants:
+            self.tenant_var = ctk.StringVar(value=TENANT if TENANT in tenants else tenants[0])
+            ctk.CTkLabel(self.login_frame, text="Cliente").pack(pady=(0, 0), padx=20)
+            ctk.CTkOptionMenu(self.login_frame, variable=self.tenant_var, values=tenants, width=250).pack(pady=(0, 12), padx=20)
+
         self.username_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Usuario (ej: piloto1 o admin)", width=250)
         self.username_entry.pack(pady=12, padx=20)
 
         self.password_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Contraseña", show="*", width=250)
         self.password_entry.pack(pady=12, padx=20)
 
-        login_button = ctk.CTkButton(self.login_frame, text="Ingresar", command=self.attempt_login)
-        login_button.pack(pady=20, padx=20)
+        self.login_button = ctk.CTkButton(self.login_frame, text="Ingresar", command=self.attempt_login)
+        self.login_button.pack(pady=20, padx=20)
         
         self.bind("<Return>", lambda event: self.attempt_login())
 
@@ -1350,20 +7310,41 @@ class App(ctk.CTk):
             widget.destroy()
 
     def attempt_login(self):
-        """Intenta iniciar sesión y redirige al usuario."""
+        """Intenta iniciar sesión. La verificación (hash costoso) corre fuera del hilo de la interfaz."""
+        if self.login_button.cget("state") == "disabled":
+            return  # Ya hay una verificación en curso
         username = self.username_entry.get()
         password = self.password_entry.get()
-
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        query = "SELECT id, full_name, role, is_active FROM users WHERE username = ? AND password = ?"
-        cursor.execute(query, (username, password))
-        user_data = cursor.fetchone()
-        conn.close()
-
-        if user_data:
-            user_id, full_name, role, is_active = user_data
+        if self.tenant_var is not None:
+            use_storage(self.tenant_var.get())
+            report_writer.start()  # Reencola lo que haya quedado en la cola local de este cliente
+
+        self.login_button.configure(state="disabled", text="Verificando...")
+        self._login_results = queue.Queue()
+
+        def worker():
+            try:
+                self._login_results.put((authenticate_user(username, password), None))
+            except Exception as e:
+                self._login_results.put((None, e))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(LOGIN_POLL_MS, self._finish_login)
+
+    def _finish_login(self):
+        """Recoge el resultado de la verificación y redirige al usuario."""
+        if self._login_results.empty():
+            self.after(LOGIN_POLL_MS, self._finish_login)
+            return
+        user_data, error = self._login_results.get_nowait()
+        self.login_button.configure(state="normal", text="Ingresar")
+
+        if isinstance(error, ValueError):
+            messagebox.showerror("Error de Sesión", str(error))
+        elif error is not None:
+            messagebox.showerror("Error de Sesión", f"Ocurrió un error al iniciar sesión: {error}")
+        elif user_data:
+            user_id, full_name, role, is_active, must_change_password = user_data
             
             if is_active == 0:
                 messagebox.showerror("Error de Sesión", "Su cuenta ha sido deshabilitada. Contacte al administrador.")
@@ -1373,10 +7354,45 @@ class App(ctk.CTk):
             self.current_user_name = full_name
             self.current_user_role = role
             self.unbind("<Return>") # Deshabilitar el Enter para login
-            self.show_main_interface(role)
+            if must_change_password:
+                self.show_change_password_frame(role)
+            else:
+                self.show_main_interface(role)
         else:
             messagebox.showerror("Error de Sesión", "Usuario o contraseña incorrectos.")
 
+    def show_change_password_frame(self, role):
+        """Pide una contraseña nueva antes de continuar (usuarios con la contraseña de fábrica)."""
+        self.clear_frame()
+        frame = ctk.CTkFrame(self)
+        frame.grid(row=0, column=0, padx=100, pady=150)
+
+        ctk.CTkLabel(frame, text="Cambio de Contraseña", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(10, 5))
+        ctk.CTkLabel(frame, text="Debe elegir una contraseña nueva para continuar.").pack(pady=(0, 15), padx=20)
+        new_entry = ctk.CTkEntry(frame, placeholder_text="Contraseña nueva", show="*", width=250)
+        new_entry.pack(pady=12, padx=20)
+        confirm_entry = ctk.CTkEntry(frame, placeholder_text="Repita la contraseña", show="*", width=250)
+        confirm_entry.pack(pady=12, padx=20)
+
+        def save():
+            if new_entry.get() != confirm_entry.get():
+                messagebox.showerror("Cambio de Contraseña", "Las contraseñas no coinciden.")
+                return
+            try:
+                change_password(self.current_user_id, new_entry.get())
+            except ValueError as e:
+                messagebox.showerror("Cambio de Contraseña", str(e))
+                return
+            except sqlite3.Error as e:
+                messagebox.showerror("Error de DB", f"No se pudo guardar la contraseña: {e}")
+                return
+            self.unbind("<Return>")
+            self.show_main_interface(role)
+
+        ctk.CTkButton(frame, text="Guardar y continuar", command=save).pack(pady=(20, 5), padx=20)
+        ctk.CTkButton(frame, text="Cancelar", fg_color="gray", command=self.logout).pack(pady=(5, 20), padx=20)
+        self.bind("<Return>", lambda event: save())
+
     def logout(self):
         """Cierra la sesión del usuario y vuelve a la pantalla de login."""
         self.current_user_id = None
@@ -1396,12 +7412,460 @@ class App(ctk.CTk):
             self.show_login_frame()
 
 
-# --- Ejecución ---
-if __name__ == "__main__":
+# --- Línea de Comandos ---
+#
+#   python -m reportes_camiones                      -> abre la aplicación (interfaz gráfica)
+#   python -m reportes_camiones init                 -> crea/actualiza el esquema de la DB
+#   python -m reportes_camiones search C123 --format jsonl | head
+#   python -m reportes_camiones archive --before 2025-01-01 historico-2024.json.gz
+#
+# Los datos van a stdout (en streaming, fila por fila) y los mensajes a stderr.
+# Códigos de salida: 0 correcto, 1 error, 2 uso incorrecto, 3 sin resultados.
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+
+SEARCH_CSV_COLUMNS = ("id", "piloto", "vehicle_plate", "report_date", "km_actual", "fallas")
+
+def _cli_message(text):
+    print(text, file=sys.stderr)
+
+def _cli_init(args):
+    inicializar_db()
+    _cli_message(f"Base de datos lista: {DB_NAME}")
+    return EXIT_OK
+
+def _cli_tenants(args):
+    if args.action == "create":
+        if not args.tenant_id:
+            _cli_message("Indique el id del cliente a crear.")
+            return EXIT_USAGE
+        _cli_message(f"Cliente creado: {create_tenant(args.tenant_id, args.source)}")
+        return EXIT_OK
+    for tenant in list_tenants():
+        db_name = tenant_storage(tenant)["db_name"]
+        print(json.dumps({"tenant": tenant, "db": db_name, "bytes": os.path.getsize(db_name)}))
+    return EXIT_OK
+
+def _cli_export(args):
+    compact = EXPORT_COMPACT if args.compact is None else args.compact
+    manifest = export_all_reports_to_json(args.output, args.compression, force=args.force, compact=compact)
+    if manifest is None:
+        _cli_message("Sin cambios desde la última exportación (use --force para reescribir).")
+    else:
+        print(json.dumps(manifest, ensure_ascii=False))
+    return EXIT_OK
+
+def _cli_import(args):
+    imported, skipped = import_reports_from_json(args.file)
+    print(json.dumps({"imported": imported, "skipped": skipped}))
+    return EXIT_OK
+
+def _cli_search(args):
+    query, params = build_report_search_query(args.term, args.mentions)
+    if args.limit:
+        query += " LIMIT ?"
+        params.append(args.limit)
+    conn = open_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        col_names = [description[0] for description in cursor.description]
+        writer = csv.writer(sys.stdout) if args.format == "csv" else None
+        if writer and not args.no_header:
+            writer.writerow(SEARCH_CSV_COLUMNS)
+        found = 0
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                report = _decode_report_row(col_names, row)
+                if writer:
+                    checklist = report["checklist_data"] if isinstance(report["checklist_data"], dict) else {}
+                    failed = sum(1 for status in checklist.values() if status == "Mal estado")
+                    writer.writerow([report["id"], report["piloto"] or "PILOTO ELIMINADO", report["vehicle_plate"],
+                                     report["report_date"], report["km_actual"], failed])
+                else:
+                    print(json.dumps(report, ensure_ascii=False))
+                found += 1
+    finally:
+        conn.close()
+    return EXIT_OK if found else EXIT_NOT_FOUND
+
+def _cli_observations(args):
+    if args.text is not None:
+        for term in sorted(observation_terms(args.text)):
+            print(term)
+        return EXIT_OK
+    if not args.reindex:
+        _cli_message("Indique un texto o --reindex.")
+        return EXIT_USAGE
+    _cli_message(f"Observaciones etiquetadas: {reindex_observations()} reportes.")
+    return EXIT_OK
+
+def _cli_archive(args):
+    result = archive_reports(args.before, args.output, None if args.compression == "none" else args.compression)
+    print(json.dumps(result, ensure_ascii=False))
+    return EXIT_OK if result["archived"] else EXIT_NOT_FOUND
+
+def _cli_optimize(args):
+    conn = sqlite3.connect(DB_NAME, isolation_level=None)
+    try:
+        start = time.perf_counter()
+        conn.execute("ANALYZE" if args.analyze else "PRAGMA optimize")
+    finally:
+        conn.close()
+    if args.vacuum:
+        size_before = os.path.getsize(DB_NAME)
+        enable_incremental_vacuum()  # VACUUM completo; deja la DB en auto_vacuum=INCREMENTAL
+        _cli_message(f"VACUUM: {size_before / 1024:.0f} KB -> {os.path.getsize(DB_NAME) / 1024:.0f} KB")
+    _cli_message(f"Optimización terminada en {time.perf_counter() - start:.2f} s")
+    return EXIT_OK
+
+def _cli_maintenance(args):
+    if args.log:
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            install_maintenance_schema(conn.cursor())
+            for row in conn.execute("SELECT started_at, task, ok, duration_ms, result FROM maintenance_log ORDER BY id DESC LIMIT ?",
+                                    (args.log,)):
+                print(json.dumps(dict(zip(("started_at", "task", "ok", "duration_ms", "result"), row)), ensure_ascii=False))
+        finally:
+            conn.close()
+        return EXIT_OK
+    unknown = [task for task in args.tasks if task not in MAINTENANCE_TASKS]
+    if unknown:
+        _cli_message(f"Tarea desconocida: {', '.join(unknown)} (opciones: {', '.join(MAINTENANCE_TASKS)})")
+        return EXIT_USAGE
+    results = run_maintenance(args.tasks or None, args.budget)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    if not results:
+        _cli_message("No se ejecutó ninguna tarea (no hay pendientes o el tiempo no alcanzó).")
+    return EXIT_ERROR if any(result["result"].startswith("ERROR") for result in results) else EXIT_OK
+
+def _cli_dedupe(args):
+    conn = open_db(isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        install_submission_schema(cursor)
+        hashed = backfill_content_hashes(conn)
+        groups = find_duplicate_reports(cursor)
+        for group in groups:
+            print(json.dumps({"keep": group[0], "duplicates": group[1:]}))
+        removed = remove_duplicate_reports(conn, groups) if args.delete and groups else 0
+    finally:
+        conn.close()
+    _cli_message(f"{hashed} hash(es) calculados, {len(groups)} grupo(s) duplicados, {removed} reporte(s) eliminados.")
+    return EXIT_OK
+
+def _cli_trends(args):
+    if args.rebuild:
+        _cli_message(f"Agregados recalculados: {rebuild_inspection_rollups()} filas.")
+    df = inspection_trend(args.period, args.plate, args.promotion, args.category, args.item, args.since, args.until)
+    if df.empty:
+        _cli_message("No hay reportes para los filtros indicados.")
+        return EXIT_NOT_FOUND
+    df.to_csv(sys.stdout, index=False)
+    return EXIT_OK
+
+def _cli_analytics(args):
+    if args.refresh:
+        print(json.dumps(refresh_analytics_snapshot(), ensure_ascii=False))
+    snapshot = AnalyticsSnapshot()
+    if args.health:
+        snapshot.health_engine().compute_scores().head(args.limit).to_csv(sys.stdout, index=False)
+        return EXIT_OK
+    if args.item and args.item not in CHECKLIST_ITEM_INDEX:
+        _cli_message(f"Ítem desconocido: {args.item}")
+        return EXIT_USAGE
+    if any((args.plate, args.since, args.until, args.item, args.status)):
+        ids = snapshot.select(args.plate, args.since, args.until, args.item, args.status)
+        print(json.dumps({"reports": len(ids), "ids": ids[::-1][:args.limit].tolist()}, ensure_ascii=False))
+        return EXIT_OK if len(ids) else EXIT_NOT_FOUND
+    if not args.refresh:
+        print(json.dumps({"rows": snapshot.rows, "max_id": snapshot.max_id, "vehicles": len(snapshot.plates),
+                          "refreshed_at": snapshot.refreshed_at}, ensure_ascii=False))
+    return EXIT_OK
+
+def _cli_who_drove(args):
+    conn = open_db()
+    try:
+        drivers = drivers_on(conn.cursor(), args.plate.upper(), args.day)
+    finally:
+        conn.close()
+    for user_id, full_name, valid_from, valid_to in drivers:
+        print(json.dumps({"user_id": user_id, "piloto": full_name, "valid_from": valid_from, "valid_to": valid_to},
+                         ensure_ascii=False))
+    return EXIT_OK if drivers else EXIT_NOT_FOUND
+
+def _cli_pdf(args):
+    conn = open_db()
+    try:
+        placeholders = ",".join("?" * len(args.report_ids))
+        existing = {row[0] for row in conn.execute(f"SELECT id FROM reports WHERE id IN ({placeholders})", args.report_ids)}
+    finally:
+        conn.close()
+    missing = [report_id for report_id in args.report_ids if report_id not in existing]
+    if missing:
+        _cli_message("No existen los reportes: " + ", ".join(map(str, missing)))
+        return EXIT_NOT_FOUND
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for path in render_reports_pdf_batch(args.report_ids, output_dir=args.output_dir, db_name=DB_NAME):
+            print(path)
+    else:
+        render_reports_pdf_batch(args.report_ids, output_path=args.output, db_name=DB_NAME)
+        print(args.output)
+    return EXIT_OK
+
+def _cli_sync(args):
+    if not (args.server or SYNC_SERVER_URL):
+        _cli_message("Indique la URL de la base central con --server.")
+        return EXIT_USAGE
+    print(json.dumps(sync_with_central(args.server, token=args.token)))
+    return EXIT_OK
+
+def _cli_sync_server(args):
+    server = create_sync_server(DB_NAME, args.host, args.port, args.token)
+    _cli_message(f"Servidor central escuchando en http://{args.host}:{server.server_address[1]} (Ctrl+C para detener)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return EXIT_OK
+
+def _cli_backend_server(args):
+    server = create_backend_server(DB_NAME, args.host, args.port, args.token)
+    _cli_message(f"Servidor de datos escuchando en http://{args.host}:{server.server_address[1]} (Ctrl+C para detener)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return EXIT_OK
+
+def _cli_backend_check(args):
+    failed = 0
+    for backend, results in backend_conformance_suite(args.url).items():
+        for result in results:
+            failed += not result["ok"]
+            print(json.dumps({"backend": backend, **result}, ensure_ascii=False), flush=True)
+    return EXIT_ERROR if failed else EXIT_OK
+
+BENCHMARKS = {
+    "login": lambda args: benchmark_login(),
+    "export": lambda args: benchmark_export(args.reports or 20000),
+    "fleet-health": lambda args: benchmark_fleet_health(args.reports or 1_000_000),
+    "submissions": lambda args: {mode: stress_test_submissions(args.stations, args.reports or 50, mode)
+                                 for mode in ("direct", "coalesced")},
+}
+
+def _cli_benchmark(args):
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        _cli_message(f"Benchmark desconocido: {', '.join(unknown)} (opciones: {', '.join(BENCHMARKS)})")
+        return EXIT_USAGE
+    for name in args.names or list(BENCHMARKS):
+        _cli_message(f"Ejecutando benchmark '{name}'...")
+        print(json.dumps({"benchmark": name, **BENCHMARKS[name](args)}), flush=True)
+    return EXIT_OK
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(prog="python -m reportes_camiones",
+                                     description="Reportes de inspección de camiones. Sin comando abre la aplicación.")
+    parser.add_argument("--db", default=None, help=f"archivo de base de datos (por defecto: {DB_NAME})")
+    parser.add_argument("--tenant", default=None, metavar="CLIENTE",
+                        help=f"cliente sobre el que se trabaja (sus datos están en {TENANTS_DIR}/CLIENTE/)")
+    parser.add_argument("--backend", default=None, metavar="URL",
+                        help="usa un servidor de datos (ej: http://servidor:8766) en lugar del archivo SQLite local")
+    parser.add_argument("--backend-token", default=None, metavar="CLAVE", help="clave compartida con el servidor de datos")
+    parser.add_argument("--analytics", action="store_true",
+                        help="modo análisis: el tablero lee una instantánea en disco en lugar de la DB")
+    commands = parser.add_subparsers(dest="command", metavar="comando")
+
+    command = commands.add_parser("tenants", help="lista o crea clientes (una base de datos por cliente)")
+    command.add_argument("action", choices=["list", "create"], nargs="?", default="list")
+    command.add_argument("tenant_id", nargs="?", metavar="cliente")
+    command.add_argument("--from", dest="source", default=None, metavar="DB",
+                         help="al crear, copia esta base existente (p. ej. la copia separada del cliente)")
+    command.set_defaults(handler=_cli_tenants, local_file=True)
+
+    command = commands.add_parser("init", aliases=["migrate"], help="crea o actualiza el esquema de la base de datos")
+    command.set_defaults(handler=_cli_init)
+
+    command = commands.add_parser("export", help="exporta todos los reportes a JSON (atómico, con manifiesto)")
+    command.add_argument("-o", "--output", default=None, help=f"archivo de salida (por defecto: {EXPORT_FILE_NAME})")
+    command.add_argument("--compression", choices=[c for c in EXPORT_SUFFIXES if c], default=EXPORT_COMPRESSION)
+    command.add_argument("--compact", action=argparse.BooleanOptionalAction, default=None)
+    command.add_argument("--force", action="store_true", help="reescribir aunque no haya cambios")
+    command.set_defaults(handler=_cli_export)
+
+    command = commands.add_parser("import", help="importa reportes de una exportación o archivo histórico")
+    command.add_argument("file", help="archivo .json, .json.gz o .json.zst")
+    command.set_defaults(handler=_cli_import)
+
+    command = commands.add_parser("search", help="busca reportes por placa o piloto (vacío = todos)")
+    command.add_argument("term", nargs="?", default="")
+    command.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    command.add_argument("--limit", type=int, default=None)
+    command.add_argument("--no-header", action="store_true")
+    command.add_argument("--mentions", default=None, metavar="TEXTO",
+                         help="solo reportes cuyas observaciones mencionan esto (ítem, categoría, placa o palabras)")
+    command.set_defaults(handler=_cli_search)
+
+    command = commands.add_parser("observations", help="etiquetas de las observaciones (índice invertido)")
+    command.add_argument("text", nargs="?", default=None, help="muestra las etiquetas que generaría este texto")
+    command.add_argument("--reindex", action="store_true", help="vuelve a etiquetar todos los reportes")
+    command.set_defaults(handler=_cli_observations)
+
+    command = commands.add_parser("archive", help="mueve los reportes anteriores a una fecha a un archivo histórico")
+    command.add_argument("--before", required=True, help="fecha límite YYYY-MM-DD (no incluida)")
+    command.add_argument("output", help="archivo histórico de salida (p. ej. historico-2024.json.gz)")
+    command.add_argument("--compression", choices=["gzip", "zstd", "none"], default=ARCHIVE_COMPRESSION)
+    command.set_defaults(handler=_cli_archive)
+
+    command = commands.add_parser("optimize", aliases=["vacuum"], help="actualiza estadísticas y opcionalmente compacta la DB")
+    command.add_argument("--analyze", action="store_true", help="ANALYZE completo en lugar de PRAGMA optimize")
+    command.add_argument("--vacuum", action="store_true",
+                         help="compacta el archivo y activa auto_vacuum=INCREMENTAL (requiere acceso exclusivo)")
+    command.set_defaults(handler=_cli_optimize, local_file=True)
+
+    command = commands.add_parser("maintenance", help="tareas de mantenimiento pendientes, con tiempo acotado")
+    command.add_argument("tasks", nargs="*", metavar="tarea",
+                         help="forzar estas tareas: " + ", ".join(MAINTENANCE_TASKS) + " (por defecto: las pendientes)")
+    command.add_argument("--budget", type=float, default=None, help=f"segundos máximos (por defecto: {MAINTENANCE_BUDGET_S})")
+    command.add_argument("--log", type=int, metavar="N", default=None, help="muestra las últimas N entradas de la bitácora")
+    command.set_defaults(handler=_cli_maintenance, local_file=True)
+
+    command = commands.add_parser("dedupe", help="busca reportes guardados dos veces (mismo contenido)")
+    command.add_argument("--delete", action="store_true", help="elimina los duplicados y conserva el más antiguo")
+    command.set_defaults(handler=_cli_dedupe)
+
+    command = commands.add_parser("trends", help="tendencia de inspecciones y defectos por período (CSV)")
+    command.add_argument("--period", choices=list(KM_PERIOD_FORMATS), default="mes")
+    command.add_argument("--plate", default=None)
+    command.add_argument("--promotion", default=None)
+    command.add_argument("--category", default=None, choices=[category for category, _ in CHECKLIST_ITEMS])
+    command.add_argument("--item", default=None)
+    command.add_argument("--since", default=None, help="primer período (ej: 2024-01)")
+    command.add_argument("--until", default=None, help="último período")
+    command.add_argument("--rebuild", action="store_true", help="recalcula los agregados desde los reportes antes de consultar")
+    command.set_defaults(handler=_cli_trends)
+
+    command = commands.add_parser("analytics", help="instantánea columnar de solo lectura para análisis (sin bloquear la DB)")
+    command.add_argument("--refresh", action="store_true", help="agrega los reportes nuevos a la instantánea")
+    command.add_argument("--health", action="store_true", help="ranking de vehículos en riesgo (CSV) desde la instantánea")
+    command.add_argument("--plate", default=None)
+    command.add_argument("--since", default=None, help="YYYY-MM-DD")
+    command.add_argument("--until", default=None, help="YYYY-MM-DD")
+    command.add_argument("--item", default=None, help="ítem del checklist")
+    command.add_argument("--status", default=None, choices=list(STATUS_CODES), help="estado buscado (por defecto: Mal estado)")
+    command.add_argument("--limit", type=int, default=50, help="filas o ids mostrados")
+    command.set_defaults(handler=_cli_analytics, local_file=True)
+
+    command = commands.add_parser("who-drove", help="pilotos asignados a un vehículo en una fecha")
+    command.add_argument("plate")
+    command.add_argument("day", help="YYYY-MM-DD")
+    command.set_defaults(handler=_cli_who_drove)
+
+    command = commands.add_parser("pdf", help="genera el PDF de uno o más reportes")
+    command.add_argument("report_ids", type=int, nargs="+")
+    output = command.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--output", help="un solo PDF con todos los reportes")
+    output.add_argument("--output-dir", help="un PDF por reporte en este directorio")
+    command.set_defaults(handler=_cli_pdf)
+
+    command = commands.add_parser("sync", help="sincroniza este depósito con la base central")
+    command.add_argument("--server", default=None, help="URL de la base central")
+    command.add_argument("--token", default=None, help="clave compartida con la base central")
+    command.set_defaults(handler=_cli_sync, local_file=True)
+
+    command = commands.add_parser("sync-server", help="inicia el servidor de la base central")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.add_argument("--token", default=None, help="clave que deben enviar los depósitos (obligatoria)")
+    command.set_defaults(handler=_cli_sync_server, local_file=True)
+
+    command = commands.add_parser("backend-server", help="inicia el servidor de datos para varias estaciones")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8766)
+    command.add_argument("--token", default=None, help="clave que deben enviar las estaciones con --backend-token (obligatoria)")
+    command.set_defaults(handler=_cli_backend_server)
+
+    command = commands.add_parser("backend-check", help="pruebas de conformidad de los backends de almacenamiento")
+    command.add_argument("--url", default=None,
+                         help="probar este servidor de datos (por defecto: SQLite temporal y un servidor de prueba local)")
+    command.set_defaults(handler=_cli_backend_check)
+
+    command = commands.add_parser("benchmark", help="mediciones de rendimiento (una línea JSON por benchmark)")
+    command.add_argument("names", nargs="*", metavar="nombre", help="uno o más de: " + ", ".join(BENCHMARKS))
+    command.add_argument("--reports", type=int, default=None, help="cantidad de reportes sintéticos (por estación en 'submissions')")
+    command.add_argument("--stations", type=int, default=4, help="estaciones simultáneas en 'submissions'")
+    command.set_defaults(handler=_cli_benchmark, local_file=True)
+    return parser
+
+def run_app():
     try:
         inicializar_db()
+        for tenant in list_tenants():
+            inicializar_db(tenant_storage(tenant)["db_name"])
     except sqlite3.OperationalError as e:
         print(f"Error de DB durante inicialización: {e}")
+
+    # Reportes que quedaron en la cola local (DB ocupada o cierre antes de confirmarlos)
+    report_writer.start()
         
     app = App()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+
+def main(argv=None):
+    """Punto de entrada: sin comando abre la aplicación; con comando devuelve el código de salida."""
+    global ANALYTICS_MODE, STORAGE_BACKEND, BACKEND_TOKEN
+    args = build_cli_parser().parse_args(argv)
+    if args.analytics:
+        ANALYTICS_MODE = True
+    if args.backend_token:
+        BACKEND_TOKEN = args.backend_token
+    if args.backend and getattr(args, "handler", None) is not _cli_backend_server:
+        if getattr(args, "local_file", False):
+            # Trabajan sobre el archivo SQLite (tamaño, VACUUM, copias, sincronización): van en el servidor
+            _cli_message(f"El comando {args.command} trabaja sobre el archivo SQLite local: ejecútelo en el servidor de datos, sin --backend.")
+            return EXIT_USAGE
+        STORAGE_BACKEND = args.backend
+    try:
+        # Con servidor de datos, el cliente debe existir en el servidor (lo verifica al abrir la sesión)
+        if args.tenant and not STORAGE_BACKEND and getattr(args, "handler", None) not in (_cli_init, _cli_tenants) \
+                and not os.path.isfile(tenant_storage(args.tenant)["db_name"]):
+            _cli_message(f"No existe el cliente {args.tenant} (créelo con: tenants create {args.tenant})")
+            return EXIT_NOT_FOUND
+        use_storage(args.tenant, args.db)
+        get_storage_backend()  # Valida --backend antes de usarlo
+    except ValueError as e:
+        _cli_message(str(e))
+        return EXIT_USAGE
+    if args.command is None:
+        run_app()
+        return EXIT_OK
+
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # La salida se cortó (p. ej. "| head"): no es un error. Se descarta el resto de stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_OK
+    except (ValueError, OSError, sqlite3.Error) as e:
+        _cli_message(f"Error: {e}")
+        return EXIT_ERROR
+    except KeyboardInterrupt:
+        return 130
+
+# --- Ejecución ---
+if __name__ == "__main__":
+    sys.exit(main())
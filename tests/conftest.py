@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reportes_camiones as rc  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Base nueva (esquema completo y datos de ejemplo) usada como DB_NAME del módulo."""
+    path = str(tmp_path / "reportes.db")
+    monkeypatch.setattr(rc, "DB_NAME", path)
+    rc.inicializar_db(path)
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    connection = sqlite3.connect(db_path)
+    yield connection
+    connection.close()
+
+
+def add_pilot(cursor, username, full_name=None):
+    cursor.execute("INSERT INTO users (username, password, full_name, role) VALUES (?, '', ?, 'piloto')",
+                   (username, full_name or username))
+    return cursor.lastrowid
+
+
+def add_vehicle(cursor, plate):
+    cursor.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES (?, 'FOTON', 'Promo A (Lanzamiento)')", (plate,))
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+
+import reportes_camiones as rc
+from conftest import add_vehicle
+
+
+def checklist(bad=()):
+    return json.dumps({item: "Mal estado" if item in bad else "Buen estado" for item in rc.CHECKLIST_ITEM_NAMES})
+
+
+def insert(cursor, day, plate="C123456", km="1000", bad=()):
+    return rc.insert_report(cursor, 2, day, plate, km, json.dumps({"placa": plate}), checklist(bad), f"Inspección {day}", "Firmado")
+
+
+def test_snapshot_round_trip(conn, db_path, tmp_path):
+    cursor = conn.cursor()
+    add_vehicle(cursor, "C900001")
+    first = insert(cursor, "2024-03-01", km="1500")
+    second = insert(cursor, "2024-03-02", plate="C900001", km="", bad=("Bocina",))
+    conn.commit()
+
+    assert rc.refresh_analytics_snapshot(db_path, tmp_path) == {"rows": 2, "added": 2, "rebuilt": True}
+    snapshot = rc.AnalyticsSnapshot(tmp_path)
+    assert snapshot.report_ids.tolist() == [first, second]
+    assert snapshot.dates.tolist() == [np.datetime64("2024-03-01"), np.datetime64("2024-03-02")]
+    assert snapshot.km.tolist() == [1500, rc.ANALYTICS_KM_MISSING]
+    assert [snapshot.plates[code] for code in snapshot.vehicle_codes] == ["C123456", "C900001"]
+    bocina = rc.CHECKLIST_ITEM_INDEX["Bocina"]
+    assert snapshot.status[1, bocina] == rc.STATUS_CODES["Mal estado"]
+    assert (np.delete(snapshot.status[1], bocina) == rc.STATUS_CODES["Buen estado"]).all()
+
+    assert snapshot.select(plate="C900001").tolist() == [second]
+    assert snapshot.select(since="2024-03-02").tolist() == [second]
+    assert snapshot.select(until="2024-03-01").tolist() == [first]
+    assert snapshot.select(item="Bocina").tolist() == [second]
+    assert snapshot.select(status="Mal estado").tolist() == [second]
+    assert snapshot.select(plate="CNOEXISTE").tolist() == []
+
+
+def test_refresh_appends_new_reports_and_rebuilds_after_deletes(conn, db_path, tmp_path):
+    cursor = conn.cursor()
+    first = insert(cursor, "2024-03-01")
+    conn.commit()
+    rc.refresh_analytics_snapshot(db_path, tmp_path)
+    generation = rc.read_analytics_manifest(tmp_path)["generation"]
+
+    second = insert(cursor, "2024-03-02")
+    conn.commit()
+    assert rc.refresh_analytics_snapshot(db_path, tmp_path) == {"rows": 2, "added": 1, "rebuilt": False}
+    assert rc.refresh_analytics_snapshot(db_path, tmp_path) == {"rows": 2, "added": 0, "rebuilt": False}
+    assert rc.read_analytics_manifest(tmp_path)["generation"] == generation
+
+    cursor.execute("DELETE FROM reports WHERE id = ?", (first,))
+    conn.commit()
+    assert rc.refresh_analytics_snapshot(db_path, tmp_path) == {"rows": 1, "added": 1, "rebuilt": True}
+    assert rc.read_analytics_manifest(tmp_path)["generation"] == generation + 1
+    assert rc.AnalyticsSnapshot(tmp_path).report_ids.tolist() == [second]
+
+
+def test_health_scores_match_the_database(conn, db_path, tmp_path):
+    cursor = conn.cursor()
+    item = rc.CHECKLIST_ITEM_NAMES[0]
+    for day in range(1, 6):
+        insert(cursor, f"2024-01-{day:02d}", bad=(item,) if day >= 4 else ())
+    conn.commit()
+    rc.refresh_analytics_snapshot(db_path, tmp_path)
+
+    engine = rc.FleetHealthEngine(db_path)
+    engine.refresh()
+    expected = engine.compute_scores(today="2024-01-05")
+    actual = rc.AnalyticsSnapshot(tmp_path).health_engine().compute_scores(today="2024-01-05")
+    assert actual.to_dict("records") == expected.to_dict("records")
+
+
+def test_missing_snapshot(tmp_path):
+    assert rc.read_analytics_manifest(tmp_path) is None
+    with pytest.raises(FileNotFoundError):
+        rc.AnalyticsSnapshot(tmp_path)
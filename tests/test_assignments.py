@@ -0,0 +1,131 @@
+import datetime
+import sqlite3
+
+import reportes_camiones as rc
+from conftest import add_pilot, add_vehicle
+
+
+def names(drivers):
+    return [full_name for _, full_name, _, _ in drivers]
+
+
+def test_drivers_on_follows_assignment_history(conn):
+    cursor = conn.cursor()
+    ana, beto = add_pilot(cursor, "ana", "Ana"), add_pilot(cursor, "beto", "Beto")
+    add_vehicle(cursor, "C900001")
+    rc.assign_vehicle(cursor, "C900001", ana, at="2024-03-01T08:00:00")
+    rc.assign_vehicle(cursor, "C900001", beto, at="2024-03-10T14:30:00")
+
+    assert rc.drivers_on(cursor, "C900001", "2024-02-29") == []
+    assert names(rc.drivers_on(cursor, "C900001", "2024-03-01")) == ["Ana"]
+    assert names(rc.drivers_on(cursor, "C900001", "2024-03-10")) == ["Ana", "Beto"]  # Traspaso en el día
+    assert names(rc.drivers_on(cursor, "C900001", "2024-03-11")) == ["Beto"]
+    assert names(rc.drivers_on(cursor, "C900001", "2030-01-01")) == ["Beto"]  # Sigue vigente
+
+
+def test_drivers_on_keeps_one_vehicle_per_pilot(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    add_vehicle(cursor, "C900001")
+    add_vehicle(cursor, "C900002")
+    rc.assign_vehicle(cursor, "C900001", ana, at="2024-03-01T08:00:00")
+    rc.assign_vehicle(cursor, "C900002", ana, at="2024-03-05T08:00:00")
+
+    assert rc.drivers_on(cursor, "C900001", "2024-03-06") == []
+    assert names(rc.drivers_on(cursor, "C900002", "2024-03-06")) == ["Ana"]
+    cursor.execute("SELECT assigned_to_user_id FROM vehicles WHERE plate = 'C900001'")
+    assert cursor.fetchone()[0] is None
+
+
+def test_legacy_assignment_starts_at_first_report_as_datetime(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    add_vehicle(cursor, "C900001")
+    cursor.execute("UPDATE vehicles SET assigned_to_user_id = ? WHERE plate = 'C900001'", (ana,))
+    for day in ("2024-05-20", "2024-05-07"):
+        cursor.execute("INSERT INTO reports (driver_id, report_date, vehicle_plate) VALUES (?, ?, 'C900001')", (ana, day))
+
+    rc.migrate_legacy_assignments(cursor)
+
+    cursor.execute("SELECT valid_from, valid_to FROM assignments WHERE plate = 'C900001'")
+    assert cursor.fetchall() == [("2024-05-07T00:00:00", None)]
+    assert names(rc.drivers_on(cursor, "C900001", "2024-05-07")) == ["Ana"]
+    assert rc.drivers_on(cursor, "C900001", "2024-05-06") == []
+
+
+def test_legacy_assignment_with_invalid_report_date_starts_now(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    add_vehicle(cursor, "C900001")
+    cursor.execute("UPDATE vehicles SET assigned_to_user_id = ? WHERE plate = 'C900001'", (ana,))
+    cursor.execute("INSERT INTO reports (driver_id, report_date, vehicle_plate) VALUES (?, '2024-02-30', 'C900001')", (ana,))
+
+    rc.migrate_legacy_assignments(cursor)
+
+    cursor.execute("SELECT valid_from FROM assignments WHERE plate = 'C900001'")
+    valid_from = cursor.fetchone()[0]
+    assert datetime.datetime.fromisoformat(valid_from).date() == datetime.date.today()
+
+
+def test_migration_repairs_date_only_rows(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    add_vehicle(cursor, "C900001")
+    cursor.execute("INSERT INTO assignments (plate, user_id, valid_from, valid_to) VALUES ('C900001', ?, '2024-05-07', '2024-05-07')",
+                   (ana,))
+
+    rc.migrate_legacy_assignments(cursor)
+
+    cursor.execute("SELECT valid_from, valid_to FROM assignments WHERE plate = 'C900001'")
+    assert cursor.fetchall() == [("2024-05-07T00:00:00", "2024-05-07T00:00:00")]
+
+
+def test_legacy_assignment_recorded_only_on_the_pilot_side(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    add_vehicle(cursor, "CDRIFT1")
+    cursor.execute("UPDATE users SET assigned_vehicle_plate = 'CDRIFT1' WHERE id = ?", (ana,))
+    cursor.execute("INSERT INTO reports (driver_id, report_date, vehicle_plate) VALUES (?, '2024-04-02', 'CDRIFT1')", (ana,))
+
+    rc.migrate_legacy_assignments(cursor)
+
+    cursor.execute("SELECT user_id, valid_from FROM assignments WHERE plate = 'CDRIFT1' AND valid_to IS NULL")
+    assert cursor.fetchall() == [(ana, "2024-04-02T00:00:00")]
+    cursor.execute("SELECT assigned_to_user_id FROM vehicles WHERE plate = 'CDRIFT1'")
+    assert cursor.fetchone() == (ana,)
+    cursor.execute("SELECT assigned_vehicle_plate FROM users WHERE id = ?", (ana,))
+    assert cursor.fetchone() == ("CDRIFT1",)
+
+
+def test_vehicle_side_wins_when_legacy_columns_disagree(conn):
+    cursor = conn.cursor()
+    ana, beto = add_pilot(cursor, "ana", "Ana"), add_pilot(cursor, "beto", "Beto")
+    add_vehicle(cursor, "CDRIFT1")
+    cursor.execute("UPDATE vehicles SET assigned_to_user_id = ? WHERE plate = 'CDRIFT1'", (ana,))
+    cursor.execute("UPDATE users SET assigned_vehicle_plate = 'CDRIFT1' WHERE id = ?", (beto,))
+
+    rc.migrate_legacy_assignments(cursor)
+
+    cursor.execute("SELECT user_id FROM assignments WHERE plate = 'CDRIFT1' AND valid_to IS NULL")
+    assert cursor.fetchall() == [(ana,)]
+    cursor.execute("SELECT assigned_vehicle_plate FROM users WHERE id = ?", (beto,))
+    assert cursor.fetchone() == (None,)
+
+
+def test_reinitializing_keeps_a_pilot_side_assignment(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES ('CDRIFT', 'FOTON', 'Promo A')")
+    conn.execute("DELETE FROM assignments")
+    conn.execute("UPDATE vehicles SET assigned_to_user_id = NULL")
+    conn.execute("UPDATE users SET assigned_vehicle_plate = 'CDRIFT' WHERE username = 'piloto1'")
+    conn.commit()
+    conn.close()
+
+    rc.inicializar_db(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT assigned_vehicle_plate FROM users WHERE username = 'piloto1'").fetchone() == ("CDRIFT",)
+        assert conn.execute("SELECT COUNT(*) FROM assignments WHERE plate = 'CDRIFT' AND valid_to IS NULL").fetchone() == (1,)
+    finally:
+        conn.close()
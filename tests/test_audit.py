@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import reportes_camiones as rc
+from conftest import add_pilot
+
+ADMIN = (1, "Administrador")
+
+
+def audit_count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_audit_entry_shares_the_change_transaction(conn, db_path):
+    cursor = conn.cursor()
+    before = rc.audit_snapshot(cursor, "vehicle", "C123456")
+    cursor.execute("UPDATE vehicles SET brand = 'HINO' WHERE plate = 'C123456'")
+    rc.record_audit(cursor, ADMIN, "actualizar", "vehicle", "C123456", before, rc.audit_snapshot(cursor, "vehicle", "C123456"))
+    conn.rollback()
+    assert audit_count(db_path) == 0
+
+    cursor.execute("UPDATE vehicles SET brand = 'HINO' WHERE plate = 'C123456'")
+    rc.record_audit(cursor, ADMIN, "actualizar", "vehicle", "C123456", before, rc.audit_snapshot(cursor, "vehicle", "C123456"))
+    conn.commit()
+    entry, = rc.query_audit_log(cursor, entity="vehicle", entity_key="C123456")
+    assert (entry["actor_name"], entry["before"]["brand"], entry["after"]["brand"]) == ("Administrador", "FOTON", "HINO")
+
+
+def test_audit_log_is_append_only(conn):
+    cursor = conn.cursor()
+    rc.record_audit(cursor, ADMIN, "crear", "user", 2, None, rc.audit_snapshot(cursor, "user", 2))
+    conn.commit()
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("UPDATE audit_log SET actor_name = 'otro'")
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("DELETE FROM audit_log")
+
+
+def test_only_changed_entities_are_recorded_without_passwords(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    states = {("user", 2): rc.audit_snapshot(cursor, "user", 2), ("user", ana): rc.audit_snapshot(cursor, "user", ana)}
+    cursor.execute("UPDATE users SET full_name = 'Ana María', password = 'x' WHERE id = ?", (ana,))
+    rc.record_audit_changes(cursor, ADMIN, states, "actualizar")
+
+    entry, = rc.query_audit_log(cursor)
+    assert entry["entity_key"] == str(ana)
+    assert entry["after"]["full_name"] == "Ana María" and "password" not in entry["after"]
+
+
+def test_old_entries_move_to_compressed_partitions(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        for at in ("2020-01-05T10:00:00.000", "2020-01-20T10:00:00.000", "2020-02-03T10:00:00.000"):
+            cursor.execute("INSERT INTO audit_log (at, actor_id, actor_name, action, entity, entity_key) "
+                           "VALUES (?, 1, 'Administrador', 'crear', 'vehicle', 'C000001')", (at,))
+        rc.record_audit(cursor, ADMIN, "crear", "vehicle", "C000002")
+
+        assert rc.compact_audit_log(conn) == "3 entradas en 2 partición(es)"
+        assert [entry["entity_key"] for entry in rc.query_audit_log(cursor)] == ["C000002"]
+        archived = rc.query_audit_log(cursor, entity_key="C000001", since="2020-01-10", include_archived=True)
+        assert [entry["at"][:10] for entry in archived] == ["2020-02-03", "2020-01-20"]
+        with pytest.raises(sqlite3.IntegrityError):
+            cursor.execute("DELETE FROM audit_partitions")
+    finally:
+        conn.close()
@@ -0,0 +1,114 @@
+import http.client
+import os
+import socket
+import sqlite3
+import threading
+
+import pytest
+
+import reportes_camiones as rc
+
+TOKEN = "clave-de-prueba"
+
+
+@pytest.fixture
+def data_server(tmp_path):
+    """Servidor de datos con un cliente 'acme'; devuelve (url, base del servidor, base de acme)."""
+    tenants_dir = str(tmp_path / "clientes")
+    acme_db = os.path.join(tenants_dir, "acme", rc._SINGLE_TENANT_STORAGE["db_name"])
+    os.makedirs(os.path.dirname(acme_db))
+    rc.inicializar_db(acme_db, backend=rc.SQLiteBackend())
+    server_db = str(tmp_path / "servidor.db")
+    server = rc.create_backend_server(server_db, port=0, token=TOKEN, tenants_dir=tenants_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server_db, acme_db
+    server.shutdown()
+    server.server_close()
+
+
+def plates(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        return {row[0] for row in conn.execute("SELECT plate FROM vehicles")}
+    finally:
+        conn.close()
+
+
+def test_remote_sessions_are_scoped_to_the_active_tenant(data_server, monkeypatch):
+    url, server_db, acme_db = data_server
+    backend = rc.RemoteBackend(url, TOKEN)
+    try:
+        monkeypatch.setattr(rc, "TENANT", "acme")
+        conn = backend.connect()
+        conn.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES ('CACME01', 'FOTON', 'Promo A')")
+        conn.commit()
+        conn.close()
+
+        monkeypatch.setattr(rc, "TENANT", None)
+        conn = backend.connect()
+        assert conn.execute("SELECT COUNT(*) FROM vehicles WHERE plate = 'CACME01'").fetchone() == (0,)
+        conn.close()
+    finally:
+        backend.close()
+    assert "CACME01" in plates(acme_db)
+    assert "CACME01" not in plates(server_db)
+
+
+def test_unknown_tenant_is_refused(data_server, monkeypatch):
+    url, _, _ = data_server
+    backend = rc.RemoteBackend(url, TOKEN)
+    monkeypatch.setattr(rc, "TENANT", "otro")
+    with pytest.raises(sqlite3.OperationalError):
+        backend.connect()
+    monkeypatch.setattr(rc, "TENANT", "../acme")
+    with pytest.raises(sqlite3.OperationalError):
+        backend.connect()
+    backend.close()
+
+
+def test_data_server_requires_a_key(tmp_path):
+    with pytest.raises(ValueError):
+        rc.create_backend_server(str(tmp_path / "servidor.db"), port=0)
+
+
+def test_backend_conformance_suite():
+    suite = rc.backend_conformance_suite()
+    assert set(suite) == {"sqlite", "remote"}
+    for results in suite.values():
+        assert [result for result in results if not result["ok"]] == []
+
+
+def test_lost_response_is_not_resent(data_server, monkeypatch):
+    url, server_db, _ = data_server
+    backend = rc.RemoteBackend(url, TOKEN)
+    conn = backend.connect(isolation_level=None)
+    try:
+        conn.execute("SELECT 1").fetchall()  # Conexión HTTP ya usada: un fallo no es de conexión nueva
+        original = http.client.HTTPConnection.getresponse
+
+        def lost_response(self):
+            original(self).read()
+            raise http.client.RemoteDisconnected("respuesta perdida")
+
+        monkeypatch.setattr(http.client.HTTPConnection, "getresponse", lost_response)
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO vehicles (plate, brand, promotion) VALUES ('CUNAVEZ', 'FOTON', 'Promo A')")
+        monkeypatch.undo()
+    finally:
+        backend.close()
+    conn = sqlite3.connect(server_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM vehicles WHERE plate = 'CUNAVEZ'").fetchone() == (1,)
+    finally:
+        conn.close()
+
+
+def test_idle_connection_closed_by_the_server_is_replaced(data_server):
+    url, _, _ = data_server
+    backend = rc.RemoteBackend(url, TOKEN)
+    conn = backend.connect()
+    try:
+        conn._http.sock.shutdown(socket.SHUT_RD)  # Como si el servidor hubiera cerrado la conexión inactiva
+        assert conn.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0] >= 1
+    finally:
+        backend.close()
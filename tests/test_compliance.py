@@ -0,0 +1,42 @@
+import json
+
+import pandas as pd
+
+import reportes_camiones as rc
+from conftest import add_pilot, add_vehicle
+
+
+def report(cursor, driver_id, plate, day):
+    rc.insert_report(cursor, driver_id, day, plate, "1000", json.dumps({"placa": plate}),
+                     json.dumps({"Llantas": "Buen estado"}), f"Inspección {day}", "Firmado")
+
+
+def test_compliance_follows_assignment_history(conn, db_path):
+    cursor = conn.cursor()
+    ana, beto = add_pilot(cursor, "ana", "Ana"), add_pilot(cursor, "beto", "Beto")
+    for plate in ("C900001", "C900002"):
+        add_vehicle(cursor, plate)
+    # C900001: Ana desde el 2, Beto desde el 4 al mediodía; C900002: Ana del 4 al 5 y luego sin piloto
+    rc.assign_vehicle(cursor, "C900001", ana, at="2024-03-02T08:00:00")
+    rc.assign_vehicle(cursor, "C900002", ana, at="2024-03-04T12:00:00")
+    rc.assign_vehicle(cursor, "C900001", beto, at="2024-03-04T12:00:00")
+    rc.assign_vehicle(cursor, "C900002", None, at="2024-03-05T18:00:00")
+    report(cursor, ana, "C900001", "2024-03-02")
+    report(cursor, beto, "C900001", "2024-03-05")
+    report(cursor, ana, "C900002", "2024-03-04")
+    conn.commit()
+
+    grid = rc.compliance_grid("2024-03-01", "2024-03-06")
+    days = ["2024-03-01", "2024-03-02", "2024-03-03", "2024-03-04", "2024-03-05", "2024-03-06"]
+    as_list = lambda plate: [None if pd.isna(value) else bool(value) for value in grid.loc[plate, days]]
+
+    assert as_list("C900001") == [None, True, False, False, True, False]
+    assert as_list("C900002") == [None, None, None, True, False, None]
+    assert grid.loc["C900001", "piloto"] == "Beto"
+    assert grid.loc["C900002", "cumplimiento"] == 50.0
+    assert "C123456" not in grid.index  # Asignado recién al crear la base
+
+    assert rc.get_missing_inspections(cursor, "2024-03-01") == []
+    assert rc.get_missing_inspections(cursor, "2024-03-03") == [("C900001", ana, "Ana")]
+    assert rc.get_missing_inspections(cursor, "2024-03-04") == [("C900001", beto, "Beto")]
+    assert rc.get_missing_inspections(cursor, "2024-03-06") == [("C900001", beto, "Beto")]
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import reportes_camiones as rc
+from conftest import add_pilot
+
+
+def stored_password(conn, username):
+    return conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+
+def test_scrypt_hash_round_trip():
+    stored = rc.hash_password("secreta")
+    assert stored.startswith("scrypt$") and "secreta" not in stored
+    assert stored != rc.hash_password("secreta")  # Sal distinta en cada hash
+    assert rc.verify_password("secreta", stored) == (True, False)
+    assert rc.verify_password("otra", stored) == (False, False)
+    assert rc.verify_password("secreta", "") == (False, False)
+
+
+def test_legacy_passwords_are_upgraded_on_login(conn, db_path):
+    ana = add_pilot(conn.cursor(), "ana", "Ana")
+    add_pilot(conn.cursor(), "beto", "Beto")
+    conn.execute("UPDATE users SET password = 'texto-plano' WHERE id = ?", (ana,))
+    conn.execute("UPDATE users SET password = ? WHERE username = 'beto'", (rc.hash_password("clave", n=2 ** 10),))
+    conn.commit()
+
+    assert rc.authenticate_user("ana", "texto-plano") == (ana, "Ana", "piloto", 1, 0)
+    assert rc.verify_password("texto-plano", stored_password(conn, "ana")) == (True, False)
+    assert rc.authenticate_user("beto", "clave") is not None
+    assert stored_password(conn, "beto").startswith(f"scrypt${rc.PASSWORD_SCRYPT_N}$")
+
+
+def test_default_users_must_change_their_password(conn, db_path):
+    admin = rc.authenticate_user("admin", rc.DEFAULT_CREDENTIALS["admin"])
+    assert admin[4] == 1
+    with pytest.raises(ValueError):
+        rc.change_password(admin[0], rc.DEFAULT_CREDENTIALS["admin"])
+
+    rc.change_password(admin[0], "nueva-clave")
+    assert rc.authenticate_user("admin", rc.DEFAULT_CREDENTIALS["admin"]) is None
+    assert rc.authenticate_user("admin", "nueva-clave")[4] == 0
+    rc.login_rate_limiter.reset(rc.login_limiter_key("admin"))
+
+
+def test_existing_default_passwords_are_flagged_on_upgrade(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("ALTER TABLE users DROP COLUMN must_change_password")
+    conn.execute("UPDATE users SET password = ? WHERE username = 'piloto1'", (rc.hash_password("cambiada"),))
+    conn.commit()
+    conn.close()
+
+    rc.inicializar_db(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT username, must_change_password FROM users ORDER BY id").fetchall() == [
+            ("admin", 1), ("piloto1", 0)]
+    finally:
+        conn.close()
+
+
+def test_rate_limiter_locks_and_forgets(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rc.time, "monotonic", lambda: now[0])
+    limiter = rc.LoginRateLimiter(max_attempts=3, window_s=60, lockout_s=120, max_tracked=100)
+
+    for _ in range(3):
+        limiter.record_failure("ana")
+    assert limiter.seconds_locked("ana") == 121
+    now[0] += 121
+    assert limiter.seconds_locked("ana") == 0
+
+    # Fallos con nombres inventados: los vencidos se descartan y nunca se guardan más de max_tracked
+    for i in range(250):
+        limiter.record_failure(f"falso-{i}")
+    assert len(limiter) == 100
+    now[0] += 61
+    limiter.record_failure("beto")
+    assert len(limiter) == 1
@@ -0,0 +1,77 @@
+import json
+import sqlite3
+
+import pytest
+
+import reportes_camiones as rc
+
+CHECKLIST = json.dumps({"Llantas": "Buen estado", "Frenos": "Mal estado"})
+
+
+@pytest.fixture
+def autocommit(db_path):
+    """Conexión sin transacción implícita, como la que usan las tareas por bloques."""
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    yield connection
+    connection.close()
+
+
+def insert(cursor, observations="Sin novedad", submission_id=None, checklist=CHECKLIST, header=None):
+    return rc.insert_report(cursor, 2, "2024-06-01", "C123456", "1000", header or json.dumps({"placa": "C123456"}),
+                            checklist, observations, "Firmado", submission_id)
+
+
+def test_same_submission_is_saved_once(conn):
+    cursor = conn.cursor()
+    first = insert(cursor, submission_id="envio-1")
+    assert insert(cursor, submission_id="envio-1") == first
+    # El mismo envío reintentado con el contenido editado sigue siendo el mismo reporte
+    assert insert(cursor, observations="Editado", submission_id="envio-1") == first
+    cursor.execute("SELECT COUNT(*) FROM reports")
+    assert cursor.fetchone()[0] == 1
+
+
+def test_same_content_is_saved_once(conn):
+    cursor = conn.cursor()
+    first = insert(cursor)
+    # Otro orden de claves en el JSON es el mismo contenido
+    reordered = json.dumps(dict(reversed(list(json.loads(CHECKLIST).items()))))
+    assert insert(cursor, checklist=reordered) == first
+    assert insert(cursor, observations="Otra observación") != first
+
+
+def test_identical_inspections_with_different_submissions_are_both_saved(conn):
+    cursor = conn.cursor()
+    first = insert(cursor, submission_id="sub-A")
+    second = insert(cursor, submission_id="sub-B")
+    assert second != first
+    cursor.execute("SELECT COUNT(*) FROM reports")
+    assert cursor.fetchone()[0] == 2
+    # La limpieza tampoco los trata como duplicados
+    assert rc.find_duplicate_reports(cursor) == []
+
+
+def test_remove_legacy_duplicates(autocommit):
+    cursor = autocommit.cursor()
+    cursor.execute("BEGIN")
+    keep_id = insert(cursor)
+    duplicate_id = insert(cursor, observations="temporal")
+    # Como en versiones anteriores: mismo contenido guardado dos veces y sin hash calculado
+    cursor.execute("UPDATE reports SET observations = 'Sin novedad', content_hash = NULL")
+    cursor.execute("INSERT INTO report_photos (report_id, item, photo_hash) VALUES (?, 'Frenos', 'abc')", (duplicate_id,))
+    cursor.execute("COMMIT")
+
+    assert rc.backfill_content_hashes(autocommit) == 2
+    groups = rc.find_duplicate_reports(cursor)
+    assert groups == [[keep_id, duplicate_id]]
+    assert rc.remove_duplicate_reports(autocommit, groups) == 1
+
+    cursor.execute("SELECT id FROM reports")
+    assert cursor.fetchall() == [(keep_id,)]
+    cursor.execute("SELECT report_id FROM report_photos")
+    assert cursor.fetchall() == [(keep_id,)]
+    cursor.execute("SELECT report_count, first_report_id FROM inspection_calendar WHERE day = '2024-06-01'")
+    assert cursor.fetchall() == [(1, keep_id)]
+    cursor.execute("SELECT COUNT(*) FROM odometer_readings WHERE report_id = ?", (duplicate_id,))
+    assert cursor.fetchone()[0] == 0
+    assert rc.find_duplicate_reports(cursor) == []
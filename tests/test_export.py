@@ -0,0 +1,33 @@
+import json
+import os
+import stat
+
+import reportes_camiones as rc
+
+
+def test_export_keeps_regular_file_permissions(db_path, tmp_path):
+    target = str(tmp_path / "exportacion.json")
+    rc.export_all_reports_to_json(target, db_name=db_path)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o666 & ~umask
+
+    # Un archivo existente conserva sus permisos al reemplazarse
+    os.chmod(target, 0o640)
+    rc.export_all_reports_to_json(target, db_name=db_path, force=True)
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+
+
+def test_regenerated_snapshots_refresh_the_export(conn, db_path, tmp_path):
+    rc.insert_report(conn.cursor(), 2, "2024-06-01", "C123456", "1000", json.dumps({"placa": "C123456"}),
+                     json.dumps({"Llantas": "Buen estado"}), "Sin novedad", "Firmado")
+    conn.commit()
+    target = str(tmp_path / "exportacion.json")
+    assert rc.export_all_reports_to_json(target, db_name=db_path)["row_count"] == 1
+    assert rc.export_all_reports_to_json(target, db_name=db_path) is None  # Sin cambios
+
+    rc.rebuild_report_snapshots(db_path, all_reports=True)
+    manifest = rc.export_all_reports_to_json(target, db_name=db_path)
+    assert manifest is not None
+    assert manifest["snapshot_version"] == rc.SNAPSHOT_VERSION
+    assert rc.export_all_reports_to_json(target, db_name=db_path) is None
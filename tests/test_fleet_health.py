@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+
+import reportes_camiones as rc
+
+
+def checklist(bad=()):
+    return json.dumps({item: "Mal estado" if item in bad else "Buen estado" for item in rc.CHECKLIST_ITEM_NAMES})
+
+
+def test_refresh_loads_all_chunks_and_only_new_reports(conn, db_path, monkeypatch):
+    monkeypatch.setattr(rc, "HEALTH_LOAD_CHUNK", 3)
+    item = rc.CHECKLIST_ITEM_NAMES[0]
+    rows = [(2, f"2024-01-{day:02d}", "C123456", str(1000 + day), "{}", checklist((item,) if day >= 9 else ()), f"r{day}", "")
+            for day in range(1, 11)]
+    conn.executemany("INSERT INTO reports (driver_id, report_date, vehicle_plate, km_actual, header_data, checklist_data, "
+                     "observations, signature_confirmation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+    engine = rc.FleetHealthEngine(db_path)
+    assert engine.refresh() == 10
+    assert engine.refresh() == 0
+    assert engine.status.shape == (10, len(rc.CHECKLIST_ITEM_NAMES))
+    assert np.array_equal(engine.report_ids, np.sort(engine.report_ids))
+
+    scores = engine.compute_scores(today="2024-01-10").set_index("placa")
+    assert scores.loc["C123456", "fallas_repetidas"] == 1
+    assert scores.loc["C123456", "dias_sin_ok"] == 2
+    assert scores.loc["C123456", "reportes"] == 10
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import time
+
+import reportes_camiones as rc
+
+
+def add_free_pages(db_path, rows=2000):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE relleno (datos BLOB)")
+    conn.executemany("INSERT INTO relleno VALUES (?)", ((os.urandom(2000),) for _ in range(rows)))
+    conn.commit()
+    conn.execute("DROP TABLE relleno")
+    conn.commit()
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.close()
+    return free_pages
+
+
+def free_pages(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_due_tasks_run_once_and_are_logged(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(rc, "BACKUP_DIR", str(tmp_path / "respaldos"))
+    results = rc.run_maintenance(budget_s=30, db_name=db_path)
+    assert [result["task"] for result in results] == list(rc.MAINTENANCE_INTERVALS)
+    assert all(result["ok"] for result in results), results
+    assert len(os.listdir(tmp_path / "respaldos")) == 1
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert rc.due_maintenance_tasks(conn.cursor()) == []
+        assert conn.execute("SELECT COUNT(*) FROM maintenance_log WHERE ok = 1").fetchone()[0] == len(results)
+    finally:
+        conn.close()
+
+
+def test_vacuum_stays_within_its_budget_and_resumes(db_path, monkeypatch):
+    pages = add_free_pages(db_path)
+    assert pages > 100
+    monkeypatch.setattr(rc, "VACUUM_PAGES_PER_STEP", 1)
+
+    start = time.monotonic()
+    result, = rc.run_maintenance(["incremental_vacuum"], budget_s=0.05, db_name=db_path)
+    assert time.monotonic() - start < 1.0
+    assert not result["ok"] and result["result"].startswith("tiempo agotado")
+    assert 0 < free_pages(db_path) < pages
+
+    result, = rc.run_maintenance(["incremental_vacuum"], budget_s=30, db_name=db_path)
+    assert result["ok"]
+    assert free_pages(db_path) == 0
+
+
+def test_maintenance_yields_to_a_writer(db_path):
+    add_free_pages(db_path)
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")  # Un piloto guardando (como ReportWriter)
+    try:
+        start = time.monotonic()
+        result, = rc.run_maintenance(["incremental_vacuum"], budget_s=5, db_name=db_path)
+        assert time.monotonic() - start < 2.0
+        assert not result["ok"] and result["result"].startswith("pospuesto")
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
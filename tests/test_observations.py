@@ -0,0 +1,45 @@
+import json
+
+import reportes_camiones as rc
+
+
+def add_report(cursor, observations):
+    return rc.insert_report(cursor, 2, "2024-06-01", "C123456", "1000", json.dumps({"placa": "C123456"}),
+                            json.dumps({"Acelerador": "Buen estado"}), observations, "Firmado")
+
+
+def test_observation_tags():
+    terms = rc.observation_terms("Revisar el FRENO DE MANO, vibra. Ver también C-123ABC")
+    assert {"item:Freno de Mano", "categoria:General", "placa:C123ABC", "palabra:vibra"} <= terms
+    assert "palabra:el" not in terms  # Palabras vacías
+    # Plurales y tildes: "luces" -> luz, igual que el ítem
+    assert {"item:Luces (alta, media y baja)", "categoria:Luces", "palabra:luz"} <= rc.observation_terms("Las LUCES no encienden")
+    assert rc.observation_terms("") == set()
+
+
+def test_reports_mentioning(conn):
+    cursor = conn.cursor()
+    brake = add_report(cursor, "Freno de mano flojo")
+    lights = add_report(cursor, "Luces traseras quemadas, cambiar pronto")
+    both = add_report(cursor, "Luces quemadas y freno de mano flojo; avisar a C-654321")
+    add_report(cursor, "Sin novedad")
+
+    assert rc.reports_mentioning(cursor, "freno de mano") == [both, brake]
+    assert rc.reports_mentioning(cursor, "Luces") == [both, lights]  # Categoría
+    assert rc.reports_mentioning(cursor, "quem") == [both, lights]   # Prefijo de palabra
+    assert rc.reports_mentioning(cursor, "quemadas flojo") == [both]
+    assert rc.reports_mentioning(cursor, "C654321") == [both]
+    assert rc.reports_mentioning(cursor, "parabrisas") == []
+    assert rc.reports_mentioning(cursor, "") == []
+
+
+def test_reindex_replaces_the_tags(conn, db_path):
+    cursor = conn.cursor()
+    report_id = add_report(cursor, "Bocina no suena")
+    cursor.execute("DELETE FROM observation_terms")
+    cursor.execute("INSERT INTO observation_terms (term, report_id) VALUES ('palabra:obsoleta', ?)", (report_id,))
+    conn.commit()
+
+    assert rc.reindex_observations(db_path) == 1
+    assert rc.reports_mentioning(cursor, "obsoleta") == []
+    assert rc.reports_mentioning(cursor, "bocina") == [report_id]
@@ -0,0 +1,25 @@
+import json
+
+import reportes_camiones as rc
+
+
+def test_parse_km_rejects_non_ascii_digits():
+    assert rc.parse_km(" 12345 ") == 12345
+    assert rc.parse_km("²") is None
+    assert rc.parse_km("١٢٣") is None
+    assert rc.parse_km("12.5") is None
+    assert rc.parse_km(None) is None
+
+
+def test_report_with_unicode_digit_km_is_saved_without_reading(conn):
+    cursor = conn.cursor()
+    report_id = rc.insert_report(cursor, 2, "2024-06-01", "C123456", "²", json.dumps({"placa": "C123456"}),
+                                 json.dumps({"Llantas": "Buen estado"}), "", "Firmado")
+    cursor.execute("SELECT COUNT(*) FROM odometer_readings WHERE report_id = ?", (report_id,))
+    assert cursor.fetchone()[0] == 0
+
+
+def test_odometer_regression_is_flagged(conn):
+    cursor = conn.cursor()
+    assert rc.record_odometer_reading(cursor, "C123456", "2024-06-01", "1000") is None
+    assert rc.record_odometer_reading(cursor, "C123456", "2024-06-02", "900") == "regresion"
@@ -0,0 +1,58 @@
+import json
+import re
+import zlib
+
+import reportes_camiones as rc
+
+
+def add_reports(conn, count):
+    cursor = conn.cursor()
+    ids = []
+    for i in range(count):
+        header = {"placa": "C123456", "marca": "FOTON", "fecha": f"2024-06-{i + 1:02d}", "km_actual": str(1000 + i),
+                  "piloto_nombre": "Juan Pérez"}
+        ids.append(rc.insert_report(cursor, 2, header["fecha"], "C123456", header["km_actual"], json.dumps(header),
+                                    json.dumps({"Líquido de frenos": "Mal estado", "Acelerador": "Buen estado"}), f"Observación {i}", "Firmado"))
+    conn.commit()
+    return ids
+
+
+def parse_pdf(path):
+    """Comprueba la tabla xref y devuelve (páginas declaradas, textos de las páginas)."""
+    data = open(path, "rb").read()
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+    xref_position = int(re.search(rb"startxref\n(\d+)\n", data).group(1))
+    assert data[xref_position:].startswith(b"xref")
+    entries = re.findall(rb"(\d{10}) 00000 n ", data[xref_position:])
+    for object_id, offset in enumerate(entries, start=1):
+        assert data[int(offset):].startswith(b"%d 0 obj" % object_id)
+
+    count = int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", data).group(1))
+    texts = []
+    for match in re.finditer(rb"<< /Filter /FlateDecode /Length (\d+) >>\nstream\n", data):
+        length = int(match.group(1))
+        texts.append(zlib.decompress(data[match.end():match.end() + length]).decode("cp1252"))
+    return count, texts
+
+
+def test_single_report_pdf(conn, db_path, tmp_path):
+    report_id, = add_reports(conn, 1)
+    output = rc.render_report_pdf(report_id, str(tmp_path / "reporte.pdf"), db_name=db_path)
+    count, texts = parse_pdf(output)
+    assert count == 1
+    assert "(Mal estado)" in texts[0] and "(Buen estado)" in texts[0] and "(Observación 0)" in texts[0] and "(Juan Pérez)" in texts[0]
+
+
+def test_batch_pdf_keeps_one_page_per_report_in_order(conn, db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(rc, "PDF_BATCH_CHUNK", 2)  # Varios bloques: usa el pool de procesos
+    ids = add_reports(conn, 5)
+    order = list(reversed(ids))
+
+    count, texts = parse_pdf(rc.render_reports_pdf_batch(order, output_path=str(tmp_path / "lote.pdf"), processes=2,
+                                                         db_name=db_path))
+    assert count == 5
+    assert [int(re.search(r"\(Observación (\d+)\)", text).group(1)) for text in texts] == [4, 3, 2, 1, 0]
+
+    paths = rc.render_reports_pdf_batch(ids, output_dir=str(tmp_path / "individuales"), db_name=db_path)
+    assert [path.rsplit("_", 1)[1] for path in paths] == [f"{report_id}.pdf" for report_id in ids]
+    assert all(parse_pdf(path)[0] == 1 for path in paths)
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+import reportes_camiones as rc
+
+
+def make_image(path, color, size=(640, 480)):
+    Image.new("RGB", size, color).save(path, "JPEG")
+    return str(path)
+
+
+def test_photos_are_stored_once_under_their_hash(tmp_path):
+    store = rc.PhotoStore(str(tmp_path / "fotos"))
+    first = make_image(tmp_path / "frenos.jpg", "red")
+    copy = tmp_path / "frenos_copia.jpg"
+    copy.write_bytes(open(first, "rb").read())
+
+    photo_hash = store.ingest(first)
+    assert photo_hash == hashlib.sha256(open(first, "rb").read()).hexdigest()
+    assert store.ingest(str(copy)) == photo_hash
+    assert store.blob_path(photo_hash) == os.path.join(store.root, photo_hash[:2], photo_hash)
+    blobs = [name for _, _, names in os.walk(store.root) for name in names if not name.endswith(".png")]
+    assert blobs == [photo_hash]
+
+    with Image.open(store.thumbnail_path(photo_hash)) as thumbnail:
+        assert thumbnail.width <= rc.PHOTO_THUMB_SIZE[0] and thumbnail.height <= rc.PHOTO_THUMB_SIZE[1]
+    assert store.ingest(make_image(tmp_path / "luces.jpg", "blue")) != photo_hash
+
+
+def test_non_images_are_rejected(tmp_path):
+    store = rc.PhotoStore(str(tmp_path / "fotos"))
+    not_an_image = tmp_path / "nota.jpg"
+    not_an_image.write_text("no es una foto")
+    with pytest.raises(UnidentifiedImageError):
+        store.ingest(str(not_an_image))
+    assert not os.path.exists(store.root) or not any(names for _, _, names in os.walk(store.root))
+
+
+def test_attaching_the_same_photo_twice_keeps_one_reference(conn):
+    cursor = conn.cursor()
+    photos = {"Frenos": [("abc123", "frenos.jpg")], "Luces": [("abc123", "frenos.jpg"), ("def456", "luces.jpg")]}
+    rc.attach_report_photos(cursor, 1, photos)
+    rc.attach_report_photos(cursor, 1, photos)  # Reenvío del mismo reporte
+    assert rc.get_report_photos(cursor, 1) == [("Frenos", "abc123"), ("Luces", "abc123"), ("Luces", "def456")]
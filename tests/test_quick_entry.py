@@ -0,0 +1,48 @@
+import json
+
+import reportes_camiones as rc
+from conftest import add_vehicle
+
+
+def insert(cursor, day, plate, checklist):
+    return rc.insert_report(cursor, 2, day, plate, "1000", json.dumps({"placa": plate}), json.dumps(checklist),
+                            f"Inspección {day}", "Firmado")
+
+
+def test_last_vehicle_checklist_returns_the_latest_report_of_the_vehicle(conn):
+    cursor = conn.cursor()
+    add_vehicle(cursor, "C900001")
+    insert(cursor, "2024-03-01", "C123456", {"Bocina": "Mal estado"})
+    latest = insert(cursor, "2024-03-02", "C123456", {"Bocina": "Buen estado", "Espejos": "N/A"})
+    insert(cursor, "2024-03-03", "C900001", {"Bocina": "Mal estado"})
+
+    assert rc.last_vehicle_checklist(cursor, "C123456") == (latest, "2024-03-02", {"Bocina": "Buen estado", "Espejos": "N/A"})
+    assert rc.last_vehicle_checklist(cursor, "C999999") is None
+
+
+def test_last_vehicle_checklist_keeps_only_current_items_and_statuses(conn):
+    cursor = conn.cursor()
+    report_id = insert(cursor, "2024-03-01", "C123456",
+                       {"Bocina": "Mal estado", "Llantas": "Buen estado", "Espejos": "Regular"})
+    assert rc.last_vehicle_checklist(cursor, "C123456") == (report_id, "2024-03-01", {"Bocina": "Mal estado"})
+
+    # Un checklist ilegible cuenta como vacío, no rompe el formulario
+    cursor.execute("UPDATE reports SET checklist_data = 'no es json' WHERE id = ?", (report_id,))
+    assert rc.last_vehicle_checklist(cursor, "C123456") == (report_id, "2024-03-01", {})
+    cursor.execute("UPDATE reports SET checklist_data = '[1, 2]' WHERE id = ?", (report_id,))
+    assert rc.last_vehicle_checklist(cursor, "C123456") == (report_id, "2024-03-01", {})
+
+
+def test_checklist_changes_lists_only_items_that_changed(conn):
+    previous = {"Bocina": "Buen estado", "Espejos": "Mal estado", "Acelerador": "N/A"}
+    current = {"Bocina": "Mal estado", "Espejos": "Mal estado", "Freno de Mano": "Buen estado"}
+    # Los ítems sin estado anterior no cuentan como cambio
+    assert rc.checklist_changes(previous, current) == {"Bocina": ("Buen estado", "Mal estado")}
+    assert rc.checklist_changes({}, current) == {}
+
+
+def test_plate_index_is_used_for_the_lookup(conn):
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN QUERY PLAN SELECT id, report_date, checklist_data FROM reports "
+                   "WHERE vehicle_plate = ? ORDER BY id DESC LIMIT 1", ("C123456",))
+    assert any("idx_reports_plate" in row[-1] for row in cursor.fetchall())
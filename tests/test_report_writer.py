@@ -0,0 +1,40 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+import reportes_camiones as rc
+
+
+def report(observations):
+    return {"driver_id": 2, "report_date": "2024-06-01", "vehicle_plate": "C123456", "km_actual": "1000",
+            "header_data": json.dumps({"placa": "C123456"}), "checklist_data": json.dumps({"Llantas": "Buen estado"}),
+            "observations": observations, "signature_confirmation": "Firmado"}
+
+
+def test_writer_gives_up_on_a_locked_database_and_keeps_the_spool(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(rc, "WRITE_RETRY_MAX_S", 0.3)
+    monkeypatch.setattr(rc, "WRITE_LOCK_TIMEOUT_S", 0.05)
+    spool_dir = str(tmp_path / "cola")
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")  # Otra estación con el bloqueo de escritura tomado
+    try:
+        writer = rc.ReportWriter(db_path, spool_dir, export=False)
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit(report("Bloqueado")).result(timeout=10)
+        assert writer.stats["lock_retries"] > 0
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert [name for name in os.listdir(spool_dir) if name.endswith(".json")]
+
+    # Al reiniciar, lo que quedó en la cola local se guarda
+    restarted = rc.ReportWriter(db_path, spool_dir, export=False)
+    report_id, _ = restarted.submit(report("Después")).result(timeout=10)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT observations FROM reports ORDER BY id").fetchall() == [("Bloqueado",), ("Después",)]
+    finally:
+        conn.close()
+    assert not [name for name in os.listdir(spool_dir) if name.endswith(".json")]
@@ -0,0 +1,30 @@
+import json
+
+import reportes_camiones as rc
+from conftest import add_vehicle
+
+
+def rollups(cursor):
+    cursor.execute("SELECT * FROM inspection_rollups ORDER BY period, vehicle_plate, item, bucket, promotion")
+    return cursor.fetchall()
+
+
+def test_incremental_rollups_match_a_rebuild(conn, db_path):
+    cursor = conn.cursor()
+    add_vehicle(cursor, "C900001")
+    checklists = [{"Llantas": "Buen estado", "Frenos": "Mal estado"}, {"Llantas": "Buen estado", "Luces": "N/A"}]
+    for day, checklist in zip(("2024-01-30", "2024-02-02"), checklists):
+        rc.insert_report(cursor, 2, day, "C900001", "1000", json.dumps({"placa": "C900001"}), json.dumps(checklist),
+                         "Sin novedad", "Firmado")
+    # Cambia la promoción: los reportes siguientes se agregan con la nueva, los anteriores conservan la suya
+    cursor.execute("UPDATE vehicles SET promotion = 'Promo B' WHERE plate = 'C900001'")
+    rc.insert_report(cursor, 2, "2024-02-03", "C900001", "1100", json.dumps({"placa": "C900001"}),
+                     json.dumps(checklists[0]), "Sin novedad", "Firmado")
+    conn.commit()
+
+    incremental = rollups(cursor)
+    cursor.execute("SELECT DISTINCT promotion FROM inspection_rollups WHERE vehicle_plate = 'C900001' ORDER BY promotion")
+    assert cursor.fetchall() == [("Promo A (Lanzamiento)",), ("Promo B",)]
+
+    rc.rebuild_inspection_rollups(db_path)
+    assert rollups(cursor) == incremental
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+import reportes_camiones as rc
+from conftest import add_pilot
+
+
+@pytest.fixture
+def pilots_with_reports(conn):
+    cursor = conn.cursor()
+    for username, full_name in (("ana_b", "Ana_B"), ("anaxb", "AnaXB"), ("cien", "100% Pérez"), ("jose", "José")):
+        driver_id = add_pilot(cursor, username, full_name)
+        rc.insert_report(cursor, driver_id, "2024-06-01", "C123456", "1000", json.dumps({"placa": "C123456"}),
+                         json.dumps({"Llantas": "Buen estado"}), f"Reporte de {full_name}", "Firmado")
+    conn.commit()
+    return conn
+
+
+@pytest.mark.parametrize("term, expected", [
+    ("a_b", ["Ana_B"]),
+    ("100%", ["100% Pérez"]),
+    ("0% p", ["100% Pérez"]),
+    ("josé", ["José"]),
+    ("JOSÉ", []),  # Como UPPER de SQLite: las mayúsculas solo se igualan en ASCII
+])
+def test_sql_and_in_memory_search_agree(pilots_with_reports, term, expected):
+    from_sql = rc.query_reports_df(pilots_with_reports, term)
+    in_memory = rc.filter_reports_df(rc.query_reports_df(pilots_with_reports), rc.search_key(term))
+    assert sorted(from_sql["piloto"]) == expected
+    assert sorted(in_memory["piloto"]) == expected
@@ -0,0 +1,38 @@
+import json
+
+import reportes_camiones as rc
+from conftest import add_pilot
+
+
+def test_snapshot_keeps_the_names_at_save_time(conn):
+    cursor = conn.cursor()
+    ana = add_pilot(cursor, "ana", "Ana")
+    checklist = {"Bocina": "Mal estado", "Acelerador": "Buen estado", "Espejos": "Buen estado", "Extra": "N/A"}
+    report_id = rc.insert_report(cursor, ana, "2024-06-01", "C123456", "1000", json.dumps({"placa": "C123456"}),
+                                 json.dumps(checklist), "Bocina no suena", "Firmado")
+    cursor.execute("UPDATE users SET full_name = 'Ana María' WHERE id = ?", (ana,))
+    cursor.execute("UPDATE vehicles SET promotion = 'Promo B' WHERE plate = 'C123456'")
+    cursor.execute("DELETE FROM users WHERE id = ?", (ana,))
+
+    snapshot = rc.get_report_snapshot(cursor, report_id)
+    assert snapshot["resumen"] == {"piloto": "Ana", "usuario": "ana", "marca": "FOTON", "promocion": "Promo A (Lanzamiento)",
+                                   "fallas": 1, "categorias": [["Pedales", 1], ["General", 2]]}
+    # Ordenado por categoría; lo que no está en CHECKLIST_ITEMS va al final
+    assert list(snapshot["checklist_data"]) == ["Acelerador", "Espejos", "Bocina", "Extra"]
+    assert snapshot["header_data"] == {"placa": "C123456"}
+
+
+def test_outdated_snapshots_are_rebuilt(conn, db_path, monkeypatch):
+    cursor = conn.cursor()
+    report_id = rc.insert_report(cursor, 2, "2024-06-01", "C123456", "1000", json.dumps({"placa": "C123456"}),
+                                 json.dumps({"Bocina": "Buen estado"}), "Sin novedad", "Firmado")
+    cursor.execute("DELETE FROM report_snapshots")
+    conn.commit()
+    # Sin instantánea guardada se arma en el momento
+    assert rc.get_report_snapshot(cursor, report_id)["resumen"]["piloto"] == "Juan Pérez"
+
+    monkeypatch.setattr(rc, "SNAPSHOT_VERSION", rc.SNAPSHOT_VERSION + 1)
+    assert rc.rebuild_report_snapshots(db_path) == 1
+    assert rc.rebuild_report_snapshots(db_path) == 0  # Ya están al día
+    cursor.execute("SELECT version FROM report_snapshots WHERE report_id = ?", (report_id,))
+    assert cursor.fetchone() == (rc.SNAPSHOT_VERSION,)
@@ -0,0 +1,209 @@
+import http.client
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import zlib
+
+import pytest
+
+import reportes_camiones as rc
+from conftest import add_pilot, add_vehicle
+
+TOKEN = "clave-de-prueba"
+
+
+@pytest.fixture
+def central(tmp_path):
+    """Servidor central en un puerto libre; devuelve (url, ruta de la base central)."""
+    central_db = str(tmp_path / "central.db")
+    server = rc.create_sync_server(central_db, port=0, token=TOKEN)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", central_db
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def depots(tmp_path):
+    paths = []
+    for name in ("deposito_a.db", "deposito_b.db"):
+        path = str(tmp_path / name)
+        rc.inicializar_db(path)
+        paths.append(path)
+    return paths
+
+
+def run(db_path, statement, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(statement, params).fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def add_report(db_path, username, day, km="1000", observations="Sin novedad"):
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+        report_id = rc.insert_report(cursor, cursor.fetchone()[0], day, "C123456", km, json.dumps({"placa": "C123456"}),
+                                     json.dumps({"Llantas": "Buen estado"}), observations, "Firmado")
+        conn.commit()
+        return report_id
+    finally:
+        conn.close()
+
+
+def sync(url, db_path):
+    return rc.sync_with_central(url, db_name=db_path, token=TOKEN)
+
+
+def stamp_last_change(db_path, changed_at):
+    """Fija la fecha del último cambio registrado (para decidir qué escritura es la última)."""
+    run(db_path, "UPDATE change_log SET changed_at = ? WHERE seq = (SELECT MAX(seq) FROM change_log)", (changed_at,))
+
+
+def test_round_trip_depot_central_depot(central, depots):
+    url, central_db = central
+    depot_a, depot_b = depots
+    conn = sqlite3.connect(depot_a)
+    add_pilot(conn.cursor(), "ana", "Ana")
+    add_vehicle(conn.cursor(), "C900001")
+    rc.assign_vehicle(conn.cursor(), "C900001", conn.execute("SELECT id FROM users WHERE username = 'ana'").fetchone()[0])
+    conn.commit()
+    conn.close()
+    add_report(depot_a, "piloto1", "2024-06-01")
+
+    assert sync(url, depot_a)["pushed"] > 0
+    assert run(central_db, "SELECT report_date, observations FROM reports") == [("2024-06-01", "Sin novedad")]
+
+    assert sync(url, depot_b)["pulled"] > 0
+    assert run(depot_b, "SELECT full_name, role, assigned_vehicle_plate FROM users WHERE username = 'ana'") == [
+        ("Ana", "piloto", "C900001")]
+    # Los reportes de otros depósitos no se copian a los depósitos; solo los datos de referencia
+    assert run(depot_b, "SELECT COUNT(*) FROM reports") == [(0,)]
+    # Lo recibido de la central no vuelve a enviarse
+    assert sync(url, depot_b) == {"pushed": 0, "rejected": 0, "pulled": 0}
+
+
+def test_last_write_wins_between_depots(central, depots):
+    url, central_db = central
+    depot_a, depot_b = depots
+    conn = sqlite3.connect(depot_a)
+    add_pilot(conn.cursor(), "ana", "Ana")
+    conn.commit()
+    conn.close()
+    sync(url, depot_a)
+    sync(url, depot_b)
+
+    run(depot_a, "UPDATE users SET full_name = 'Ana (A)' WHERE username = 'ana'")
+    stamp_last_change(depot_a, "2030-01-01 10:00:00.000")
+    run(depot_b, "UPDATE users SET full_name = 'Ana (B)' WHERE username = 'ana'")
+    stamp_last_change(depot_b, "2030-01-01 12:00:00.000")
+
+    # B escribió después: gana aunque A sincronice último
+    sync(url, depot_b)
+    assert sync(url, depot_a)["rejected"] == 1
+    assert run(central_db, "SELECT full_name FROM users WHERE username = 'ana'") == [("Ana (B)",)]
+
+    # La central vuelve a publicar su versión: A la recibe en la siguiente sincronización
+    sync(url, depot_a)
+    assert run(depot_a, "SELECT full_name FROM users WHERE username = 'ana'") == [("Ana (B)",)]
+    sync(url, depot_b)
+    assert run(depot_b, "SELECT full_name FROM users WHERE username = 'ana'") == [("Ana (B)",)]
+
+
+def test_retried_push_does_not_duplicate_reports(central, depots):
+    url, central_db = central
+    depot_a, _ = depots
+    add_report(depot_a, "piloto1", "2024-06-01")
+    add_report(depot_a, "piloto1", "2024-06-02", km="1100")
+    sync(url, depot_a)
+
+    # Respuesta perdida: el depósito no registró el envío y vuelve a mandar todo
+    run(depot_a, "UPDATE sync_state SET value = '0' WHERE key = 'last_pushed_seq'")
+    sync(url, depot_a)
+
+    assert run(central_db, "SELECT COUNT(*) FROM reports") == [(2,)]
+    assert run(central_db, "SELECT COUNT(*) FROM sync_report_origin") == [(2,)]
+
+
+def test_same_batch_applied_twice(depots, tmp_path):
+    depot_a, _ = depots
+    central_db = str(tmp_path / "central.db")
+    rc.inicializar_db(central_db)
+    add_report(depot_a, "piloto1", "2024-06-01")
+    conn = sqlite3.connect(depot_a)
+    changes, _ = rc.collect_changes(conn.cursor(), 0, rc.SYNC_BATCH_SIZE, entities=("report",))
+    conn.close()
+
+    central_conn = sqlite3.connect(central_db, isolation_level=None)
+    try:
+        assert rc.apply_pushed_changes(central_conn, "sitio-a", changes) == (1, 0)
+        assert rc.apply_pushed_changes(central_conn, "sitio-a", changes) == (0, 0)
+    finally:
+        central_conn.close()
+    assert run(central_db, "SELECT COUNT(*) FROM reports") == [(1,)]
+
+
+def test_sync_requires_the_shared_key(central, depots, tmp_path):
+    url, _ = central
+    with pytest.raises(urllib.error.HTTPError) as error:
+        rc.sync_with_central(url, db_name=depots[0], token="otra-clave")
+    assert error.value.code == 401
+    with pytest.raises(ValueError):
+        rc.sync_with_central(url, db_name=depots[0])
+    with pytest.raises(ValueError):
+        rc.create_sync_server(str(tmp_path / "sin_clave.db"), port=0)
+
+
+def test_central_rejects_plaintext_passwords(central, depots):
+    url, central_db = central
+    body = rc.encode_sync_payload({"site_id": "intruso", "changes": [
+        {"entity": "user", "username": "intruso", "password": "1234", "full_name": "Intruso", "role": "admin",
+         "is_active": 1, "deleted": False, "changed_at": "2030-01-01 00:00:00.000"}]})
+
+    assert rc._sync_request(f"{url}/push", TOKEN, body) == {"applied": 0, "rejected": 1}
+    assert run(central_db, "SELECT COUNT(*) FROM users WHERE username = 'intruso'") == [(0,)]
+
+
+def test_pilot_created_in_the_same_batch_keeps_the_vehicle(tmp_path):
+    central_db = str(tmp_path / "central.db")
+    rc.inicializar_db(central_db)
+    changed_at = "2030-01-01 00:00:00.000"
+    # El vehículo llega antes que el piloto al que está asignado
+    changes = [{"entity": "vehicle", "plate": "C900001", "brand": "FOTON", "promotion": "Promo A",
+                "assigned_username": "ana", "deleted": False, "changed_at": changed_at},
+               {"entity": "user", "username": "ana", "password": "", "full_name": "Ana", "role": "piloto",
+                "is_active": 1, "previous_username": None, "deleted": False, "changed_at": changed_at}]
+
+    central_conn = sqlite3.connect(central_db, isolation_level=None)
+    try:
+        assert rc.apply_pushed_changes(central_conn, "sitio-a", changes) == (2, 0)
+    finally:
+        central_conn.close()
+    assert run(central_db, "SELECT u.username FROM vehicles v JOIN users u ON u.id = v.assigned_to_user_id "
+                           "WHERE v.plate = 'C900001'") == [("ana",)]
+
+
+def test_central_rejects_oversized_batches(central):
+    url, _ = central
+    # Se rechaza por la longitud declarada, sin leer el cuerpo
+    connection = http.client.HTTPConnection(urllib.parse.urlsplit(url).netloc, timeout=10)
+    connection.putrequest("POST", "/push")
+    connection.putheader("Authorization", f"Bearer {TOKEN}")
+    connection.putheader("Content-Length", str(rc.SYNC_MAX_BODY_BYTES + 1))
+    connection.endheaders()
+    assert connection.getresponse().status == 413
+    connection.close()
+
+    # Poco comprimido, enorme al descomprimir
+    bomb = zlib.compress(b" " * (rc.SYNC_MAX_PAYLOAD_BYTES + 1), 9)
+    assert len(bomb) < rc.SYNC_MAX_BODY_BYTES
+    with pytest.raises(urllib.error.HTTPError) as error:
+        rc._sync_request(f"{url}/push", TOKEN, bomb)
+    assert error.value.code == 400
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+
+import pytest
+
+import reportes_camiones as rc
+
+ORDER_COLUMNS = "vehicle_plate, item, status, opened_report_id, last_report_id, closed_report_id, opened_at, updated_at, occurrences"
+
+
+@pytest.fixture
+def autocommit(db_path):
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    yield connection
+    connection.close()
+
+
+def orders(cursor):
+    cursor.execute(f"SELECT {ORDER_COLUMNS} FROM work_orders ORDER BY item, opened_report_id")
+    return cursor.fetchall()
+
+
+def replayed_orders(cursor):
+    """Órdenes recalculadas desde cero con los reportes que quedan (la referencia correcta)."""
+    cursor.execute("SAVEPOINT replay")
+    cursor.execute("DELETE FROM work_orders")
+    cursor.execute("SELECT id, vehicle_plate, report_date, checklist_data FROM reports ORDER BY id")
+    for report_id, plate, report_date, checklist_data in cursor.fetchall():
+        rc.update_work_orders(cursor, report_id, plate, report_date, json.loads(checklist_data))
+    result = orders(cursor)
+    cursor.execute("ROLLBACK TO replay")
+    cursor.execute("RELEASE replay")
+    return result
+
+
+# Secuencias de estados de "Frenos"; el reporte marcado con * es el duplicado (mismo contenido que el primero)
+@pytest.mark.parametrize("statuses", [
+    ["Mal estado", "Mal estado*"],                                     # Reintento: una ocurrencia de más
+    ["Mal estado", "Buen estado", "Mal estado*", "Mal estado"],        # El duplicado abrió una orden
+    ["Mal estado", "Buen estado", "Mal estado*"],                      # ...que no habría existido
+    ["Mal estado", "Mal estado", "Mal estado*"],                       # Era la última ocurrencia
+    ["Buen estado", "Mal estado", "Buen estado*", "Mal estado"],       # Cerró una orden que seguía abierta
+    ["Buen estado", "Mal estado", "Buen estado*", "Buen estado"],      # ...que cerraba el siguiente
+    ["Buen estado", "Mal estado", "Buen estado*"],                     # ...que queda abierta
+])
+def test_removing_a_duplicate_reconciles_work_orders(autocommit, statuses):
+    cursor = autocommit.cursor()
+    cursor.execute("BEGIN")
+    ids = []
+    for day, status in enumerate(statuses, start=1):
+        checklist = json.dumps({"Frenos": status.rstrip("*"), "Llantas": "Mal estado"})
+        ids.append(rc.insert_report(cursor, 2, f"2024-06-{day:02d}", "C123456", str(1000 + day), json.dumps({"placa": "C123456"}),
+                                    checklist, f"Día {day}", "Firmado"))
+    cursor.execute("COMMIT")
+    duplicate_id = ids[[status.endswith("*") for status in statuses].index(True)]
+
+    assert rc.remove_duplicate_reports(autocommit, [[ids[0], duplicate_id]]) == 1
+    cursor.execute("BEGIN")
+    assert orders(cursor) == replayed_orders(cursor)
+    cursor.execute("ROLLBACK")